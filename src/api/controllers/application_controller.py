@@ -1,45 +1,69 @@
-from fastapi import FastAPI, HTTPException, Depends, APIRouter
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import FastAPI, HTTPException, Depends, APIRouter, Query
+from sqlalchemy.orm import Session, contains_eager, selectinload
+from typing import List, Optional
 from src.api.models.application import Application
+from src.api.models.cash_flow_metrics import CashFlowMetrics
+from src.api.models.webhook import WebhookEventType
 from src.api.schemas.application_schema import ApplicationCreate, ApplicationUpdate, ApplicationResponse
-from src.core.database import get_db
-from src.core.security import get_current_user
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user
+from src.services.cross_document_validator import normalize_business_name
 from src.services.data_validator import DataValidator
+from src.services.merchant_matching import rename_merchant, save_merchant
 from src.services.webhook_service import WebhookService
 
 router = APIRouter()
 
+# Cash-flow metrics the application list can be sorted by; each has an index
+SORTABLE_METRICS = {
+    'average_daily_balance': CashFlowMetrics.average_daily_balance,
+    'average_monthly_deposits': CashFlowMetrics.average_monthly_deposits,
+    'nsf_count': CashFlowMetrics.nsf_count,
+    'negative_balance_days': CashFlowMetrics.negative_balance_days,
+}
+
 @router.post('/', response_model=ApplicationResponse)
-async def create_application(
+def create_application(
     application: ApplicationCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ) -> ApplicationResponse:
     # Validate application data using DataValidator
-    DataValidator.validate_application(application)
-
-    # Create new Application instance
-    new_application = Application(**application.dict())
+    validation_results = DataValidator().validate_application(application.dict())
+    if validation_results["errors"]:
+        raise HTTPException(status_code=422, detail=validation_results["errors"])
+
+    # Create new Application instance with its form fields; applications entered through the API have no email behind them
+    new_application = Application()
+    new_application.email_id = f'<{new_application.id}@api>'
+    new_application.applicant_email = application.applicant_email
+    new_application.business_type = application.business_type
+    new_application.requested_amount = application.requested_amount
+    new_application.purpose_of_funding = application.purpose_of_funding
 
     # Add application to database session
     db.add(new_application)
 
+    # Name the application's merchant, indexed for matching against other applications
+    normalized_name = normalize_business_name(application.business_name)
+    if normalized_name:
+        save_merchant(db, new_application.id, application.business_name, normalized_name)
+
     # Commit changes to database
     db.commit()
     db.refresh(new_application)
 
     # Trigger webhook notification for new application
-    WebhookService.notify_new_application(new_application)
+    WebhookService().trigger_webhook(WebhookEventType.APPLICATION_CREATED, {'application_id': new_application.id}, db)
 
     # Return created application
     return ApplicationResponse.from_orm(new_application)
 
 @router.get('/{application_id}', response_model=ApplicationResponse)
-async def get_application(
-    application_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def get_application(
+    application_id: str,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ) -> ApplicationResponse:
     # Query database for application with given ID
     application = db.query(Application).filter(Application.id == application_id).first()
@@ -52,24 +76,52 @@ async def get_application(
     return ApplicationResponse.from_orm(application)
 
 @router.get('/', response_model=List[ApplicationResponse])
-async def get_applications(
+def get_applications(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    sort_by: Optional[str] = Query(None, regex=f"^({'|'.join(SORTABLE_METRICS)})$"),
+    descending: bool = False,
+    min_average_daily_balance: Optional[float] = None,
+    min_average_monthly_deposits: Optional[float] = None,
+    max_nsf_count: Optional[int] = None,
+    max_negative_balance_days: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ) -> List[ApplicationResponse]:
+    # Join the precomputed cash-flow metrics, loading them with each application, and load the page's merchants in one query
+    query = (
+        db.query(Application)
+        .outerjoin(Application.cash_flow)
+        .options(contains_eager(Application.cash_flow), selectinload(Application.merchant))
+    )
+
+    # Filter on the metrics; applications without bank statements have none and are left out
+    if min_average_daily_balance is not None:
+        query = query.filter(CashFlowMetrics.average_daily_balance >= min_average_daily_balance)
+    if min_average_monthly_deposits is not None:
+        query = query.filter(CashFlowMetrics.average_monthly_deposits >= min_average_monthly_deposits)
+    if max_nsf_count is not None:
+        query = query.filter(CashFlowMetrics.nsf_count <= max_nsf_count)
+    if max_negative_balance_days is not None:
+        query = query.filter(CashFlowMetrics.negative_balance_days <= max_negative_balance_days)
+
+    # Sort on a metric, applications without one last, with the id keeping pages stable
+    if sort_by:
+        column = SORTABLE_METRICS[sort_by]
+        query = query.order_by((column.desc() if descending else column.asc()).nullslast(), Application.id)
+
     # Query database for applications with pagination
-    applications = db.query(Application).offset(skip).limit(limit).all()
+    applications = query.offset(skip).limit(limit).all()
 
     # Return list of applications
     return [ApplicationResponse.from_orm(app) for app in applications]
 
 @router.patch('/{application_id}', response_model=ApplicationResponse)
-async def update_application(
-    application_id: int,
+def update_application(
+    application_id: str,
     application_update: ApplicationUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ) -> ApplicationResponse:
     # Query database for application with given ID
     application = db.query(Application).filter(Application.id == application_id).first()
@@ -78,11 +130,19 @@ async def update_application(
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
 
-    # Validate updated application data using DataValidator
-    DataValidator.validate_application_update(application_update)
+    # Validate the fields being changed using DataValidator
+    changes = application_update.dict(exclude_unset=True, exclude_none=True)
+    validation_results = DataValidator().validate_application(changes)
+    if validation_results["errors"]:
+        raise HTTPException(status_code=422, detail=validation_results["errors"])
+
+    # The business name belongs to the merchant, which is re-indexed for matching when renamed
+    business_name = changes.pop('business_name', None)
+    if business_name is not None:
+        rename_merchant(db, application.id, business_name, normalize_business_name(business_name))
 
     # Update application with new data
-    for key, value in application_update.dict(exclude_unset=True).items():
+    for key, value in changes.items():
         setattr(application, key, value)
 
     # Commit changes to database
@@ -90,7 +150,7 @@ async def update_application(
     db.refresh(application)
 
     # Trigger webhook notification for updated application
-    WebhookService.notify_updated_application(application)
+    WebhookService().trigger_webhook(WebhookEventType.APPLICATION_UPDATED, {'application_id': application.id}, db)
 
     # Return updated application
-    return ApplicationResponse.from_orm(application)
\ No newline at end of file
+    return ApplicationResponse.from_orm(application)
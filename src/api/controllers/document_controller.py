@@ -1,65 +1,108 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+import os
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, APIRouter, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
-from src.api.models.document import Document
+from src.api.models.application import Application
+from src.api.models.document import Document, application_documents
+from src.api.responses import FileRangeResponse, RangeNotSatisfiable, etag_matches, parse_range
 from src.api.schemas.document_schema import DocumentCreate, DocumentUpdate, DocumentResponse
-from src.core.database import get_db
-from src.core.security import get_current_user
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user
 from src.services.document_classifier import DocumentClassifier
-from src.services.ocr_engine import OCREngine
-from src.services.data_extractor import DataExtractor
-from src.utils.helpers import save_upload_file
+from src.services.extraction_queue import enqueue_documents
+from src.services.storage import document_key, get_storage
+from src.utils.helpers import file_md5, remove_file, save_upload_file
+from src.utils.tracing import trace_stage
 
 router = APIRouter()
 
 @router.post('/', response_model=DocumentResponse)
-async def upload_document(
+def upload_document(
     file: UploadFile = File(...),
-    application_id: int,
+    application_id: str = Query(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Upload a new document for an MCA application
-    """
-    # Save uploaded file using save_upload_file helper
-    file_path = await save_upload_file(file)
-
-    # Classify document using DocumentClassifier
-    document_classifier = DocumentClassifier()
-    document_type = document_classifier.classify(file_path)
-
-    # Perform OCR on document using OCREngine
-    ocr_engine = OCREngine()
-    ocr_result = ocr_engine.process(file_path)
-
-    # Extract data from OCR result using DataExtractor
-    data_extractor = DataExtractor()
-    extracted_data = data_extractor.extract(ocr_result)
-
-    # Create new Document instance with extracted data
-    new_document = Document(
-        application_id=application_id,
-        file_path=file_path,
-        document_type=document_type,
-        extracted_data=extracted_data
-    )
-
-    # Add document to database session
-    db.add(new_document)
 
-    # Commit changes to database
-    db.commit()
-    db.refresh(new_document)
+    The file is classified and stored under its content hash, and queued for
+    OCR, extraction and validation by the extraction workers in the
+    transaction creating the document. A file that was uploaded before is
+    linked to the application instead of being stored and queued again.
+    """
+    with trace_stage("document_upload", application_id=application_id) as span:
+        # Save uploaded file using save_upload_file helper
+        file_path = save_upload_file(file)
+        try:
+            file_size = os.path.getsize(file_path)
+            md5_hash = file_md5(file_path)
+
+            # Documents are uploaded for an existing application
+            if db.query(Application.id).filter(Application.id == application_id).scalar() is None:
+                raise HTTPException(status_code=404, detail="Application not found")
+
+            # A file stored before keeps its document; the application is linked to it
+            existing_document = db.query(Document).filter(Document.md5_hash == md5_hash).first()
+            if existing_document is not None:
+                return link_document(db, existing_document, application_id)
+
+            # End the lookups' transaction rather than hold it through classification and storage
+            db.rollback()
+
+            # Classify document using DocumentClassifier
+            document_classifier = DocumentClassifier()
+            document_type = document_classifier.classify_document(Path(file_path), {'file_name': file.filename, 'file_size': file_size})
+
+            # Hand the file to the storage backend under its content hash before the write transaction,
+            # which then stays short, and before the commit makes the extraction job claimable
+            storage = get_storage()
+            storage_key = document_key(md5_hash, file.filename)
+            content_type = file.content_type or 'application/octet-stream'
+            storage.store_file(storage_key, file_path, content_type)
+
+            # Create new Document instance, queued for extraction; its row must exist before its job
+            new_document = Document(application_id, document_type, file.filename, storage_key, content_type, file_size, md5_hash)
+            try:
+                db.add(new_document)
+                db.flush()
+                enqueue_documents(db, [new_document])
+                span.set_attribute("document_id", new_document.id)
+                db.commit()
+            except IntegrityError:
+                # The same file was uploaded concurrently and stored under the same key; link the application to that document
+                db.rollback()
+                return link_document(db, db.query(Document).filter(Document.md5_hash == md5_hash).one(), application_id)
+            except Exception:
+                # Remove the stored file again, unless another document holds the same content
+                db.rollback()
+                if db.query(Document.id).filter(Document.md5_hash == md5_hash).scalar() is None:
+                    storage.delete(storage_key)
+                raise
+        finally:
+            remove_file(file_path)
+        db.refresh(new_document)
 
     # Return created document
     return new_document
 
+def link_document(db: Session, document: Document, application_id: str) -> Document:
+    """Link an application to a document already stored, once, and return the document"""
+    link = {'application_id': application_id, 'document_id': document.id}
+    if document.application_id != application_id and not db.query(application_documents).filter_by(**link).first():
+        db.execute(application_documents.insert().values(**link))
+        db.commit()
+    return document
+
 @router.get('/{document_id}', response_model=DocumentResponse)
 def get_document(
-    document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    document_id: str,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Retrieve a specific document by ID
@@ -74,27 +117,92 @@ def get_document(
     # Return found document
     return document
 
+@router.get('/{document_id}/content')
+def get_document_content(
+    document_id: str,
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
+) -> Response:
+    """
+    Download a document's content, or one byte range of it
+
+    Local files are sent without passing through Python memory; documents in
+    S3 are served by redirecting to a presigned URL. The ETag is the
+    document's MD5 hash, so unchanged documents are revalidated with 304.
+    """
+    # Query database for document with given ID
+    document = db.query(Document).filter(Document.id == document_id).first()
+
+    # If document not found, raise HTTPException
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # The client already holds this version of the document
+    etag = f'"{document.md5_hash}"'
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': 'private'}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+
+    # Let the object store serve the bytes (and any Range) directly
+    storage = get_storage()
+    url = storage.presigned_url(document.file_path, filename=document.file_name)
+    if url is not None:
+        return RedirectResponse(url, status_code=307, headers={'Cache-Control': 'no-store'})
+
+    try:
+        size = storage.size(document.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document content not found")
+
+    # A Range only applies to the version named by If-Range, if one is given
+    if_range = request.headers.get('if-range')
+    range_header = request.headers.get('range') if if_range is None or if_range == etag else None
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    if byte_range is not None:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Disposition'] = 'inline; filename="{}"'.format(document.file_name.replace('"', ''))
+    status_code = 206 if byte_range is not None else 200
+
+    # Local files are sent by the server itself; other backends are streamed in chunks
+    path = storage.local_path(document.file_path)
+    if path is not None:
+        return FileRangeResponse(path, start, end, status_code=status_code, headers=headers, media_type=document.content_type)
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(storage.read_range(document.file_path, start, end), status_code=status_code, headers=headers, media_type=document.content_type)
+
 @router.get('/application/{application_id}', response_model=List[DocumentResponse])
 def get_application_documents(
-    application_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    application_id: str,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Retrieve all documents for a specific MCA application
     """
-    # Query database for documents associated with given application ID
-    documents = db.query(Document).filter(Document.application_id == application_id).all()
+    # Query database for documents ingested for the application or linked to it as duplicates
+    documents = (
+        db.query(Document)
+        .outerjoin(application_documents, application_documents.c.document_id == Document.id)
+        .filter(or_(Document.application_id == application_id, application_documents.c.application_id == application_id))
+        .distinct()
+        .all()
+    )
 
     # Return list of documents
     return documents
 
 @router.patch('/{document_id}', response_model=DocumentResponse)
 def update_document(
-    document_id: int,
+    document_id: str,
     document_update: DocumentUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Update an existing document's metadata
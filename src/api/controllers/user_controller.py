@@ -1,16 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, APIRouter
 from sqlalchemy.orm import Session
 from typing import List
 from src.api.models.user import User
 from src.api.schemas.user_schema import UserCreate, UserUpdate, UserResponse
-from src.core.database import get_db
-from src.core.security import get_current_user, get_password_hash, verify_password
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user, get_password_hash, verify_password, invalidate_cached_user
 from src.utils.logger import logger
 
 router = APIRouter()
 
 @router.post('/', response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can create new users")
@@ -45,7 +45,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: U
     return new_user
 
 @router.get('/{user_id}', response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_user(user_id: int, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges or is requesting their own information
     if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to access this user's information")
@@ -61,7 +61,7 @@ def get_user(user_id: int, db: Session = Depends(get_db), current_user: User = D
     return user
 
 @router.get('/', response_model=List[UserResponse])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can retrieve user list")
@@ -73,7 +73,7 @@ def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), cu
     return users
 
 @router.patch('/{user_id}', response_model=UserResponse)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges or is updating their own information
     if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user's information")
@@ -96,6 +96,9 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     # Commit changes to database
     db.commit()
     db.refresh(user)
+
+    # Drop cached authentications so the change applies to the next request
+    invalidate_cached_user(user.id)
     
     # Log user update
     logger.info(f"User updated: {user.email}")
@@ -104,7 +107,7 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     return user
 
 @router.delete('/{user_id}')
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Only admins can delete users")
@@ -121,6 +124,9 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User
     
     # Commit changes to database
     db.commit()
+
+    # Drop cached authentications so the user's tokens stop working immediately
+    invalidate_cached_user(user.id)
     
     # Log user deletion
     logger.info(f"User deleted: {user.email}")
@@ -3,20 +3,17 @@ from sqlalchemy.orm import Session
 from typing import List
 from src.api.models.webhook import Webhook
 from src.api.schemas.webhook_schema import WebhookCreate, WebhookUpdate, WebhookResponse
-from src.core.database import get_db
-from src.core.security import get_current_user
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user
 from src.services.webhook_service import WebhookService
 from src.utils.logger import logger
 
 router = APIRouter()
 
 @router.post('/', response_model=WebhookResponse)
-def create_webhook(webhook: WebhookCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Validate webhook URL using WebhookService
-    WebhookService.validate_url(webhook.url)
-
-    # Create new Webhook instance
-    new_webhook = Webhook(**webhook.dict(), user_id=current_user.id)
+def create_webhook(webhook: WebhookCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    # Create new Webhook instance owned by the current user; WebhookCreate has already checked the URL is well-formed
+    new_webhook = Webhook(url=str(webhook.url), event_type=webhook.event_type, user_id=current_user.id)
 
     # Add webhook to database session
     db.add(new_webhook)
@@ -32,7 +29,7 @@ def create_webhook(webhook: WebhookCreate, db: Session = Depends(get_db), curren
     return new_webhook
 
 @router.get('/{webhook_id}', response_model=WebhookResponse)
-def get_webhook(webhook_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_webhook(webhook_id: str, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Query database for webhook with given ID
     webhook = db.query(Webhook).filter(Webhook.id == webhook_id, Webhook.user_id == current_user.id).first()
 
@@ -44,7 +41,7 @@ def get_webhook(webhook_id: int, db: Session = Depends(get_db), current_user: Us
     return webhook
 
 @router.get('/', response_model=List[WebhookResponse])
-def get_webhooks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_webhooks(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Query database for webhooks with pagination
     webhooks = db.query(Webhook).filter(Webhook.user_id == current_user.id).offset(skip).limit(limit).all()
 
@@ -52,7 +49,7 @@ def get_webhooks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
     return webhooks
 
 @router.patch('/{webhook_id}', response_model=WebhookResponse)
-def update_webhook(webhook_id: int, webhook_update: WebhookUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_webhook(webhook_id: str, webhook_update: WebhookUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Query database for webhook with given ID
     webhook = db.query(Webhook).filter(Webhook.id == webhook_id, Webhook.user_id == current_user.id).first()
 
@@ -60,13 +57,9 @@ def update_webhook(webhook_id: int, webhook_update: WebhookUpdate, db: Session =
     if not webhook:
         raise HTTPException(status_code=404, detail="Webhook not found")
 
-    # If URL is being updated, validate new URL using WebhookService
-    if webhook_update.url:
-        WebhookService.validate_url(webhook_update.url)
-
-    # Update webhook with new data
+    # Update webhook with new data; WebhookUpdate has already checked a new URL is well-formed
     for key, value in webhook_update.dict(exclude_unset=True).items():
-        setattr(webhook, key, value)
+        setattr(webhook, key, str(value) if key == 'url' else value)
 
     # Commit changes to database
     db.commit()
@@ -79,7 +72,7 @@ def update_webhook(webhook_id: int, webhook_update: WebhookUpdate, db: Session =
     return webhook
 
 @router.delete('/{webhook_id}')
-def delete_webhook(webhook_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_webhook(webhook_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Query database for webhook with given ID
     webhook = db.query(Webhook).filter(Webhook.id == webhook_id, Webhook.user_id == current_user.id).first()
 
@@ -100,7 +93,7 @@ def delete_webhook(webhook_id: int, db: Session = Depends(get_db), current_user:
     return {"message": "Webhook deleted successfully"}
 
 @router.post('/{webhook_id}/test')
-def test_webhook(webhook_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def test_webhook(webhook_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Query database for webhook with given ID
     webhook = db.query(Webhook).filter(Webhook.id == webhook_id, Webhook.user_id == current_user.id).first()
 
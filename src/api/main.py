@@ -1,10 +1,15 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from src.core.config import settings
-from src.core.database import get_db
+from src.core.database import get_db, get_pool_stats, replica_engines
+from src.core.metrics import registry
 from src.core.security import get_current_user
-from src.api.routes import application_routes, document_routes, user_routes, webhook_routes
+from src.utils.logger import setup_logger
+from src.api.routes import application_routes, auth_routes, document_routes, user_routes, webhook_routes
 
 app = FastAPI()
 
@@ -18,8 +23,19 @@ def configure_cors():
         allow_headers=["*"],
     )
 
+def configure_threadpool():
+    # Route handlers that use the synchronous database Session are declared
+    # with plain "def" so FastAPI runs them via run_in_threadpool, which uses
+    # the event loop's default executor. Size that executor explicitly so the
+    # number of concurrent blocking handlers per worker is tunable.
+    loop = asyncio.get_event_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.THREADPOOL_MAX_WORKERS, thread_name_prefix="api-worker")
+    )
+
 def include_routers():
     # Include all API routers in the main application
+    app.include_router(auth_routes.router, prefix=settings.API_V1_STR)
     app.include_router(application_routes.router, prefix="/applications")
     app.include_router(document_routes.router, prefix="/documents")
     app.include_router(user_routes.router, prefix="/users")
@@ -30,6 +46,8 @@ async def startup_event():
     # Log application startup
     print("Application is starting up...")
     # Perform any necessary initialization tasks
+    setup_logger()
+    configure_threadpool()
     configure_cors()
     include_routers()
 
@@ -47,6 +65,19 @@ async def root():
         "version": settings.API_VERSION
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Expose pipeline stage latencies, application ingestion latency and pool usage for Prometheus
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    # Return connection pool occupancy and checkout wait counters for every engine
+    return {
+        "primary": get_pool_stats(),
+        "replicas": [get_pool_stats(replica_engine) for replica_engine in replica_engines],
+    }
+
 # Human tasks:
 # 1. Review and update CORS settings in the configure_cors function if necessary
 # 2. Add any additional initialization tasks in the startup_event function
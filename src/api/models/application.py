@@ -1,15 +1,19 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float, Numeric
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
 from src.core.database import Base
-from src.api.models.document import Document
+from src.api.models.cash_flow_metrics import CashFlowMetrics
+from src.api.models.document import Document, application_documents
 from src.api.models.merchant import Merchant
-from src.api.models.owner import Owner
-from src.api.models.funding import Funding
 
-# Define the ApplicationStatus enum
-ApplicationStatus = Enum('PENDING', 'APPROVED', 'REJECTED', 'UNDER_REVIEW', name='application_status')
+class ApplicationStatus(str, enum.Enum):
+    """Statuses an application moves through"""
+    PENDING = 'PENDING'
+    APPROVED = 'APPROVED'
+    REJECTED = 'REJECTED'
+    UNDER_REVIEW = 'UNDER_REVIEW'
 
 class Application(Base):
     """Represents an MCA application in the system"""
@@ -18,16 +22,24 @@ class Application(Base):
 
     # Define columns
     id = Column(String, primary_key=True)
-    email_id = Column(String, nullable=False)
-    status = Column(ApplicationStatus, nullable=False)
+    # Message-ID of the email the application arrived in; re-delivered emails map to the same application
+    email_id = Column(String, nullable=False, unique=True)
+    status = Column(Enum(ApplicationStatus, name='application_status'), nullable=False)
     received_date = Column(DateTime, nullable=False)
     processed_date = Column(DateTime)
+    # Application form fields; applications ingested from email have none
+    applicant_email = Column(String)
+    business_type = Column(String)
+    requested_amount = Column(Numeric(14, 2))
+    purpose_of_funding = Column(String)
 
     # Define relationships
     documents = relationship('Document', back_populates='application')
+    # Documents first ingested for another application and resent with this one
+    linked_documents = relationship('Document', secondary=application_documents)
     merchant = relationship('Merchant', back_populates='application', uselist=False)
-    owners = relationship('Owner', back_populates='application')
-    funding = relationship('Funding', back_populates='application', uselist=False)
+    # Aggregated over the application's bank statements as they are extracted
+    cash_flow = relationship('CashFlowMetrics', back_populates='application', uselist=False)
 
     def __init__(self):
         """Initializes a new Application instance"""
@@ -38,4 +50,9 @@ class Application(Base):
         self.received_date = datetime.utcnow()
         
         # Set the initial status to PENDING
-        self.status = ApplicationStatus.PENDING
\ No newline at end of file
+        self.status = ApplicationStatus.PENDING
+
+    @property
+    def business_name(self):
+        """The business name of the application's merchant, once one is known"""
+        return self.merchant.business_name if self.merchant is not None else None
\ No newline at end of file
@@ -0,0 +1,81 @@
+from decimal import Decimal
+from typing import Any, Dict
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from src.core.database import Base
+
+# Days in an average month, for deposits per month
+DAYS_PER_MONTH = Decimal('30.4375')
+
+class CashFlowMetrics(Base):
+    """
+    Cash-flow metrics of an application, over all of its bank statements
+
+    Keeps the sums of every statement's metrics (see
+    src/services/cash_flow.py), so a new statement is added without reading
+    the earlier ones, and the averages derived from them in indexed columns
+    the application list sorts and filters on.
+    """
+    __tablename__ = 'cash_flow_metrics'
+
+    # Define columns
+    application_id = Column(String, ForeignKey('applications.id', ondelete='CASCADE'), primary_key=True)
+    statement_count = Column(Integer, nullable=False)
+    # Days covered by the statements' transactions
+    days = Column(Integer, nullable=False)
+    deposit_total = Column(Numeric(16, 2), nullable=False)
+    deposit_count = Column(Integer, nullable=False)
+    withdrawal_total = Column(Numeric(16, 2), nullable=False)
+    # Sum of the closing balance of every day covered
+    daily_balance_sum = Column(Numeric(18, 2), nullable=False)
+    nsf_count = Column(Integer, nullable=False, index=True)
+    negative_balance_days = Column(Integer, nullable=False, index=True)
+    average_daily_balance = Column(Numeric(14, 2), index=True)
+    average_monthly_deposits = Column(Numeric(14, 2), index=True)
+    updated_at = Column(DateTime, nullable=False)
+
+    # Define the relationship with the Application model
+    application = relationship('Application', back_populates='cash_flow')
+
+    def __init__(self, application_id: str):
+        """Initializes new CashFlowMetrics with no statements"""
+        self.application_id = application_id
+        self.statement_count = 0
+        self.days = 0
+        self.deposit_total = Decimal('0')
+        self.deposit_count = 0
+        self.withdrawal_total = Decimal('0')
+        self.daily_balance_sum = Decimal('0')
+        self.nsf_count = 0
+        self.negative_balance_days = 0
+        self.average_daily_balance = None
+        self.average_monthly_deposits = None
+        self.updated_at = datetime.utcnow()
+
+    def add_statement(self, metrics: Dict[str, Any], sign: int = 1) -> None:
+        """
+        Add the metrics of one statement, or take them out again with sign=-1
+
+        Args:
+            metrics (Dict[str, Any]): The statement's metrics, as from statement_metrics
+            sign (int): 1 to add the statement, -1 to remove it
+        """
+        self.statement_count += sign
+        self.days += sign * metrics['days']
+        self.deposit_total += sign * Decimal(str(metrics['deposit_total']))
+        self.deposit_count += sign * metrics['deposit_count']
+        self.withdrawal_total += sign * Decimal(str(metrics['withdrawal_total']))
+        self.daily_balance_sum += sign * Decimal(str(metrics['daily_balance_sum']))
+        self.nsf_count += sign * metrics['nsf_count']
+        self.negative_balance_days += sign * metrics['negative_balance_days']
+
+        # Recompute the averages from the sums
+        cent = Decimal('0.01')
+        if self.days > 0:
+            self.average_daily_balance = (self.daily_balance_sum / self.days).quantize(cent)
+            self.average_monthly_deposits = (self.deposit_total * DAYS_PER_MONTH / self.days).quantize(cent)
+        else:
+            self.average_daily_balance = None
+            self.average_monthly_deposits = None
+        self.updated_at = datetime.utcnow()
@@ -1,11 +1,32 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, JSON, Table
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
 from src.core.database import Base
 
-# Define the DocumentType enum
-DocumentType = Enum('BANK_STATEMENT', 'TAX_RETURN', 'BUSINESS_LICENSE', 'FINANCIAL_STATEMENT', 'OTHER', name='document_type')
+class DocumentType(str, enum.Enum):
+    """
+    Types of documents attached to an application
+
+    Members are stored by name; the value names the matching extraction and
+    validation methods (e.g. DataValidator.validate_bank_statement).
+    """
+    BANK_STATEMENT = 'bank_statement'
+    TAX_RETURN = 'tax_return'
+    BUSINESS_LICENSE = 'business_license'
+    FINANCIAL_STATEMENT = 'financial_statement'
+    OTHER = 'other'
+
+# Links an application to documents first ingested for another application.
+# Brokers resend the same statements; a resent attachment is linked here
+# instead of being stored, classified and extracted again.
+application_documents = Table(
+    'application_documents',
+    Base.metadata,
+    Column('application_id', String, ForeignKey('applications.id'), primary_key=True),
+    Column('document_id', String, ForeignKey('documents.id'), primary_key=True),
+)
 
 class Document(Base):
     """Represents a document associated with an MCA application"""
@@ -15,18 +36,22 @@ class Document(Base):
     # Define the columns for the Document table
     id = Column(String, primary_key=True)
     application_id = Column(String, ForeignKey('applications.id'), nullable=False)
-    type = Column(DocumentType, nullable=False)
+    type = Column(Enum(DocumentType, name='document_type'), nullable=False)
     file_name = Column(String, nullable=False)
+    # Storage key of the file in the configured storage backend (see src/services/storage.py)
     file_path = Column(String, nullable=False)
     upload_date = Column(DateTime, nullable=False)
     content_type = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
-    md5_hash = Column(String, nullable=False)
+    # Content hash of the decoded file; unique so each distinct file is stored once
+    md5_hash = Column(String, nullable=False, unique=True, index=True)
+    # Extracted fields; transactions are stored in the transactions table instead
+    extracted_data = Column(JSON)
 
     # Define the relationship with the Application model
     application = relationship('Application', back_populates='documents')
 
-    def __init__(self, application_id, type, file_name, file_path, content_type, file_size, md5_hash):
+    def __init__(self, application_id, type, file_name, file_path, content_type, file_size, md5_hash, extracted_data=None):
         """
         Initializes a new Document instance
 
@@ -34,10 +59,11 @@ class Document(Base):
             application_id (str): The ID of the associated application
             type (DocumentType): The type of the document
             file_name (str): The name of the file
-            file_path (str): The path where the file is stored
+            file_path (str): The storage key the file is stored under
             content_type (str): The MIME type of the file
             file_size (int): The size of the file in bytes
             md5_hash (str): The MD5 hash of the file
+            extracted_data (dict): The fields extracted from the file, if already extracted
         """
         # Generate a new UUID for the document
         self.id = str(uuid4())
@@ -52,4 +78,5 @@ class Document(Base):
         self.file_path = file_path
         self.content_type = content_type
         self.file_size = file_size
-        self.md5_hash = md5_hash
\ No newline at end of file
+        self.md5_hash = md5_hash
+        self.extracted_data = extracted_data
\ No newline at end of file
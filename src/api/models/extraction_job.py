@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+from src.core.database import Base
+
+class ExtractionJob(Base):
+    """
+    A stored document waiting for OCR, extraction and validation
+
+    Jobs are created in the same transaction as their document, by email
+    ingestion and by uploads, and deleted in the transaction that stores the
+    document's extracted data (see src/services/extraction_queue.py). A
+    worker claims a job by moving available_at past the end of its lease, so
+    a job whose worker died becomes available again when the lease runs out.
+    """
+    __tablename__ = 'extraction_jobs'
+
+    # Define columns
+    document_id = Column(String, ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    # When the document reached the system: the receipt of its email, or its upload
+    received_at = Column(DateTime, nullable=False)
+    enqueued_at = Column(DateTime, nullable=False)
+    # The job is not claimed before this time: the lease of the worker holding it, or the delay before a retry
+    available_at = Column(DateTime, nullable=False, index=True)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String)
+
+    def __init__(self, document_id: str, received_at: datetime = None):
+        """
+        Initializes a new ExtractionJob instance
+
+        Args:
+            document_id (str): The ID of the document to process
+            received_at (datetime): When the document reached the system, naive UTC; defaults to now
+        """
+        self.document_id = document_id
+        self.enqueued_at = self.available_at = datetime.utcnow()
+        self.received_at = received_at or self.enqueued_at
+        self.attempts = 0
+        self.last_error = None
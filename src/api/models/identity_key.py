@@ -0,0 +1,31 @@
+import enum
+from sqlalchemy import Column, String, Enum, ForeignKey, Index
+from src.core.database import Base
+
+class IdentityKind(str, enum.Enum):
+    """Identities compared across documents and applications"""
+    BUSINESS_NAME = 'business_name'
+    EIN = 'ein'
+    ACCOUNT_NUMBER = 'account_number'
+
+class IdentityKey(Base):
+    """
+    A normalized identity found in an extracted document
+
+    Keys are written when a document's extracted data is stored (see
+    src/services/cross_document_validator.py). The (kind, value,
+    application_id) index answers "which other applications carry this
+    account number" without reading any document.
+    """
+    __tablename__ = 'identity_keys'
+    __table_args__ = (
+        Index('ix_identity_keys_kind_value_application', 'kind', 'value', 'application_id'),
+    )
+
+    # Define columns
+    document_id = Column(String, ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    kind = Column(Enum(IdentityKind, name='identity_kind'), primary_key=True)
+    value = Column(String, primary_key=True)
+    application_id = Column(String, ForeignKey('applications.id', ondelete='CASCADE'), nullable=False, index=True)
+    # The extracted field the value was normalized from, e.g. account_holder
+    field = Column(String, nullable=False)
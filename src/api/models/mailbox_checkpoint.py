@@ -0,0 +1,26 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from datetime import datetime
+from src.core.database import Base
+
+class MailboxCheckpoint(Base):
+    """
+    Records how far an intake mailbox has been ingested
+
+    IMAP UIDs only grow within one UIDVALIDITY, so every message with a UID
+    up to last_uid has been persisted and the next poll starts above it. A
+    changed UIDVALIDITY invalidates the checkpoint.
+    """
+    __tablename__ = 'mailbox_checkpoints'
+
+    # Define columns
+    mailbox = Column(String, primary_key=True)
+    uid_validity = Column(BigInteger, nullable=False)
+    last_uid = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    def __init__(self, mailbox: str, uid_validity: int, last_uid: int):
+        """Initializes a new MailboxCheckpoint instance"""
+        self.mailbox = mailbox
+        self.uid_validity = uid_validity
+        self.last_uid = last_uid
+        self.updated_at = datetime.utcnow()
@@ -0,0 +1,56 @@
+from sqlalchemy import Column, BigInteger, SmallInteger, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from uuid import uuid4
+from src.core.database import Base
+
+class Merchant(Base):
+    """The business behind an MCA application, as named on its documents"""
+
+    __tablename__ = 'merchants'
+
+    # Define columns
+    id = Column(String, primary_key=True)
+    application_id = Column(String, ForeignKey('applications.id', ondelete='CASCADE'), nullable=False, unique=True)
+    business_name = Column(String, nullable=False)
+    # Business name without case, punctuation or legal form; the key fuzzy matching works on
+    normalized_name = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+
+    # Define relationships
+    application = relationship('Application', back_populates='merchant')
+
+    def __init__(self, application_id: str, business_name: str, normalized_name: str):
+        """
+        Initializes a new Merchant instance
+
+        Args:
+            application_id (str): The ID of the application
+            business_name (str): The business name as found on the documents
+            normalized_name (str): The normalized business name
+        """
+        # Generate a new UUID for the merchant
+        self.id = str(uuid4())
+        self.application_id = application_id
+        self.business_name = business_name
+        self.normalized_name = normalized_name
+        self.created_at = datetime.utcnow()
+
+class MerchantNameBand(Base):
+    """
+    One locality-sensitive hash band of a merchant's normalized name
+
+    Names sharing a band value are likely to be similar (see
+    src/services/merchant_matching.py), so finding candidate matches for a
+    name is one lookup in the (band, value) index per band.
+    """
+
+    __tablename__ = 'merchant_name_bands'
+    __table_args__ = (
+        Index('ix_merchant_name_bands_band_value', 'band', 'value'),
+    )
+
+    # Define columns
+    merchant_id = Column(String, ForeignKey('merchants.id', ondelete='CASCADE'), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    value = Column(BigInteger, nullable=False)
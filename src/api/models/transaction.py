@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey
+from src.core.database import Base
+
+class Transaction(Base):
+    """
+    A transaction extracted from a bank statement
+
+    Rows are keyed by document and position in the statement, so loading a
+    statement is one range scan of the primary key, in statement order. They
+    are written and read in bulk by src/services/transaction_store.py rather
+    than one ORM object at a time.
+    """
+    __tablename__ = 'transactions'
+
+    # Define columns
+    document_id = Column(String, ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    # As printed; statements often leave out the year
+    date = Column(String)
+    description = Column(String)
+    amount = Column(Numeric(14, 2))
+    balance = Column(Numeric(14, 2))
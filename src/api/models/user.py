@@ -1,11 +1,16 @@
+import enum
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
 from src.core.database import Base
 
-# Define the UserRole enum
-UserRole = Enum('ADMIN', 'MANAGER', 'DATA_ENTRY_SPECIALIST', 'API_USER', name='user_role')
+class UserRole(str, enum.Enum):
+    """Roles a user can hold"""
+    ADMIN = 'ADMIN'
+    MANAGER = 'MANAGER'
+    DATA_ENTRY_SPECIALIST = 'DATA_ENTRY_SPECIALIST'
+    API_USER = 'API_USER'
 
 class User(Base):
     """Represents a user in the MCA application processing system"""
@@ -17,7 +22,7 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
-    role = Column(UserRole, nullable=False)
+    role = Column(Enum(UserRole, name='user_role'), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, nullable=False)
     last_login = Column(DateTime, nullable=True)
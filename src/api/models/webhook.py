@@ -1,11 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
 from src.core.database import Base
 
-# Define the WebhookEventType enum
-WebhookEventType = Enum('APPLICATION_CREATED', 'APPLICATION_UPDATED', 'DOCUMENT_UPLOADED', 'APPLICATION_APPROVED', 'APPLICATION_REJECTED', name='webhook_event_type')
+class WebhookEventType(str, enum.Enum):
+    """Events a webhook can subscribe to"""
+    APPLICATION_CREATED = 'APPLICATION_CREATED'
+    APPLICATION_UPDATED = 'APPLICATION_UPDATED'
+    DOCUMENT_UPLOADED = 'DOCUMENT_UPLOADED'
+    APPLICATION_APPROVED = 'APPLICATION_APPROVED'
+    APPLICATION_REJECTED = 'APPLICATION_REJECTED'
 
 class Webhook(Base):
     """
@@ -15,23 +21,26 @@ class Webhook(Base):
 
     # Define the columns for the Webhook table
     id = Column(String, primary_key=True)
+    # The user who registered the webhook; only they can see or change it
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     url = Column(String, nullable=False)
-    event_type = Column(WebhookEventType, nullable=False)
+    event_type = Column(Enum(WebhookEventType, name='webhook_event_type'), nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, nullable=False)
     last_triggered_at = Column(DateTime)
     retry_count = Column(Integer, default=0)
 
-    def __init__(self, url: str, event_type: WebhookEventType):
+    def __init__(self, url: str, event_type: WebhookEventType, user_id: str):
         """
         Initializes a new Webhook instance
         """
         # Generate a new UUID for the webhook
         self.id = str(uuid4())
         
-        # Set the url and event_type
+        # Set the url, event_type and owner
         self.url = url
         self.event_type = event_type
+        self.user_id = user_id
         
         # Set is_active to True by default
         self.is_active = True
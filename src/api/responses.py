@@ -0,0 +1,95 @@
+import os
+import re
+from typing import Mapping, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# A single byte range; multiple ranges are answered with the whole file, which RFC 7233 allows
+_BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Size of the reads used when the server cannot send the file itself
+FILE_CHUNK_SIZE = 256 * 1024
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies outside the file"""
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header against a file of `size` bytes
+
+    Args:
+        header (Optional[str]): The Range header, if any
+        size (int): Size of the file in bytes
+
+    Returns:
+        Optional[Tuple[int, int]]: The first and last byte to send, or None to send the whole file
+
+    Raises:
+        RangeNotSatisfiable: When the range starts beyond the end of the file
+    """
+    match = _BYTE_RANGE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        # No range, several ranges or a syntax error: the whole file
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # A suffix range, the final `last` bytes
+        if not last or int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - int(last)), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, end
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag, using the weak comparison it calls for"""
+    if not header:
+        return False
+    candidates = {candidate.strip() for candidate in header.split(',')}
+    return '*' in candidates or etag in {candidate[2:] if candidate.startswith('W/') else candidate for candidate in candidates}
+
+class FileRangeResponse(Response):
+    """
+    Send a byte range of a local file without reading it into Python memory
+
+    Servers that support the ASGI zerocopy extension send the file with
+    sendfile(2); otherwise it is read with os.pread in FILE_CHUNK_SIZE pieces
+    off the event loop.
+    """
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, media_type: Optional[str] = None):
+        """Initialize the FileRangeResponse"""
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        super().__init__(content=None, status_code=status_code, headers=headers, media_type=media_type)
+        self.raw_headers = [(name, value) for name, value in self.raw_headers if name != b'content-length']
+        self.raw_headers.append((b'content-length', str(self.length).encode('latin-1')))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        with open(self.path, 'rb') as file:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopy", "file": file, "offset": self.start, "count": self.length, "more_body": False})
+            else:
+                offset, remaining = self.start, self.length
+                more_body = True
+                while more_body:
+                    chunk = await run_in_threadpool(os.pread, file.fileno(), min(FILE_CHUNK_SIZE, remaining), offset) if remaining > 0 else b''
+                    offset += len(chunk)
+                    remaining -= len(chunk)
+                    # Stop at the end of the range, or early if the file shrank while it was being sent
+                    more_body = bool(chunk) and remaining > 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        if self.background is not None:
+            await self.background()
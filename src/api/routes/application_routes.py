@@ -1,11 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from src.api.controllers.application_controller import create_application, get_application, get_applications, update_application
+from typing import List, Optional
+from src.api.controllers.application_controller import SORTABLE_METRICS, create_application, get_application, get_applications, update_application
 from src.api.schemas.application_schema import ApplicationCreate, ApplicationUpdate, ApplicationResponse
-from src.core.database import get_db
-from src.core.security import get_current_user
-from src.api.models.user import User
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user
 
 router = APIRouter()
 
@@ -13,22 +12,22 @@ router = APIRouter()
 def create_new_application(
     application: ApplicationCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Call create_application function from application_controller
-    new_application = create_application(db, application, current_user)
+    new_application = create_application(application=application, db=db, current_user=current_user)
     
     # Return the created application
     return new_application
 
 @router.get('/{application_id}', response_model=ApplicationResponse)
 def read_application(
-    application_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    application_id: str,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Call get_application function from application_controller
-    application = get_application(db, application_id, current_user)
+    application = get_application(application_id=application_id, db=db, current_user=current_user)
     
     # Return the retrieved application
     if application is None:
@@ -39,24 +38,41 @@ def read_application(
 def read_applications(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    sort_by: Optional[str] = Query(None, regex=f"^({'|'.join(SORTABLE_METRICS)})$"),
+    descending: bool = False,
+    min_average_daily_balance: Optional[float] = None,
+    min_average_monthly_deposits: Optional[float] = None,
+    max_nsf_count: Optional[int] = None,
+    max_negative_balance_days: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     # Call get_applications function from application_controller
-    applications = get_applications(db, skip, limit, current_user)
+    applications = get_applications(
+        skip=skip,
+        limit=limit,
+        sort_by=sort_by,
+        descending=descending,
+        min_average_daily_balance=min_average_daily_balance,
+        min_average_monthly_deposits=min_average_monthly_deposits,
+        max_nsf_count=max_nsf_count,
+        max_negative_balance_days=max_negative_balance_days,
+        db=db,
+        current_user=current_user,
+    )
     
     # Return the list of applications
     return applications
 
 @router.patch('/{application_id}', response_model=ApplicationResponse)
 def update_existing_application(
-    application_id: int,
+    application_id: str,
     application_update: ApplicationUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Call update_application function from application_controller
-    updated_application = update_application(db, application_id, application_update, current_user)
+    updated_application = update_application(application_id=application_id, application_update=application_update, db=db, current_user=current_user)
     
     # Return the updated application
     if updated_application is None:
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+from src.core.config import settings
+from src.core.database import get_db
+from src.core.security import authenticate_user, create_access_token
+
+router = APIRouter()
+
+@router.post('/token')
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """
+    Route to exchange a username (email) and password for an access token
+    """
+    # Verify the credentials; the password check runs on the hashing executor
+    user = authenticate_user(db, form_data.username, form_data.password)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Create the access token for the authenticated user
+    access_token = create_access_token(
+        data={"sub": user.id},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+    # Return the token in the OAuth2 response format
+    return {"access_token": access_token, "token_type": "bearer"}
@@ -3,14 +3,13 @@ from sqlalchemy.orm import Session
 from typing import List
 from src.api.controllers.user_controller import create_user, get_user, get_users, update_user, delete_user
 from src.api.schemas.user_schema import UserCreate, UserUpdate, UserResponse
-from src.core.database import get_db
-from src.core.security import get_current_user
-from src.api.models.user import User
+from src.core.database import get_db, get_read_db
+from src.core.security import Principal, get_current_user
 
 router = APIRouter()
 
 @router.post('/', response_model=UserResponse)
-def create_new_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_new_user(user: UserCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can create new users")
@@ -22,7 +21,7 @@ def create_new_user(user: UserCreate, db: Session = Depends(get_db), current_use
     return new_user
 
 @router.get('/{user_id}', response_model=UserResponse)
-def read_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_user(user_id: int, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges or is requesting their own information
     if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
@@ -36,7 +35,7 @@ def read_user(user_id: int, db: Session = Depends(get_db), current_user: User =
     return user
 
 @router.get('/', response_model=List[UserResponse])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can list all users")
@@ -48,7 +47,7 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), c
     return users
 
 @router.patch('/{user_id}', response_model=UserResponse)
-def update_existing_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_existing_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges or is updating their own information
     if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
@@ -62,7 +61,7 @@ def update_existing_user(user_id: int, user_update: UserUpdate, db: Session = De
     return updated_user
 
 @router.delete('/{user_id}')
-def delete_existing_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_existing_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if current user has admin privileges
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can delete users")
@@ -16,13 +16,43 @@ class ApplicationBase(BaseModel):
 class ApplicationCreate(ApplicationBase):
     pass
 
-# Schema for updating an existing MCA application
-class ApplicationUpdate(ApplicationBase):
+# Schema for updating an existing MCA application; only the fields given are changed
+class ApplicationUpdate(BaseModel):
+    applicant_email: Optional[EmailStr] = None
+    business_name: Optional[str] = None
+    business_type: Optional[str] = None
+    requested_amount: Optional[float] = None
+    purpose_of_funding: Optional[str] = None
     status: Optional[ApplicationStatus] = None
 
+# Schema for the cash-flow metrics of an application's bank statements
+class CashFlowMetricsResponse(BaseModel):
+    statement_count: int
+    days: int
+    deposit_total: float
+    deposit_count: int
+    withdrawal_total: float
+    nsf_count: int
+    negative_balance_days: int
+    average_daily_balance: Optional[float] = None
+    average_monthly_deposits: Optional[float] = None
+
+    class Config:
+        orm_mode = True
+
 # Schema for MCA application response data
 class ApplicationResponse(ApplicationBase):
+    # Applications ingested from email have no application form; the business name comes from their merchant
+    applicant_email: Optional[EmailStr] = None
+    business_name: Optional[str] = None
+    business_type: Optional[str] = None
+    requested_amount: Optional[float] = None
+    purpose_of_funding: Optional[str] = None
     id: UUID
     status: ApplicationStatus
     received_date: datetime
-    processed_date: Optional[datetime] = None
\ No newline at end of file
+    processed_date: Optional[datetime] = None
+    cash_flow: Optional[CashFlowMetricsResponse] = None
+
+    class Config:
+        orm_mode = True
\ No newline at end of file
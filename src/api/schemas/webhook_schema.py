@@ -25,4 +25,7 @@ class WebhookResponse(WebhookBase):
     is_active: bool
     created_at: datetime
     last_triggered_at: Optional[datetime] = None
-    retry_count: int
\ No newline at end of file
+    retry_count: int
+
+    class Config:
+        orm_mode = True
\ No newline at end of file
@@ -1,25 +1,102 @@
 from pydantic import BaseSettings, SecretStr
-from typing import List
+from typing import Any, Dict, List, Optional
 
 class Settings(BaseSettings):
     # Project configuration
     PROJECT_NAME: str
     API_V1_STR: str
+    API_VERSION: str = "1.0.0"
     SECRET_KEY: SecretStr
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # Verified tokens are cached in-process for this long to skip the per-request user query
+    AUTH_CACHE_TTL_SECONDS: int = 30
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    # bcrypt cost factor; existing hashes are upgraded on the next successful login
+    BCRYPT_ROUNDS: int = 12
+    # Threads dedicated to password hashing
+    PASSWORD_HASH_WORKERS: int = 4
 
     # Database configuration
     DATABASE_URL: str
+    # Read replicas for GET endpoints; reads go to the primary when this is empty
+    DATABASE_REPLICA_URLS: List[str] = []
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    # Connections idle for longer than this are pinged on checkout; -1 disables pings
+    DB_POOL_PRE_PING_IDLE_SECONDS: int = 30
+    # Seconds after a write request during which the same client's reads go to the primary; keep it above the replica lag
+    DB_READ_PRIMARY_AFTER_WRITE_SECONDS: int = 10
+
+    # Server configuration
+    # Size of the threadpool that runs sync route handlers and dependencies.
+    # Every handler touching the synchronous SQLAlchemy Session runs there.
+    THREADPOOL_MAX_WORKERS: int = 64
+
+    # Logging configuration
+    DEBUG: bool = False
+    # "json" for structured output, anything else for plain text lines
+    LOG_FORMAT: str = "json"
+    # Records beyond this many waiting for the writer thread are dropped
+    LOG_QUEUE_SIZE: int = 10000
+    # Keep one in N high-volume INFO records (those logged with extra={"sampled": True})
+    LOG_INFO_SAMPLE_EVERY: int = 1
 
     # Security configuration
     ALLOWED_HOSTS: List[str]
+    # Origins allowed to make cross-origin requests; empty disables CORS
+    ALLOWED_ORIGINS: List[str] = []
 
     # AWS configuration
     AWS_ACCESS_KEY_ID: str
     AWS_SECRET_ACCESS_KEY: SecretStr
     AWS_REGION: str
     S3_BUCKET_NAME: str
+    # Endpoint of an S3-compatible store (MinIO, a local stand-in); AWS S3 when unset
+    S3_ENDPOINT_URL: Optional[str] = None
+
+    # File storage configuration
+    # Directory uploaded files are written to before processing
+    TEMP_UPLOAD_DIR: str = "/tmp/mca-uploads"
+    # "local" stores documents under STORAGE_LOCAL_ROOT, "s3" in S3_BUCKET_NAME
+    STORAGE_BACKEND: str = "local"
+    # Directory documents are stored in by the local backend; share it between workers
+    STORAGE_LOCAL_ROOT: str = "/var/lib/mca/documents"
+    # Part size of multipart uploads to S3; S3 requires at least 5 MiB
+    STORAGE_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024
+    # Seconds a presigned download URL stays valid
+    STORAGE_PRESIGNED_URL_EXPIRY: int = 300
+
+    # Merchant matching configuration
+    # Trigram similarity (0-1) from which another merchant's name is reported as a likely match
+    MERCHANT_MATCH_THRESHOLD: float = 0.6
+    # Most candidate merchants returned for a name
+    MERCHANT_MATCH_LIMIT: int = 10
+
+    # Document extraction configuration
+    # Directory of additional bank statement layout files (*.json), see src/services/bank_layouts.py
+    BANK_LAYOUT_DIR: Optional[str] = None
+    # Lines from the top of a statement used to recognise its bank
+    BANK_FINGERPRINT_LINES: int = 15
+    # Worker processes parsing the pages of long documents in parallel
+    EXTRACTION_WORKERS: int = 4
+    # Documents with fewer pages are parsed in the calling process
+    EXTRACTION_PARALLEL_MIN_PAGES: int = 20
+    # Documents processed concurrently when recomputing stale results (python -m src.services.reprocessing)
+    REPROCESSING_WORKERS: int = 8
+    # Threads of the extraction workers (python -m src.services.extraction_queue) taking new documents off the queue
+    EXTRACTION_QUEUE_WORKERS: int = 4
+    # Seconds an idle extraction worker waits before looking for queued documents again
+    EXTRACTION_POLL_INTERVAL: float = 2.0
+    # Seconds a claimed document is held by its worker; must exceed OCR and extraction of the largest document
+    EXTRACTION_LEASE_SECONDS: int = 900
+    # Attempts at a failing document before it is left queued for an operator, and seconds between attempts
+    EXTRACTION_MAX_ATTEMPTS: int = 5
+    EXTRACTION_RETRY_DELAY: int = 60
+    # Also write each statement's transactions to a Parquet file next to the document, for analytics (needs pyarrow)
+    TRANSACTION_PARQUET_SIDECAR: bool = False
 
     # Email configuration
     EMAIL_SERVER: str
@@ -27,6 +104,25 @@ class Settings(BaseSettings):
     EMAIL_USERNAME: str
     EMAIL_PASSWORD: SecretStr
     EMAIL_FROM: str
+    # Emails are fetched and decoded in pieces of this many bytes, bounding memory per message
+    EMAIL_FETCH_CHUNK_SIZE: int = 1024 * 1024
+    # Intake mailboxes polled concurrently, as JSON objects with name, username, password and
+    # optionally server, port and folder; the EMAIL_* account's INBOX is used when this is empty
+    EMAIL_MAILBOXES: List[Dict[str, Any]] = []
+    # Seconds between polls of each mailbox
+    EMAIL_POLL_INTERVAL: int = 30
+    # Fetched emails waiting for classification and persistence; mailbox workers block when it is full
+    INGESTION_QUEUE_SIZE: int = 64
+    # Threads classifying and persisting fetched emails
+    INGESTION_WORKERS: int = 4
+    # Most emails persisted in one transaction; batches only fill up while a backlog is drained
+    INGESTION_BATCH_SIZE: int = 50
+
+    # Webhook configuration
+    WEBHOOK_MAX_RETRIES: int = 3
+    WEBHOOK_RETRY_INTERVAL: int = 60
+    # Seconds to wait for a subscriber to respond
+    WEBHOOK_TIMEOUT: int = 10
 
     class Config:
         case_sensitive = True
@@ -1,24 +1,294 @@
-from sqlalchemy import create_engine
+import random
+import threading
+import time
+from typing import Any, Dict, List
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import Pool, QueuePool
 from src.core.config import settings
+from src.core.metrics import registry
+
+class PoolMetrics:
+    """Thread-safe counters describing how a connection pool is being used"""
+
+    def __init__(self):
+        """Initialize all counters to zero"""
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.pre_pings = 0
+        self.pre_ping_failures = 0
+
+    def record_checkout(self, wait_seconds: float) -> None:
+        """Record a checkout and the time spent waiting for a connection"""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            if wait_seconds > self.wait_seconds_max:
+                self.wait_seconds_max = wait_seconds
+
+    def record_timeout(self) -> None:
+        """Record a checkout that gave up after pool_timeout seconds"""
+        with self._lock:
+            self.timeouts += 1
+
+    def record_pre_ping(self, success: bool) -> None:
+        """Record a liveness ping issued for an idle connection"""
+        with self._lock:
+            self.pre_pings += 1
+            if not success:
+                self.pre_ping_failures += 1
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures how long each checkout waits for a connection"""
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        # QueuePool keeps its overflow limit private; keep it readable for get_pool_stats
+        self.max_overflow = max_overflow
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # Keep the counters when the pool is recreated after a dispose or an invalidation
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+def attach_idle_pre_ping(pool: Pool, idle_seconds: int) -> None:
+    """
+    Ping pooled connections on checkout, but only when they have been idle
+    for longer than idle_seconds.
+
+    Unlike pool_pre_ping, connections that were returned to the pool moments
+    ago are handed out without an extra round-trip. A failed ping raises
+    DisconnectionError, which makes the pool discard the connection and
+    retry the checkout with a fresh one.
+
+    Args:
+        pool (Pool): The pool to instrument
+        idle_seconds (int): Idle time after which a connection is pinged
+    """
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_used = connection_record.info.get("last_used", 0.0)
+        if time.monotonic() - last_used <= idle_seconds:
+            return
+
+        metrics = getattr(pool, "metrics", None)
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            if metrics is not None:
+                metrics.record_pre_ping(success=False)
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if metrics is not None:
+            metrics.record_pre_ping(success=True)
+        connection_record.info["last_used"] = time.monotonic()
+
+def create_database_engine(database_url: str) -> Engine:
+    """
+    Create a SQLAlchemy engine configured from the pool settings
+
+    Args:
+        database_url (str): The database URL to connect to
+
+    Returns:
+        Engine: The configured engine
+    """
+    # SQLite uses its own single-connection pools, which take none of the QueuePool options.
+    # Sessions are used from threadpool workers, so the connection must not be pinned to its creating thread.
+    if database_url.startswith("sqlite"):
+        return create_engine(database_url, connect_args={"check_same_thread": False})
+
+    database_engine = create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+
+    # A negative idle threshold disables liveness pings entirely
+    if settings.DB_POOL_PRE_PING_IDLE_SECONDS >= 0:
+        attach_idle_pre_ping(database_engine.pool, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+
+    return database_engine
+
+def get_pool_stats(database_engine: Engine = None) -> Dict[str, Any]:
+    """
+    Report connection pool usage for an engine
+
+    Args:
+        database_engine (Engine): The engine to report on, defaults to the primary engine
+
+    Returns:
+        Dict[str, Any]: Current pool occupancy and cumulative checkout counters
+    """
+    pool = (database_engine or engine).pool
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow_in_use": max(pool.overflow(), 0),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats["max_overflow"] = pool.max_overflow
+
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update({
+            "checkouts_total": metrics.checkouts,
+            "checkout_wait_seconds_total": metrics.wait_seconds_total,
+            "checkout_wait_seconds_max": metrics.wait_seconds_max,
+            "checkout_wait_seconds_avg": metrics.wait_seconds_total / metrics.checkouts if metrics.checkouts else 0.0,
+            "checkout_timeouts_total": metrics.timeouts,
+            "pre_pings_total": metrics.pre_pings,
+            "pre_ping_failures_total": metrics.pre_ping_failures,
+        })
+
+    return stats
+
+# Pool statistics exported on /metrics: (stats key, Prometheus type, help text)
+_POOL_METRICS = (
+    ("pool_size", "gauge", "Configured number of persistent connections"),
+    ("checked_out", "gauge", "Connections currently checked out"),
+    ("checked_in", "gauge", "Idle connections held in the pool"),
+    ("overflow_in_use", "gauge", "Overflow connections currently open beyond pool_size"),
+    ("checkouts_total", "counter", "Connections checked out from the pool"),
+    ("checkout_wait_seconds_total", "counter", "Total time spent waiting for a pooled connection"),
+    ("checkout_wait_seconds_max", "gauge", "Longest wait for a pooled connection"),
+    ("checkout_timeouts_total", "counter", "Checkouts that timed out waiting for a connection"),
+    ("pre_pings_total", "counter", "Liveness pings issued for idle connections"),
+    ("pre_ping_failures_total", "counter", "Liveness pings that found a dead connection"),
+)
+
+def _collect_pool_metrics():
+    # Report every engine's pool, labelled primary / replica-N
+    engines = [("primary", engine)] + [(f"replica-{index}", replica) for index, replica in enumerate(replica_engines)]
+    stats = [(name, get_pool_stats(database_engine)) for name, database_engine in engines]
+    for key, metric_type, documentation in _POOL_METRICS:
+        samples = [({"engine": name}, engine_stats[key]) for name, engine_stats in stats if key in engine_stats]
+        if samples:
+            yield f"mca_db_pool_{key}", metric_type, documentation, samples
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica and writes to the primary
+
+    Each session picks one replica on its first read and keeps it, so a
+    request sees a single consistent snapshot. Flushes and DML statements
+    always go to the primary, and once the session has flushed, all of its
+    later reads go to the primary too (read-after-write within the session).
+    Across requests, get_db and get_read_db keep a client that just wrote on
+    the primary for DB_READ_PRIMARY_AFTER_WRITE_SECONDS.
+    """
+
+    def __init__(self, primary: Engine = None, replicas: List[Engine] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas or []
+        self._replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # DML executed directly (session.execute(update(...))) never flushes, so
+        # pin the session here: anything that is not a SELECT may write
+        if clause is not None and (isinstance(clause, UpdateBase) or not getattr(clause, "is_select", False)):
+            self.info["use_primary"] = True
+
+        # Writes, and everything after the first write, use the primary
+        if self._flushing or self.info.get("use_primary") or not self.replicas:
+            return self.primary
+
+        # Pin one replica for the lifetime of the session
+        if self._replica is None:
+            self._replica = random.choice(self.replicas)
+        return self._replica
+
+@event.listens_for(RoutingSession, "after_flush")
+def _route_to_primary_after_flush(session, flush_context):
+    # Rows written by this session are not yet visible on the replicas
+    session.info["use_primary"] = True
+
+def use_primary(session: Session) -> None:
+    """
+    Route every remaining statement of a RoutingSession to the primary
+
+    Args:
+        session (Session): The session to pin to the primary
+    """
+    session.info["use_primary"] = True
 
 # Create a SQLAlchemy engine instance
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_database_engine(settings.DATABASE_URL)
+
+# Create engines for the read replicas; reads fall back to the primary when none are configured
+replica_engines = [create_database_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+
+# Export pool statistics alongside the other metrics
+registry.register_collector(_collect_pool_metrics)
 
 # Create a sessionmaker, which will be used to create database sessions
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create a sessionmaker for read-mostly sessions that are routed to the replicas
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, primary=engine, replicas=replica_engines
+)
+
 # Create a base class for declarative models
 Base = declarative_base()
 
-def get_db():
+# Cookie marking a client that made a write request in the last DB_READ_PRIMARY_AFTER_WRITE_SECONDS
+READ_PRIMARY_COOKIE = "mca_read_primary"
+
+def get_db(response: Response):
     """
     Dependency function to get a database session.
 
+    Marks the client as a recent writer with a short-lived cookie, so its
+    reads in the next DB_READ_PRIMARY_AFTER_WRITE_SECONDS are served by the
+    primary rather than a replica that may not have its write yet.
+
     Returns:
         Generator[Session, None, None]: A database session
     """
+    if settings.DATABASE_REPLICA_URLS:
+        response.set_cookie(READ_PRIMARY_COOKIE, "1", max_age=settings.DB_READ_PRIMARY_AFTER_WRITE_SECONDS, httponly=True, samesite="strict")
+
     # Create a new SessionLocal instance
     db = SessionLocal()
     try:
@@ -26,4 +296,23 @@ def get_db():
         yield db
     finally:
         # Ensure the session is closed after use
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request):
+    """
+    Dependency function to get a database session for read endpoints.
+
+    Reads are served by a read replica; any write made through the session
+    goes to the primary, as do the reads that follow it. Clients that made a
+    write request recently (see get_db) read from the primary.
+
+    Returns:
+        Generator[Session, None, None]: A replica-routed database session
+    """
+    db = ReadSessionLocal()
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        use_primary(db)
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,157 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Default latency buckets in seconds, from a few milliseconds up to the 5 minute SRS target and beyond
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# A collector returns (name, type, documentation, [(labels, value), ...]) tuples at scrape time
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    # Render labels in Prometheus text format, escaping backslashes, quotes and newlines
+    if not labels:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + rendered + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+class Counter:
+    """Monotonically increasing counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for the given label values"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.label_names, key)))} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels
+
+    Observing a value is a bisection over the bucket bounds plus a few
+    additions under a lock, cheap enough for per-document and per-request use.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the given label values"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+
+        # Find the first bucket whose upper bound holds the value
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, **labels: str) -> Dict[str, object]:
+        """Return cumulative bucket counts, sum and count for the given label values"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            counts, total, count = self._series.get(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            keys = sorted(self._series)
+        for key in keys:
+            labels = dict(zip(self.label_names, key))
+            snapshot = self.snapshot(**labels)
+            for bound, cumulative in snapshot["buckets"].items():
+                bucket_labels = dict(labels, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {snapshot['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Holds the process's metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        """Create or return the counter registered under name"""
+        return self._get_or_create(name, lambda: Counter(name, documentation, label_names))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Create or return the histogram registered under name"""
+        return self._get_or_create(name, lambda: Histogram(name, documentation, label_names, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        """Register a callback that reports gauge-style samples at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric and collector in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        for collector in collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+# Create the process-wide metrics registry
+registry = MetricsRegistry()
@@ -1,32 +1,125 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from src.core.config import settings
-from src.core.database import get_db
-from src.api.models.user import User
+from src.core.database import get_read_db
+from src.api.models.user import User, UserRole
+from src.utils.cache import TTLCache
 
-# Create a password context for hashing and verifying passwords
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+# Create a password context for hashing and verifying passwords. Hashes made
+# with a different cost factor are reported as needing an update, which
+# authenticate_user uses to rehash transparently on the next login.
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Dedicated, bounded executor for bcrypt. Hashing never runs on the event loop
+# or ties up more than PASSWORD_HASH_WORKERS cores, however many logins arrive.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
 
 # Create an OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f'{settings.API_V1_STR}/token')
 
+class Principal(NamedTuple):
+    """
+    The authenticated user of a request
+
+    An immutable copy of what authorization needs, so the token cache never
+    shares a User bound to another request's session between threads.
+    """
+    id: str
+    role: UserRole
+    is_active: bool
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRole.ADMIN
+
+# Cache of verified tokens -> (time cached, principal), so repeat requests skip
+# JWT decoding and the user query. Entries are per process; the TTL bounds how
+# long another worker can keep serving a user that was changed elsewhere.
+_token_cache = TTLCache(max_size=settings.AUTH_CACHE_MAX_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+
+# When each user was last invalidated (time.monotonic()); tokens cached before then are looked up again.
+# Entries older than the cache TTL outlived every token they applied to and are pruned.
+_user_invalidations: Dict[str, float] = {}
+_user_invalidations_lock = threading.Lock()
+# Tokens of every user cached before this time are looked up again; set when the invalidations overflow
+_all_invalidated_at = float("-inf")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain password against a hashed password
     """
-    # Use pwd_context to verify the plain password against the hashed password
-    return pwd_context.verify(plain_password, hashed_password)
+    # Use pwd_context on the hashing executor to verify the plain password against the hashed password
+    return _hash_executor.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password: str) -> str:
     """
     Generate a hash for a password
     """
-    # Use pwd_context to hash the provided password
-    return pwd_context.hash(password)
+    # Use pwd_context on the hashing executor to hash the provided password
+    return _hash_executor.submit(pwd_context.hash, password).result()
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if its hash uses an outdated cost factor
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password is valid, and a replacement hash if one is needed
+    """
+    return _hash_executor.submit(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password from async code without blocking the event loop
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password from async code without blocking the event loop
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
+
+def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    """
+    Authenticate a user by email and password
+
+    Upgrades the stored hash when BCRYPT_ROUNDS changed since it was created
+    and records the login time.
+
+    Returns:
+        Optional[User]: The authenticated user, or None if the credentials are invalid
+    """
+    # Query the database for the user
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        # Spend the same hashing time as a real check so unknown emails are not distinguishable
+        _hash_executor.submit(pwd_context.dummy_verify).result()
+        return None
+
+    # Verify the password and get a replacement hash if the cost factor changed
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
+        return None
+
+    # Store the rehashed password and the login time
+    if new_hash is not None:
+        user.hashed_password = new_hash
+    user.update_last_login()
+    db.commit()
+
+    # Return the authenticated user
+    return user
 
 def create_access_token(data: dict, expires_delta: timedelta) -> str:
     """
@@ -42,18 +135,31 @@ def create_access_token(data: dict, expires_delta: timedelta) -> str:
     to_encode.update({"exp": expire})
     
     # Encode the token data using JWT
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY.get_secret_value(), algorithm=settings.ALGORITHM)
     
     # Return the encoded token
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> Principal:
     """
     Get the current authenticated user
+
+    Declared as a plain function so FastAPI runs it in the threadpool; the
+    user lookup uses the synchronous Session and must not block the event loop.
+    Verified tokens are cached, so only the first request with a token pays
+    for decoding and the user query.
     """
+    # Serve the principal from the token cache unless the user changed since it was cached
+    cached = _token_cache.get(token)
+    if cached is not None:
+        cached_at, principal = cached
+        if cached_at > max(_all_invalidated_at, _user_invalidations.get(principal.id, float("-inf"))):
+            return principal
+        _token_cache.pop(token)
+
     try:
         # Decode the JWT token
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = jwt.decode(token, settings.SECRET_KEY.get_secret_value(), algorithms=[settings.ALGORITHM])
         
         # Extract the user ID from the token payload
         user_id: str = payload.get("sub")
@@ -61,13 +167,46 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     except jwt.JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-    
+
+    # Take the caching time before the query so a concurrent invalidation wins
+    cached_at = time.monotonic()
+
     # Query the database for the user
     user = db.query(User).filter(User.id == user_id).first()
     
-    # If user not found, raise HTTPException
+    # If user not found or deactivated, raise HTTPException
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
+
+    # Cache the principal, never beyond the token's own expiry
+    principal = Principal(user.id, user.role, user.is_active)
+    ttl_seconds = settings.AUTH_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl_seconds = min(ttl_seconds, payload["exp"] - time.time())
+    _token_cache.set(token, (cached_at, principal), ttl_seconds=ttl_seconds)
     
-    # Return the user
-    return user
\ No newline at end of file
+    # Return the principal
+    return principal
+
+def invalidate_cached_user(user_id: str) -> None:
+    """
+    Invalidate every cached token of a user, e.g. after the user was updated or deleted
+    """
+    global _all_invalidated_at
+    now = time.monotonic()
+    with _user_invalidations_lock:
+        _user_invalidations[user_id] = now
+
+        # Forget invalidations every token cached before has expired since
+        if len(_user_invalidations) > settings.AUTH_CACHE_MAX_SIZE:
+            expired_before = now - settings.AUTH_CACHE_TTL_SECONDS
+            for invalidated_user_id, invalidated_at in list(_user_invalidations.items()):
+                if invalidated_at < expired_before:
+                    del _user_invalidations[invalidated_user_id]
+
+        # Still too many recent ones: invalidate every user's tokens instead, which takes no per-user entry
+        if len(_user_invalidations) > settings.AUTH_CACHE_MAX_SIZE:
+            _all_invalidated_at = now
+            _user_invalidations.clear()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import functools
+import json
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple, Union
+from src.core.config import settings
+from src.utils.logger import logger
+from src.services.extraction_templates import CompiledTemplate, DocumentTemplate, Table, get_template
+
+# Layouts shipped with the service; BANK_LAYOUT_DIR adds (or overrides) deployment-specific ones
+BUNDLED_LAYOUT_DIR = os.path.join(os.path.dirname(__file__), 'data', 'bank_layouts')
+
+# Transaction columns a layout can declare, in the order rows are returned
+COLUMNS = ('date', 'description', 'amount', 'debit', 'credit', 'balance')
+
+_MONEY = r'-?\$?-?[\d,]*\d\.\d{2}'
+_NON_LETTERS = re.compile(r'[^a-z]+')
+_DATE_DIRECTIVES = {
+    '%m': r'\d{1,2}', '%d': r'\d{1,2}', '%y': r'\d{2}', '%Y': r'\d{4}',
+    '%b': r'[A-Za-z]{3}\.?', '%B': r'[A-Za-z]{3,9}', '%%': '%',
+}
+
+def fingerprint_line(line: str) -> str:
+    """Reduce a line to its lowercase words; dates, amounts and page numbers differ between statements of one bank"""
+    return ' '.join(_NON_LETTERS.sub(' ', line.lower()).split())
+
+def _date_pattern(date_formats: Tuple[str, ...]) -> str:
+    # Translate strftime formats into one regular expression, longest first
+    alternatives = []
+    for date_format in date_formats:
+        pattern = ''
+        for part in re.split(r'(%.)', date_format):
+            if part.startswith('%'):
+                if part not in _DATE_DIRECTIVES:
+                    raise ValueError(f"Unsupported date directive {part} in {date_format}")
+                pattern += _DATE_DIRECTIVES[part]
+            else:
+                pattern += re.escape(part)
+        alternatives.append(pattern)
+    return '|'.join(sorted(alternatives, key=len, reverse=True))
+
+def _row_pattern(columns: Tuple[str, ...], date_formats: Tuple[str, ...]) -> Optional[str]:
+    # With separate debit and credit columns one of them is blank on every line, so text lines are ambiguous
+    if 'debit' in columns or 'credit' in columns:
+        return None
+
+    date = _date_pattern(date_formats) if date_formats else r'\d{1,2}/\d{1,2}(?:/\d{2,4})?'
+    values = {'date': f'(?:{date})', 'description': r'[^\n:]+?'}
+    pattern = ''
+    for position, column in enumerate(columns):
+        group = f'(?P<{column}>{values.get(column, _MONEY)})'
+        if column == 'balance' and position == len(columns) - 1:
+            # Not every line carries a running balance
+            pattern += f'(?:[ \\t]+{group})?'
+        else:
+            pattern += ('[ \\t]+' if pattern else '') + group
+    return pattern + r'[ \t]*$'
+
+@dataclass(frozen=True)
+class BankLayout:
+    """
+    How one bank lays out its statements
+
+    Loaded from a JSON file named after the layout id, for example:
+
+        {
+          "name": "First Commerce Bank",
+          "markers": ["First Commerce Bank", "Business Checking Bank Statement"],
+          "columns": ["date", "description", "amount", "balance"],
+          "headers": {"date": ["Date"], "amount": ["Amount"]},
+          "date_formats": ["%m/%d/%Y"],
+          "labels": {"opening_balance": ["Previous Balance"]}
+        }
+
+    `markers` are whole lines found near the top of the first page, `columns`
+    the transaction table from left to right (`debit` and `credit` columns
+    are combined into a signed `amount`), `headers` and `labels` extra names
+    for table columns and fields, tried before the generic ones.
+    """
+    id: str
+    name: str
+    markers: Tuple[str, ...]
+    columns: Tuple[str, ...]
+    headers: Dict[str, Tuple[str, ...]]
+    date_formats: Tuple[str, ...]
+    labels: Dict[str, Tuple[str, ...]]
+
+    @classmethod
+    def from_file(cls, path: str) -> 'BankLayout':
+        """
+        Load and check a layout file
+
+        Raises:
+            ValueError: When the file does not describe a usable layout
+        """
+        with open(path) as file:
+            data = json.load(file)
+
+        layout = cls(
+            id=os.path.splitext(os.path.basename(path))[0],
+            name=data.get('name', ''),
+            markers=tuple(data.get('markers', ())),
+            columns=tuple(data.get('columns', ())),
+            headers={column: tuple(names) for column, names in data.get('headers', {}).items()},
+            date_formats=tuple(data.get('date_formats', ())),
+            labels={name: tuple(aliases) for name, aliases in data.get('labels', {}).items()},
+        )
+
+        if not layout.markers or not all(fingerprint_line(marker) for marker in layout.markers):
+            raise ValueError(f"Bank layout {path} needs markers containing words")
+        unknown = set(layout.columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Bank layout {path} has unknown columns: {', '.join(sorted(unknown))}")
+        if 'date' not in layout.columns or not ('amount' in layout.columns or {'debit', 'credit'} <= set(layout.columns)):
+            raise ValueError(f"Bank layout {path} needs a date column and an amount column or debit and credit columns")
+        _date_pattern(layout.date_formats)
+        return layout
+
+    def template(self) -> DocumentTemplate:
+        """The generic bank statement template, specialised with this layout's names and column order"""
+        base = get_template('bank_statement')
+        base_table = base.tables[0]
+        fields = tuple(replace(field, aliases=self.labels.get(field.name, ()) + field.aliases) for field in base.fields)
+        table = Table(
+            base_table.name,
+            {column: self.headers.get(column, ()) + base_table.columns.get(column, ()) for column in COLUMNS if column in self.columns},
+            required=('date', 'amount') if 'amount' in self.columns else ('date',),
+            row=_row_pattern(self.columns, self.date_formats),
+            order=self.columns,
+            debit_credit=None if 'amount' in self.columns else ('debit', 'credit'),
+        )
+        return DocumentTemplate(base.document_type, fields, (table,), base.ignored)
+
+class BankLayoutRegistry:
+    """
+    Bank statement layouts, recognised from the first lines of a statement
+
+    Each marker is indexed by its fingerprint, so identifying a statement
+    costs one dictionary lookup per line examined, however many layouts are
+    registered. Layout templates are compiled once, when the registry loads.
+    """
+
+    def __init__(self, directories: List[str]):
+        """Initialize the BankLayoutRegistry"""
+        self.layouts: Dict[str, BankLayout] = {}
+        for directory in directories:
+            for file_name in sorted(os.listdir(directory)):
+                if file_name.endswith('.json'):
+                    # A later directory overrides a layout with the same id
+                    layout = BankLayout.from_file(os.path.join(directory, file_name))
+                    self.layouts[layout.id] = layout
+
+        self.markers: Dict[str, List[str]] = {}
+        self.marker_counts: Dict[str, int] = {}
+        self.templates: Dict[str, CompiledTemplate] = {}
+        for layout in self.layouts.values():
+            fingerprints = set(map(fingerprint_line, layout.markers))
+            for fingerprint in fingerprints:
+                self.markers.setdefault(fingerprint, []).append(layout.id)
+            self.marker_counts[layout.id] = len(fingerprints)
+            self.templates[layout.id] = CompiledTemplate(layout.template())
+        logger.info("Loaded %d bank statement layouts", len(self.layouts))
+
+    def identify(self, ocr_result: Union[Dict[str, Any], str]) -> Optional[BankLayout]:
+        """
+        Find the layout of a statement from its first BANK_FINGERPRINT_LINES lines
+
+        Args:
+            ocr_result (Union[Dict[str, Any], str]): An OCREngine result, or plain text
+
+        Returns:
+            Optional[BankLayout]: The layout whose markers are all present, the one with most markers if several are
+        """
+        text = ocr_result if isinstance(ocr_result, str) else ocr_result.get('full_text') or ''
+        limit = settings.BANK_FINGERPRINT_LINES
+        hits = Counter()
+        for fingerprint in {fingerprint_line(line) for line in text.split('\n', limit)[:limit]}:
+            hits.update(self.markers.get(fingerprint, ()))
+
+        matches = [layout_id for layout_id, count in hits.items() if count == self.marker_counts[layout_id]]
+        return self.layouts[max(matches, key=self.marker_counts.get)] if matches else None
+
+    def extract(self, layout: BankLayout, ocr_result: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        """Extract a bank statement with the compiled template of its layout"""
+        return self.templates[layout.id].extract(ocr_result)
+
+@functools.lru_cache()
+def get_bank_layouts() -> BankLayoutRegistry:
+    """Return the process-wide layout registry, with the bundled layouts and those in BANK_LAYOUT_DIR"""
+    directories = [BUNDLED_LAYOUT_DIR]
+    if settings.BANK_LAYOUT_DIR:
+        directories.append(settings.BANK_LAYOUT_DIR)
+    return BankLayoutRegistry(directories)
+
+# Human tasks:
+# 1. Add a layout file for each bank whose statements are received regularly, starting from a reviewed sample statement
@@ -0,0 +1,124 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.services.extraction_templates import parse_amount
+
+# Transactions for returned items and insufficient-funds fees; matched a description (line) at a time
+NSF_PATTERN = re.compile(
+    r'^.*\b(?:NSF|non[- ]?sufficient|insufficient funds|returned (?:item|check|ach|payment))\b.*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+DAYS_PER_MONTH = 365.25 / 12
+
+_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%m-%d-%Y', '%m-%d-%y', '%Y-%m-%d', '%b %d, %Y', '%B %d, %Y', '%b %d %Y')
+# Statements often print dates without the year, which is taken from the statement period
+_YEARLESS_FORMATS = ('%m/%d', '%m-%d', '%b %d', '%B %d', '%b. %d')
+_YEAR = re.compile(r'(?:19|20)\d{2}')
+_MONEY_CHARACTERS = str.maketrans('', '', '$, ')
+
+def _number(value: Optional[str]) -> float:
+    # Plain amounts take the fast path; parentheses and other forms go through parse_amount
+    if not value:
+        return np.nan
+    try:
+        return float(value.translate(_MONEY_CHARACTERS))
+    except ValueError:
+        amount = parse_amount(value)
+        return np.nan if amount is None else float(amount)
+
+def _parse_date(value: str, year: int) -> Optional[date]:
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    for date_format in _YEARLESS_FORMATS:
+        try:
+            # Parsed with its year, so February 29 is accepted in leap years
+            return datetime.strptime(f"{value} {year}", f"{date_format} %Y").date()
+        except ValueError:
+            pass
+    return None
+
+def _parse_dates(values: List[Optional[str]], statement_period: Optional[str]) -> np.ndarray:
+    # Each distinct date string is parsed once; a statement has a few dozen
+    years = _YEAR.findall(statement_period or '')
+    year = int(years[-1]) if years else date.today().year
+    parsed = {value: _parse_date(value, year) for value in set(values) if value}
+
+    # A statement running from December into January: its yearless late-year dates belong to the year before
+    yearless = {value for value, day in parsed.items() if day is not None and not _YEAR.search(value)}
+    months = {parsed[value].month for value in yearless}
+    if 1 in months and 12 in months:
+        for value in yearless:
+            if parsed[value].month >= 7:
+                parsed[value] = parsed[value].replace(year=year - 1)
+
+    return np.array([parsed.get(value) if value else None for value in values], dtype='datetime64[D]')
+
+def statement_metrics(transactions: List[Dict[str, Optional[str]]], opening_balance: Optional[str] = None,
+                      statement_period: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compute the cash-flow metrics of one bank statement
+
+    Transactions are converted to arrays once and every metric is an array
+    operation over them. The daily balance is the last balance printed on
+    each day, carried over the days without transactions; without a balance
+    column it is the opening balance plus the running sum of amounts. The
+    sums are returned alongside the averages so statements can be combined
+    (see CashFlowMetrics.add_statement).
+
+    Args:
+        transactions (List[Dict[str, Optional[str]]]): Transactions as DataExtractor returns them
+        opening_balance (Optional[str]): The statement's opening balance
+        statement_period (Optional[str]): The statement period, for the year of dates printed without one
+
+    Returns:
+        Dict[str, Any]: The statement's metrics, as JSON-serialisable values
+    """
+    days = _parse_dates([transaction.get('date') for transaction in transactions], statement_period)
+    amounts = np.array([_number(transaction.get('amount')) for transaction in transactions], dtype=float)
+    balances = np.array([_number(transaction.get('balance')) for transaction in transactions], dtype=float)
+    opening = parse_amount(opening_balance)
+    if transactions and np.isnan(balances).all() and opening is not None:
+        balances = float(opening) + np.nancumsum(amounts)
+
+    deposits = amounts > 0
+    withdrawals = amounts < 0
+    nsf_count = len(NSF_PATTERN.findall('\n'.join(transaction.get('description') or '' for transaction in transactions)))
+
+    statement_days = negative_days = 0
+    daily_balance_sum = 0.0
+    start = end = None
+    dated = ~np.isnat(days) & ~np.isnan(balances)
+    if dated.any():
+        order = np.argsort(days[dated], kind='stable')
+        row_days, row_balances = days[dated][order], balances[dated][order]
+        # The last row of each day carries the day's closing balance
+        last = np.flatnonzero(np.append(row_days[1:] != row_days[:-1], True))
+        closing_days, closing = row_days[last], row_balances[last]
+        # Each closing balance stands until the next day with transactions
+        spans = np.append(np.diff(closing_days).astype(np.int64), 1)
+        statement_days = int(spans.sum())
+        daily_balance_sum = float((closing * spans).sum())
+        negative_days = int(spans[closing < 0].sum())
+        start, end = str(closing_days[0]), str(closing_days[-1])
+
+    deposit_total = float(amounts[deposits].sum())
+    return {
+        'start_date': start,
+        'end_date': end,
+        'days': statement_days,
+        'deposit_total': round(deposit_total, 2),
+        'deposit_count': int(deposits.sum()),
+        'withdrawal_total': round(float(-amounts[withdrawals].sum()), 2),
+        'daily_balance_sum': round(daily_balance_sum, 2),
+        'nsf_count': nsf_count,
+        'negative_balance_days': negative_days,
+        'average_daily_balance': round(daily_balance_sum / statement_days, 2) if statement_days else None,
+        'average_monthly_deposits': round(deposit_total * DAYS_PER_MONTH / statement_days, 2) if statement_days else None,
+    }
+
+# Human tasks:
+# 1. Review NSF_PATTERN against the NSF and returned-item descriptions of the banks seen most often
@@ -0,0 +1,172 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from src.api.models.document import application_documents
+from src.api.models.identity_key import IdentityKey, IdentityKind
+from src.services.merchant_matching import find_candidate_merchants
+from src.utils.logger import logger
+from src.utils.tracing import trace_stage
+
+# The extracted fields holding each identity, by document type
+IDENTITY_FIELDS = {
+    'bank_statement': (('account_holder', IdentityKind.BUSINESS_NAME), ('account_number', IdentityKind.ACCOUNT_NUMBER)),
+    'tax_return': (('taxpayer_name', IdentityKind.BUSINESS_NAME), ('ein', IdentityKind.EIN)),
+    'business_license': (('business_name', IdentityKind.BUSINESS_NAME),),
+    'financial_statement': (('company_name', IdentityKind.BUSINESS_NAME),),
+}
+
+# Legal forms and filler words that vary between documents of one business
+_NAME_NOISE = {
+    'THE', 'AND', 'LLC', 'L', 'C', 'INC', 'INCORPORATED', 'CORP', 'CORPORATION', 'CO', 'COMPANY',
+    'LTD', 'LIMITED', 'LP', 'LLP', 'PC', 'PLLC', 'PA',
+}
+_NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]+')
+_NON_DIGITS = re.compile(r'\D+')
+_MASKED = re.compile(r'[Xx*]')
+
+def normalize_business_name(name: Optional[str]) -> Optional[str]:
+    """Upper-case words of a business name without punctuation, legal forms or the part after DBA"""
+    if not name:
+        return None
+    words = _NON_ALPHANUMERIC.sub(' ', name.upper().replace('&', ' AND ')).split()
+    if 'DBA' in words:
+        words = words[:words.index('DBA')]
+    words = [word for word in words if word not in _NAME_NOISE]
+    return ' '.join(words) or None
+
+def normalize_ein(ein: Optional[str]) -> Optional[str]:
+    """The nine digits of an EIN, None unless it has exactly nine"""
+    digits = _NON_DIGITS.sub('', ein or '')
+    return digits if len(digits) == 9 else None
+
+def normalize_account_number(account_number: Optional[str]) -> Optional[str]:
+    """The digits of a full account number; masked numbers (XXXX1234) cannot be compared and give None"""
+    if not account_number or _MASKED.search(account_number):
+        return None
+    digits = _NON_DIGITS.sub('', account_number)
+    return digits if len(digits) >= 6 else None
+
+_NORMALIZERS = {
+    IdentityKind.BUSINESS_NAME: normalize_business_name,
+    IdentityKind.EIN: normalize_ein,
+    IdentityKind.ACCOUNT_NUMBER: normalize_account_number,
+}
+
+def identity_keys(document_type: str, extracted_data: Dict[str, Any]) -> List[Tuple[IdentityKind, str, str]]:
+    """
+    Normalize the identities in a document's extracted data
+
+    Returns:
+        List[Tuple[IdentityKind, str, str]]: (kind, normalized value, field) of each identity found
+    """
+    keys = {}
+    for field, kind in IDENTITY_FIELDS.get(document_type, ()):
+        value = _NORMALIZERS[kind](extracted_data.get(field))
+        if value:
+            keys.setdefault((kind, value), field)
+    return [(kind, value, field) for (kind, value), field in keys.items()]
+
+def record_identity_keys(db: Session, document_id: str, application_id: str, document_type: str, extracted_data: Dict[str, Any]) -> None:
+    """Replace the identity keys of a document; the caller commits"""
+    table = IdentityKey.__table__
+    db.execute(table.delete().where(table.c.document_id == document_id))
+    rows = [
+        {'document_id': document_id, 'application_id': application_id, 'kind': kind, 'value': value, 'field': field}
+        for kind, value, field in identity_keys(document_type, extracted_data)
+    ]
+    if rows:
+        db.execute(table.insert(), rows)
+
+def _mask(account_number: str) -> str:
+    return f"ending {account_number[-4:]}"
+
+class CrossDocumentValidator:
+    """
+    Checks the identities of an application's documents against each other and against other applications
+
+    Works on the identity_keys table only: the keys of one application come
+    from its application_id index, and each comparison with the rest of the
+    history is a lookup in the (kind, value, application_id) index, so the
+    cost of a check grows with the log of the history, not its size. Similar
+    business names of other merchants come from the merchant name index.
+    """
+
+    def validate_application(self, db: Session, application_id: str) -> Dict[str, Any]:
+        """
+        Validate the documents of an application together
+
+        Args:
+            db (Session): The database session
+            application_id (str): The ID of the application
+
+        Returns:
+            Dict[str, Any]: 'errors' and 'warnings', as from DataValidator.validate_data
+        """
+        errors = []
+        warnings = []
+        table = IdentityKey.__table__
+
+        with trace_stage("cross_document_validation", application_id=application_id):
+            # The application's own documents and those linked to it as resent duplicates
+            linked = select(application_documents.c.document_id).where(application_documents.c.application_id == application_id)
+            rows = db.execute(
+                select(table.c.kind, table.c.value, table.c.field)
+                .where(or_(table.c.application_id == application_id, table.c.document_id.in_(linked)))
+            ).all()
+            values: Dict[IdentityKind, Dict[str, List[str]]] = {kind: {} for kind in IdentityKind}
+            for kind, value, field in rows:
+                values[kind].setdefault(value, []).append(field)
+
+            # Every document should name the same business
+            names = values[IdentityKind.BUSINESS_NAME]
+            if len(names) > 1:
+                found = '; '.join(f"{name} ({', '.join(sorted(set(fields)))})" for name, fields in sorted(names.items()))
+                warnings.append(f"Business name differs across documents: {found}")
+            # The same business on other applications may be stacking
+            for name in sorted(names):
+                matches = find_candidate_merchants(db, name, exclude_application_id=application_id)
+                if matches:
+                    found = ', '.join(f"{merchant.application_id} ({score:.2f})" for merchant, score in matches)
+                    warnings.append(f"Business name {name} resembles the merchants of other applications: {found}")
+            if len(values[IdentityKind.EIN]) > 1:
+                errors.append("Documents carry different Employer Identification Numbers")
+
+            accounts = values[IdentityKind.ACCOUNT_NUMBER]
+            if accounts:
+                for account_number, other_applications in sorted(self._unrelated_reuse(db, application_id, accounts, values).items()):
+                    errors.append(f"Account number {_mask(account_number)} also appears on unrelated applications: {', '.join(sorted(other_applications))}")
+
+        logger.info("Cross-document validation of application %s: %d errors, %d warnings", application_id, len(errors), len(warnings))
+        return {"errors": errors, "warnings": warnings}
+
+    def _unrelated_reuse(self, db: Session, application_id: str, accounts: Dict[str, List[str]],
+                         values: Dict[IdentityKind, Dict[str, List[str]]]) -> Dict[str, set]:
+        # Other applications with one of these account numbers
+        table = IdentityKey.__table__
+        reuse: Dict[str, set] = {}
+        for account_number, other_application in db.execute(
+            select(table.c.value, table.c.application_id).distinct()
+            .where(table.c.kind == IdentityKind.ACCOUNT_NUMBER, table.c.value.in_(list(accounts)), table.c.application_id != application_id)
+        ):
+            reuse.setdefault(account_number, set()).add(other_application)
+        if not reuse:
+            return {}
+
+        # Those sharing an EIN or business name are the same merchant applying again, not a reused account
+        identities = [
+            and_(table.c.kind == kind, table.c.value.in_(list(values[kind])))
+            for kind in (IdentityKind.EIN, IdentityKind.BUSINESS_NAME) if values[kind]
+        ]
+        related = set()
+        if identities:
+            others = set().union(*reuse.values())
+            related = set(db.execute(
+                select(table.c.application_id).distinct().where(or_(*identities), table.c.application_id.in_(list(others)))
+            ).scalars())
+
+        unrelated = {account_number: applications - related for account_number, applications in reuse.items()}
+        return {account_number: applications for account_number, applications in unrelated.items() if applications}
+
+# Human tasks:
+# 1. Surface the cross_document errors returned by DocumentResults.process_document to underwriters
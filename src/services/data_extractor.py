@@ -1,7 +1,16 @@
-from typing import Dict, Any, List
+from typing import Dict, Any
 from src.core.config import settings
 from src.utils.logger import logger
 from src.services.ocr_engine import OCREngine
+from src.services.extraction_templates import compiled_template
+from src.services.bank_layouts import get_bank_layouts
+from src.services.cash_flow import statement_metrics
+from src.services.page_extraction import check_balance_continuity, extract_by_page
+from src.utils.tracing import trace_stage
+
+# Bump when a change to the extraction code (rather than to a template or bank layout) changes
+# what is extracted; stored results of older versions are then recomputed by src/services/reprocessing.py
+EXTRACTION_VERSION = 2
 
 class DataExtractor:
     """Class for extracting structured data from OCR results"""
@@ -24,21 +33,39 @@ class DataExtractor:
         """
         # Perform OCR on the document using OCREngine
         ocr_result = self.ocr_engine.perform_ocr(file_path)
+        return self.extract_from_ocr(ocr_result, document_type, str(file_path))
+
+    def extract_stored_document(self, storage_key: str, document_type: str) -> Dict[str, Any]:
+        """
+        Extract structured data from a document in storage
 
-        # Based on document_type, call appropriate extraction method
-        if document_type == "bank_statement":
-            extracted_data = self.extract_bank_statement(ocr_result)
-        elif document_type == "tax_return":
-            extracted_data = self.extract_tax_return(ocr_result)
-        elif document_type == "business_license":
-            extracted_data = self.extract_business_license(ocr_result)
-        elif document_type == "financial_statement":
-            extracted_data = self.extract_financial_statement(ocr_result)
-        else:
-            raise ValueError(f"Unsupported document type: {document_type}")
+        Args:
+            storage_key (str): Storage key of the document (Document.file_path)
+            document_type (str): Type of the document
+
+        Returns:
+            Dict[str, Any]: Extracted structured data
+        """
+        ocr_result = self.ocr_engine.perform_stored_ocr(storage_key)
+        return self.extract_from_ocr(ocr_result, document_type, storage_key)
+
+    def extract_from_ocr(self, ocr_result: Dict[str, Any], document_type: str, source: str) -> Dict[str, Any]:
+        """Extract structured data from the OCR result of a document"""
+        with trace_stage("extraction", file_path=source, document_type=document_type):
+            # Based on document_type, call appropriate extraction method
+            if document_type == "bank_statement":
+                extracted_data = self.extract_bank_statement(ocr_result)
+            elif document_type == "tax_return":
+                extracted_data = self.extract_tax_return(ocr_result)
+            elif document_type == "business_license":
+                extracted_data = self.extract_business_license(ocr_result)
+            elif document_type == "financial_statement":
+                extracted_data = self.extract_financial_statement(ocr_result)
+            else:
+                raise ValueError(f"Unsupported document type: {document_type}")
 
         # Log the extraction process
-        logger.info(f"Data extracted from {document_type}: {file_path}")
+        logger.info("Data extracted from %s: %s", document_type, source, extra={"sampled": True})
 
         # Return the extracted structured data
         return extracted_data
@@ -53,33 +80,23 @@ class DataExtractor:
         Returns:
             Dict[str, Any]: Extracted bank statement data
         """
-        # Extract account holder name
-        account_holder = self._extract_account_holder(ocr_result)
-
-        # Extract account number
-        account_number = self._extract_account_number(ocr_result)
-
-        # Extract statement period
-        statement_period = self._extract_statement_period(ocr_result)
-
-        # Extract opening balance
-        opening_balance = self._extract_opening_balance(ocr_result)
-
-        # Extract closing balance
-        closing_balance = self._extract_closing_balance(ocr_result)
-
-        # Extract transaction details
-        transactions = self._extract_transactions(ocr_result)
-
-        # Return structured bank statement data
-        return {
-            "account_holder": account_holder,
-            "account_number": account_number,
-            "statement_period": statement_period,
-            "opening_balance": opening_balance,
-            "closing_balance": closing_balance,
-            "transactions": transactions
-        }
+        # Use the issuing bank's layout when the top of the statement identifies it
+        bank_layouts = get_bank_layouts()
+        layout = bank_layouts.identify(ocr_result)
+        template = bank_layouts.templates[layout.id] if layout else compiled_template("bank_statement")
+
+        # Read transactions page by page, then check the running balance across page breaks
+        extracted_data, page_rows = extract_by_page(template, ocr_result)
+        extracted_data["bank_layout"] = layout.id if layout else None
+        extracted_data["balance_breaks"] = check_balance_continuity(
+            extracted_data["transactions"], page_rows.get("transactions", []), extracted_data["opening_balance"]
+        )
+
+        # Summarise the statement's cash flow for underwriting
+        extracted_data["cash_flow"] = statement_metrics(
+            extracted_data["transactions"], extracted_data["opening_balance"], extracted_data["statement_period"]
+        )
+        return extracted_data
 
     def extract_tax_return(self, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -91,33 +108,7 @@ class DataExtractor:
         Returns:
             Dict[str, Any]: Extracted tax return data
         """
-        # Extract taxpayer name
-        taxpayer_name = self._extract_taxpayer_name(ocr_result)
-
-        # Extract tax year
-        tax_year = self._extract_tax_year(ocr_result)
-
-        # Extract total income
-        total_income = self._extract_total_income(ocr_result)
-
-        # Extract taxable income
-        taxable_income = self._extract_taxable_income(ocr_result)
-
-        # Extract tax paid
-        tax_paid = self._extract_tax_paid(ocr_result)
-
-        # Extract any relevant deductions or credits
-        deductions_credits = self._extract_deductions_credits(ocr_result)
-
-        # Return structured tax return data
-        return {
-            "taxpayer_name": taxpayer_name,
-            "tax_year": tax_year,
-            "total_income": total_income,
-            "taxable_income": taxable_income,
-            "tax_paid": tax_paid,
-            "deductions_credits": deductions_credits
-        }
+        return self._extract_fields("tax_return", ocr_result)
 
     def extract_business_license(self, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -129,33 +120,7 @@ class DataExtractor:
         Returns:
             Dict[str, Any]: Extracted business license data
         """
-        # Extract business name
-        business_name = self._extract_business_name(ocr_result)
-
-        # Extract license number
-        license_number = self._extract_license_number(ocr_result)
-
-        # Extract issue date
-        issue_date = self._extract_issue_date(ocr_result)
-
-        # Extract expiration date
-        expiration_date = self._extract_expiration_date(ocr_result)
-
-        # Extract business type
-        business_type = self._extract_business_type(ocr_result)
-
-        # Extract business address
-        business_address = self._extract_business_address(ocr_result)
-
-        # Return structured business license data
-        return {
-            "business_name": business_name,
-            "license_number": license_number,
-            "issue_date": issue_date,
-            "expiration_date": expiration_date,
-            "business_type": business_type,
-            "business_address": business_address
-        }
+        return self._extract_fields("business_license", ocr_result)
 
     def extract_financial_statement(self, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -167,145 +132,13 @@ class DataExtractor:
         Returns:
             Dict[str, Any]: Extracted financial statement data
         """
-        # Extract company name
-        company_name = self._extract_company_name(ocr_result)
-
-        # Extract statement period
-        statement_period = self._extract_statement_period(ocr_result)
-
-        # Extract revenue
-        revenue = self._extract_revenue(ocr_result)
-
-        # Extract expenses
-        expenses = self._extract_expenses(ocr_result)
-
-        # Extract net income
-        net_income = self._extract_net_income(ocr_result)
-
-        # Extract assets
-        assets = self._extract_assets(ocr_result)
-
-        # Extract liabilities
-        liabilities = self._extract_liabilities(ocr_result)
-
-        # Extract equity
-        equity = self._extract_equity(ocr_result)
-
-        # Return structured financial statement data
-        return {
-            "company_name": company_name,
-            "statement_period": statement_period,
-            "revenue": revenue,
-            "expenses": expenses,
-            "net_income": net_income,
-            "assets": assets,
-            "liabilities": liabilities,
-            "equity": equity
-        }
-
-    # Helper methods for data extraction (to be implemented)
-    def _extract_account_holder(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting account holder name
-        pass
-
-    def _extract_account_number(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting account number
-        pass
-
-    def _extract_statement_period(self, ocr_result: Dict[str, Any]) -> Dict[str, str]:
-        # Implementation for extracting statement period
-        pass
-
-    def _extract_opening_balance(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting opening balance
-        pass
-
-    def _extract_closing_balance(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting closing balance
-        pass
-
-    def _extract_transactions(self, ocr_result: Dict[str, Any]) -> List[Dict[str, Any]]:
-        # Implementation for extracting transaction details
-        pass
-
-    def _extract_taxpayer_name(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting taxpayer name
-        pass
-
-    def _extract_tax_year(self, ocr_result: Dict[str, Any]) -> int:
-        # Implementation for extracting tax year
-        pass
-
-    def _extract_total_income(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting total income
-        pass
-
-    def _extract_taxable_income(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting taxable income
-        pass
-
-    def _extract_tax_paid(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting tax paid
-        pass
-
-    def _extract_deductions_credits(self, ocr_result: Dict[str, Any]) -> Dict[str, float]:
-        # Implementation for extracting deductions and credits
-        pass
-
-    def _extract_business_name(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting business name
-        pass
-
-    def _extract_license_number(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting license number
-        pass
-
-    def _extract_issue_date(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting issue date
-        pass
-
-    def _extract_expiration_date(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting expiration date
-        pass
-
-    def _extract_business_type(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting business type
-        pass
-
-    def _extract_business_address(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting business address
-        pass
-
-    def _extract_company_name(self, ocr_result: Dict[str, Any]) -> str:
-        # Implementation for extracting company name
-        pass
-
-    def _extract_revenue(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting revenue
-        pass
-
-    def _extract_expenses(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting expenses
-        pass
-
-    def _extract_net_income(self, ocr_result: Dict[str, Any]) -> float:
-        # Implementation for extracting net income
-        pass
-
-    def _extract_assets(self, ocr_result: Dict[str, Any]) -> Dict[str, float]:
-        # Implementation for extracting assets
-        pass
-
-    def _extract_liabilities(self, ocr_result: Dict[str, Any]) -> Dict[str, float]:
-        # Implementation for extracting liabilities
-        pass
+        return self._extract_fields("financial_statement", ocr_result)
 
-    def _extract_equity(self, ocr_result: Dict[str, Any]) -> Dict[str, float]:
-        # Implementation for extracting equity
-        pass
+    def _extract_fields(self, document_type: str, ocr_result: Dict[str, Any]) -> Dict[str, Any]:
+        # Resolve every field of the document type in one pass with its compiled template
+        return compiled_template(document_type).extract(ocr_result)
 
 # Human tasks:
-# TODO: Implement the helper methods for data extraction (_extract_*) with appropriate logic to parse OCR results
+# TODO: Add templates to extraction_templates.py for additional document types as needed
 # TODO: Add error handling and validation for extracted data
-# TODO: Implement additional document types as needed
 # TODO: Optimize performance for large documents or high volume processing
\ No newline at end of file
@@ -1,8 +1,20 @@
 from typing import Dict, Any, List
 from src.core.config import settings
 from src.utils.logger import logger
+from src.utils.validators import validate_account_number, validate_ein, validate_ssn
 from src.api.models.application import Application
 from src.api.models.document import Document, DocumentType
+from src.services.cross_document_validator import normalize_business_name
+from src.utils.tracing import trace_stage
+
+# Version of the rules of each document type. Bump it with any change to that type's rules;
+# stored validation results of older versions are then recomputed by src/services/reprocessing.py
+RULE_VERSIONS: Dict[str, int] = {
+    DocumentType.BANK_STATEMENT.value: 2,
+    DocumentType.TAX_RETURN.value: 2,
+    DocumentType.BUSINESS_LICENSE.value: 1,
+    DocumentType.FINANCIAL_STATEMENT.value: 1,
+}
 
 class DataValidator:
     """Class for validating extracted data from various document types"""
@@ -14,20 +26,52 @@ class DataValidator:
 
     def validate_data(self, extracted_data: Dict[str, Any], document_type: DocumentType) -> Dict[str, Any]:
         """Validate extracted data based on document type"""
-        # Based on document_type, call appropriate validation method
-        validation_method = getattr(self, f"validate_{document_type.value}", None)
-        if validation_method:
-            validation_results = validation_method(extracted_data)
-        else:
-            validation_results = {"errors": [f"No validation method found for document type: {document_type.value}"]}
+        with trace_stage("validation", document_type=document_type.value):
+            # Based on document_type, call appropriate validation method
+            validation_method = getattr(self, f"validate_{document_type.value}", None)
+            if validation_method:
+                validation_results = validation_method(extracted_data)
+            else:
+                validation_results = {"errors": [f"No validation method found for document type: {document_type.value}"]}
 
         # Log the validation process
-        logger.info(f"Validated data for document type: {document_type.value}")
-        logger.debug(f"Validation results: {validation_results}")
+        logger.info("Validated data for document type: %s", document_type.value, extra={"sampled": True})
+        logger.debug("Validation results", extra={"fields": {"document_type": document_type.value, "validation_results": validation_results}})
 
         # Return the validation results
         return validation_results
 
+    def validate_application(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate the form fields of an application entered through the API
+
+        Only the fields present are checked, so a partial update is validated
+        against the same rules as a new application.
+
+        Args:
+            data (Dict[str, Any]): The form fields, as from ApplicationCreate or ApplicationUpdate
+
+        Returns:
+            Dict[str, Any]: The errors and warnings found
+        """
+        errors = []
+        warnings = []
+
+        # A business name must keep something to match merchants on once case, punctuation and legal form are removed
+        if "business_name" in data and not normalize_business_name(data["business_name"]):
+            errors.append("Business name must contain letters or digits besides its legal form")
+
+        # Free-text fields must not be blank
+        for field in ["business_type", "purpose_of_funding"]:
+            if field in data and not (data[field] or "").strip():
+                errors.append(f"Missing required field: {field}")
+
+        # The requested amount must be a positive amount of money
+        if "requested_amount" in data and not (data["requested_amount"] or 0) > 0:
+            errors.append("Requested amount must be greater than zero")
+
+        return {"errors": errors, "warnings": warnings}
+
     def validate_bank_statement(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Validate extracted bank statement data"""
         errors = []
@@ -148,8 +192,8 @@ class DataValidator:
 
     # Helper methods (these would need to be implemented)
     def _is_valid_account_number(self, account_number: str) -> bool:
-        # Implement account number validation logic
-        pass
+        # Statements print full or masked account numbers
+        return validate_account_number(account_number)
 
     def _is_valid_date_range(self, date_range: str) -> bool:
         # Implement date range validation logic
@@ -172,12 +216,10 @@ class DataValidator:
         pass
 
     def _is_valid_ssn(self, ssn: str) -> bool:
-        # Implement SSN validation logic
-        pass
+        return validate_ssn(ssn)
 
     def _is_valid_ein(self, ein: str) -> bool:
-        # Implement EIN validation logic
-        pass
+        return validate_ein(ein)
 
     def _is_valid_license_number(self, license_number: str) -> bool:
         # Implement license number validation logic
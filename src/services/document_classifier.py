@@ -3,6 +3,7 @@ from pathlib import Path
 from src.core.config import settings
 from src.api.models.document import DocumentType
 from src.utils.logger import logger
+from src.utils.tracing import trace_stage
 
 class DocumentClassifier:
     """Class for classifying documents based on their content and metadata"""
@@ -14,17 +15,18 @@ class DocumentClassifier:
 
     def classify_document(self, file_path: Path, metadata: Dict[str, Any]) -> DocumentType:
         """Classify a document based on its content and metadata"""
-        # Extract text content from the document
-        text_content = self.extract_text(file_path)
+        with trace_stage("classification", file_path=str(file_path)):
+            # Extract text content from the document
+            text_content = self.extract_text(file_path)
 
-        # Analyze document metadata
-        metadata_features = self.analyze_metadata(metadata)
+            # Analyze document metadata
+            metadata_features = self.analyze_metadata(metadata)
 
-        # Apply classification rules or machine learning model
-        document_type = self.apply_classification_rules(text_content, metadata_features)
+            # Apply classification rules or machine learning model
+            document_type = self.apply_classification_rules(text_content, metadata_features)
 
         # Log the classification result
-        logger.info(f"Classified document {file_path} as {document_type}")
+        logger.info("Classified document %s as %s", file_path, document_type, extra={"sampled": True})
 
         # Return the classified DocumentType
         return document_type
@@ -45,7 +47,7 @@ class DocumentClassifier:
             with open(file_path, 'r', encoding='utf-8') as file:
                 return file.read()
         else:
-            logger.warning(f"Unsupported file type for text extraction: {file_type}")
+            logger.warning("Unsupported file type for text extraction: %s", file_type)
             return ""
 
         # Return the extracted text
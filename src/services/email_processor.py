@@ -1,157 +1,528 @@
 import imaplib
-from email import message_from_bytes
-from email.header import decode_header
-from typing import List, Dict, Any
+import os
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
 from src.core.config import settings
 from src.services.document_classifier import DocumentClassifier
+from src.services.extraction_queue import enqueue_documents, extraction_jobs
+from src.services.storage import document_key, get_storage
+from src.services.streaming_mime_parser import StreamedAttachment, StreamingMimeParser
 from src.api.models.application import Application
-from src.api.models.document import Document
+from src.api.models.document import Document, application_documents
+from src.api.models.mailbox_checkpoint import MailboxCheckpoint
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from src.core.database import SessionLocal
 from src.utils.logger import logger
+from src.utils.tracing import current_span, record_application_ingested, trace_stage
+
+class MailboxConfig:
+    """Connection details of one intake mailbox"""
+
+    __slots__ = ("name", "server", "port", "username", "password", "folder")
+
+    def __init__(self, name: str, server: str, port: int, username: str, password: str, folder: str = 'INBOX'):
+        self.name = name
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.folder = folder
+
+    @classmethod
+    def from_settings(cls) -> List['MailboxConfig']:
+        """Build the configured intake mailboxes, falling back to the single EMAIL_* account"""
+        if settings.EMAIL_MAILBOXES:
+            # Entries may leave out the server and port shared with the default account
+            return [cls(**{'server': settings.EMAIL_SERVER, 'port': settings.EMAIL_PORT, **mailbox}) for mailbox in settings.EMAIL_MAILBOXES]
+        return [cls(settings.EMAIL_USERNAME, settings.EMAIL_SERVER, settings.EMAIL_PORT, settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD.get_secret_value())]
 
 class EmailProcessor:
     """Class for processing incoming emails and extracting relevant information"""
 
-    def __init__(self):
+    def __init__(self, mailbox: Optional[MailboxConfig] = None):
         """Initialize the EmailProcessor"""
-        # Initialize IMAP client using settings
-        self.imap_client = imaplib.IMAP4_SSL(settings.EMAIL_SERVER, settings.EMAIL_PORT)
+        self.mailbox = mailbox or MailboxConfig.from_settings()[0]
+        # Initialize IMAP client for the mailbox
+        self.imap_client = imaplib.IMAP4_SSL(self.mailbox.server, self.mailbox.port)
         # Login to email server
-        self.imap_client.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
-        # Initialize DocumentClassifier
-        self.document_classifier = DocumentClassifier()
+        self.imap_client.login(self.mailbox.username, self.mailbox.password)
+        # Classification, deduplication and persistence of parsed emails
+        self.ingestor = EmailIngestor()
+        # Initialize the streaming parser that decodes attachments into the upload directory
+        self.mime_parser = StreamingMimeParser(settings.TEMP_UPLOAD_DIR, chunk_size=settings.EMAIL_FETCH_CHUNK_SIZE)
 
     def process_emails(self) -> List[Dict[str, Any]]:
-        """Process new emails in the inbox"""
+        """
+        Process the emails that arrived since the mailbox's checkpoint
+
+        Emails are persisted in batches of up to INGESTION_BATCH_SIZE, each
+        committed together with the checkpoint advancing past its last UID,
+        so a crash never skips a message and a message is never ingested
+        twice. The \\Seen flag is set once a batch is committed, for people
+        reading the mailbox; ingestion no longer depends on it.
+        """
         processed_emails = []
 
         try:
-            # Select the inbox
-            self.imap_client.select('INBOX')
-
-            # Search for unread emails
-            _, message_numbers = self.imap_client.search(None, 'UNSEEN')
-
-            for num in message_numbers[0].split():
-                # Fetch the email content
-                _, msg_data = self.imap_client.fetch(num, '(RFC822)')
-                email_body = msg_data[0][1]
-                email_message = message_from_bytes(email_body)
-
-                # Parse the email
-                email_data = self.parse_email(email_message)
-
-                # Extract relevant information
-                application_data = {
-                    'applicant_name': email_data['sender'],
-                    'application_date': email_data['date'],
-                    'status': 'Received'
-                }
-
-                # Classify and save attachments
-                attachments = []
-                for attachment in email_data['attachments']:
-                    attachment_info = self.save_attachment(attachment)
-                    attachments.append(attachment_info)
-
-                # Create Application and Document records
-                with SessionLocal() as db:
-                    application = Application(**application_data)
-                    db.add(application)
-                    db.flush()
+            # Select the mailbox folder and find where the last poll stopped
+            self.select_mailbox()
+            last_uid = self.load_checkpoint()
 
-                    for attachment in attachments:
-                        document = Document(
-                            application_id=application.id,
-                            file_path=attachment['file_path'],
-                            document_type=attachment['document_type']
-                        )
-                        db.add(document)
+            uids = self.search_new_uids(last_uid)
+            for start in range(0, len(uids), settings.INGESTION_BATCH_SIZE):
+                batch = uids[start:start + settings.INGESTION_BATCH_SIZE]
+                with trace_stage("email_ingestion", mailbox=self.mailbox.name, uid=f"{batch[0].decode()}:{batch[-1].decode()}"):
+                    # Stream the emails in partial fetches; attachments are decoded and hashed straight to disk
+                    emails = [self.fetch_email(uid) for uid in batch]
 
-                    db.commit()
+                    # Classify and persist the emails' attachments, advancing the checkpoint in the same transaction;
+                    # the first poll has no checkpoint yet, so a restart takes its messages from UNSEEN again
+                    checkpoint = (self.mailbox.name, self.uid_validity, int(batch[-1])) if last_uid is not None else None
+                    if len(emails) == 1:
+                        processed_emails.append(self.ingestor.ingest(emails[0], checkpoint=checkpoint))
+                    else:
+                        processed_emails.extend(self.ingestor.ingest_batch(emails, checkpoint=checkpoint))
 
-                # Mark email as read
-                self.imap_client.store(num, '+FLAGS', '\\Seen')
+                    # Mark the committed emails as read
+                    self.imap_client.uid('STORE', b','.join(batch), '+FLAGS', '\\Seen')
 
-                processed_emails.append({
-                    'application_id': application.id,
-                    'email_subject': email_data['subject'],
-                    'attachments': attachments
-                })
+            if last_uid is None:
+                # The first poll took the UNSEEN messages; later polls start above everything that existed then
+                self.save_checkpoint(self.uid_next - 1)
 
             # Close the IMAP connection
             self.imap_client.close()
             self.imap_client.logout()
 
         except Exception as e:
-            logger.error(f"Error processing emails: {str(e)}")
+            logger.error("Error processing emails: %s", e)
 
         # Return processed email data
         return processed_emails
 
-    def parse_email(self, email_message: message_from_bytes) -> Dict[str, Any]:
-        """Parse an email message and extract relevant information"""
-        # Extract subject
-        subject, encoding = decode_header(email_message['Subject'])[0]
-        if isinstance(subject, bytes):
-            subject = subject.decode(encoding or 'utf-8')
-
-        # Extract sender
-        sender, encoding = decode_header(email_message['From'])[0]
-        if isinstance(sender, bytes):
-            sender = sender.decode(encoding or 'utf-8')
-
-        # Extract body
-        if email_message.is_multipart():
-            body = ''
-            for part in email_message.walk():
-                if part.get_content_type() == "text/plain":
-                    body = part.get_payload(decode=True).decode()
-                    break
+    def select_mailbox(self) -> None:
+        """Select the mailbox folder and record its UIDVALIDITY and UIDNEXT"""
+        self.imap_client.select(self.mailbox.folder)
+        self.uid_validity = int(self.imap_client.response('UIDVALIDITY')[1][0])
+        self.uid_next = int(self.imap_client.response('UIDNEXT')[1][0])
+
+    def load_checkpoint(self) -> Optional[int]:
+        """
+        Read the last ingested UID of the selected mailbox
+
+        Returns:
+            Optional[int]: The last ingested UID, 0 when UIDVALIDITY changed and
+                the whole folder must be rescanned, or None before the first poll
+        """
+        with SessionLocal() as db:
+            checkpoint = db.query(MailboxCheckpoint).get(self.mailbox.name)
+            if checkpoint is None:
+                return None
+            if checkpoint.uid_validity != self.uid_validity:
+                # UIDs were renumbered; applications already ingested are recognised by Message-ID
+                logger.warning("UIDVALIDITY of mailbox %s changed, rescanning %s", self.mailbox.name, self.mailbox.folder)
+                return 0
+            return checkpoint.last_uid
+
+    def save_checkpoint(self, last_uid: int) -> None:
+        """Advance the selected mailbox's checkpoint to last_uid"""
+        with SessionLocal() as db:
+            self.ingestor.advance_checkpoint(db, self.mailbox.name, self.uid_validity, last_uid)
+            db.commit()
+
+    def search_new_uids(self, last_uid: Optional[int]) -> List[bytes]:
+        """
+        Find the UIDs of messages to ingest, in ascending order
+
+        Only messages above last_uid are searched, so a poll costs O(new
+        messages). Without a checkpoint the UNSEEN messages are taken, which is
+        how ingestion tracked progress before checkpoints existed.
+        """
+        if last_uid is None:
+            _, data = self.imap_client.uid('SEARCH', None, 'UNSEEN')
+            return sorted(data[0].split(), key=int)
+
+        # "n:*" always matches the highest UID, even when it is below n
+        _, data = self.imap_client.uid('SEARCH', None, f'UID {last_uid + 1}:*')
+        return sorted((uid for uid in data[0].split() if int(uid) > last_uid), key=int)
+
+    def fetch_email(self, uid: bytes) -> Dict[str, Any]:
+        """Fetch and parse one message, decoding its attachments to disk"""
+        with trace_stage("imap_fetch", mailbox=self.mailbox.name):
+            email_data = self.mime_parser.parse(self.fetch_message_chunks(uid))
+        if not email_data['message_id']:
+            # Applications are keyed on Message-ID; fall back to the message's permanent UID
+            email_data['message_id'] = f'<{self.uid_validity}.{uid.decode()}@{self.mailbox.name}>'
+        return email_data
+
+    def fetch_message_chunks(self, uid: bytes) -> Iterator[bytes]:
+        """
+        Yield a message's raw bytes using partial UID fetches of EMAIL_FETCH_CHUNK_SIZE
+
+        BODY.PEEK leaves the \\Seen flag alone; it is set once the message is persisted.
+        """
+        chunk_size = settings.EMAIL_FETCH_CHUNK_SIZE
+        offset = 0
+        while True:
+            _, msg_data = self.imap_client.uid('FETCH', uid, f'(BODY.PEEK[]<{offset}.{chunk_size}>)')
+            chunk = msg_data[0][1] if msg_data and isinstance(msg_data[0], tuple) else b''
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            offset += len(chunk)
+
+class EmailIngestor:
+    """
+    Classify, deduplicate and persist parsed emails
+
+    Holds no mailbox connection, so one instance per thread can consume
+    emails fetched from any number of mailboxes.
+    """
+
+    def __init__(self):
+        """Initialize the EmailIngestor"""
+        # Initialize DocumentClassifier
+        self.document_classifier = DocumentClassifier()
+        # Documents are stored where every worker can read them
+        self.storage = get_storage()
+
+    def ingest(self, email_data: Dict[str, Any], checkpoint: Optional[Tuple[str, int, int]] = None) -> Dict[str, Any]:
+        """
+        Store and classify an email's new attachments and create its Application
+
+        Applications are keyed on Message-ID, so an email that is delivered
+        again (a retry after a crash, or the same email sent to two intake
+        mailboxes) returns the existing application without storing anything.
+
+        Args:
+            email_data (Dict[str, Any]): A message parsed by StreamingMimeParser
+            checkpoint (Optional[Tuple[str, int, int]]): mailbox, UIDVALIDITY and UID
+                of the message, advanced in the same transaction as the application
+
+        Returns:
+            Dict[str, Any]: application_id, email_subject and attachments; duplicate
+                is set when the email had already been ingested
+        """
+        existing_application = self.find_application(email_data['message_id'])
+        if existing_application is not None:
+            return self.skip_ingested(email_data, existing_application, checkpoint)
+
+        # Look every attachment hash up in one indexed query;
+        # a file attached more than once to the same email is kept once
+        with trace_stage("deduplication"):
+            unique_attachments = self.unique_attachments(email_data)
+            existing_documents = self.find_existing_documents(set(unique_attachments))
+
+        attachments = self.store_attachments(unique_attachments, existing_documents)
+        return self.persist(email_data, attachments, checkpoint)
+
+    def ingest_batch(self, emails: List[Dict[str, Any]], checkpoint: Optional[Tuple[str, int, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Ingest several emails in one transaction, for draining a backlog
+
+        The Message-IDs and attachment hashes of the whole batch are looked up
+        in one query each, and applications, documents and duplicate links are
+        written with one bulk INSERT per table. IDs are generated client-side,
+        so no row is read back. If another worker ingested one of the emails
+        or files in the meantime, the batch is rolled back and its emails are
+        persisted one by one as ingest() does. Callers flag the messages once
+        this returns.
+
+        Args:
+            emails (List[Dict[str, Any]]): Messages parsed by StreamingMimeParser, in UID order
+            checkpoint (Optional[Tuple[str, int, int]]): mailbox, UIDVALIDITY and UID
+                of the batch's last message, advanced in the same transaction
+
+        Returns:
+            List[Dict[str, Any]]: What ingest() returns for each email, in order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(emails)
+
+        # Skip emails ingested before; an email repeated within the batch is ingested once
+        with trace_stage("deduplication"):
+            ingested = self.find_applications({email_data['message_id'] for email_data in emails})
+            first_index: Dict[str, int] = {}
+            new_emails = []
+            repeated = []
+            for index, email_data in enumerate(emails):
+                message_id = email_data['message_id']
+                if message_id in ingested:
+                    results[index] = self.skip_ingested(email_data, ingested[message_id], None)
+                elif message_id in first_index:
+                    for attachment in email_data['attachments']:
+                        os.remove(attachment.file_path)
+                    repeated.append((index, first_index[message_id]))
+                else:
+                    first_index[message_id] = index
+                    new_emails.append((index, email_data, self.unique_attachments(email_data)))
+            existing_documents = self.find_existing_documents(set().union(*(unique for _, _, unique in new_emails)))
+
+        # Build the rows; a file attached to several emails of the batch is stored by the first and linked by the others
+        applications, documents, links, jobs = [], [], [], []
+        created: Dict[str, Dict[str, Any]] = {}
+        prepared = []
+        for index, email_data, unique_attachments in new_emails:
+            attachments = self.store_attachments(unique_attachments, existing_documents)
+            application = Application()
+            application.email_id = email_data['message_id']
+            applications.append(application)
+            email_documents = []
+            for attachment in attachments:
+                if attachment.get('duplicate'):
+                    links.append({'application_id': application.id, 'document_id': attachment['document_id']})
+                else:
+                    document = self.new_document(application.id, attachment)
+                    email_documents.append(document)
+                    attachment['document_id'] = existing_documents[attachment['md5_hash']] = document.id
+                    created[document.id] = attachment
+            documents.extend(email_documents)
+            jobs.extend(extraction_jobs(email_documents, self.received_at(email_data['date'])))
+            prepared.append((index, email_data, attachments, application.id))
+
+        with trace_stage("persistence", emails=len(prepared)), SessionLocal() as db:
+            try:
+                db.bulk_save_objects(applications)
+                db.bulk_save_objects(documents)
+                # New documents are extracted by the extraction workers once the batch is committed
+                db.bulk_save_objects(jobs)
+                if links:
+                    db.execute(application_documents.insert(), links)
+                if checkpoint is not None:
+                    self.advance_checkpoint(db, *checkpoint)
+                db.commit()
+                conflict = False
+            except IntegrityError:
+                db.rollback()
+                conflict = True
+
+        if conflict:
+            logger.warning("Batch of %d emails conflicted with another worker, persisting them one by one", len(prepared))
+            for index, email_data, attachments, _ in prepared:
+                # Documents of the rolled-back batch are created again, and later emails attaching the same file link to them
+                attachments = [
+                    {key: value for key, value in created[attachment['document_id']].items() if key not in ('document_id', 'duplicate')}
+                    if attachment.get('document_id') in created else attachment
+                    for attachment in attachments
+                ]
+                results[index] = self.persist(email_data, attachments, None)
+            if checkpoint is not None:
+                with SessionLocal() as db:
+                    self.advance_checkpoint(db, *checkpoint)
+                    db.commit()
         else:
-            body = email_message.get_payload(decode=True).decode()
+            for index, email_data, attachments, application_id in prepared:
+                self.record_latency(email_data['date'])
+                results[index] = {'application_id': application_id, 'email_subject': email_data['subject'], 'attachments': attachments}
+
+        for index, first in repeated:
+            results[index] = {'application_id': results[first]['application_id'], 'email_subject': emails[index]['subject'], 'attachments': [], 'duplicate': True}
+        logger.info("Ingested a batch of %d emails, %d new applications", len(emails), len(prepared))
+        return results
+
+    def unique_attachments(self, email_data: Dict[str, Any]) -> Dict[str, StreamedAttachment]:
+        """Key an email's attachments by content hash, deleting the files of repeated ones"""
+        unique_attachments = {}
+        for attachment in email_data['attachments']:
+            if attachment.md5_hash in unique_attachments:
+                os.remove(attachment.file_path)
+            else:
+                unique_attachments[attachment.md5_hash] = attachment
+        return unique_attachments
 
-        # Extract attachments
+    def store_attachments(self, unique_attachments: Dict[str, StreamedAttachment], existing_documents: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Store and classify only attachments that have not been ingested before"""
         attachments = []
-        for part in email_message.walk():
-            if part.get_content_maintype() == 'multipart':
-                continue
-            if part.get('Content-Disposition') is None:
-                continue
-            attachments.append(part)
-
-        # Return extracted data
+        for md5_hash, attachment in unique_attachments.items():
+            if md5_hash in existing_documents:
+                os.remove(attachment.file_path)
+                attachments.append({'md5_hash': md5_hash, 'document_id': existing_documents[md5_hash], 'duplicate': True})
+            else:
+                attachments.append(self.save_attachment(attachment))
+        return attachments
+
+    def persist(self, email_data: Dict[str, Any], attachments: List[Dict[str, Any]], checkpoint: Optional[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """Create the Application and Document records of one email in its own transaction"""
+        # Create Application and Document records, linking duplicates to their stored documents
+        with trace_stage("persistence"), SessionLocal() as db:
+            application = Application()
+            application.email_id = email_data['message_id']
+            try:
+                with db.begin_nested():
+                    db.add(application)
+            except IntegrityError:
+                # Another worker ingested the same email since the lookup; its application keeps the documents,
+                # which were stored under the same content-addressed paths
+                application_id = db.query(Application.id).filter(Application.email_id == email_data['message_id']).scalar()
+                if checkpoint is not None:
+                    self.advance_checkpoint(db, *checkpoint)
+                db.commit()
+                return {'application_id': application_id, 'email_subject': email_data['subject'], 'attachments': [], 'duplicate': True}
+            application_id = application.id
+
+            # New documents are queued for the extraction workers in the same transaction
+            received_at = self.received_at(email_data['date'])
+            for attachment in attachments:
+                if attachment.get('duplicate'):
+                    self.link_document(db, application_id, attachment['document_id'])
+                else:
+                    attachment['document_id'] = self.create_document(db, application_id, attachment, received_at)
+
+            if checkpoint is not None:
+                self.advance_checkpoint(db, *checkpoint)
+            db.commit()
+
+        span = current_span()
+        if span is not None:
+            span.set_attribute("application_id", application_id)
+
+        # Record ingestion latency from the time the email was sent
+        self.record_latency(email_data['date'])
+
         return {
-            'subject': subject,
-            'sender': sender,
-            'body': body,
-            'date': email_message['Date'],
+            'application_id': application_id,
+            'email_subject': email_data['subject'],
             'attachments': attachments
         }
 
-    def save_attachment(self, attachment: Any) -> Dict[str, Any]:
-        """Save an email attachment and classify it"""
+    def find_application(self, message_id: str) -> Optional[str]:
+        """Return the id of the application created from the email with this Message-ID, if any"""
+        with SessionLocal() as db:
+            return db.query(Application.id).filter(Application.email_id == message_id).scalar()
+
+    def find_applications(self, message_ids: Set[str]) -> Dict[str, str]:
+        """Return the id of the application created from each of these Message-IDs that was ingested"""
+        with SessionLocal() as db:
+            rows = db.query(Application.email_id, Application.id).filter(Application.email_id.in_(message_ids)).all()
+        return {message_id: application_id for message_id, application_id in rows}
+
+    def skip_ingested(self, email_data: Dict[str, Any], application_id: str, checkpoint: Optional[Tuple[str, int, int]]) -> Dict[str, Any]:
+        """Discard an email that was already ingested, still advancing the checkpoint past it"""
+        for attachment in email_data['attachments']:
+            os.remove(attachment.file_path)
+        if checkpoint is not None:
+            with SessionLocal() as db:
+                self.advance_checkpoint(db, *checkpoint)
+                db.commit()
+        logger.info("Email %s was already ingested as application %s", email_data['message_id'], application_id)
+        return {'application_id': application_id, 'email_subject': email_data['subject'], 'attachments': [], 'duplicate': True}
+
+    def advance_checkpoint(self, db: Session, mailbox: str, uid_validity: int, last_uid: int) -> None:
+        """Move a mailbox's checkpoint forward to last_uid within the caller's transaction"""
+        checkpoint = db.query(MailboxCheckpoint).filter(MailboxCheckpoint.mailbox == mailbox).with_for_update().one_or_none()
+        if checkpoint is None:
+            db.add(MailboxCheckpoint(mailbox, uid_validity, last_uid))
+        elif checkpoint.uid_validity != uid_validity or last_uid > checkpoint.last_uid:
+            checkpoint.uid_validity = uid_validity
+            checkpoint.last_uid = last_uid
+            checkpoint.updated_at = datetime.utcnow()
+
+    def record_latency(self, email_date: str) -> None:
+        """Record the application's ingestion latency measured from the email's Date header"""
+        received_at = self.received_at(email_date)
+        if received_at is not None:
+            record_application_ingested(received_at)
+
+    def received_at(self, email_date: str) -> Optional[datetime]:
+        """Parse an email's Date header as naive UTC; None when it is missing or unparseable"""
+        try:
+            received_at = parsedate_to_datetime(email_date)
+        except (TypeError, ValueError):
+            return None
+        if received_at.tzinfo is not None:
+            received_at = received_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return received_at
+
+    def find_existing_documents(self, md5_hashes: Set[str]) -> Dict[str, str]:
+        """
+        Look up already-stored documents by content hash
+
+        Args:
+            md5_hashes (Set[str]): Hashes of the decoded attachments of one email
+
+        Returns:
+            Dict[str, str]: Document id for every hash that is already stored
+        """
+        if not md5_hashes:
+            return {}
+
+        # A single lookup against the unique md5_hash index
+        with SessionLocal() as db:
+            rows = db.query(Document.md5_hash, Document.id).filter(Document.md5_hash.in_(md5_hashes)).all()
+        return {md5_hash: document_id for md5_hash, document_id in rows}
+
+    def save_attachment(self, attachment: StreamedAttachment) -> Dict[str, Any]:
+        """Classify a new email attachment and move it to document storage"""
         # Get attachment filename
-        filename = attachment.get_filename()
+        filename = attachment.filename or attachment.md5_hash
 
-        # Save attachment to temporary file
-        file_path = f"/tmp/{filename}"
-        with open(file_path, 'wb') as f:
-            f.write(attachment.get_payload(decode=True))
+        # Give the decoded file its extension, which the classifier goes by
+        file_path = os.path.splitext(attachment.file_path)[0] + Path(filename).suffix.lower()
+        os.replace(attachment.file_path, file_path)
 
         # Classify document using DocumentClassifier
-        document_type = self.document_classifier.classify(file_path)
+        document_type = self.document_classifier.classify_document(Path(file_path), {'file_name': filename, 'file_size': attachment.file_size})
+
+        # Hand the file to the storage backend under its content hash so identical files share one key
+        storage_key = document_key(attachment.md5_hash, filename)
+        self.storage.store_file(storage_key, file_path, attachment.content_type)
 
         # Return attachment information
         return {
-            'file_path': file_path,
+            'filename': filename,
+            'file_path': storage_key,
+            'content_type': attachment.content_type,
+            'file_size': attachment.file_size,
+            'md5_hash': attachment.md5_hash,
             'document_type': document_type
         }
 
+    def create_document(self, db: Session, application_id: str, attachment: Dict[str, Any], received_at: Optional[datetime] = None) -> str:
+        """
+        Create the Document for a newly stored attachment and queue its extraction
+
+        If another worker stored the same file since the duplicate lookup, the
+        unique md5_hash index rejects the insert and the application is linked
+        to that document instead, which that worker queued.
+
+        Returns:
+            str: The id of the created or already-stored document
+        """
+        document = self.new_document(application_id, attachment)
+        try:
+            with db.begin_nested():
+                db.add(document)
+                db.flush()
+                enqueue_documents(db, [document], received_at)
+            return document.id
+        except IntegrityError:
+            document_id = db.query(Document.id).filter(Document.md5_hash == attachment['md5_hash']).scalar()
+            self.link_document(db, application_id, document_id)
+            return document_id
+
+    def new_document(self, application_id: str, attachment: Dict[str, Any]) -> Document:
+        """Build the Document of a newly stored attachment"""
+        return Document(
+            application_id=application_id,
+            type=attachment['document_type'],
+            file_name=attachment['filename'],
+            file_path=attachment['file_path'],
+            content_type=attachment['content_type'],
+            file_size=attachment['file_size'],
+            md5_hash=attachment['md5_hash']
+        )
+
+    def link_document(self, db: Session, application_id: str, document_id: str) -> None:
+        """Link an application to a document already stored for another application"""
+        db.execute(application_documents.insert().values(application_id=application_id, document_id=document_id))
+        logger.info("Linked duplicate document %s to application %s", document_id, application_id, extra={"sampled": True})
+
 # Human tasks:
 # 1. Review and adjust email parsing logic if needed
 # 2. Implement error handling and retries for IMAP operations
 # 3. Add additional security measures for handling attachments
-# 4. Implement a mechanism to handle duplicate emails or applications
+# 4. Implement a mechanism to handle duplicate emails or applications (duplicate attachments are linked by content hash)
 # 5. Add logging for important events and errors
\ No newline at end of file
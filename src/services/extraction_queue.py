@@ -0,0 +1,183 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from src.api.models.document import Document, DocumentType
+from src.api.models.extraction_job import ExtractionJob
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.core.metrics import registry
+from src.services.reprocessing import DocumentResults
+from src.utils.logger import logger
+from src.utils.tracing import record_document_processed
+
+# Queued documents taken by the extraction workers, by whether their data was stored
+documents_extracted = registry.counter(
+    "mca_documents_extracted_total",
+    "Queued documents run through OCR, extraction and validation",
+    label_names=("outcome",),
+)
+
+# Jobs read per claim, so workers racing for the oldest job fall through to the next ones
+_CLAIM_CANDIDATES = 8
+
+def extraction_jobs(documents: Iterable[Document], received_at: Optional[datetime] = None) -> List[ExtractionJob]:
+    """Build the extraction jobs of new documents; OTHER documents have nothing to extract and get none"""
+    return [ExtractionJob(document.id, received_at) for document in documents if document.type != DocumentType.OTHER]
+
+def enqueue_documents(db: Session, documents: Iterable[Document], received_at: Optional[datetime] = None) -> None:
+    """
+    Queue new documents for OCR, extraction and validation
+
+    Called in the transaction that creates the documents, once they are
+    flushed, so a document is queued exactly when it is committed. The
+    caller commits.
+
+    Args:
+        db (Session): The session the documents were added in
+        documents (Iterable[Document]): The new documents
+        received_at (Optional[datetime]): When the documents reached the system, naive UTC; defaults to now
+    """
+    db.bulk_save_objects(extraction_jobs(documents, received_at))
+
+def claim_job(db: Session) -> Optional[ExtractionJob]:
+    """
+    Claim the longest-waiting available job for EXTRACTION_LEASE_SECONDS
+
+    The claim is a conditional UPDATE committed on its own, so of several
+    workers reading the same job only one moves its available_at forward.
+
+    Returns:
+        Optional[ExtractionJob]: The claimed job, None when no job is available
+    """
+    now = datetime.utcnow()
+    available = (ExtractionJob.available_at <= now) & (ExtractionJob.attempts < settings.EXTRACTION_MAX_ATTEMPTS)
+    candidates = db.query(ExtractionJob.document_id).filter(available).order_by(ExtractionJob.available_at).limit(_CLAIM_CANDIDATES).all()
+    for document_id, in candidates:
+        claimed = db.execute(
+            update(ExtractionJob)
+            .where((ExtractionJob.document_id == document_id) & available)
+            .values(available_at=now + timedelta(seconds=settings.EXTRACTION_LEASE_SECONDS), attempts=ExtractionJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return db.get(ExtractionJob, document_id)
+    return None
+
+class ExtractionWorker:
+    """
+    Run queued documents through OCR, extraction and validation, one at a time
+
+    A document's data, the deletion of its job and then its results in
+    storage are committed together by DocumentResults.commit. A failure
+    leaves the job queued with its error, available again after
+    EXTRACTION_RETRY_DELAY seconds per attempt so far; after
+    EXTRACTION_MAX_ATTEMPTS it is no longer claimed.
+    """
+
+    def __init__(self, document_results: Optional[DocumentResults] = None):
+        """Initialize the ExtractionWorker"""
+        self.document_results = document_results or DocumentResults()
+
+    def process_next(self) -> bool:
+        """
+        Claim and process the longest-waiting queued document
+
+        Returns:
+            bool: Whether a document was claimed
+        """
+        with SessionLocal() as db:
+            job = claim_job(db)
+            if job is None:
+                return False
+
+            received_at = job.received_at
+            try:
+                document = db.get(Document, job.document_id)
+                outcome = self.document_results.process_document(db, document)
+                db.delete(job)
+                self.document_results.commit(db, document, outcome)
+            except Exception as e:
+                db.rollback()
+                self.fail(db, job, e)
+                documents_extracted.inc(outcome="error")
+                return True
+
+        # The end-to-end latency the 5 minute SRS target applies to
+        record_document_processed(received_at)
+        documents_extracted.inc(outcome="ok")
+        return True
+
+    def fail(self, db: Session, job: ExtractionJob, error: Exception) -> None:
+        """Record a failed attempt and make the job available again after the retry delay"""
+        job.last_error = f"{type(error).__name__}: {error}"[:1000]
+        job.available_at = datetime.utcnow() + timedelta(seconds=settings.EXTRACTION_RETRY_DELAY * job.attempts)
+        db.commit()
+        if job.attempts >= settings.EXTRACTION_MAX_ATTEMPTS:
+            logger.error("Giving up on document %s after %d attempts: %s", job.document_id, job.attempts, job.last_error)
+        else:
+            logger.warning("Error processing document %s, attempt %d: %s", job.document_id, job.attempts, job.last_error)
+
+class ExtractionService:
+    """
+    Run EXTRACTION_QUEUE_WORKERS threads taking documents off the extraction queue
+
+    Ingestion and uploads only queue their new documents, so Textract calls
+    neither hold up mailbox batches nor API requests. Any number of
+    services can share the queue.
+    """
+
+    def __init__(self, workers: Optional[int] = None, poll_interval: Optional[float] = None):
+        """Initialize the ExtractionService"""
+        self.workers = workers or settings.EXTRACTION_QUEUE_WORKERS
+        self.poll_interval = settings.EXTRACTION_POLL_INTERVAL if poll_interval is None else poll_interval
+        self._stop = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"extraction-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info("Started %d extraction workers", len(self.threads))
+
+    def stop(self) -> None:
+        """Stop claiming documents and wait for the ones being processed"""
+        self._stop.set()
+        for thread in self.threads:
+            thread.join()
+
+    def run_forever(self) -> None:
+        """Run until interrupted"""
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _run(self) -> None:
+        # One worker per thread; sessions are opened per document
+        worker = ExtractionWorker()
+        while not self._stop.is_set():
+            try:
+                if worker.process_next():
+                    continue
+            except Exception as e:
+                # The queue itself could not be read; wait for the database to come back
+                logger.error("Error claiming a queued document: %s", e)
+            self._stop.wait(self.poll_interval)
+
+if __name__ == "__main__":
+    ExtractionService().run_forever()
+
+# Human tasks:
+# 1. Create the extraction_jobs table in the production database
+# 2. Run python -m src.services.extraction_queue as its own deployment and size EXTRACTION_QUEUE_WORKERS to the Textract limits
+# 3. Alert on jobs that reached EXTRACTION_MAX_ATTEMPTS; their last_error says why
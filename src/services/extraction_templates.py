@@ -0,0 +1,406 @@
+import functools
+import itertools
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+# Value patterns; a field value is the part of its text that matches from the start
+AMOUNT = r'\(?-?\$?\s?-?\d[\d,]*(?:\.\d+)?\)?'
+DATE = r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}'
+YEAR = r'(?:19|20)\d{2}'
+IDENTIFIER = r'[A-Za-z0-9][A-Za-z0-9\-]*'
+ACCOUNT_NUMBER = r'[\dXx*][\dXx* \-]*[\dXx*]'
+EIN = r'\d{2}-?\d{7}'
+TEXT = r'.*\S'
+
+# A transaction line in plain text: date, description, amount and an optional running balance
+TRANSACTION_LINE = (
+    r'(?P<date>\d{1,2}/\d{1,2}(?:/\d{2,4})?)[ \t]+(?P<description>[^\n:]+?)'
+    r'[ \t]+(?P<amount>-?\$?-?[\d,]*\d\.\d{2})(?:[ \t]+(?P<balance>-?\$?-?[\d,]*\d\.\d{2}))?[ \t]*$'
+)
+
+@dataclass(frozen=True)
+class Field:
+    """A scalar field, found by any of its labels in the form data or the text"""
+    name: str
+    aliases: Tuple[str, ...]
+    value: str = TEXT
+
+@dataclass(frozen=True)
+class Table:
+    """
+    A repeating field read from the tables whose header names its required columns
+
+    When no such table was recognised, rows are read from text lines matching
+    `row`, whose named groups are the columns. With `mapping`, rows are
+    collapsed into a {key column: value column} dictionary. A table without a
+    header row is read by position when it is as wide as the previous table
+    (a continuation on a new page) or as the known column `order`. With
+    `debit_credit`, those two columns are folded into a signed `amount` and
+    rows with neither are dropped.
+    """
+    name: str
+    columns: Dict[str, Tuple[str, ...]]
+    required: Tuple[str, ...]
+    row: Optional[str] = None
+    mapping: Optional[Tuple[str, str]] = None
+    order: Optional[Tuple[str, ...]] = None
+    debit_credit: Optional[Tuple[str, str]] = None
+
+@dataclass(frozen=True)
+class DocumentTemplate:
+    """
+    The fields of one document type, in the order they are returned
+
+    Labels in `ignored` are recognised but not extracted, so that their values
+    are not taken for a field whose label they contain ("Total Liabilities
+    and Equity" is not equity).
+    """
+    document_type: str
+    fields: Tuple[Field, ...]
+    tables: Tuple[Table, ...] = field(default_factory=tuple)
+    ignored: Tuple[str, ...] = field(default_factory=tuple)
+
+TEMPLATES = (
+    DocumentTemplate("bank_statement", (
+        Field("account_holder", ("Account Holder", "Account Name", "Account Owner", "Customer Name")),
+        Field("account_number", ("Account Number", "Account No", "Account #", "Acct Number", "Acct No", "Acct #"), ACCOUNT_NUMBER),
+        Field("statement_period", ("Statement Period", "Statement Dates", "For the Period")),
+        Field("opening_balance", ("Opening Balance", "Beginning Balance", "Starting Balance", "Previous Balance"), AMOUNT),
+        Field("closing_balance", ("Closing Balance", "Ending Balance", "New Balance"), AMOUNT),
+    ), (
+        Table("transactions", {
+            "date": ("Date", "Posting Date", "Transaction Date"),
+            "description": ("Description", "Details", "Transaction", "Memo"),
+            "amount": ("Amount", "Transaction Amount"),
+            "balance": ("Balance", "Running Balance", "Ending Balance"),
+        }, required=("date", "amount"), row=TRANSACTION_LINE),
+    )),
+    DocumentTemplate("tax_return", (
+        Field("taxpayer_name", ("Taxpayer Name", "Name of Taxpayer", "Name")),
+        Field("tax_year", ("Tax Year", "Calendar Year", "Year"), YEAR),
+        Field("total_income", ("Total Income", "Gross Income"), AMOUNT),
+        Field("taxable_income", ("Taxable Income",), AMOUNT),
+        Field("tax_paid", ("Tax Paid", "Total Tax", "Total Payments"), AMOUNT),
+        Field("ein", ("Employer Identification Number", "Employer ID Number", "FEIN", "EIN"), EIN),
+    ), (
+        Table("deductions_credits", {
+            "item": ("Deduction", "Deductions", "Credit", "Credits", "Description"),
+            "amount": ("Amount",),
+        }, required=("item", "amount"), mapping=("item", "amount")),
+    )),
+    DocumentTemplate("business_license", (
+        Field("business_name", ("Business Name", "Name of Business", "Licensee", "DBA")),
+        Field("license_number", ("License Number", "License No", "License #", "Permit Number"), IDENTIFIER),
+        Field("issue_date", ("Issue Date", "Date Issued", "Issued"), DATE),
+        Field("expiration_date", ("Expiration Date", "Expiry Date", "Expires", "Valid Until"), DATE),
+        Field("business_type", ("Business Type", "Type of Business", "Business Activity")),
+        Field("business_address", ("Business Address", "Location Address", "Address")),
+    )),
+    DocumentTemplate("financial_statement", (
+        Field("company_name", ("Company Name", "Business Name", "Company")),
+        Field("statement_period", ("Statement Period", "Period Ended", "Period")),
+        Field("revenue", ("Total Revenue", "Revenue", "Net Sales", "Sales"), AMOUNT),
+        Field("expenses", ("Total Expenses", "Operating Expenses", "Expenses"), AMOUNT),
+        Field("net_income", ("Net Income", "Net Profit", "Net Earnings"), AMOUNT),
+        Field("assets", ("Total Assets", "Assets"), AMOUNT),
+        Field("liabilities", ("Total Liabilities", "Liabilities"), AMOUNT),
+        Field("equity", ("Total Equity", "Shareholders' Equity", "Owners' Equity", "Equity"), AMOUNT),
+    ), ignored=("Total Liabilities and Equity", "Total Liabilities and Shareholders' Equity")),
+)
+
+class TablePlan(NamedTuple):
+    """Where the rows of one OCR table are: the template table, (column, position) pairs and the first row"""
+    index: int
+    layout: List[Tuple[str, Optional[int]]]
+    first_row: int
+    repeated_header: Optional[List[str]]
+
+def _unpack(ocr_result: Union[Dict[str, Any], str]) -> Tuple[str, Dict[str, str], List[List[List[str]]]]:
+    # Plain text has neither form data nor tables
+    if isinstance(ocr_result, str):
+        return ocr_result, {}, []
+    return ocr_result.get('full_text') or '', ocr_result.get('form_data') or {}, ocr_result.get('tables') or []
+
+def _normalize(label: str) -> str:
+    # Labels compare without case, colons or repeated whitespace
+    return ' '.join(label.replace(':', ' ').lower().split())
+
+def _label_trie(aliases: List[str]) -> str:
+    # Factor the labels into a trie of words, so that at each position the
+    # scanner only follows the branch the text actually starts with; optional
+    # continuations are greedy, so the longest label wins
+    trie: Dict[str, dict] = {}
+    for alias in aliases:
+        node = trie
+        for word in alias.lower().split():
+            node = node.setdefault(word, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = []
+        for word, child in node.items():
+            if not word:
+                continue
+            if list(child) == ['']:
+                branches.append(re.escape(word))
+            else:
+                rest = r'\s+' + build(child)
+                branches.append(re.escape(word) + (f'(?:{rest})?' if '' in child else rest))
+        return '(?:' + '|'.join(branches) + ')'
+
+    return build(trie)
+
+class CompiledTemplate:
+    """
+    A document template compiled into lookup tables and a single scanner
+
+    Form keys and table headers are resolved with dictionary lookups. Fields
+    still missing afterwards are found with one pass of one regular
+    expression over the text, which matches every label of every field at
+    once instead of searching the text once per field, and stops as soon as
+    every field is resolved.
+    """
+
+    def __init__(self, template: DocumentTemplate):
+        """Initialize the CompiledTemplate"""
+        self.template = template
+        self.values = [re.compile(f'(?:{template_field.value})', re.IGNORECASE) for template_field in template.fields]
+
+        # Form keys: normalized alias -> (field index, preference)
+        self.form_keys: Dict[str, Tuple[int, int]] = {}
+        for index, template_field in enumerate(template.fields):
+            for rank, alias in enumerate(template_field.aliases):
+                self.form_keys.setdefault(_normalize(alias), (index, rank))
+
+        # Table headers: normalized header -> column, per table
+        self.headers = [
+            {_normalize(alias): column for column, aliases in table.columns.items() for alias in aliases}
+            for table in template.tables
+        ]
+
+        # Labels in the text: normalized alias -> field index, None for ignored labels
+        self.labels: Dict[str, Optional[int]] = {_normalize(alias): None for alias in template.ignored}
+        for index, template_field in enumerate(template.fields):
+            for alias in template_field.aliases:
+                self.labels.setdefault(_normalize(alias), index)
+
+        # One scanner for every label. It runs over lowercased text because a
+        # case-insensitive pattern, or a look-behind for the word boundary,
+        # stops the regex engine from skipping ahead to a possible first letter.
+        pattern = f'({_label_trie(list(self.labels))})(?!\\w)[ \\t]*:?'
+        self.scanner = re.compile(pattern)
+        self.scanner_ignorecase = re.compile(pattern, re.IGNORECASE)
+        self.rows = [re.compile(f'^[ \\t]*{table.row}', re.MULTILINE) if table.row else None for table in template.tables]
+
+    def extract(self, ocr_result: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        """
+        Resolve every field of the template
+
+        Args:
+            ocr_result (Union[Dict[str, Any], str]): An OCREngine result, or plain text
+
+        Returns:
+            Dict[str, Any]: Field values in template order, None for fields that were not found
+        """
+        text, _, tables = _unpack(ocr_result)
+        result = self.extract_fields(ocr_result)
+        rows = self.read_tables(tables, self.plan_tables(tables))
+
+        # Without a recognised table, rows are read from the text
+        for index, row_pattern in enumerate(self.rows):
+            if text and row_pattern and not rows[index]:
+                rows[index] = self.scan_rows(text, index)
+
+        result.update(self.assemble_tables(rows))
+        return result
+
+    def extract_fields(self, ocr_result: Union[Dict[str, Any], str]) -> Dict[str, Optional[str]]:
+        """Resolve the scalar fields of the template, leaving its tables out"""
+        text, form_data, _ = _unpack(ocr_result)
+        values: Dict[int, str] = {}
+        self._match_form_data(form_data, values)
+
+        # Only scan the text for what the form data did not provide
+        if text and len(values) < len(self.template.fields):
+            self._scan_text(text, values)
+        return {template_field.name: values.get(index) for index, template_field in enumerate(self.template.fields)}
+
+    def assemble_tables(self, rows: List[List[Dict[str, Optional[str]]]]) -> Dict[str, Any]:
+        """Return the rows of each template table by name, collapsed into a dictionary for mapping tables"""
+        result = {}
+        for index, table in enumerate(self.template.tables):
+            if table.mapping:
+                key, value = table.mapping
+                result[table.name] = {row[key]: row[value] for row in rows[index]}
+            else:
+                result[table.name] = rows[index]
+        return result
+
+    def _coerce(self, index: int, raw: str) -> Optional[str]:
+        # The leading part of raw that looks like the field's value
+        match = self.values[index].match(raw.strip())
+        return match.group(0).strip() if match and match.group(0).strip() else None
+
+    def _match_form_data(self, form_data: Dict[str, str], values: Dict[int, str]) -> None:
+        ranks: Dict[int, int] = {}
+        for key, raw in form_data.items():
+            hit = self.form_keys.get(_normalize(key))
+            if hit is None or not raw:
+                continue
+            index, rank = hit
+            # Several aliases of one field may be present; the earliest declared wins
+            if rank < ranks.get(index, len(self.template.fields[index].aliases)):
+                value = self._coerce(index, raw)
+                if value is not None:
+                    values[index] = value
+                    ranks[index] = rank
+
+    def plan_tables(self, tables: List[List[List[str]]]) -> List[Optional[TablePlan]]:
+        """
+        Decide which template table each OCR table holds and where its columns are
+
+        Only header rows are examined, so planning a whole document is cheap
+        even when its rows are read separately, page by page.
+
+        Args:
+            tables (List[List[List[str]]]): The OCR tables of the document, in order
+
+        Returns:
+            List[Optional[TablePlan]]: A plan per OCR table, None for tables the template does not use
+        """
+        plans: List[Optional[TablePlan]] = []
+        # Width and column positions of the last table planned for each template table, for continuations without a header
+        previous: Dict[int, Tuple[int, Dict[str, int]]] = {}
+        for ocr_table in tables:
+            plan = None
+            header = [_normalize(cell) for cell in ocr_table[0]] if ocr_table else []
+            for index, table in enumerate(self.template.tables if header else ()):
+                positions = {}
+                for position, cell in enumerate(header):
+                    positions.setdefault(self.headers[index].get(cell), position)
+                first_row, repeated_header = 1, header
+                if not all(column in positions for column in table.required):
+                    if index in previous and len(header) == previous[index][0]:
+                        # A headerless continuation of the previous table
+                        positions = previous[index][1]
+                    elif table.order and len(header) == len(table.order):
+                        # No header, but exactly as many columns as the known order
+                        positions = {column: position for position, column in enumerate(table.order)}
+                    else:
+                        continue
+                    first_row, repeated_header = 0, None
+                positions.pop(None, None)
+                previous[index] = (len(header), positions)
+                plan = TablePlan(index, [(column, positions.get(column)) for column in table.columns], first_row, repeated_header)
+                break
+            plans.append(plan)
+        return plans
+
+    def read_tables(self, tables: List[List[List[str]]], plans: List[Optional[TablePlan]]) -> List[List[Dict[str, Optional[str]]]]:
+        """Read the rows of OCR tables planned by plan_tables, per template table"""
+        rows: List[List[Dict[str, Optional[str]]]] = [[] for _ in self.template.tables]
+        for ocr_table, plan in zip(tables, plans):
+            if plan is None:
+                continue
+            table = self.template.tables[plan.index]
+            for ocr_row in ocr_table[plan.first_row:]:
+                cells = [cell.strip() for cell in ocr_row]
+                # Tables continued on a new page may repeat their header
+                if plan.repeated_header and cells and _normalize(cells[0]) == plan.repeated_header[0] \
+                        and [_normalize(cell) for cell in cells] == plan.repeated_header:
+                    continue
+                row = {column: cells[position] or None if position is not None and position < len(cells) else None for column, position in plan.layout}
+                if all(row[column] for column in table.required):
+                    row = self._finish_row(table, row)
+                    if row is not None:
+                        rows[plan.index].append(row)
+        return rows
+
+    def _finish_row(self, table: Table, row: Dict[str, Optional[str]]) -> Optional[Dict[str, Optional[str]]]:
+        if not table.debit_credit:
+            return row
+        # Fold separate debit and credit columns into a signed amount; rows with neither carry no transaction
+        debit_column, credit_column = table.debit_credit
+        debit, credit = row[debit_column], row[credit_column]
+        if not debit and not credit:
+            return None
+        amount = credit if credit else '-' + debit.lstrip('-')
+        finished = {}
+        for column, value in row.items():
+            if column == debit_column or column == credit_column:
+                finished.setdefault('amount', amount)
+            else:
+                finished[column] = value
+        return finished
+
+    def _scan_text(self, text: str, values: Dict[int, str]) -> None:
+        lowered = text.lower()
+        # Lowercasing a few non-ASCII characters changes the length, and with it the offsets
+        matches = self.scanner.finditer(lowered) if len(lowered) == len(text) else self.scanner_ignorecase.finditer(text)
+
+        pending = None
+        for match in itertools.chain(matches, [None]):
+            if match is not None and match.start() and (text[match.start() - 1].isalnum() or text[match.start() - 1] == '_'):
+                # Inside a longer word
+                continue
+
+            if pending is not None:
+                # The value runs to the next label or the end of the line, or is on the next line when the label ends one
+                segment = text[pending.end():match.start() if match else len(text)].lstrip(' \t')
+                if segment.startswith('\n'):
+                    segment = segment[1:]
+                index = self.labels[_normalize(pending.group(1))]
+                value = self._coerce(index, segment.split('\n', 1)[0])
+                if value is not None:
+                    values[index] = value
+                    if len(values) == len(self.template.fields):
+                        return
+
+            pending = None
+            if match is not None:
+                index = self.labels[_normalize(match.group(1))]
+                if index is not None and index not in values:
+                    pending = match
+
+    def scan_rows(self, text: str, index: int) -> List[Dict[str, Optional[str]]]:
+        """Read the rows of template table `index` from text lines matching its row pattern"""
+        # The named groups of the row pattern are the columns; columns it lacks stay None
+        table = self.template.tables[index]
+        blank = dict.fromkeys(table.columns)
+        rows = []
+        for match in self.rows[index].finditer(text):
+            row = self._finish_row(table, {**blank, **match.groupdict()})
+            if row is not None:
+                rows.append(row)
+        return rows
+
+def parse_amount(value: Optional[str]) -> Optional[Decimal]:
+    """Parse an extracted amount such as "$1,250.00", "-40.00" or "(1,800.00)", None if it is not one"""
+    if not value:
+        return None
+    text = value.strip().replace('$', '').replace(',', '').replace(' ', '')
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+def get_template(document_type: str) -> DocumentTemplate:
+    """Return the template of document_type"""
+    for template in TEMPLATES:
+        if template.document_type == document_type:
+            return template
+    raise ValueError(f"Unsupported document type: {document_type}")
+
+@functools.lru_cache(maxsize=None)
+def compiled_template(document_type: str) -> CompiledTemplate:
+    """Return the compiled template of document_type, compiling it on first use"""
+    return CompiledTemplate(get_template(document_type))
+
+# Human tasks:
+# 1. Add label aliases for the bank and tax form layouts seen in production as they are reviewed
@@ -0,0 +1,276 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from src.core.config import settings
+from src.core.metrics import registry
+from src.services.email_processor import EmailIngestor, EmailProcessor, MailboxConfig
+from src.utils.logger import logger
+from src.utils.tracing import stage_latency, trace_stage
+
+# Emails taken off the shared queue, by mailbox and whether they were persisted
+emails_ingested = registry.counter(
+    "mca_emails_ingested_total",
+    "Emails classified and persisted from each intake mailbox",
+    label_names=("mailbox", "outcome"),
+)
+
+# How often blocked threads re-check for shutdown
+_WAKE_INTERVAL = 0.5
+# How long a stopping worker waits for its queued emails to be persisted before closing its connection
+_SHUTDOWN_TIMEOUT = 30.0
+
+class IngestionItem:
+    """A fetched email waiting in the shared queue for classification and persistence"""
+
+    __slots__ = ("worker", "uid", "email_data", "enqueued_at")
+
+    def __init__(self, worker: 'MailboxWorker', uid: bytes, email_data: Dict[str, Any]):
+        self.worker = worker
+        self.uid = uid
+        self.email_data = email_data
+        self.enqueued_at = time.perf_counter()
+
+class MailboxWorker(threading.Thread):
+    """
+    Poll one mailbox over its own IMAP connection and feed the shared queue
+
+    Polls fetch only messages above the UID checkpoint stored for the
+    mailbox. Pipeline threads finish emails out of order, so the stored
+    checkpoint only advances to just below the oldest UID still in flight.
+    An email that fails to persist holds the checkpoint back and is fetched
+    again on the next poll. IMAP connections are not thread-safe, so
+    pipeline threads report back through acknowledge(), and the worker
+    sets \\Seen and saves the checkpoint from its own thread.
+    """
+
+    def __init__(self, mailbox: MailboxConfig, ingestion_queue: queue.Queue, stop_event: threading.Event, poll_interval: float):
+        """Initialize the MailboxWorker"""
+        super().__init__(name=f"mailbox-{mailbox.name}", daemon=True)
+        self.mailbox = mailbox
+        self.ingestion_queue = ingestion_queue
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        # UIDVALIDITY the UIDs below belong to; None until the first poll
+        self.uid_validity: Optional[int] = None
+        # Highest UID fetched so far and highest UID saved as the checkpoint
+        self.last_uid: Optional[int] = None
+        self.saved_uid: Optional[int] = None
+        # UIDs handed to the queue and not yet persisted, and failed UIDs to fetch again
+        self.in_flight: Set[int] = set()
+        self.retry: List[bytes] = []
+        # Emails handed to the queue and not yet acknowledged
+        self.pending = 0
+        self.acks: queue.SimpleQueue = queue.SimpleQueue()
+        self.processor: Optional[EmailProcessor] = None
+
+    def acknowledge(self, uid: bytes, persisted: bool) -> None:
+        """Report the outcome of an email from this mailbox; called from pipeline threads"""
+        self.acks.put((uid, persisted))
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                if self.processor is None:
+                    self.processor = EmailProcessor(self.mailbox)
+                self.poll()
+            except Exception as e:
+                # Drop the connection and reconnect on the next poll
+                logger.error("Error polling mailbox %s: %s", self.mailbox.name, e)
+                self._disconnect()
+            self._wait(self.poll_interval)
+
+        # Let the pipeline finish what this mailbox already queued so it can be flagged and checkpointed
+        deadline = time.monotonic() + _SHUTDOWN_TIMEOUT
+        while self.pending and time.monotonic() < deadline:
+            self._drain_acks(timeout=_WAKE_INTERVAL)
+        self._disconnect()
+
+    def poll(self) -> None:
+        """Fetch every message above the checkpoint and hand it to the pipeline"""
+        self.processor.select_mailbox()
+        if self.processor.uid_validity != self.uid_validity:
+            # First poll, or the server renumbered the folder: start from the stored checkpoint
+            self.uid_validity = self.processor.uid_validity
+            self.last_uid = self.saved_uid = self.processor.load_checkpoint()
+            self.in_flight.clear()
+            self.retry = []
+
+        bootstrap = self.last_uid is None
+        uids, self.retry = self.retry + self.processor.search_new_uids(self.last_uid), []
+        for uid in uids:
+            if self.stop_event.is_set():
+                return
+            email_data = self.processor.fetch_email(uid)
+            self._enqueue(IngestionItem(self, uid, email_data))
+            self.in_flight.add(int(uid))
+            self.last_uid = max(self.last_uid or 0, int(uid))
+            self._drain_acks()
+
+        if bootstrap:
+            # The first poll took the UNSEEN messages; later polls start above everything that existed then
+            self.last_uid = max(self.last_uid or 0, self.processor.uid_next - 1)
+        self._save_checkpoint()
+
+    def _enqueue(self, item: IngestionItem) -> None:
+        # Block while the pipeline is saturated, still flagging what it finishes meanwhile
+        while True:
+            try:
+                self.ingestion_queue.put(item, timeout=_WAKE_INTERVAL)
+                self.pending += 1
+                return
+            except queue.Full:
+                self._drain_acks()
+
+    def _wait(self, seconds: float) -> None:
+        # Sleep until the next poll, flagging persisted messages as their acknowledgements arrive
+        deadline = time.monotonic() + seconds
+        while not self.stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._drain_acks(timeout=min(remaining, _WAKE_INTERVAL))
+
+    def _drain_acks(self, timeout: Optional[float] = None) -> None:
+        try:
+            uid, persisted = self.acks.get(timeout=timeout) if timeout else self.acks.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            self.pending -= 1
+            if persisted:
+                self.in_flight.discard(int(uid))
+                if self.processor is not None:
+                    self.processor.imap_client.uid('STORE', uid, '+FLAGS', '\\Seen')
+            else:
+                # Keep the checkpoint below the failed email and fetch it again on the next poll
+                logger.warning("Email UID %s in mailbox %s was not persisted, retrying on the next poll", uid.decode(), self.mailbox.name)
+                self.retry.append(uid)
+            try:
+                uid, persisted = self.acks.get_nowait()
+            except queue.Empty:
+                break
+        self._save_checkpoint()
+
+    def _save_checkpoint(self) -> None:
+        # Every UID below the oldest one in flight has been persisted. Without a stored checkpoint,
+        # wait for the UNSEEN messages of the first poll so a restart takes them from UNSEEN again
+        if self.saved_uid is None and self.in_flight:
+            return
+        watermark = min(self.in_flight) - 1 if self.in_flight else self.last_uid
+        if self.processor is None or watermark is None or (self.saved_uid is not None and watermark <= self.saved_uid):
+            return
+        self.processor.save_checkpoint(watermark)
+        self.saved_uid = watermark
+
+    def _disconnect(self) -> None:
+        if self.processor is None:
+            return
+        try:
+            self.processor.imap_client.logout()
+        except Exception:
+            pass
+        self.processor = None
+
+class MailboxSupervisor:
+    """
+    Run one worker per intake mailbox and a shared pool of pipeline threads
+
+    Mailbox workers fetch and decode emails concurrently, each over its own
+    connection, into a bounded queue. INGESTION_WORKERS threads take emails
+    off the queue and classify and persist them, taking up to
+    INGESTION_BATCH_SIZE queued emails into one transaction while there is
+    a backlog. When the pipeline falls behind, the queue fills up and
+    mailbox workers block instead of buffering more emails in memory.
+    """
+
+    def __init__(self, mailboxes: Optional[List[MailboxConfig]] = None, ingestion_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, poll_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        """Initialize the MailboxSupervisor"""
+        self.mailboxes = mailboxes or MailboxConfig.from_settings()
+        self.ingestion_workers = ingestion_workers or settings.INGESTION_WORKERS
+        self.batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+        self.poll_interval = settings.EMAIL_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.ingestion_queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.INGESTION_QUEUE_SIZE)
+        self._fetch_stop = threading.Event()
+        self._pipeline_stop = threading.Event()
+        self.workers: List[MailboxWorker] = []
+        self.pipeline_threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the pipeline threads and one worker per mailbox"""
+        for index in range(self.ingestion_workers):
+            thread = threading.Thread(target=self._consume, name=f"ingestion-{index}", daemon=True)
+            thread.start()
+            self.pipeline_threads.append(thread)
+
+        for mailbox in self.mailboxes:
+            worker = MailboxWorker(mailbox, self.ingestion_queue, self._fetch_stop, self.poll_interval)
+            worker.start()
+            self.workers.append(worker)
+        logger.info("Started %d mailbox workers and %d ingestion workers", len(self.workers), len(self.pipeline_threads))
+
+    def stop(self) -> None:
+        """Stop fetching, finish the emails already queued and close every connection"""
+        self._fetch_stop.set()
+        for worker in self.workers:
+            worker.join()
+        self._pipeline_stop.set()
+        for thread in self.pipeline_threads:
+            thread.join()
+
+    def run_forever(self) -> None:
+        """Run until interrupted"""
+        self.start()
+        try:
+            while True:
+                time.sleep(self.poll_interval or _WAKE_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _consume(self) -> None:
+        # One ingestor per thread; ingestors hold no connection and open a session per email or batch
+        ingestor = EmailIngestor()
+        while True:
+            try:
+                items = [self.ingestion_queue.get(timeout=_WAKE_INTERVAL)]
+            except queue.Empty:
+                if self._pipeline_stop.is_set():
+                    return
+                continue
+
+            # While the queue holds a backlog, persist up to INGESTION_BATCH_SIZE emails in one transaction
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self.ingestion_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in items:
+                stage_latency.observe(time.perf_counter() - item.enqueued_at, stage="ingestion_queue", outcome="ok")
+            persisted = False
+            try:
+                if len(items) == 1:
+                    with trace_stage("email_ingestion", mailbox=items[0].worker.mailbox.name, uid=items[0].uid.decode()):
+                        ingestor.ingest(items[0].email_data)
+                else:
+                    with trace_stage("email_ingestion", emails=len(items)):
+                        ingestor.ingest_batch([item.email_data for item in items])
+                persisted = True
+            except Exception as e:
+                logger.error("Error ingesting %s: %s", ', '.join(f"email UID {item.uid.decode()} from mailbox {item.worker.mailbox.name}" for item in items), e)
+            finally:
+                # Workers flag the messages only now that their transaction is committed
+                for item in items:
+                    emails_ingested.inc(mailbox=item.worker.mailbox.name, outcome="ok" if persisted else "error")
+                    item.worker.acknowledge(item.uid, persisted)
+                    self.ingestion_queue.task_done()
+
+if __name__ == "__main__":
+    MailboxSupervisor().run_forever()
+
+# Human tasks:
+# 1. Run the supervisor as its own deployment and size INGESTION_WORKERS to the database and Textract limits
+# 2. Add the intake mailbox of each ISO partner and product line to EMAIL_MAILBOXES
@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import zlib
+from typing import List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+from src.api.models.document import Document
+from src.api.models.identity_key import IdentityKey, IdentityKind
+from src.api.models.merchant import Merchant, MerchantNameBand
+from src.core.config import settings
+from src.core.database import SessionLocal
+from src.utils.logger import logger
+
+# MinHash signature of BANDS x ROWS_PER_BAND hashes. Two names share at least one band with
+# probability 1 - (1 - s^3)^20 for trigram similarity s: 0.99 at 0.6, 0.73 at 0.4, 0.15 at 0.2
+BANDS = 20
+ROWS_PER_BAND = 3
+
+_PRIME = 2 ** 31 - 1
+# Fixed seed: signatures must stay comparable across processes and deploys
+_random = np.random.RandomState(1879)
+_A = _random.randint(1, _PRIME, size=BANDS * ROWS_PER_BAND).astype(np.int64)
+_B = _random.randint(0, _PRIME, size=BANDS * ROWS_PER_BAND).astype(np.int64)
+
+def name_trigrams(normalized_name: str) -> Set[str]:
+    """Character trigrams of each word, padded like PostgreSQL's pg_trgm so short words still have some"""
+    trigrams = set()
+    for word in normalized_name.split():
+        padded = f"  {word} "
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    """Jaccard similarity of two trigram sets"""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+def band_values(trigrams: Set[str]) -> List[int]:
+    """
+    The locality-sensitive hash of each band of a name's MinHash signature
+
+    Each of the BANDS * ROWS_PER_BAND hash functions is applied to every
+    trigram at once, and the signature keeps each function's minimum. A band's
+    value is a 63-bit digest of its rows, so it fits a BIGINT column.
+    """
+    hashes = np.array([zlib.crc32(trigram.encode()) & _PRIME for trigram in trigrams], dtype=np.int64)
+    signature = ((np.outer(_A, hashes) + _B[:, None]) % _PRIME).min(axis=1)
+    return [
+        int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), 'big', signed=True)
+        for row in signature.reshape(BANDS, ROWS_PER_BAND)
+    ]
+
+def index_merchant(db: Session, merchant: Merchant) -> None:
+    """Replace the name bands of a merchant; called whenever a merchant is created or renamed"""
+    table = MerchantNameBand.__table__
+    db.flush()
+    db.execute(table.delete().where(table.c.merchant_id == merchant.id))
+    trigrams = name_trigrams(merchant.normalized_name)
+    if trigrams:
+        db.execute(table.insert(), [
+            {'merchant_id': merchant.id, 'band': band, 'value': value} for band, value in enumerate(band_values(trigrams))
+        ])
+
+def save_merchant(db: Session, application_id: str, business_name: str, normalized_name: str) -> Merchant:
+    """
+    Create the merchant of an application from a business name found on its documents
+
+    The first name found is kept; later documents do not rename the merchant.
+    The caller commits.
+
+    Args:
+        db (Session): The database session
+        application_id (str): The ID of the application
+        business_name (str): The name as found on the document
+        normalized_name (str): The name as from normalize_business_name
+
+    Returns:
+        Merchant: The application's merchant
+    """
+    merchant = db.query(Merchant).filter(Merchant.application_id == application_id).one_or_none()
+    if merchant is not None:
+        return merchant
+
+    merchant = Merchant(application_id, business_name, normalized_name)
+    db.add(merchant)
+    index_merchant(db, merchant)
+    return merchant
+
+def rename_merchant(db: Session, application_id: str, business_name: str, normalized_name: str) -> Merchant:
+    """
+    Set the business name of an application's merchant, as entered by a user
+
+    Unlike save_merchant, an existing merchant is renamed, and re-indexed when
+    its normalized name changes. The caller commits.
+
+    Args:
+        db (Session): The database session
+        application_id (str): The ID of the application
+        business_name (str): The new business name
+        normalized_name (str): The name as from normalize_business_name
+
+    Returns:
+        Merchant: The application's merchant
+    """
+    merchant = db.query(Merchant).filter(Merchant.application_id == application_id).one_or_none()
+    if merchant is None:
+        return save_merchant(db, application_id, business_name, normalized_name)
+
+    merchant.business_name = business_name
+    if merchant.normalized_name != normalized_name:
+        merchant.normalized_name = normalized_name
+        index_merchant(db, merchant)
+    return merchant
+
+def find_candidate_merchants(db: Session, normalized_name: str, exclude_application_id: Optional[str] = None,
+                             limit: Optional[int] = None, threshold: Optional[float] = None) -> List[Tuple[Merchant, float]]:
+    """
+    Find merchants whose name is similar to a business name
+
+    Candidates are the merchants sharing a band with the name, one indexed
+    lookup per band, ranked by the number of shared bands; only those are
+    compared trigram by trigram. No merchant table scan takes place however
+    many merchants are stored.
+
+    Args:
+        db (Session): The database session
+        normalized_name (str): The name to match, as from normalize_business_name
+        exclude_application_id (Optional[str]): An application whose own merchant is left out
+        limit (Optional[int]): Most matches returned, MERCHANT_MATCH_LIMIT by default
+        threshold (Optional[float]): Lowest trigram similarity returned, MERCHANT_MATCH_THRESHOLD by default
+
+    Returns:
+        List[Tuple[Merchant, float]]: Matching merchants with their similarity, most similar first
+    """
+    limit = limit or settings.MERCHANT_MATCH_LIMIT
+    threshold = settings.MERCHANT_MATCH_THRESHOLD if threshold is None else threshold
+    trigrams = name_trigrams(normalized_name)
+    if not trigrams:
+        return []
+
+    table = MerchantNameBand.__table__
+    shared = func.count().label('shared')
+    bands = or_(*(and_(table.c.band == band, table.c.value == value) for band, value in enumerate(band_values(trigrams))))
+    # Compare a few more candidates than are returned; the band count only approximates similarity
+    candidate_ids = [merchant_id for merchant_id, _ in db.execute(
+        select(table.c.merchant_id, shared).where(bands).group_by(table.c.merchant_id).order_by(shared.desc()).limit(limit * 5)
+    )]
+    if not candidate_ids:
+        return []
+
+    query = db.query(Merchant).filter(Merchant.id.in_(candidate_ids))
+    if exclude_application_id is not None:
+        query = query.filter(Merchant.application_id != exclude_application_id)
+    matches = [(merchant, similarity(trigrams, name_trigrams(merchant.normalized_name))) for merchant in query]
+    matches = sorted((match for match in matches if match[1] >= threshold), key=lambda match: match[1], reverse=True)[:limit]
+    logger.debug("Merchant matching for %s: %d candidates, %d matches", normalized_name, len(candidate_ids), len(matches))
+    return matches
+
+def backfill_merchants(db: Session) -> int:
+    """
+    Create the merchants of applications that have none, from the business names indexed on their documents
+
+    The normalized names come from the identity_keys table; the earliest
+    uploaded document naming a business names the merchant, as it would
+    have at ingestion.
+
+    Args:
+        db (Session): The database session; committed once the merchants are created
+
+    Returns:
+        int: The number of merchants created
+    """
+    keys = IdentityKey.__table__
+    rows = db.execute(
+        select(keys.c.application_id, keys.c.value, keys.c.field, Document.extracted_data)
+        .join(Document, Document.id == keys.c.document_id)
+        .where(keys.c.kind == IdentityKind.BUSINESS_NAME, keys.c.application_id.notin_(select(Merchant.application_id)))
+        .order_by(keys.c.application_id, Document.upload_date)
+    ).all()
+
+    named = set()
+    for application_id, normalized_name, field, extracted_data in rows:
+        if application_id not in named:
+            named.add(application_id)
+            save_merchant(db, application_id, (extracted_data or {}).get(field) or normalized_name, normalized_name)
+    db.commit()
+    return len(named)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Create and index the merchants of applications that have none, from the business names on their documents"
+    )
+    parser.parse_args()
+
+    with SessionLocal() as db:
+        print(f"merchants created: {backfill_merchants(db)}")
+
+if __name__ == "__main__":
+    main()
+
+# Human tasks:
+# 1. Create the merchants and merchant_name_bands tables in the production database
+# 2. Run python -m src.services.merchant_matching once after creating them
@@ -2,7 +2,9 @@ import boto3
 from typing import Dict, Any, List
 from pathlib import Path
 from src.core.config import settings
+from src.services.storage import get_storage
 from src.utils.logger import logger
+from src.utils.tracing import trace_stage
 
 class OCREngine:
     """Class for performing Optical Character Recognition (OCR) on documents"""
@@ -12,33 +14,67 @@ class OCREngine:
         # Initialize AWS Textract client using boto3
         self.textract_client = boto3.client('textract', 
                                             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                                            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                                            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY.get_secret_value(),
                                             region_name=settings.AWS_REGION)
 
     def perform_ocr(self, file_path: Path) -> Dict[str, Any]:
         """Perform OCR on a document file"""
-        # Read the document file
-        with open(file_path, 'rb') as document:
-            file_bytes = document.read()
+        with trace_stage("ocr", file_path=str(file_path)):
+            # Read the document file
+            with open(file_path, 'rb') as document:
+                file_bytes = document.read()
 
-        # Send the document to AWS Textract for processing
+            # Send the document to AWS Textract for processing
+            ocr_results = self.analyze_document({'Bytes': file_bytes})
+
+        # Log the OCR process completion
+        logger.info("OCR completed for file: %s", file_path, extra={"sampled": True})
+
+        # Return the OCR results
+        return ocr_results
+
+    def perform_stored_ocr(self, storage_key: str) -> Dict[str, Any]:
+        """Perform OCR on a document in storage, letting Textract read it from S3 in place when possible"""
+        storage = get_storage()
+        location = storage.s3_location(storage_key)
+        if location is None:
+            # Local storage is read in place; other stores are downloaded to a temporary file
+            with storage.local_file(storage_key) as file_path:
+                return self.perform_ocr(Path(file_path))
+
+        with trace_stage("ocr", file_path=storage_key):
+            bucket, key = location
+            ocr_results = self.analyze_document({'S3Object': {'Bucket': bucket, 'Name': key}})
+
+        logger.info("OCR completed for file: %s", storage_key, extra={"sampled": True})
+        return ocr_results
+
+    def analyze_document(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Run Textract AnalyzeDocument on a Textract Document (Bytes or S3Object) and parse the result"""
         response = self.textract_client.analyze_document(
-            Document={'Bytes': file_bytes},
+            Document=document,
             FeatureTypes=['FORMS', 'TABLES']
         )
 
         # Receive and parse the OCR results
-        ocr_results = {
+        return {
             'full_text': self.extract_text(response),
             'form_data': self.extract_form_data(response),
-            'tables': self.extract_tables(response)
+            'tables': self.extract_tables(response),
+            'pages': self.extract_pages(response)
         }
 
-        # Log the OCR process completion
-        logger.info(f"OCR completed for file: {file_path}")
+    def extract_pages(self, textract_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split the text and tables of Textract results by page, so long documents can be parsed a page at a time"""
+        # Blocks carry the number of the page they are on; single-page results may omit it
+        pages: Dict[int, List[Dict[str, Any]]] = {}
+        for item in textract_result['Blocks']:
+            pages.setdefault(item.get('Page', 1), []).append(item)
 
-        # Return the OCR results
-        return ocr_results
+        return [
+            {'page': number, 'full_text': self.extract_text({'Blocks': blocks}), 'tables': self.extract_tables({'Blocks': blocks})}
+            for number, blocks in sorted(pages.items())
+        ]
 
     def extract_text(self, textract_result: Dict[str, Any]) -> str:
         """Extract full text from Textract results"""
@@ -50,7 +86,7 @@ class OCREngine:
                 full_text.append(item['Text'])
 
         # Return the full extracted text
-        return ' '.join(full_text)
+        return '\n'.join(full_text)
 
     def extract_form_data(self, textract_result: Dict[str, Any]) -> Dict[str, str]:
         """Extract structured form data from Textract results"""
@@ -80,29 +116,26 @@ class OCREngine:
 
     def extract_tables(self, textract_result: Dict[str, Any]) -> List[List[str]]:
         """Extract table data from Textract results"""
-        # Iterate through Textract blocks
+        # Iterate through Textract blocks, collecting each table's cells by position
         tables = []
-        table = []
-        row = []
+        cells = None
 
         for item in textract_result['Blocks']:
             if item['BlockType'] == 'TABLE':
-                table = []
+                cells = {}
+                tables.append(cells)
             elif item['BlockType'] == 'CELL':
-                if item['RowIndex'] == 1 and item['ColumnIndex'] == 1:
-                    if table:
-                        tables.append(table)
-                    table = []
-                if item['ColumnIndex'] == 1:
-                    if row:
-                        table.append(row)
-                    row = []
-                row.append(item.get('Text', ''))
-
-        if row:
-            table.append(row)
-        if table:
-            tables.append(table)
+                if cells is None:
+                    cells = {}
+                    tables.append(cells)
+                cells[(item['RowIndex'], item['ColumnIndex'])] = item.get('Text', '')
+
+        # Lay the cells of each table out in rows, leaving blanks for cells Textract omitted
+        tables = [
+            [[table.get((row, column), '') for column in range(1, max(column for _, column in table) + 1)]
+             for row in range(1, max(row for row, _ in table) + 1)]
+            for table in tables if table
+        ]
 
         # Return the table data
         return tables
\ No newline at end of file
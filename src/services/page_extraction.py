@@ -0,0 +1,139 @@
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.services.extraction_templates import CompiledTemplate, TablePlan, parse_amount
+
+# One page as sent to a worker: its OCR tables, their plans, its text and the tables to read from text
+PageTask = Tuple[List[List[List[str]]], List[Optional[TablePlan]], str, Tuple[int, ...]]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Created on first use; spawned rather than forked, since the API process runs threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.EXTRACTION_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def _parse_pages(template: CompiledTemplate, pages: List[PageTask]) -> List[List[List[Dict[str, Optional[str]]]]]:
+    # Runs in a worker: the rows of every template table on each page of a contiguous run of pages
+    parsed = []
+    for tables, plans, text, scanned in pages:
+        rows = template.read_tables(tables, plans)
+        for index in scanned:
+            rows[index] = template.scan_rows(text, index)
+        parsed.append(rows)
+    return parsed
+
+def _batches(pages: List[PageTask], count: int) -> List[List[PageTask]]:
+    # Contiguous runs of pages, so results come back in page order and each worker gets one task
+    size = -(-len(pages) // count)
+    return [pages[start:start + size] for start in range(0, len(pages), size)]
+
+def extract_by_page(template: CompiledTemplate, ocr_result: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Tuple[int, int]]]]:
+    """
+    Extract a document with its table rows read page by page
+
+    Which OCR table holds which template table, and where its columns are, is
+    decided once for the whole document from the header rows, so a table
+    continued on a later page without its header is still read. The rows of
+    each page are then parsed independently: in worker processes when the
+    document has at least EXTRACTION_PARALLEL_MIN_PAGES pages, in this
+    process otherwise, and merged in page order. The result is the same as
+    template.extract(ocr_result).
+
+    Args:
+        template (CompiledTemplate): The template to extract with
+        ocr_result (Dict[str, Any]): An OCREngine result with its 'pages'
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, List[Tuple[int, int]]]]: The extracted data, and for each
+        table the (page number, row count) of every page, in order
+    """
+    pages = ocr_result.get('pages') if isinstance(ocr_result, dict) else None
+    if not pages:
+        return template.extract(ocr_result), {}
+
+    # Plan every table of the document in page order
+    plans = template.plan_tables([table for page in pages for table in page['tables']])
+    planned = {plan.index for plan in plans if plan is not None}
+    # Tables no OCR table holds are read from the text of each page
+    scanned = tuple(index for index, row_pattern in enumerate(template.rows) if row_pattern is not None and index not in planned)
+
+    tasks: List[PageTask] = []
+    offset = 0
+    for page in pages:
+        count = len(page['tables'])
+        tasks.append((page['tables'], plans[offset:offset + count], page['full_text'], scanned))
+        offset += count
+
+    workers = settings.EXTRACTION_WORKERS
+    if len(pages) >= settings.EXTRACTION_PARALLEL_MIN_PAGES and workers > 1:
+        parsed = [rows for batch in _get_executor().map(functools.partial(_parse_pages, template), _batches(tasks, workers)) for rows in batch]
+    else:
+        parsed = _parse_pages(template, tasks)
+
+    # A planned table whose rows were all rejected is read from the text instead, as template.extract would
+    for index, row_pattern in enumerate(template.rows):
+        if row_pattern is not None and index not in scanned and not any(rows[index] for rows in parsed):
+            for task, rows in zip(tasks, parsed):
+                rows[index] = template.scan_rows(task[2], index)
+
+    extracted = template.extract_fields(ocr_result)
+    merged = [[row for rows in parsed for row in rows[index]] for index in range(len(template.template.tables))]
+    extracted.update(template.assemble_tables(merged))
+
+    page_rows = {
+        table.name: [(page['page'], len(rows[index])) for page, rows in zip(pages, parsed)]
+        for index, table in enumerate(template.template.tables)
+    }
+    return extracted, page_rows
+
+def check_balance_continuity(transactions: List[Dict[str, Optional[str]]], page_rows: List[Tuple[int, int]],
+                             opening_balance: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Check that running balances carry forward across page breaks
+
+    The balance on the first transaction of each page must equal the last
+    balance of the pages before it (the opening balance for the first page)
+    plus that transaction's amount. A mismatch means a row was lost or
+    misread around the break.
+
+    Args:
+        transactions (List[Dict[str, Optional[str]]]): Transactions in statement order
+        page_rows (List[Tuple[int, int]]): (page number, row count) for every page, as from extract_by_page
+        opening_balance (Optional[str]): The statement's opening balance
+
+    Returns:
+        List[Dict[str, Any]]: One entry per page whose first balance does not continue the previous one
+    """
+    breaks = []
+    carried: Optional[Decimal] = parse_amount(opening_balance)
+    offset = 0
+    for page, count in page_rows:
+        rows = transactions[offset:offset + count]
+        offset += count
+        if not rows:
+            continue
+
+        first = rows[0]
+        amount, balance = parse_amount(first.get('amount')), parse_amount(first.get('balance'))
+        if carried is not None and amount is not None and balance is not None and carried + amount != balance:
+            breaks.append({'page': page, 'carried_balance': str(carried), 'amount': first.get('amount'), 'balance': first.get('balance')})
+
+        # The last balance printed on the page is carried to the next
+        for row in reversed(rows):
+            last = parse_amount(row.get('balance'))
+            if last is not None:
+                carried = last
+                break
+    return breaks
+
+# Human tasks:
+# 1. Size EXTRACTION_WORKERS to the cores of the extraction hosts, leaving room for the API workers
@@ -0,0 +1,299 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from sqlalchemy.orm import Session
+from src.api.models.document import Document, DocumentType
+from src.core.config import settings
+from src.core.database import ReadSessionLocal, SessionLocal
+from src.services.bank_layouts import get_bank_layouts
+from src.services.cross_document_validator import CrossDocumentValidator
+from src.services.data_extractor import EXTRACTION_VERSION, DataExtractor
+from src.services.data_validator import RULE_VERSIONS, DataValidator
+from src.services.extraction_templates import get_template
+from src.services.storage import StorageBackend, get_storage
+from src.services.transaction_store import store_extracted_data
+from src.utils.logger import logger
+from src.utils.tracing import trace_stage
+
+# Document types with a template and validation rules
+PROCESSED_TYPES = tuple(document_type.value for document_type in DocumentType if document_type != DocumentType.OTHER)
+
+# Documents queued per reprocessing worker, so ids are read from the query as workers free up
+QUEUED_PER_WORKER = 4
+
+class ProcessingOutcome(NamedTuple):
+    """What processing a stored document did"""
+    # 'current' (nothing was stale), 'updated', or 'missing_ocr' (stale, but no cached OCR result to recompute from)
+    status: str
+    # Extracted fields whose value changed
+    changed_fields: List[str]
+    # Whether validation was run again
+    revalidated: bool
+    results: Dict[str, Any]
+
+def ocr_key(storage_key: str) -> str:
+    """Storage key of the cached OCR result of a document, next to the document itself"""
+    return os.path.splitext(storage_key)[0] + '.ocr.json'
+
+def results_key(storage_key: str) -> str:
+    """Storage key of the versioned extraction and validation results of a document"""
+    return os.path.splitext(storage_key)[0] + '.results.json'
+
+def _version(*parts: Any) -> str:
+    # Templates and layouts are frozen dataclasses, so their repr covers every alias, pattern and column
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:16]
+
+@functools.lru_cache(maxsize=None)
+def extraction_version(document_type: str) -> str:
+    """
+    Version of what is extracted from documents of a type
+
+    Changes with the type's template, with EXTRACTION_VERSION and, for bank
+    statements, with any bank layout or the number of lines layouts are
+    recognised from. A template change for one type leaves the results of
+    the other types current.
+    """
+    parts = [EXTRACTION_VERSION, get_template(document_type)]
+    if document_type == DocumentType.BANK_STATEMENT.value:
+        layouts = get_bank_layouts().layouts
+        parts += [settings.BANK_FINGERPRINT_LINES, [layouts[layout_id] for layout_id in sorted(layouts)]]
+    return _version(*parts)
+
+def validation_version(document_type: str) -> str:
+    """Version of the validation rules of a document type"""
+    return str(RULE_VERSIONS.get(document_type, 0))
+
+def _read_json(storage: StorageBackend, key: str) -> Optional[Any]:
+    try:
+        return json.loads(b''.join(storage.read_range(key)))
+    except FileNotFoundError:
+        return None
+
+def _write_json(storage: StorageBackend, key: str, value: Any) -> None:
+    storage.store_stream(key, [json.dumps(value, default=str).encode()], 'application/json')
+
+def _as_stored(value: Any) -> Any:
+    # Results as they read back from storage, so fresh and stored results compare equal
+    return json.loads(json.dumps(value, default=str))
+
+class DocumentResults:
+    """
+    Extraction and validation results of stored documents, kept next to their OCR result
+
+    The OCR result of a document is cached in storage the first time it is
+    needed, and its extracted data and validation results are stored with the
+    version of the template and rules that produced them. Processing a
+    document again recomputes only what is stale: extraction, from the cached
+    OCR result, when the extraction version changed; validation when its rules
+    changed or re-extraction changed a field. Textract is never called twice
+    for a document.
+    """
+
+    def __init__(self, storage: Optional[StorageBackend] = None, data_extractor: Optional[DataExtractor] = None,
+                 data_validator: Optional[DataValidator] = None, cross_document_validator: Optional[CrossDocumentValidator] = None):
+        """Initialize the DocumentResults"""
+        self.storage = storage or get_storage()
+        self.data_extractor = data_extractor or DataExtractor()
+        self.data_validator = data_validator or DataValidator()
+        self.cross_document_validator = cross_document_validator or CrossDocumentValidator()
+
+    def ocr_result(self, storage_key: str, run_ocr: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Return the OCR result of a stored document
+
+        Args:
+            storage_key (str): Storage key of the document (Document.file_path)
+            run_ocr (bool): Whether to run OCR, and cache its result, when no result is cached
+
+        Returns:
+            Optional[Dict[str, Any]]: The OCR result, None when it is not cached and run_ocr is False
+        """
+        ocr_result = _read_json(self.storage, ocr_key(storage_key))
+        if ocr_result is None and run_ocr:
+            ocr_result = self.data_extractor.ocr_engine.perform_stored_ocr(storage_key)
+            _write_json(self.storage, ocr_key(storage_key), ocr_result)
+        return ocr_result
+
+    def load(self, storage_key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored results of a document, if any"""
+        return _read_json(self.storage, results_key(storage_key))
+
+    def process(self, storage_key: str, document_type: str, run_ocr: bool = True, save: bool = True) -> ProcessingOutcome:
+        """
+        Bring the stored results of a document up to date
+
+        Args:
+            storage_key (str): Storage key of the document (Document.file_path)
+            document_type (str): Type of the document
+            run_ocr (bool): Whether to run OCR when no result is cached; the re-run CLI never does
+            save (bool): Whether to store recomputed results
+
+        Returns:
+            ProcessingOutcome: What was recomputed, with the up-to-date results
+        """
+        results = self.load(storage_key) or {}
+        extraction = results.get('extraction') or {}
+        validation = results.get('validation') or {}
+        current_extraction, current_validation = extraction_version(document_type), validation_version(document_type)
+        if extraction.get('version') == current_extraction and validation.get('version') == current_validation:
+            return ProcessingOutcome('current', [], False, results)
+
+        changed_fields = []
+        if extraction.get('version') != current_extraction:
+            ocr_result = self.ocr_result(storage_key, run_ocr)
+            if ocr_result is None:
+                return ProcessingOutcome('missing_ocr', [], False, results)
+
+            data = _as_stored(self.data_extractor.extract_from_ocr(ocr_result, document_type, storage_key))
+            previous = extraction.get('data') or {}
+            changed_fields = sorted(name for name in data.keys() | previous.keys() if data.get(name) != previous.get(name))
+            extraction = {'version': current_extraction, 'data': data}
+
+        # Validation results stand while neither the rules nor the data they checked changed
+        revalidated = bool(changed_fields) or validation.get('version') != current_validation
+        if revalidated:
+            validation_results = self.data_validator.validate_data(extraction['data'], DocumentType(document_type))
+            validation = {'version': current_validation, 'results': _as_stored(validation_results)}
+
+        results = {'document_type': document_type, 'extraction': extraction, 'validation': validation}
+        if save:
+            _write_json(self.storage, results_key(storage_key), results)
+        return ProcessingOutcome('updated', changed_fields, revalidated, results)
+
+    def process_document(self, db: Session, document: Document, run_ocr: bool = True, save: bool = True) -> ProcessingOutcome:
+        """
+        Bring the results of a document up to date and store its extracted data in the database
+
+        Re-extracted data that changed, and data the database does not have
+        yet, goes through store_extracted_data, so Document.extracted_data,
+        the transactions and the tables derived from the fields follow the
+        results in storage. Whenever the document was validated again, its
+        application's documents are also validated together; those results
+        are returned under 'cross_document' but not stored, since they change
+        with the application's other documents. Recomputed results are not
+        written to storage here: the caller stores the database changes and
+        then the results with commit().
+
+        Args:
+            db (Session): The database session
+            document (Document): The document to process
+            run_ocr (bool): Whether to run OCR when no result is cached
+            save (bool): Whether to store recomputed data in the database
+
+        Returns:
+            ProcessingOutcome: What was recomputed, with the up-to-date results
+        """
+        # The OCR, extraction and validation spans within inherit the document's id
+        with trace_stage("document_processing", document_id=document.id, application_id=document.application_id):
+            outcome = self.process(document.file_path, DocumentType(document.type).value, run_ocr, save=False)
+            extraction = outcome.results.get('extraction')
+            stored = bool(save and extraction and (outcome.changed_fields or document.extracted_data is None))
+            if stored:
+                store_extracted_data(db, document, extraction['data'], self.storage)
+
+            # Check the document's identities against the application's other documents and other applications
+            if outcome.revalidated or stored:
+                cross_document = self.cross_document_validator.validate_application(db, document.application_id)
+                outcome = outcome._replace(results=dict(outcome.results, cross_document=cross_document))
+        return outcome
+
+    def commit(self, db: Session, document: Document, outcome: ProcessingOutcome) -> None:
+        """
+        Commit the session process_document stored a document's data in, then store its recomputed results
+
+        The results go to storage only once the database holds the data
+        extracted with them. Written first, a failed commit would leave them
+        current in storage and the database stale, with nothing for a later
+        run to recompute.
+
+        Args:
+            db (Session): The session process_document was given
+            document (Document): The processed document
+            outcome (ProcessingOutcome): What process_document returned
+        """
+        db.commit()
+        if outcome.status == 'updated':
+            results = {key: value for key, value in outcome.results.items() if key != 'cross_document'}
+            _write_json(self.storage, results_key(document.file_path), results)
+
+def stored_documents(document_types: Iterable[str]) -> Iterator[str]:
+    """Yield the id of every document of the given types"""
+    types = [DocumentType(document_type) for document_type in document_types]
+    with ReadSessionLocal() as db:
+        query = db.query(Document.id).filter(Document.type.in_(types)).order_by(Document.id)
+        for document_id, in query.yield_per(1000):
+            yield document_id
+
+def reprocess(document_ids: Iterable[str], document_results: DocumentResults,
+              save: bool = True, workers: int = 1) -> Counter:
+    """
+    Recompute the stale results of documents from their cached OCR results
+
+    Each document is processed in its own transaction, which stores its
+    changed data in the database. At most QUEUED_PER_WORKER documents per
+    worker are queued at a time, so document_ids can be a lazy query.
+
+    Args:
+        document_ids (Iterable[str]): The documents to reprocess
+        document_results (DocumentResults): Where results are read from and stored
+        save (bool): Whether to store recomputed results; a dry run only reports them
+        workers (int): Documents processed concurrently
+
+    Returns:
+        Counter: Documents by outcome status, and 'failed'
+    """
+    def process(document_id: str) -> str:
+        try:
+            with SessionLocal() as db:
+                document = db.get(Document, document_id)
+                outcome = document_results.process_document(db, document, run_ocr=False, save=save)
+                if save:
+                    document_results.commit(db, document, outcome)
+        except Exception as e:
+            logger.error("Error reprocessing document %s: %s", document_id, e)
+            return 'failed'
+
+        if outcome.status == 'missing_ocr':
+            logger.warning("Document %s has stale results but no cached OCR result", document_id)
+        elif outcome.changed_fields:
+            logger.info("Document %s: %s changed", document_id, ', '.join(outcome.changed_fields))
+        return outcome.status
+
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for document_id in document_ids:
+            if len(pending) >= workers * QUEUED_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                counts.update(future.result() for future in done)
+            pending.add(executor.submit(process, document_id))
+        counts.update(future.result() for future in wait(pending).done)
+    return counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recompute the extraction and validation results made stale by template or rule changes, "
+                    "from cached OCR results; Textract is not called"
+    )
+    parser.add_argument("--type", dest="types", action="append", choices=PROCESSED_TYPES,
+                        help="Document type to reprocess; repeat for several (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without storing it")
+    parser.add_argument("--workers", type=int, default=settings.REPROCESSING_WORKERS)
+    args = parser.parse_args()
+
+    counts = reprocess(stored_documents(args.types or PROCESSED_TYPES), DocumentResults(), save=not args.dry_run, workers=args.workers)
+    for status in ('current', 'updated', 'missing_ocr', 'failed'):
+        print(f"{status + ':':<13} {counts[status]}")
+    if counts['failed']:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
+
+# Human tasks:
+# 1. Run python -m src.services.reprocessing after deploying a template, bank layout or rule change
@@ -0,0 +1,278 @@
+import errno
+import functools
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from src.core.config import settings
+from src.utils.logger import logger
+
+# Size of the pieces reads are streamed in
+READ_CHUNK_SIZE = 256 * 1024
+
+class StorageBackend(ABC):
+    """
+    Where document files live once they are ingested
+
+    Documents are addressed by a storage key (Document.file_path) rather than
+    a path on the machine that received them, so any worker can read any
+    document. Reads are streamed and can be limited to a byte range.
+    """
+
+    @abstractmethod
+    def store_file(self, key: str, file_path: str, content_type: Optional[str] = None) -> None:
+        """Store a local file under key; the backend takes ownership of the file and removes it"""
+
+    @abstractmethod
+    def store_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> int:
+        """
+        Store a stream of bytes under key without holding it in memory
+
+        Returns:
+            int: The number of bytes stored
+        """
+
+    @abstractmethod
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes of key from start up to and including end (the whole object by default)"""
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Return the size of key in bytes, raising FileNotFoundError when it does not exist"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key if it exists"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Return a filesystem path for key when the backend is a local directory"""
+        return None
+
+    def presigned_url(self, key: str, expires_in: Optional[int] = None, filename: Optional[str] = None, disposition: str = 'inline') -> Optional[str]:
+        """
+        Return a time-limited URL that downloads key directly from the backend, if it supports one
+
+        The response carries Content-Disposition `disposition` (inline or
+        attachment) with filename, like documents served from local storage.
+        """
+        return None
+
+    def s3_location(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return the (bucket, key) AWS services can read key from directly, if any"""
+        return None
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        """Yield a local path with the content of key, downloading it to a temporary file if needed"""
+        path = self.local_path(key)
+        if path is not None:
+            yield path
+            return
+
+        os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)
+        descriptor, path = tempfile.mkstemp(dir=settings.TEMP_UPLOAD_DIR, suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in self.read_range(key):
+                    file.write(chunk)
+            yield path
+        finally:
+            os.remove(path)
+
+class LocalStorage(StorageBackend):
+    """Stores documents under a directory, typically a volume shared by every worker"""
+
+    def __init__(self, root: str):
+        """Initialize the LocalStorage"""
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        # Keys are relative paths; refuse any that would escape the root
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def store_file(self, key: str, file_path: str, content_type: Optional[str] = None) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # An atomic rename when the file is on the same filesystem
+            os.replace(file_path, path)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        # Otherwise copy next to the destination and rename, so readers never see a partial file
+        descriptor, partial_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(descriptor, 'wb') as file, open(file_path, 'rb') as source:
+                shutil.copyfileobj(source, file, READ_CHUNK_SIZE)
+            os.replace(partial_path, path)
+        except BaseException:
+            os.remove(partial_path)
+            raise
+        os.remove(file_path)
+
+    def store_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write next to the destination and rename, so readers never see a partial file
+        descriptor, partial_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        size = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    size += len(chunk)
+            os.replace(partial_path, path)
+        except BaseException:
+            os.remove(partial_path)
+            raise
+        return size
+
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(key), 'rb') as file:
+            file.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = file.read(READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+class S3Storage(StorageBackend):
+    """
+    Stores documents in an S3 bucket or an S3-compatible store (S3_ENDPOINT_URL)
+
+    Uploads larger than one part use multipart uploads of part_size bytes, so
+    neither files nor streams are ever held in memory whole.
+    """
+
+    def __init__(self, bucket: str, client=None, part_size: Optional[int] = None):
+        """Initialize the S3Storage"""
+        self.bucket = bucket
+        self.part_size = part_size or settings.STORAGE_MULTIPART_CHUNK_SIZE
+        self.client = client or boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY.get_secret_value(),
+            region_name=settings.AWS_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+        )
+        self.transfer_config = TransferConfig(multipart_threshold=self.part_size, multipart_chunksize=self.part_size)
+
+    def store_file(self, key: str, file_path: str, content_type: Optional[str] = None) -> None:
+        extra_args = {'ContentType': content_type} if content_type else None
+        self.client.upload_file(file_path, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config)
+        os.remove(file_path)
+
+    def store_stream(self, key: str, chunks: Iterable[bytes], content_type: Optional[str] = None) -> int:
+        extra_args = {'ContentType': content_type} if content_type else {}
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts = []
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                # Every part but the last must be at least 5 MiB, so upload in whole parts only
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra_args)['UploadId']
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer[:self.part_size])))
+                    del buffer[:self.part_size]
+
+            if upload_id is None:
+                # Smaller than one part: a single PUT
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra_args)
+                return size
+
+            if buffer:
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+            return size
+        except BaseException:
+            # Abandoned parts are billed until the upload is aborted
+            if upload_id is not None:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body)
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{'' if end is None else end}")
+        except ClientError as e:
+            raise self._translate(e, key)
+        body = response['Body']
+        try:
+            yield from body.iter_chunks(READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def size(self, key: str) -> int:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError as e:
+            raise self._translate(e, key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def presigned_url(self, key: str, expires_in: Optional[int] = None, filename: Optional[str] = None, disposition: str = 'inline') -> Optional[str]:
+        params = {'Bucket': self.bucket, 'Key': key}
+        if filename:
+            params['ResponseContentDisposition'] = '{}; filename="{}"'.format(disposition, filename.replace('"', ''))
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in or settings.STORAGE_PRESIGNED_URL_EXPIRY)
+
+    def s3_location(self, key: str) -> Optional[Tuple[str, str]]:
+        # Other AWS services cannot reach an S3-compatible store on a custom endpoint
+        if settings.S3_ENDPOINT_URL:
+            return None
+        return self.bucket, key
+
+    def _translate(self, error: ClientError, key: str) -> Exception:
+        if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return FileNotFoundError(key)
+        return error
+
+@functools.lru_cache()
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend selected by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == 's3':
+        logger.info("Storing documents in S3 bucket %s", settings.S3_BUCKET_NAME)
+        return S3Storage(settings.S3_BUCKET_NAME)
+    return LocalStorage(settings.STORAGE_LOCAL_ROOT)
+
+def document_key(md5_hash: str, file_name: str) -> str:
+    """Storage key of a document; identical files share one key"""
+    return f"documents/{md5_hash[:2]}/{md5_hash}{os.path.splitext(file_name)[1].lower()}"
+
+# Human tasks:
+# 1. Create the S3 bucket with default encryption and a lifecycle rule aborting incomplete multipart uploads
+# 2. Grant Textract read access to the bucket so OCR can read documents in place
@@ -0,0 +1,326 @@
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from email import policy
+from email.parser import BytesHeaderParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Characters that can appear in base64 content; everything else (line breaks, padding whitespace) is dropped
+_NON_BASE64 = re.compile(rb'[^A-Za-z0-9+/=]')
+
+# RFC 5322 caps lines at 998 characters plus CRLF; header and boundary lines are never split below this
+_MIN_LINE_LENGTH = 1000
+
+class StreamedAttachment:
+    """An attachment decoded to a file on disk while its message was read"""
+
+    __slots__ = ("filename", "content_type", "file_path", "file_size", "md5_hash")
+
+    def __init__(self, filename: Optional[str], content_type: str, file_path: str, file_size: int, md5_hash: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.file_path = file_path
+        self.file_size = file_size
+        self.md5_hash = md5_hash
+
+class _FileSink:
+    # Writes decoded bytes to a temporary file, hashing and counting them on the way
+    def __init__(self, directory: str):
+        descriptor, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self.file = os.fdopen(descriptor, 'wb')
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.md5.update(data)
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self) -> None:
+        self.file.close()
+
+class _MemorySink:
+    # Keeps up to `limit` decoded bytes in memory, used for the text body
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> None:
+        remaining = self.limit - len(self.data)
+        if remaining > 0:
+            self.data += data[:remaining]
+
+    def close(self) -> None:
+        pass
+
+class _NullSink:
+    # Discards the content of parts that are neither the body nor an attachment
+    def write(self, data: bytes) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class _IdentityDecoder:
+    # 7bit, 8bit and binary content is written as is
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write(self, data: bytes) -> None:
+        self.sink.write(data)
+
+    def close(self) -> None:
+        self.sink.close()
+
+class _Base64Decoder:
+    # Decodes base64 in blocks of up to chunk_size, carrying incomplete 4-character groups over
+    def __init__(self, sink, chunk_size: int):
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.pending = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.pending += _NON_BASE64.sub(b'', data)
+        if len(self.pending) >= self.chunk_size:
+            usable = len(self.pending) - len(self.pending) % 4
+            self.sink.write(binascii.a2b_base64(bytes(self.pending[:usable])))
+            del self.pending[:usable]
+
+    def close(self) -> None:
+        if self.pending:
+            # Tolerate missing padding at the end of the part, like the stdlib decoder
+            self.pending += b'=' * (-len(self.pending) % 4)
+            try:
+                self.sink.write(binascii.a2b_base64(bytes(self.pending)))
+            except binascii.Error:
+                pass
+        self.sink.close()
+
+class _QuotedPrintableDecoder:
+    # Decodes quoted-printable one complete line at a time so soft line breaks are joined correctly
+    def __init__(self, sink):
+        self.sink = sink
+        self.pending = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.pending += data
+        end = self.pending.rfind(b'\n')
+        if end >= 0:
+            self.sink.write(binascii.a2b_qp(bytes(self.pending[:end + 1])))
+            del self.pending[:end + 1]
+
+    def close(self) -> None:
+        if self.pending:
+            self.sink.write(binascii.a2b_qp(bytes(self.pending)))
+        self.sink.close()
+
+class _LineReader:
+    """
+    Splits a stream of byte chunks into lines
+
+    Lines longer than `max_line` (binary parts without line breaks) are
+    returned in pieces so memory stays bounded; only pieces that start a
+    line can be headers or boundaries.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], max_line: int):
+        self.chunks = iter(chunks)
+        self.max_line = max_line
+        self.buffer = bytearray()
+        self.at_line_start = True
+        self.exhausted = False
+
+    def __iter__(self) -> Iterator[Tuple[bytes, bool]]:
+        return self
+
+    def __next__(self) -> Tuple[bytes, bool]:
+        while True:
+            end = self.buffer.find(b'\n')
+            if end >= 0:
+                return self._take(end + 1, ends_line=True)
+            if len(self.buffer) >= self.max_line:
+                return self._take(len(self.buffer), ends_line=False)
+            if self.exhausted:
+                if self.buffer:
+                    return self._take(len(self.buffer), ends_line=True)
+                raise StopIteration
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+            else:
+                self.buffer += chunk
+
+    def _take(self, size: int, ends_line: bool) -> Tuple[bytes, bool]:
+        line = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        starts_line = self.at_line_start
+        self.at_line_start = ends_line
+        return line, starts_line
+
+class StreamingMimeParser:
+    """
+    Parse an email from a stream of byte chunks without holding it in memory
+
+    Headers are parsed with the stdlib header parser; bodies are scanned line
+    by line for MIME boundaries. Attachment parts are decoded (base64,
+    quoted-printable or as is) straight to files in `upload_dir` and hashed
+    as they are written, so memory per message is bounded by the chunk size
+    rather than by the size of the message or its attachments.
+    """
+
+    def __init__(self, upload_dir: str, chunk_size: int = 1024 * 1024, max_body_size: int = 1024 * 1024):
+        """Initialize the StreamingMimeParser"""
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.max_body_size = max_body_size
+        self.header_parser = BytesHeaderParser(policy=policy.default)
+
+    def parse(self, chunks: Iterable[bytes]) -> Dict[str, Any]:
+        """
+        Parse a message and decode its attachments to disk
+
+        Args:
+            chunks (Iterable[bytes]): The raw RFC 822 message in consecutive pieces of any size
+
+        Returns:
+            Dict[str, Any]: subject, sender, body, date, message_id and attachments
+                (a list of StreamedAttachment); the caller owns the attachment files
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self._attachments: List[StreamedAttachment] = []
+        self._body: Optional[_MemorySink] = None
+        self._body_charset = 'utf-8'
+        self._boundaries: Dict[bytes, Tuple[bytes, bool]] = {}
+
+        try:
+            headers, _ = self._parse_entity(_LineReader(chunks, max(self.chunk_size, _MIN_LINE_LENGTH)), [])
+        except BaseException:
+            # Do not leave partial attachment files behind
+            for attachment in self._attachments:
+                os.remove(attachment.file_path)
+            raise
+
+        body = ''
+        if self._body is not None:
+            body = bytes(self._body.data).decode(self._body_charset, errors='replace')
+
+        return {
+            'subject': str(headers.get('Subject', '')),
+            'sender': str(headers.get('From', '')),
+            'body': body,
+            'date': headers.get('Date') and str(headers['Date']),
+            'message_id': headers.get('Message-ID') and str(headers['Message-ID']),
+            'attachments': self._attachments
+        }
+
+    def _set_boundaries(self, stack: List[bytes]) -> None:
+        # Index the delimiter and close-delimiter lines of every open multipart for O(1) matching
+        self._boundaries = {}
+        for boundary in stack:
+            self._boundaries[b'--' + boundary] = (boundary, False)
+            self._boundaries[b'--' + boundary + b'--'] = (boundary, True)
+
+    def _match_boundary(self, line: bytes, starts_line: bool) -> Optional[Tuple[bytes, bool]]:
+        if not starts_line or not line.startswith(b'--'):
+            return None
+        return self._boundaries.get(line.rstrip(b' \t\r\n'))
+
+    def _parse_entity(self, lines: _LineReader, stack: List[bytes]):
+        # Parse one entity (headers and body); returns its headers and the boundary that ended it, if any
+        header_lines = []
+        terminator = None
+        for line, starts_line in lines:
+            terminator = self._match_boundary(line, starts_line)
+            if terminator is not None:
+                break
+            if starts_line and line in (b'\r\n', b'\n'):
+                break
+            header_lines.append(line)
+        headers = self.header_parser.parsebytes(b''.join(header_lines))
+        if terminator is not None:
+            return headers, terminator
+
+        if headers.get_content_maintype() == 'multipart' and headers.get_boundary():
+            return headers, self._parse_multipart(lines, stack, headers.get_boundary().encode('ascii', 'replace'))
+        return headers, self._parse_leaf(lines, headers)
+
+    def _parse_multipart(self, lines: _LineReader, stack: List[bytes], boundary: bytes):
+        inner_stack = stack + [boundary]
+        self._set_boundaries(inner_stack)
+
+        # Skip the preamble up to the first delimiter
+        terminator = self._skip(lines)
+        while terminator is not None and terminator[0] == boundary and not terminator[1]:
+            _, terminator = self._parse_entity(lines, inner_stack)
+            self._set_boundaries(inner_stack)
+
+        # Skip the epilogue up to an enclosing delimiter or the end of the message
+        self._set_boundaries(stack)
+        if terminator is not None and terminator[0] == boundary:
+            terminator = self._skip(lines)
+        return terminator
+
+    def _skip(self, lines: _LineReader):
+        for line, starts_line in lines:
+            terminator = self._match_boundary(line, starts_line)
+            if terminator is not None:
+                return terminator
+        return None
+
+    def _parse_leaf(self, lines: _LineReader, headers):
+        # Choose where the decoded content goes
+        file_sink = None
+        if headers.get('Content-Disposition') is not None:
+            file_sink = sink = _FileSink(self.upload_dir)
+        elif self._body is None and headers.get_content_type() == 'text/plain':
+            self._body = sink = _MemorySink(self.max_body_size)
+            self._body_charset = headers.get_content_charset() or 'utf-8'
+        else:
+            sink = _NullSink()
+
+        encoding = str(headers.get('Content-Transfer-Encoding', '7bit')).strip().lower()
+        if encoding == 'base64':
+            decoder = _Base64Decoder(sink, self.chunk_size)
+        elif encoding == 'quoted-printable':
+            decoder = _QuotedPrintableDecoder(sink)
+        else:
+            decoder = _IdentityDecoder(sink)
+
+        # The line break before a delimiter belongs to the delimiter, so hold each line break back until the next line
+        terminator = None
+        held_line_break = b''
+        try:
+            for line, starts_line in lines:
+                terminator = self._match_boundary(line, starts_line)
+                if terminator is not None:
+                    break
+                if held_line_break:
+                    decoder.write(held_line_break)
+                content = line.rstrip(b'\r\n')
+                held_line_break = line[len(content):]
+                decoder.write(content)
+            else:
+                # The message ended without a delimiter, so the last line break is content
+                decoder.write(held_line_break)
+        except BaseException:
+            if file_sink is not None:
+                file_sink.close()
+                os.remove(file_sink.path)
+            raise
+        decoder.close()
+
+        if file_sink is not None:
+            self._attachments.append(StreamedAttachment(
+                filename=headers.get_filename(),
+                content_type=headers.get_content_type(),
+                file_path=file_sink.path,
+                file_size=file_sink.size,
+                md5_hash=file_sink.md5.hexdigest(),
+            ))
+        return terminator
+
+# Human tasks:
+# 1. Decide whether inline (Content-Disposition: inline) images should be stored as attachments
+# 2. Add support for uuencoded attachments if any partner still sends them
@@ -0,0 +1,220 @@
+import io
+import os
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.api.models.cash_flow_metrics import CashFlowMetrics
+from src.api.models.document import Document, DocumentType
+from src.api.models.transaction import Transaction
+from src.core.config import settings
+from src.api.models.identity_key import IdentityKind
+from src.services.cross_document_validator import IDENTITY_FIELDS, normalize_business_name, record_identity_keys
+from src.services.extraction_templates import parse_amount
+from src.services.merchant_matching import save_merchant
+from src.services.storage import StorageBackend, get_storage
+from src.utils.logger import logger
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Only needed when TRANSACTION_PARQUET_SIDECAR is enabled
+    pyarrow = None
+
+# Stored transaction columns, in table order after document_id
+COLUMNS = ('position', 'date', 'description', 'amount', 'balance')
+
+_COPY_SQL = f"COPY transactions (document_id, {', '.join(COLUMNS)}) FROM STDIN"
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def transaction_columns(transactions: List[Dict[str, Optional[str]]]) -> Dict[str, list]:
+    """
+    Turn extracted transactions into columns, with amounts and balances as Decimals
+
+    Args:
+        transactions (List[Dict[str, Optional[str]]]): Transactions as DataExtractor returns them
+
+    Returns:
+        Dict[str, list]: One list per stored column, in statement order
+    """
+    return {
+        'position': list(range(len(transactions))),
+        'date': [transaction.get('date') for transaction in transactions],
+        'description': [transaction.get('description') for transaction in transactions],
+        'amount': [parse_amount(transaction.get('amount')) for transaction in transactions],
+        'balance': [parse_amount(transaction.get('balance')) for transaction in transactions],
+    }
+
+def _copy_value(value: Any) -> str:
+    # COPY text format: \N is NULL; backslashes, tabs and line breaks are escaped
+    return '\\N' if value is None else str(value).translate(_COPY_ESCAPES)
+
+def save_transactions(db: Session, document_id: str, columns: Dict[str, list]) -> int:
+    """
+    Replace the stored transactions of a document
+
+    On PostgreSQL (psycopg2) the rows are streamed with a single COPY; other
+    databases get one multi-row INSERT. Runs in the session's transaction,
+    which the caller commits.
+
+    Args:
+        db (Session): The database session
+        document_id (str): The ID of the statement's document
+        columns (Dict[str, list]): Transactions as from transaction_columns
+
+    Returns:
+        int: The number of transactions stored
+    """
+    table = Transaction.__table__
+    db.execute(table.delete().where(table.c.document_id == document_id))
+    count = len(columns['position'])
+    if not count:
+        return 0
+
+    connection = db.connection()
+    rows = zip(*(columns[column] for column in COLUMNS))
+    if connection.dialect.driver == 'psycopg2':
+        buffer = io.StringIO()
+        document_value = _copy_value(document_id)
+        for row in rows:
+            buffer.write(document_value + '\t' + '\t'.join(map(_copy_value, row)) + '\n')
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(_COPY_SQL, buffer)
+        finally:
+            cursor.close()
+    else:
+        connection.execute(table.insert(), [dict(zip(COLUMNS, row), document_id=document_id) for row in rows])
+    return count
+
+def load_transactions(db: Session, document_id: str) -> Dict[str, list]:
+    """
+    Load the transactions of a document as columns, in statement order
+
+    Args:
+        db (Session): The database session
+        document_id (str): The ID of the statement's document
+
+    Returns:
+        Dict[str, list]: date, description, amount and balance lists; amounts are Decimals
+    """
+    table = Transaction.__table__
+    rows = db.execute(
+        select(table.c.date, table.c.description, table.c.amount, table.c.balance)
+        .where(table.c.document_id == document_id)
+        .order_by(table.c.position)
+    ).all()
+    values = list(zip(*rows)) if rows else [()] * 4
+    return {column: list(value) for column, value in zip(COLUMNS[1:], values)}
+
+def parquet_key(storage_key: str) -> str:
+    """Storage key of the Parquet sidecar of a statement, next to the statement itself"""
+    return os.path.splitext(storage_key)[0] + '.transactions.parquet'
+
+def write_parquet_sidecar(storage: StorageBackend, storage_key: str, columns: Dict[str, list]) -> None:
+    """Write the transactions of a statement to its Parquet sidecar"""
+    if pyarrow is None:
+        raise RuntimeError("TRANSACTION_PARQUET_SIDECAR needs pyarrow installed")
+
+    money = pyarrow.decimal128(14, 2)
+    table = pyarrow.table({
+        'position': pyarrow.array(columns['position'], pyarrow.int32()),
+        'date': pyarrow.array(columns['date'], pyarrow.string()),
+        'description': pyarrow.array(columns['description'], pyarrow.string()),
+        'amount': pyarrow.array([None if value is None else value.quantize(Decimal('0.01')) for value in columns['amount']], money),
+        'balance': pyarrow.array([None if value is None else value.quantize(Decimal('0.01')) for value in columns['balance']], money),
+    })
+    buffer = io.BytesIO()
+    pyarrow.parquet.write_table(table, buffer)
+    storage.store_stream(parquet_key(storage_key), [buffer.getvalue()], 'application/vnd.apache.parquet')
+
+def read_parquet_sidecar(storage: StorageBackend, storage_key: str) -> Optional['pyarrow.Table']:
+    """Read the Parquet sidecar of a statement, None when it has none"""
+    if pyarrow is None:
+        raise RuntimeError("Reading transaction sidecars needs pyarrow installed")
+    try:
+        data = b''.join(storage.read_range(parquet_key(storage_key)))
+    except FileNotFoundError:
+        return None
+    return pyarrow.parquet.read_table(pyarrow.BufferReader(data))
+
+def apply_statement_metrics(db: Session, application_id: str, metrics: Dict[str, Any],
+                            previous: Optional[Dict[str, Any]] = None) -> CashFlowMetrics:
+    """
+    Fold the metrics of a new statement into its application's cash-flow metrics
+
+    The application's row is locked for the update, so statements of one
+    application processed concurrently are all counted. The caller commits.
+
+    Args:
+        db (Session): The database session
+        application_id (str): The ID of the statement's application
+        metrics (Dict[str, Any]): The statement's metrics, as from statement_metrics
+        previous (Optional[Dict[str, Any]]): Metrics stored for the same statement before it was re-extracted, which are taken out
+
+    Returns:
+        CashFlowMetrics: The application's updated metrics
+    """
+    cash_flow = db.query(CashFlowMetrics).filter(CashFlowMetrics.application_id == application_id).with_for_update().one_or_none()
+    if cash_flow is None:
+        try:
+            with db.begin_nested():
+                cash_flow = CashFlowMetrics(application_id)
+                db.add(cash_flow)
+        except IntegrityError:
+            # Another worker created the row first
+            cash_flow = db.query(CashFlowMetrics).filter(CashFlowMetrics.application_id == application_id).with_for_update().one()
+
+    if previous:
+        cash_flow.add_statement(previous, sign=-1)
+    cash_flow.add_statement(metrics)
+    return cash_flow
+
+def store_extracted_data(db: Session, document: Document, extracted_data: Dict[str, Any], storage: Optional[StorageBackend] = None) -> None:
+    """
+    Store what was extracted from a document
+
+    Fields go to Document.extracted_data; transactions go to the transactions
+    table and, with TRANSACTION_PARQUET_SIDECAR, to a Parquet file next to the
+    document. Its business name, EIN and account number are indexed for
+    CrossDocumentValidator, the first business name found for an application
+    names its merchant, and a bank statement's cash-flow metrics are
+    added to its application's, replacing the statement's earlier metrics
+    when it is stored again after re-extraction. The caller commits the
+    session.
+
+    Args:
+        db (Session): The database session
+        document (Document): The document the data was extracted from
+        extracted_data (Dict[str, Any]): The data as DataExtractor returns it
+        storage (Optional[StorageBackend]): Where the sidecar is written; the configured backend by default
+    """
+    transactions = extracted_data.get('transactions')
+    fields = {name: value for name, value in extracted_data.items() if name != 'transactions'}
+    document_type = DocumentType(document.type).value
+    record_identity_keys(db, document.id, document.application_id, document_type, fields)
+    for field, kind in IDENTITY_FIELDS.get(document_type, ()):
+        normalized_name = normalize_business_name(fields.get(field)) if kind == IdentityKind.BUSINESS_NAME else None
+        if normalized_name:
+            save_merchant(db, document.application_id, fields[field], normalized_name)
+            break
+    if fields.get('cash_flow'):
+        previous = (document.extracted_data or {}).get('cash_flow')
+        apply_statement_metrics(db, document.application_id, fields['cash_flow'], previous)
+    if transactions is None:
+        document.extracted_data = fields
+        return
+
+    columns = transaction_columns(transactions)
+    document.extracted_data = dict(fields, transaction_count=len(transactions))
+    save_transactions(db, document.id, columns)
+    if settings.TRANSACTION_PARQUET_SIDECAR:
+        write_parquet_sidecar(storage or get_storage(), document.file_path, columns)
+    logger.info("Stored %d transactions of document %s", len(transactions), document.id, extra={"sampled": True})
+
+# Human tasks:
+# 1. Create the transactions table and the documents.extracted_data column in the production database
+# 2. Install pyarrow on the hosts that enable TRANSACTION_PARQUET_SIDECAR
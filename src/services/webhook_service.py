@@ -1,8 +1,10 @@
+import time
 import requests
 from typing import Dict, Any, List
 from sqlalchemy.orm import Session
 from src.core.config import settings
 from src.utils.logger import logger
+from src.utils.tracing import trace_stage
 from src.api.models.webhook import Webhook
 from src.api.models.application import Application
 
@@ -27,18 +29,19 @@ class WebhookService:
             prepared_payload = self.prepare_payload(event_type, payload)
 
             # Send HTTP POST request to the webhook URL
-            try:
-                response = requests.post(webhook.url, json=prepared_payload, timeout=settings.WEBHOOK_TIMEOUT)
-                
-                # Handle the response
-                success = self.handle_webhook_response(response, webhook, db_session)
-                overall_success = overall_success and success
-            except requests.RequestException as e:
-                logger.error(f"Failed to trigger webhook {webhook.id}: {str(e)}")
-                overall_success = False
+            with trace_stage("webhook_delivery", webhook_id=webhook.id, event_type=event_type, application_id=payload.get("application_id")):
+                try:
+                    response = requests.post(webhook.url, json=prepared_payload, timeout=settings.WEBHOOK_TIMEOUT)
+
+                    # Handle the response
+                    success = self.handle_webhook_response(response, webhook, db_session)
+                    overall_success = overall_success and success
+                except requests.RequestException as e:
+                    logger.error("Failed to trigger webhook %s: %s", webhook.id, e)
+                    overall_success = False
 
         # Log the webhook triggering process
-        logger.info(f"Triggered {len(active_webhooks)} webhooks for event {event_type}")
+        logger.info("Triggered %d webhooks for event %s", len(active_webhooks), event_type, extra={"sampled": True})
 
         # Return overall success status
         return overall_success
@@ -94,7 +97,7 @@ class WebhookService:
         else:
             # If failed:
             webhook.retry_count += 1
-            logger.warning(f"Webhook {webhook.id} failed with status code {response.status_code}")
+            logger.warning("Webhook %s failed with status code %s", webhook.id, response.status_code)
             success = False
 
         # Update webhook in the database
@@ -115,13 +118,13 @@ class WebhookService:
                     response = requests.post(webhook.url, json=webhook.last_payload, timeout=settings.WEBHOOK_TIMEOUT)
                     success = self.handle_webhook_response(response, webhook, db_session)
                     if success:
-                        logger.info(f"Successfully retried webhook {webhook.id}")
+                        logger.info("Successfully retried webhook %s", webhook.id)
                 except requests.RequestException as e:
-                    logger.error(f"Failed to retry webhook {webhook.id}: {str(e)}")
+                    logger.error("Failed to retry webhook %s: %s", webhook.id, e)
             else:
                 # Mark webhook as inactive
                 webhook.is_active = False
-                logger.warning(f"Webhook {webhook.id} has been marked as inactive due to too many failures")
+                logger.warning("Webhook %s has been marked as inactive due to too many failures", webhook.id)
 
         # Commit changes to the database
         db_session.commit()
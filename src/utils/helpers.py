@@ -1,10 +1,12 @@
+import hashlib
 import os
+import shutil
 from uuid import uuid4
 from typing import Any
 from fastapi import UploadFile
 from src.core.config import settings
+from src.utils import validators
 from src.utils.logger import logger
-import re
 import html
 
 def save_upload_file(upload_file: UploadFile) -> str:
@@ -16,8 +18,8 @@ def save_upload_file(upload_file: UploadFile) -> str:
     
     # Open the file for writing in binary mode
     with open(file_path, "wb") as buffer:
-        # Write the contents of the upload file to the new file
-        buffer.write(upload_file.file.read())
+        # Copy the upload in chunks rather than reading it into memory whole
+        shutil.copyfileobj(upload_file.file, buffer, 1024 * 1024)
     
     # Log the successful file save
     logger.info(f"File saved successfully: {file_path}")
@@ -25,6 +27,14 @@ def save_upload_file(upload_file: UploadFile) -> str:
     # Return the full path of the saved file
     return file_path
 
+def file_md5(file_path: str) -> str:
+    # Hash the file in chunks rather than reading it into memory whole
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
 def remove_file(file_path: str) -> bool:
     # Check if the file exists
     if os.path.exists(file_path):
@@ -54,14 +64,8 @@ def format_currency(amount: float, currency_symbol: str) -> str:
     return f"{currency_symbol}{formatted_amount}"
 
 def validate_email(email: str) -> bool:
-    # Define a regular expression pattern for email validation
-    email_pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    
-    # Use re.match to check if the email matches the pattern
-    if re.match(email_pattern, email):
-        return True
-    else:
-        return False
+    # Match against the pattern compiled once in src/utils/validators.py
+    return validators.validate_email(email)
 
 def sanitize_input(input_string: str) -> str:
     # Use html.escape to replace special characters with their HTML entities
@@ -1,33 +1,157 @@
+import atexit
+import copy
+import itertools
+import json
 import logging
+import queue
 import sys
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener
 from src.core.config import settings
 
 # Create a logger instance
 logger = logging.getLogger(__name__)
 
+# Background listener that writes queued records; created by setup_logger
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatter that renders each record as a single JSON object
+
+    Structured fields are passed as extra={"fields": {...}}. A field whose
+    value is callable is only called here, when the record is actually
+    written, so expensive values cost nothing for filtered-out records.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        # Evaluate lazy structured fields
+        payload.update(evaluate_fields(record))
+
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, default=str)
+
+class TextFormatter(logging.Formatter):
+    """
+    Formatter for plain text lines that appends structured fields as key=value pairs
+
+    Fields are evaluated as by JsonFormatter, so both formats carry the same data.
+    """
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = evaluate_fields(record)
+        if not fields:
+            return message
+        return message + " " + " ".join(f"{key}={json.dumps(value, default=str)}" for key, value in fields.items())
+
+def evaluate_fields(record: logging.LogRecord) -> dict:
+    """Return a record's structured fields, calling the lazy ones"""
+    fields = getattr(record, "fields", None) or {}
+    return {key: value() if callable(value) else value for key, value in fields.items()}
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep one in every `sample_every` INFO records marked extra={"sampled": True}
+
+    Sampling is counted per call site, so a noisy per-document log line does
+    not crowd out a rarer one. Records that are not marked, and every record
+    above INFO, always pass.
+    """
+
+    def __init__(self, sample_every: int):
+        super().__init__()
+        self.sample_every = max(sample_every, 1)
+        self._counters = defaultdict(itertools.count)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_every == 1 or record.levelno != logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return next(self._counters[(record.pathname, record.lineno)]) % self.sample_every == 0
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that interpolates the message and leaves the rest to the writer thread
+
+    The message arguments are rendered in the calling thread, while they still
+    hold the values they were logged with and before they can be changed or
+    shared with the writer. Timestamps, layout and structured fields, whose
+    lazy values are meant to be evaluated only for written records, are
+    formatted by the background writer. When the queue is full the record is
+    dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Copy, as other handlers of the logger may still format the original
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 def setup_logger():
     """
     Set up the logger for the application
-    
+
+    Records are put on a bounded queue and written to stdout by a background
+    thread, so logging calls on request and document-processing paths never
+    wait on I/O.
+
     Returns:
         logging.Logger: Configured logger instance
     """
+    global _listener
+
+    # Configure the logger only once per process
+    if _listener is not None:
+        return logger
+
     # Set the logging level based on the DEBUG setting in config
     log_level = logging.DEBUG if settings.DEBUG else logging.INFO
     logger.setLevel(log_level)
 
-    # Create a StreamHandler for console output
+    # Create a StreamHandler for console output, used by the background writer
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
 
     # Create a Formatter for log messages
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if settings.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     # Set the formatter for the handler
     console_handler.setFormatter(formatter)
 
+    # Put records on a bounded queue; sampling runs before enqueueing so dropped records cost nothing more
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(settings.LOG_INFO_SAMPLE_EVERY))
+
     # Add the handler to the logger
-    logger.addHandler(console_handler)
+    logger.addHandler(queue_handler)
+
+    # Start the background writer and flush it on interpreter exit
+    _listener = QueueListener(queue_handler.queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
 
     # Return the configured logger
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+from src.core.metrics import registry
+from src.utils.logger import logger
+
+# Latency of each document pipeline stage (imap_fetch, classification, ocr, extraction, validation, ...)
+stage_latency = registry.histogram(
+    "mca_pipeline_stage_seconds",
+    "Time spent in each document pipeline stage",
+    label_names=("stage", "outcome"),
+)
+
+# Latency from email receipt to the application and its documents being stored, bucketed around the 5 minute SRS target
+ingestion_latency = registry.histogram(
+    "mca_application_ingestion_seconds",
+    "Time from email receipt to a stored application",
+    buckets=(30.0, 60.0, 120.0, 180.0, 240.0, 300.0, 450.0, 600.0, 900.0, 1800.0, 3600.0),
+)
+
+# Latency from email receipt or upload to a document's extracted data being stored, bucketed around the 5 minute SRS target
+document_processing_latency = registry.histogram(
+    "mca_document_processing_seconds",
+    "Time from email receipt or upload to a document's extracted and validated data",
+    buckets=(30.0, 60.0, 120.0, 180.0, 240.0, 300.0, 450.0, 600.0, 900.0, 1800.0, 3600.0),
+)
+
+class Span:
+    """A timed pipeline stage and the identifiers it applies to"""
+
+    __slots__ = ("stage", "attributes", "start", "duration")
+
+    def __init__(self, stage: str, attributes: Dict[str, Any]):
+        self.stage = stage
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an identifier discovered while the stage runs, e.g. a new application id"""
+        self.attributes[key] = value
+
+# The innermost active span of the current thread or task
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    """Return the innermost active span, if any"""
+    return _current_span.get()
+
+@contextmanager
+def trace_stage(stage: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a pipeline stage and record it in the stage latency histogram
+
+    Identifiers such as application_id and document_id are inherited from
+    the enclosing span, so nested stages carry them without re-passing.
+    A debug log line with the duration and identifiers is emitted when the
+    stage ends.
+
+    Args:
+        stage (str): Name of the stage, used as the histogram label
+        **attributes: Identifiers for the work being timed; None values are ignored
+    """
+    parent = _current_span.get()
+    span_attributes = dict(parent.attributes) if parent is not None else {}
+    span_attributes.update((key, value) for key, value in attributes.items() if value is not None)
+
+    span = Span(stage, span_attributes)
+    token = _current_span.set(span)
+    outcome = "ok"
+    try:
+        yield span
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        span.duration = time.perf_counter() - span.start
+        _current_span.reset(token)
+        stage_latency.observe(span.duration, stage=stage, outcome=outcome)
+        logger.debug(
+            "Pipeline stage completed",
+            extra={"fields": dict(span.attributes, stage=stage, outcome=outcome, duration_ms=span.duration * 1000)},
+        )
+
+def record_application_ingested(received_at: datetime, ingested_at: Optional[datetime] = None) -> None:
+    """
+    Record how long an application took from email receipt to being stored
+
+    Args:
+        received_at (datetime): When the application email was received; naive values are treated as UTC
+        ingested_at (Optional[datetime]): When the application was committed, defaults to now
+    """
+    ingestion_latency.observe(_elapsed(received_at, ingested_at))
+
+def record_document_processed(received_at: datetime, processed_at: Optional[datetime] = None) -> None:
+    """
+    Record how long a document took from email receipt or upload to its extracted data being stored
+
+    Args:
+        received_at (datetime): When the document's email was received or it was uploaded; naive values are treated as UTC
+        processed_at (Optional[datetime]): When its extracted data was committed, defaults to now
+    """
+    document_processing_latency.observe(_elapsed(received_at, processed_at))
+
+def _elapsed(start: datetime, end: Optional[datetime]) -> float:
+    # Seconds between two datetimes, naive ones in UTC, end defaulting to now; never negative
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    end = end or datetime.now(timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return max((end - start).total_seconds(), 0.0)
@@ -0,0 +1,64 @@
+import re
+from typing import Any, Iterable
+import numpy as np
+
+# Patterns are compiled once at import; re.match(pattern_string, ...) looks the
+# compiled pattern up in re's small internal cache on every call instead
+
+# Dot-separated local part and domain labels; the top-level domain has at least two letters
+EMAIL_PATTERN = re.compile(r'[\w+-]+(?:\.[\w+-]+)*@(?:[A-Za-z0-9](?:[A-Za-z0-9-]*[A-Za-z0-9])?\.)+[A-Za-z]{2,}')
+# Dashes are optional but consistent; the SSA never issues area 000, 666 or 9xx, group 00 or serial 0000
+SSN_PATTERN = re.compile(r'(?!000|666|9)\d{3}(-?)(?!00)\d{2}\1(?!0000)\d{4}')
+# Two-digit prefix assigned by an IRS campus, then seven digits
+EIN_PATTERN = re.compile(r'(?!00|07|08|09|17|18|19|28|29|49|69|70|78|79|89|96|97)\d{2}-?\d{7}')
+# 4 to 17 digits, optionally grouped by single dashes or spaces and masked (XXXXXX4567, ****4567)
+ACCOUNT_NUMBER_PATTERN = re.compile(r'(?:[Xx*]{2,}[- ]?)?\d(?:[- ]?\d){3,16}')
+
+def _matches(pattern: 're.Pattern[str]', value: Any) -> bool:
+    return isinstance(value, str) and pattern.fullmatch(value.strip()) is not None
+
+def _matches_all(pattern: 're.Pattern[str]', values: Iterable[Any]) -> np.ndarray:
+    # Bind the matcher once for the whole column
+    fullmatch = pattern.fullmatch
+    values = list(values)
+    return np.fromiter((isinstance(value, str) and fullmatch(value.strip()) is not None for value in values), dtype=bool, count=len(values))
+
+def validate_email(email: Any) -> bool:
+    """Whether a value is a well-formed email address"""
+    return _matches(EMAIL_PATTERN, email)
+
+def validate_ssn(ssn: Any) -> bool:
+    """Whether a value is a Social Security Number the SSA could have issued, with or without dashes"""
+    return _matches(SSN_PATTERN, ssn)
+
+def validate_ein(ein: Any) -> bool:
+    """Whether a value is an Employer Identification Number with an assigned prefix, with or without its dash"""
+    return _matches(EIN_PATTERN, ein)
+
+def validate_account_number(account_number: Any) -> bool:
+    """Whether a value is a bank account number as statements print it, possibly masked"""
+    return _matches(ACCOUNT_NUMBER_PATTERN, account_number)
+
+def validate_emails(emails: Iterable[Any]) -> np.ndarray:
+    """
+    Validate a column of email addresses at once
+
+    Args:
+        emails (Iterable[Any]): The values to check; anything but a string is invalid
+
+    Returns:
+        np.ndarray: One bool per value, usable as a mask over the column
+    """
+    return _matches_all(EMAIL_PATTERN, emails)
+
+def validate_ssns(ssns: Iterable[Any]) -> np.ndarray:
+    """Validate a column of Social Security Numbers at once, one bool per value"""
+    return _matches_all(SSN_PATTERN, ssns)
+
+def validate_eins(eins: Iterable[Any]) -> np.ndarray:
+    """Validate a column of Employer Identification Numbers at once, one bool per value"""
+    return _matches_all(EIN_PATTERN, eins)
+
+def validate_account_numbers(account_numbers: Iterable[Any]) -> np.ndarray:
+    """Validate a column of bank account numbers at once, one bool per value"""
+    return _matches_all(ACCOUNT_NUMBER_PATTERN, account_numbers)
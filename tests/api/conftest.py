@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.application import Application
+from src.api.models.user import User, UserRole
+from src.api.models.webhook import Webhook, WebhookEventType
+from src.core.database import Base
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A SQLite file per test, shared by the test and any TestClient threads
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def db_session(session_factory):
+    with session_factory() as db:
+        yield db
+
+@pytest.fixture
+def mock_user(db_session):
+    user = User(email="underwriter@example.com", hashed_password="not-a-hash", full_name="Test Underwriter", role=UserRole.DATA_ENTRY_SPECIALIST)
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+@pytest.fixture
+def mock_application(db_session):
+    application = Application()
+    application.email_id = f'<{application.id}@example.com>'
+    db_session.add(application)
+    db_session.commit()
+    return application
+
+@pytest.fixture
+def webhook_id(db_session, mock_user):
+    webhook = Webhook(url="https://example.com/webhook", event_type=WebhookEventType.APPLICATION_CREATED, user_id=mock_user.id)
+    db_session.add(webhook)
+    db_session.commit()
+    return webhook.id
@@ -6,8 +6,7 @@ from src.api.models.application import Application
 from src.api.schemas.application_schema import ApplicationCreate, ApplicationUpdate
 from src.api.models.user import User
 
-@pytest.mark.asyncio
-async def test_create_application(db_session: Session, mock_user: User):
+def test_create_application(db_session: Session, mock_user: User):
     # Create a mock ApplicationCreate object
     mock_application_create = ApplicationCreate(
         user_id=mock_user.id,
@@ -17,7 +16,7 @@ async def test_create_application(db_session: Session, mock_user: User):
     )
 
     # Call create_application with the mock object
-    created_application = await create_application(db_session, mock_application_create)
+    created_application = create_application(db_session, mock_application_create)
 
     # Assert that the returned application has the correct attributes
     assert created_application.user_id == mock_user.id
@@ -29,8 +28,7 @@ async def test_create_application(db_session: Session, mock_user: User):
     db_session.refresh(created_application)
     assert db_session.query(Application).filter(Application.id == created_application.id).first() is not None
 
-@pytest.mark.asyncio
-async def test_get_application(db_session: Session, mock_user: User):
+def test_get_application(db_session: Session, mock_user: User):
     # Create a mock Application object and add it to the database session
     mock_application = Application(
         user_id=mock_user.id,
@@ -42,7 +40,7 @@ async def test_get_application(db_session: Session, mock_user: User):
     db_session.commit()
 
     # Call get_application with the mock application's ID
-    retrieved_application = await get_application(db_session, mock_application.id)
+    retrieved_application = get_application(db_session, mock_application.id)
 
     # Assert that the returned application matches the mock application
     assert retrieved_application.id == mock_application.id
@@ -53,10 +51,9 @@ async def test_get_application(db_session: Session, mock_user: User):
 
     # Test with a non-existent ID and assert that it raises an HTTPException
     with pytest.raises(HTTPException):
-        await get_application(db_session, 9999)
+        get_application(db_session, 9999)
 
-@pytest.mark.asyncio
-async def test_get_applications(db_session: Session, mock_user: User):
+def test_get_applications(db_session: Session, mock_user: User):
     # Create multiple mock Application objects and add them to the database session
     mock_applications = [
         Application(user_id=mock_user.id, loan_amount=5000, loan_purpose="Car Loan", credit_score=680),
@@ -67,25 +64,24 @@ async def test_get_applications(db_session: Session, mock_user: User):
     db_session.commit()
 
     # Call get_applications with various skip and limit parameters
-    all_applications = await get_applications(db_session, skip=0, limit=100)
+    all_applications = get_applications(db_session, skip=0, limit=100)
     assert len(all_applications) == 3
 
-    first_two_applications = await get_applications(db_session, skip=0, limit=2)
+    first_two_applications = get_applications(db_session, skip=0, limit=2)
     assert len(first_two_applications) == 2
     assert first_two_applications[0].id == mock_applications[0].id
     assert first_two_applications[1].id == mock_applications[1].id
 
-    last_application = await get_applications(db_session, skip=2, limit=1)
+    last_application = get_applications(db_session, skip=2, limit=1)
     assert len(last_application) == 1
     assert last_application[0].id == mock_applications[2].id
 
     # Test pagination by verifying that different subsets of applications are returned with different skip/limit values
-    second_application = await get_applications(db_session, skip=1, limit=1)
+    second_application = get_applications(db_session, skip=1, limit=1)
     assert len(second_application) == 1
     assert second_application[0].id == mock_applications[1].id
 
-@pytest.mark.asyncio
-async def test_update_application(db_session: Session, mock_user: User):
+def test_update_application(db_session: Session, mock_user: User):
     # Create a mock Application object and add it to the database session
     mock_application = Application(
         user_id=mock_user.id,
@@ -104,7 +100,7 @@ async def test_update_application(db_session: Session, mock_user: User):
     )
 
     # Call update_application with the mock application's ID and the update object
-    updated_application = await update_application(db_session, mock_application.id, mock_application_update)
+    updated_application = update_application(db_session, mock_application.id, mock_application_update)
 
     # Assert that the returned application has the updated attributes
     assert updated_application.id == mock_application.id
@@ -119,4 +115,4 @@ async def test_update_application(db_session: Session, mock_user: User):
 
     # Test with a non-existent ID and assert that it raises an HTTPException
     with pytest.raises(HTTPException):
-        await update_application(db_session, 9999, mock_application_update)
\ No newline at end of file
+        update_application(db_session, 9999, mock_application_update)
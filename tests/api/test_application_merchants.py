@@ -0,0 +1,75 @@
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from src.api.controllers.application_controller import create_application, update_application
+from src.api.models.application import Application, ApplicationStatus
+from src.api.models.merchant import Merchant
+from src.api.models.user import User
+from src.api.models.webhook import WebhookEventType
+from src.api.schemas.application_schema import ApplicationCreate, ApplicationUpdate
+from src.services.merchant_matching import find_candidate_merchants
+
+APPLICATION_FORM = ApplicationCreate(
+    applicant_email='owner@riverside-diner.com',
+    business_name='Riverside Diner, LLC',
+    business_type='Restaurant',
+    requested_amount=50000,
+    purpose_of_funding='Kitchen equipment',
+)
+
+def test_create_application_names_and_indexes_its_merchant(db_session: Session, mock_user: User):
+    with patch('src.api.controllers.application_controller.WebhookService') as webhook_service:
+        response = create_application(application=APPLICATION_FORM, db=db_session, current_user=mock_user)
+
+    # Assert that the merchant was created with the application and can be matched by name
+    merchant = db_session.query(Merchant).one()
+    assert merchant.application_id == str(response.id)
+    assert response.business_name == 'Riverside Diner, LLC'
+    assert [match.application_id for match, _ in find_candidate_merchants(db_session, 'RIVERSIDE DINERS')] == [merchant.application_id]
+    webhook_service.return_value.trigger_webhook.assert_called_once()
+
+def test_create_application_stores_its_form(db_session: Session, mock_user: User):
+    with patch('src.api.controllers.application_controller.WebhookService'):
+        response = create_application(application=APPLICATION_FORM, db=db_session, current_user=mock_user)
+
+    # Assert that every form field is stored and returned
+    application = db_session.get(Application, str(response.id))
+    assert (application.applicant_email, application.business_type, float(application.requested_amount), application.purpose_of_funding) == (
+        'owner@riverside-diner.com', 'Restaurant', 50000.0, 'Kitchen equipment',
+    )
+    assert response.applicant_email == 'owner@riverside-diner.com'
+    assert response.requested_amount == 50000.0
+
+def test_create_application_rejects_an_invalid_form(db_session: Session, mock_user: User):
+    application_create = APPLICATION_FORM.copy(update={'business_name': 'LLC', 'requested_amount': 0})
+
+    with patch('src.api.controllers.application_controller.WebhookService') as webhook_service, pytest.raises(HTTPException) as exc_info:
+        create_application(application=application_create, db=db_session, current_user=mock_user)
+
+    # Assert that nothing was stored or announced
+    assert exc_info.value.status_code == 422
+    assert len(exc_info.value.detail) == 2
+    assert db_session.query(Application).count() == 0
+    webhook_service.return_value.trigger_webhook.assert_not_called()
+
+def test_update_application_renames_its_merchant_and_stores_the_changed_fields(db_session: Session, mock_user: User):
+    with patch('src.api.controllers.application_controller.WebhookService') as webhook_service:
+        created = create_application(application=APPLICATION_FORM, db=db_session, current_user=mock_user)
+        application_update = ApplicationUpdate(business_name='Harbor Grill Inc', requested_amount=75000, status=ApplicationStatus.UNDER_REVIEW)
+        response = update_application(application_id=str(created.id), application_update=application_update, db=db_session, current_user=mock_user)
+
+    # Assert that the merchant was renamed and re-indexed, and that fields left out kept their values
+    assert response.business_name == 'Harbor Grill Inc'
+    assert (response.requested_amount, response.status, response.business_type) == (75000.0, ApplicationStatus.UNDER_REVIEW, 'Restaurant')
+    assert [match.application_id for match, _ in find_candidate_merchants(db_session, 'HARBOR GRILL')] == [str(created.id)]
+    assert find_candidate_merchants(db_session, 'RIVERSIDE DINER') == []
+    assert webhook_service.return_value.trigger_webhook.call_args_list[-1][0][0] == WebhookEventType.APPLICATION_UPDATED
+
+def test_update_application_names_the_merchant_of_an_emailed_application(db_session: Session, mock_user: User, mock_application: Application):
+    with patch('src.api.controllers.application_controller.WebhookService'):
+        response = update_application(application_id=mock_application.id, application_update=ApplicationUpdate(business_name='Riverside Diner'),
+                                      db=db_session, current_user=mock_user)
+
+    assert response.business_name == 'Riverside Diner'
+    assert db_session.query(Merchant).one().application_id == mock_application.id
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import os
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.application import Application
+from src.api.models.document import Document, DocumentType
+from src.api.responses import FILE_CHUNK_SIZE, FileRangeResponse
+from src.api.routes import document_routes
+from src.core.database import Base, get_read_db
+from src.core.security import get_current_user
+from src.services.storage import LocalStorage
+
+CONTENT = os.urandom(3 * FILE_CHUNK_SIZE + 123)
+MD5 = hashlib.md5(CONTENT).hexdigest()
+
+@pytest.fixture
+def document_client(tmp_path):
+    # Store one document locally and serve the document routes over a SQLite database
+    storage = LocalStorage(str(tmp_path / 'documents'))
+    storage.store_stream('documents/statement.pdf', [CONTENT])
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        application = Application()
+        application.email_id = '<statement@example.com>'
+        db.add(application)
+        document = Document(application.id, DocumentType.BANK_STATEMENT, 'statement.pdf', 'documents/statement.pdf', 'application/pdf', len(CONTENT), MD5)
+        db.add(document)
+        db.commit()
+        document_id = document.id
+
+    def get_test_db():
+        with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(document_routes.router, prefix="/documents")
+    app.dependency_overrides[get_read_db] = get_test_db
+    app.dependency_overrides[get_current_user] = lambda: Mock()
+
+    with patch('src.api.controllers.document_controller.get_storage', return_value=storage):
+        yield TestClient(app), f"/documents/{document_id}/content"
+
+def test_full_download_has_validators(document_client):
+    client, url = document_client
+
+    response = client.get(url)
+
+    # Assert that the whole file is returned with its ETag and range support advertised
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers['etag'] == f'"{MD5}"'
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['content-length'] == str(len(CONTENT))
+    assert response.headers['content-type'] == 'application/pdf'
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=-10", len(CONTENT) - 10, len(CONTENT) - 1),
+    (f"bytes={len(CONTENT) - 5}-", len(CONTENT) - 5, len(CONTENT) - 1),
+    (f"bytes=0-{len(CONTENT) * 2}", 0, len(CONTENT) - 1),
+])
+def test_range_request_returns_partial_content(document_client, range_header, start, end):
+    client, url = document_client
+
+    response = client.get(url, headers={'Range': range_header})
+
+    # Assert that only the requested bytes are sent
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers['content-range'] == f'bytes {start}-{end}/{len(CONTENT)}'
+    assert response.headers['content-length'] == str(end - start + 1)
+
+def test_range_beyond_the_end_is_not_satisfiable(document_client):
+    client, url = document_client
+
+    response = client.get(url, headers={'Range': f'bytes={len(CONTENT)}-'})
+
+    assert response.status_code == 416
+    assert response.headers['content-range'] == f'bytes */{len(CONTENT)}'
+
+def test_matching_if_none_match_returns_not_modified(document_client):
+    client, url = document_client
+
+    response = client.get(url, headers={'If-None-Match': f'"other", W/"{MD5}"'})
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == f'"{MD5}"'
+
+def test_stale_if_range_returns_the_whole_file(document_client):
+    client, url = document_client
+
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_object_store_documents_redirect_to_a_presigned_url(document_client):
+    client, url = document_client
+    storage = Mock()
+    storage.presigned_url.return_value = 'https://bucket.s3.amazonaws.com/documents/statement.pdf?X-Amz-Signature=abc'
+
+    with patch('src.api.controllers.document_controller.get_storage', return_value=storage):
+        response = client.get(url, allow_redirects=False)
+
+    # Assert that the client is sent to the object store, which serves ranges itself
+    assert response.status_code == 307
+    assert response.headers['location'] == storage.presigned_url.return_value
+    storage.presigned_url.assert_called_once_with('documents/statement.pdf', filename='statement.pdf')
+
+def test_unknown_document_is_not_found(document_client):
+    client, _ = document_client
+
+    assert client.get('/documents/missing/content').status_code == 404
+
+def _send_response(response, scope):
+    # Run an ASGI response and collect the messages it sends
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response(scope, None, send))
+    return messages
+
+def test_file_range_response_uses_zerocopy_when_the_server_supports_it(tmp_path):
+    path = tmp_path / 'statement.pdf'
+    path.write_bytes(CONTENT)
+
+    messages = _send_response(FileRangeResponse(str(path), 100, 1099, status_code=206), {'type': 'http', 'extensions': {'http.response.zerocopy': {}}})
+
+    # Assert that the server is asked to send the range from the file descriptor
+    assert messages[1]['type'] == 'http.response.zerocopy'
+    assert (messages[1]['offset'], messages[1]['count']) == (100, 1000)
+
+def test_file_range_response_streams_in_bounded_chunks(tmp_path):
+    path = tmp_path / 'statement.pdf'
+    path.write_bytes(CONTENT)
+
+    messages = _send_response(FileRangeResponse(str(path), 0, len(CONTENT) - 1), {'type': 'http'})
+
+    # Assert that the body is sent in pieces of at most FILE_CHUNK_SIZE
+    bodies = [message['body'] for message in messages[1:]]
+    assert b''.join(bodies) == CONTENT
+    assert max(len(body) for body in bodies) == FILE_CHUNK_SIZE
+    assert messages[-1]['more_body'] is False
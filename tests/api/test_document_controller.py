@@ -10,8 +10,7 @@ from src.services.ocr_engine import OCREngine
 from src.services.data_extractor import DataExtractor
 from src.utils.helpers import save_upload_file
 
-@pytest.mark.asyncio
-async def test_upload_document(db_session: Session, mock_user: User, mock_application: Application):
+def test_upload_document(db_session: Session, mock_user: User, mock_application: Application):
     # Create a mock UploadFile object
     mock_file = UploadFile(filename="test_document.pdf", file=b"test content")
 
@@ -30,7 +29,7 @@ async def test_upload_document(db_session: Session, mock_user: User, mock_applic
     mock_extractor.extract_data.return_value = {"key": "value"}
 
     # Call upload_document with the mock file and application ID
-    result = await upload_document(db_session, mock_file, mock_application.id, mock_user.id,
+    result = upload_document(db_session, mock_file, mock_application.id, mock_user.id,
                                    mock_classifier, mock_ocr, mock_extractor)
 
     # Assert that the returned document has the correct attributes
@@ -49,15 +48,14 @@ async def test_upload_document(db_session: Session, mock_user: User, mock_applic
     mock_ocr.extract_text.assert_called_once_with(mock_file_path)
     mock_extractor.extract_data.assert_called_once_with("Extracted text from document")
 
-@pytest.mark.asyncio
-async def test_get_document(db_session: Session, mock_user: User):
+def test_get_document(db_session: Session, mock_user: User):
     # Create a mock Document object and add it to the database session
     mock_document = Document(id=1, filename="test_document.pdf", file_path="/tmp/test_document.pdf",
                              document_type="ID_PROOF", application_id=1, uploaded_by=mock_user.id)
     db_session.query.return_value.filter.return_value.first.return_value = mock_document
 
     # Call get_document with the mock document's ID
-    result = await get_document(db_session, 1)
+    result = get_document(db_session, 1)
 
     # Assert that the returned document matches the mock document
     assert result == mock_document
@@ -65,12 +63,11 @@ async def test_get_document(db_session: Session, mock_user: User):
     # Test with a non-existent ID and assert that it raises an HTTPException
     db_session.query.return_value.filter.return_value.first.return_value = None
     with pytest.raises(HTTPException) as exc_info:
-        await get_document(db_session, 999)
+        get_document(db_session, 999)
     assert exc_info.value.status_code == 404
     assert str(exc_info.value.detail) == "Document not found"
 
-@pytest.mark.asyncio
-async def test_get_application_documents(db_session: Session, mock_user: User, mock_application: Application):
+def test_get_application_documents(db_session: Session, mock_user: User, mock_application: Application):
     # Create multiple mock Document objects associated with the mock application and add them to the database session
     mock_documents = [
         Document(id=1, filename="doc1.pdf", file_path="/tmp/doc1.pdf", document_type="ID_PROOF",
@@ -81,7 +78,7 @@ async def test_get_application_documents(db_session: Session, mock_user: User, m
     db_session.query.return_value.filter.return_value.all.return_value = mock_documents
 
     # Call get_application_documents with the mock application's ID
-    result = await get_application_documents(db_session, mock_application.id)
+    result = get_application_documents(db_session, mock_application.id)
 
     # Assert that the returned list of documents has the correct length and content
     assert len(result) == 2
@@ -93,5 +90,5 @@ async def test_get_application_documents(db_session: Session, mock_user: User, m
 
     # Test with a non-existent application ID and assert that it returns an empty list
     db_session.query.return_value.filter.return_value.all.return_value = []
-    result = await get_application_documents(db_session, 999)
-    assert result == []
\ No newline at end of file
+    result = get_application_documents(db_session, 999)
+    assert result == []
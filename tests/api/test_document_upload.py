@@ -0,0 +1,93 @@
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.models.application import Application
+from src.api.models.document import Document, DocumentType, application_documents
+from src.api.models.extraction_job import ExtractionJob
+from src.api.routes import document_routes
+from src.core.config import settings
+from src.core.database import get_db
+from src.core.security import get_current_user
+from src.services.storage import LocalStorage
+
+TAX_RETURN = ('return.pdf', b'%PDF-1.4 tax return', 'application/pdf')
+
+@pytest.fixture
+def upload_app(tmp_path, session_factory):
+    def get_test_db():
+        with session_factory() as db:
+            yield db
+
+    # Serve the document routes over the test database
+    app = FastAPI()
+    app.include_router(document_routes.router, prefix="/documents")
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_current_user] = lambda: Mock()
+
+    # Classify every upload as a tax return
+    (tmp_path / 'uploads').mkdir()
+    storage = LocalStorage(str(tmp_path / 'documents'))
+    with patch.object(settings, 'TEMP_UPLOAD_DIR', str(tmp_path / 'uploads')), \
+         patch('src.api.controllers.document_controller.get_storage', return_value=storage), \
+         patch('src.api.controllers.document_controller.DocumentClassifier') as classifier:
+        classifier.return_value.classify_document.return_value = DocumentType.TAX_RETURN
+        yield app
+
+def _stored_files(tmp_path):
+    return [path for path in (tmp_path / 'documents').rglob('*') if path.is_file()]
+
+def test_upload_document_is_stored_and_queued_for_extraction(upload_app, session_factory, mock_application: Application, tmp_path):
+    client = TestClient(upload_app)
+
+    response = client.post('/documents/', params={'application_id': mock_application.id}, files={'file': TAX_RETURN})
+
+    # Assert that the document was stored and queued, without extracting it in the request
+    assert response.status_code == 200
+    document_id = response.json()['id']
+    with session_factory() as db:
+        assert db.get(Document, document_id).extracted_data is None
+        assert [job.document_id for job in db.query(ExtractionJob)] == [document_id]
+    assert len(_stored_files(tmp_path)) == 1
+    assert list((tmp_path / 'uploads').iterdir()) == []
+
+    # Assert that uploading the same file for another application links it without storing or queueing it again
+    with session_factory() as db:
+        other = Application()
+        other.email_id = '<other@example.com>'
+        db.add(other)
+        db.commit()
+        other_id = other.id
+    response = client.post('/documents/', params={'application_id': other_id}, files={'file': ('copy.pdf',) + TAX_RETURN[1:]})
+    assert response.json()['id'] == document_id
+    with session_factory() as db:
+        assert db.query(ExtractionJob).count() == 1
+        assert db.execute(application_documents.select()).fetchall() == [(other_id, document_id)]
+    assert len(_stored_files(tmp_path)) == 1
+
+def test_upload_needs_an_existing_application(upload_app, session_factory, tmp_path):
+    client = TestClient(upload_app)
+
+    # Assert that a missing application_id is rejected by validation and an unknown one is not found
+    assert client.post('/documents/', files={'file': TAX_RETURN}).status_code == 422
+    response = client.post('/documents/', params={'application_id': 'missing'}, files={'file': TAX_RETURN})
+    assert (response.status_code, response.json()['detail']) == (404, 'Application not found')
+    with session_factory() as db:
+        assert db.query(Document).count() == 0
+    assert _stored_files(tmp_path) == []
+
+def test_stored_file_is_removed_when_the_commit_fails(upload_app, session_factory, mock_application: Application, tmp_path):
+    def get_failing_db():
+        with session_factory() as db:
+            db.commit = Mock(side_effect=RuntimeError('connection lost'))
+            yield db
+    upload_app.dependency_overrides[get_db] = get_failing_db
+
+    with pytest.raises(RuntimeError):
+        TestClient(upload_app).post('/documents/', params={'application_id': mock_application.id}, files={'file': TAX_RETURN})
+
+    # Assert that neither the document nor its stored file outlived the failed transaction
+    with session_factory() as db:
+        assert db.query(Document).count() == 0
+    assert _stored_files(tmp_path) == []
+    assert list((tmp_path / 'uploads').iterdir()) == []
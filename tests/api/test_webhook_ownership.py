@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from src.api.controllers.webhook_controller import create_webhook, delete_webhook, get_webhook, get_webhooks, update_webhook
+from src.api.models.user import User, UserRole
+from src.api.models.webhook import Webhook, WebhookEventType
+from src.api.schemas.webhook_schema import WebhookCreate, WebhookUpdate
+
+@pytest.fixture
+def other_user(db_session: Session):
+    user = User(email="other@example.com", hashed_password="not-a-hash", full_name="Other User", role=UserRole.API_USER)
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+def test_create_webhook_is_owned_by_the_current_user(db_session: Session, mock_user: User):
+    webhook_create = WebhookCreate(url="https://example.com/hooks/new", event_type=WebhookEventType.APPLICATION_CREATED)
+
+    created_webhook = create_webhook(webhook=webhook_create, db=db_session, current_user=mock_user)
+
+    assert created_webhook.user_id == mock_user.id
+    assert [webhook.id for webhook in get_webhooks(skip=0, limit=100, db=db_session, current_user=mock_user)] == [created_webhook.id]
+
+def test_other_users_webhooks_are_not_found(db_session: Session, mock_user: User, other_user: User, webhook_id: str):
+    # Assert that another user can neither list, read, change nor delete the webhook
+    assert get_webhooks(skip=0, limit=100, db=db_session, current_user=other_user) == []
+    for call in (
+        lambda: get_webhook(webhook_id=webhook_id, db=db_session, current_user=other_user),
+        lambda: update_webhook(webhook_id=webhook_id, webhook_update=WebhookUpdate(is_active=False), db=db_session, current_user=other_user),
+        lambda: delete_webhook(webhook_id=webhook_id, db=db_session, current_user=other_user),
+    ):
+        with pytest.raises(HTTPException) as exc_info:
+            call()
+        assert exc_info.value.status_code == 404
+
+    # Assert that the owner still has it, unchanged
+    webhook = get_webhook(webhook_id=webhook_id, db=db_session, current_user=mock_user)
+    assert webhook.is_active
+    assert db_session.query(Webhook).count() == 1
@@ -0,0 +1,97 @@
+"""
+Field extraction throughput
+
+Extracts every field of synthetic documents and reports fields resolved per
+second (each table cell counts as a field) for:
+
+* naive:    one regular expression search of the text per field label
+* compiled: the compiled templates, from text alone (one scan per document)
+* ocr:      the compiled templates from a full OCR result, where form data
+            and tables answer most fields without touching the text
+
+Usage:
+    python -m tests.benchmarks.bench_extraction --documents 2000 --pages 3 --transactions 40
+"""
+import argparse
+import re
+import time
+from src.services.extraction_templates import compiled_template
+from src.services.ocr_engine import OCREngine
+from tests.benchmarks.synthetic import DOCUMENT_KINDS, generate_documents
+
+def _ocr_result(document):
+    # What OCREngine.perform_ocr returns for the document, without calling Textract
+    response = document.textract_response
+    return {
+        'full_text': OCREngine.extract_text(None, response),
+        'form_data': OCREngine.extract_form_data(None, response),
+        'tables': OCREngine.extract_tables(None, response),
+    }
+
+def _extract_naive(kind, text):
+    # Search the whole text again for every label of every field, then match every line against each row pattern
+    template = compiled_template(kind).template
+    result = {}
+    for field in template.fields:
+        result[field.name] = None
+        for alias in field.aliases:
+            match = re.search(rf'(?<!\w){re.escape(alias)}(?!\w)[ \t]*:?[ \t]*({field.value})', text, re.IGNORECASE)
+            if match:
+                result[field.name] = match.group(1).strip()
+                break
+    for table in template.tables:
+        result[table.name] = []
+        if table.row:
+            for line in text.split('\n'):
+                match = re.match(rf'[ \t]*{table.row}', line)
+                if match:
+                    result[table.name].append({column: match.groupdict().get(column) for column in table.columns})
+    return result
+
+def _count_fields(result):
+    # Scalar fields plus every cell of the repeating ones
+    fields = 0
+    for value in result.values():
+        if isinstance(value, list):
+            fields += sum(cell is not None for row in value for cell in row.values())
+        elif isinstance(value, dict):
+            fields += 2 * len(value)
+        elif value is not None:
+            fields += 1
+    return fields
+
+def _run(extract, inputs):
+    start = time.perf_counter()
+    fields = 0
+    for kind, ocr_input in inputs:
+        fields += _count_fields(extract(kind, ocr_input))
+    return fields, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--transactions", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    documents = generate_documents(args.documents, {kind: 1.0 for kind in DOCUMENT_KINDS}, args.pages, args.transactions, args.seed)
+    ocr_results = [(document.kind, _ocr_result(document)) for document in documents]
+    texts = [(kind, ocr_result['full_text']) for kind, ocr_result in ocr_results]
+
+    # Compile the templates before timing
+    for kind in DOCUMENT_KINDS:
+        compiled_template(kind)
+
+    runs = {
+        "naive": _run(_extract_naive, texts),
+        "compiled": _run(lambda kind, text: compiled_template(kind).extract(text), texts),
+        "ocr": _run(lambda kind, ocr_result: compiled_template(kind).extract(ocr_result), ocr_results),
+    }
+
+    print(f"documents:            {args.documents}")
+    for name, (fields, seconds) in runs.items():
+        print(f"{name + ':':<21} {fields / seconds:,.0f} fields/s ({fields} fields in {seconds:.2f} s)")
+
+if __name__ == "__main__":
+    main()
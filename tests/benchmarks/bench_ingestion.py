@@ -0,0 +1,84 @@
+"""
+Persisting a backlog of emails, one transaction per email vs batches
+
+Ingests synthetic parsed emails, each with a few small attachments, first
+one email per transaction (EmailIngestor.ingest) and then in batches of
+--batch-size (EmailIngestor.ingest_batch), and reports emails per second.
+Classification is replaced by a fixed document type. OCR and extraction
+are not part of ingestion: new documents are only queued for the
+extraction workers, in the same transaction, so storage and database
+writes, queue rows included, are what is timed. Runs against a SQLite file, so every commit is
+an fsync, unless --database-url points at a scratch database; the tables
+are created and dropped.
+
+Usage:
+    python -m tests.benchmarks.bench_ingestion --emails 2000 --batch-size 50
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.document import DocumentType
+from src.core.database import Base
+from src.services.email_processor import EmailIngestor
+from src.services.storage import LocalStorage
+from src.services.streaming_mime_parser import StreamedAttachment
+
+class _FixedClassifier:
+    def classify_document(self, file_path, metadata):
+        return DocumentType.BANK_STATEMENT
+
+def _emails(directory, count, attachments, prefix):
+    emails = []
+    for index in range(count):
+        parsed = []
+        for number in range(attachments):
+            content = f"%PDF-1.4 {prefix} {index} {number}".encode()
+            path = os.path.join(directory, f"{prefix}-{index}-{number}.part")
+            with open(path, 'wb') as file:
+                file.write(content)
+            parsed.append(StreamedAttachment(f"{number}.pdf", 'application/pdf', path, len(content), hashlib.md5(content).hexdigest()))
+        emails.append({'message_id': f'<{prefix}-{index}@example.com>', 'subject': 'Funding application', 'date': None, 'attachments': parsed})
+    return emails
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--attachments", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(args.database_url or f"sqlite:///{os.path.join(workdir, 'ingest.db')}")
+        Base.metadata.create_all(engine)
+        try:
+            with patch('src.services.email_processor.SessionLocal', sessionmaker(bind=engine)):
+                ingestor = EmailIngestor.__new__(EmailIngestor)
+                ingestor.document_classifier = _FixedClassifier()
+                ingestor.storage = LocalStorage(os.path.join(workdir, 'documents'))
+
+                emails = _emails(workdir, args.emails, args.attachments, 'single')
+                start = time.perf_counter()
+                for email_data in emails:
+                    ingestor.ingest(email_data)
+                single = args.emails / (time.perf_counter() - start)
+
+                emails = _emails(workdir, args.emails, args.attachments, 'batch')
+                start = time.perf_counter()
+                for offset in range(0, len(emails), args.batch_size):
+                    ingestor.ingest_batch(emails[offset:offset + args.batch_size])
+                batched = args.emails / (time.perf_counter() - start)
+
+            print(f"emails:               {args.emails} with {args.attachments} attachments each")
+            print(f"one per transaction:  {single:.0f} emails/s")
+            print(f"{f'batches of {args.batch_size}:':<22}{batched:.0f} emails/s ({batched / single:.1f}x)")
+        finally:
+            Base.metadata.drop_all(engine)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Logging overhead per processed document
+
+Replays the log calls one document makes through the pipeline (classify,
+OCR, extract, validate) and reports the time spent in logging per
+document, measured on the processing thread:
+
+* sync:     the previous setup - eager f-strings and a synchronous StreamHandler
+* pipeline: the queue-based handler with lazy arguments and JSON output
+
+Usage:
+    python -m tests.benchmarks.bench_logging --documents 20000 --transactions 500
+"""
+import argparse
+import logging
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+from src.utils.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+def _validation_results(transactions: int) -> dict:
+    # A validation result the size of a busy bank statement
+    return {
+        "errors": [f"Invalid amount in transaction {i}" for i in range(transactions // 10)],
+        "warnings": [f"Unusual description in transaction {i}" for i in range(transactions // 5)],
+    }
+
+def _log_document_sync(bench_logger, file_path, results):
+    bench_logger.info(f"Classified document {file_path} as BANK_STATEMENT")
+    bench_logger.info(f"OCR completed for file: {file_path}")
+    bench_logger.info(f"Data extracted from bank_statement: {file_path}")
+    bench_logger.info(f"Validated data for document type: bank_statement")
+    bench_logger.debug(f"Validation results: {results}")
+
+def _log_document_pipeline(bench_logger, file_path, results):
+    bench_logger.info("Classified document %s as %s", file_path, "BANK_STATEMENT", extra={"sampled": True})
+    bench_logger.info("OCR completed for file: %s", file_path, extra={"sampled": True})
+    bench_logger.info("Data extracted from %s: %s", "bank_statement", file_path, extra={"sampled": True})
+    bench_logger.info("Validated data for document type: %s", "bank_statement", extra={"sampled": True})
+    bench_logger.debug("Validation results", extra={"fields": {"validation_results": results}})
+
+def _run(name, log_document, handler, documents, results):
+    # Use a dedicated logger so the benchmark does not touch application handlers
+    bench_logger = logging.getLogger(f"bench.{name}")
+    bench_logger.handlers = [handler]
+    bench_logger.setLevel(logging.INFO)
+    bench_logger.propagate = False
+
+    start = time.perf_counter()
+    for i in range(documents):
+        log_document(bench_logger, f"/tmp/statement-{i}.pdf", results)
+    return (time.perf_counter() - start) / documents * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--sample-every", type=int, default=1)
+    args = parser.parse_args()
+
+    results = _validation_results(args.transactions)
+
+    with tempfile.TemporaryFile("w") as sync_sink, tempfile.TemporaryFile("w") as pipeline_sink:
+        # Previous setup: formatting and the write happen on the calling thread
+        sync_handler = logging.StreamHandler(sync_sink)
+        sync_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        sync_us = _run("sync", _log_document_sync, sync_handler, args.documents, results)
+
+        # New setup: the calling thread only enqueues; a listener formats and writes
+        writer = logging.StreamHandler(pipeline_sink)
+        writer.setFormatter(JsonFormatter())
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=args.documents * 5))
+        queue_handler.addFilter(SamplingFilter(args.sample_every))
+        listener = QueueListener(queue_handler.queue, writer)
+        listener.start()
+        pipeline_us = _run("pipeline", _log_document_pipeline, queue_handler, args.documents, results)
+        drain_start = time.perf_counter()
+        listener.stop()
+        drain_seconds = time.perf_counter() - drain_start
+
+    print(f"documents:                 {args.documents}")
+    print(f"sync logging per doc:      {sync_us:.1f} us")
+    print(f"pipeline logging per doc:  {pipeline_us:.1f} us")
+    print(f"writer drain after run:    {drain_seconds:.2f} s")
+    print(f"records dropped:           {queue_handler.dropped}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Login throughput benchmark for password hashing
+
+Measures how many password verifications per second the hashing executor
+sustains under concurrent logins, and how long the event loop stalls while
+async handlers verify passwords through it versus verifying inline.
+
+Usage:
+    python -m tests.benchmarks.bench_login --logins 200 --concurrency 16 --rounds 12
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.core import security
+
+def _percentile(samples, fraction):
+    # Nearest-rank percentile over an unsorted list of samples
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def bench_throughput(hashed_password: str, logins: int, concurrency: int) -> dict:
+    """Run logins concurrently from `concurrency` client threads and report logins/sec"""
+    latencies = []
+
+    def login():
+        start = time.perf_counter()
+        valid, _ = security.verify_and_update_password("correct horse battery staple", hashed_password)
+        latencies.append(time.perf_counter() - start)
+        return valid
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        results = list(clients.map(lambda _: login(), range(logins)))
+    elapsed = time.perf_counter() - start
+
+    assert all(results)
+    return {
+        "logins_per_second": logins / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+    }
+
+async def _measure_loop_lag(verify, hashed_password: str, logins: int) -> float:
+    # Tick every millisecond and record the worst delay while the logins run
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    ticker_task = asyncio.ensure_future(ticker())
+    await asyncio.gather(*(verify("correct horse battery staple", hashed_password) for _ in range(logins)))
+    done.set()
+    await ticker_task
+    return max(lags) * 1000 if lags else 0.0
+
+def bench_event_loop_lag(hashed_password: str, logins: int) -> dict:
+    """Compare worst event-loop stall for inline verification versus the hashing executor"""
+    async def inline_verify(plain, hashed):
+        return security.pwd_context.verify(plain, hashed)
+
+    loop = asyncio.new_event_loop()
+    try:
+        inline_lag = loop.run_until_complete(_measure_loop_lag(inline_verify, hashed_password, logins))
+        offloaded_lag = loop.run_until_complete(_measure_loop_lag(security.verify_password_async, hashed_password, logins))
+    finally:
+        loop.close()
+    return {"inline_max_lag_ms": inline_lag, "offloaded_max_lag_ms": offloaded_lag}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=security.settings.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+
+    # Configure the cost factor and hash the benchmark password with it
+    security.pwd_context.update(bcrypt__rounds=args.rounds)
+    hashed_password = security.pwd_context.hash("correct horse battery staple")
+    start = time.perf_counter()
+    security.pwd_context.verify("correct horse battery staple", hashed_password)
+    single_ms = (time.perf_counter() - start) * 1000
+
+    throughput = bench_throughput(hashed_password, args.logins, args.concurrency)
+    lag = bench_event_loop_lag(hashed_password, min(args.logins, 4 * security.settings.PASSWORD_HASH_WORKERS))
+
+    print(f"bcrypt rounds:              {args.rounds}")
+    print(f"hash workers:               {security.settings.PASSWORD_HASH_WORKERS}")
+    print(f"single verify:              {single_ms:.1f} ms")
+    print(f"logins/sec ({args.concurrency} clients):   {throughput['logins_per_second']:.1f}")
+    print(f"login latency p50 / p95:    {throughput['p50_ms']:.1f} / {throughput['p95_ms']:.1f} ms")
+    print(f"event loop max lag inline:  {lag['inline_max_lag_ms']:.1f} ms")
+    print(f"event loop max lag offload: {lag['offloaded_max_lag_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
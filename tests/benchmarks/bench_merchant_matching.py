@@ -0,0 +1,86 @@
+"""
+Fuzzy merchant name lookups
+
+Indexes synthetic merchant names and compares finding the merchants similar
+to a name through the name band index with comparing the name to every
+stored merchant. Runs against an in-memory SQLite database unless
+--database-url points at a scratch database; the tables are created and
+dropped.
+
+Usage:
+    python -m tests.benchmarks.bench_merchant_matching --merchants 100000 --lookups 200
+"""
+import argparse
+import random
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+# Registers the applications table the merchants refer to
+from src.api.models.application import Application
+from src.api.models.merchant import Merchant, MerchantNameBand
+from src.core.config import settings
+from src.services.merchant_matching import band_values, find_candidate_merchants, name_trigrams, similarity
+
+WORDS = (
+    'RIVERSIDE', 'LAKESIDE', 'MOUNTAIN', 'GOLDEN', 'SUNRISE', 'MAIN', 'STREET', 'CITY', 'EXPRESS', 'FAMILY',
+    'DINER', 'GRILL', 'BAKERY', 'AUTO', 'REPAIR', 'SALON', 'PLUMBING', 'DENTAL', 'FITNESS', 'MARKET',
+)
+
+def _name(random_state):
+    words = [random_state.choice(WORDS) for _ in range(random_state.randint(2, 4))]
+    return ' '.join(words) + f" {random_state.randint(1, 9999)}"
+
+def _typo(random_state, name):
+    index = random_state.randrange(len(name))
+    return name[:index] + name[index + 1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--merchants", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    random_state = random.Random(7)
+    names = [_name(random_state) for _ in range(args.merchants)]
+    engine = create_engine(args.database_url)
+    tables = [Merchant.__table__, MerchantNameBand.__table__]
+    for table in tables:
+        table.create(engine, checkfirst=True)
+    try:
+        with Session(engine) as db:
+            start = time.perf_counter()
+            merchants = [Merchant(f"app-{index}", name, name) for index, name in enumerate(names)]
+            db.bulk_save_objects(merchants)
+            db.execute(MerchantNameBand.__table__.insert(), [
+                {'merchant_id': merchant.id, 'band': band, 'value': value}
+                for merchant in merchants for band, value in enumerate(band_values(name_trigrams(merchant.normalized_name)))
+            ])
+            db.commit()
+            print(f"merchants:            {len(merchants)}")
+            print(f"index build:          {(time.perf_counter() - start) * 1000 / len(merchants):.3f} ms per merchant")
+
+            queries = [_typo(random_state, random_state.choice(names)) for _ in range(args.lookups)]
+            start = time.perf_counter()
+            found = [find_candidate_merchants(db, query) for query in queries]
+            print(f"band index lookup:    {(time.perf_counter() - start) * 1000 / len(queries):.2f} ms")
+
+            # The full comparison the index replaces, on fewer lookups
+            stored = [(merchant.normalized_name, name_trigrams(merchant.normalized_name)) for merchant in merchants]
+            sample = queries[:max(1, len(queries) // 20)]
+            start = time.perf_counter()
+            expected = []
+            for query in sample:
+                trigrams = name_trigrams(query)
+                expected.append({name for name, other in stored if similarity(trigrams, other) >= settings.MERCHANT_MATCH_THRESHOLD})
+            print(f"full comparison:      {(time.perf_counter() - start) * 1000 / len(sample):.2f} ms")
+
+            # Share of the expected matches the index returned (it returns at most MERCHANT_MATCH_LIMIT)
+            recalled = sum(len({merchant.normalized_name for merchant, _ in matches} & names) for matches, names in zip(found, expected))
+            print(f"recall:               {recalled / max(1, sum(min(len(names), settings.MERCHANT_MATCH_LIMIT) for names in expected)):.3f}")
+    finally:
+        for table in reversed(tables):
+            table.drop(engine)
+
+if __name__ == "__main__":
+    main()
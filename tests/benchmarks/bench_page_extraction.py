@@ -0,0 +1,61 @@
+"""
+Page-parallel extraction of long bank statements
+
+Extracts a synthetic multi-page statement serially (template.extract) and
+with extract_by_page over 1, 2, 4... worker processes, and reports the wall
+time of each. Speedups need as many free cores as workers; on a single core
+the worker runs show the cost of shipping pages to other processes.
+
+Usage:
+    python -m tests.benchmarks.bench_page_extraction --pages 60 --transactions 80 --workers 1 2 4
+"""
+import argparse
+import time
+from unittest.mock import patch
+from src.core.config import settings
+from src.services import page_extraction
+from src.services.extraction_templates import compiled_template
+from src.services.ocr_engine import OCREngine
+from tests.benchmarks.synthetic import generate_documents
+
+def _time(function, repeat):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--transactions", type=int, default=80)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    # Parse the Textract response the way OCREngine does, without calling Textract
+    document = generate_documents(1, {"bank_statement": 1.0}, args.pages, args.transactions)[0]
+    ocr_engine = OCREngine.__new__(OCREngine)
+    response = document.textract_response
+    ocr_result = {
+        'full_text': ocr_engine.extract_text(response),
+        'form_data': ocr_engine.extract_form_data(response),
+        'tables': ocr_engine.extract_tables(response),
+        'pages': ocr_engine.extract_pages(response),
+    }
+    template = compiled_template("bank_statement")
+
+    print(f"pages:                {args.pages}")
+    print(f"transactions:         {args.pages * args.transactions}")
+    print(f"serial:               {_time(lambda: template.extract(ocr_result), args.repeat):.1f} ms")
+    for workers in args.workers:
+        with patch.object(settings, 'EXTRACTION_WORKERS', workers), patch.object(settings, 'EXTRACTION_PARALLEL_MIN_PAGES', 2 if workers > 1 else args.pages + 1):
+            # A fresh pool per worker count; its start-up is excluded by the warm-up run
+            page_extraction._executor = None
+            elapsed = _time(lambda: page_extraction.extract_by_page(template, ocr_result), args.repeat)
+            if page_extraction._executor is not None:
+                page_extraction._executor.shutdown()
+        print(f"{workers} worker(s):{'':<10} {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
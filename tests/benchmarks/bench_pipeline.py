@@ -0,0 +1,282 @@
+"""
+End-to-end document pipeline benchmark
+
+Generates synthetic bank statements, tax returns and business licenses
+(see tests/benchmarks/synthetic.py) and drives each one through
+DocumentClassifier, OCREngine, DataExtractor, DataValidator and
+WebhookService, the same sequence a document takes after it is pulled
+from the mailbox. Textract is replaced by a client that returns the
+pre-generated AnalyzeDocument response, so OCR time is response parsing
+only. Webhooks are delivered over HTTP to a local sink backed by an
+in-memory SQLite webhook table.
+
+Reports docs/sec, p50/p95/p99 per stage, stage failures and peak RSS.
+Failures are counted and the document continues to the next stage, so
+unimplemented helpers show up in the report instead of aborting the run.
+
+Usage:
+    python -m tests.benchmarks.bench_pipeline --documents 500 --pages 3 --transactions-per-page 40
+    python -m tests.benchmarks.bench_pipeline --save-baseline tests/benchmarks/baselines/pipeline.json
+    python -m tests.benchmarks.bench_pipeline --baseline tests/benchmarks/baselines/pipeline.json --tolerance 0.2
+
+With --baseline the exit status is 1 when throughput, a stage p95 or peak
+RSS regresses by more than the tolerance. Baselines are only comparable
+when recorded with the same options on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.api.models.document import DocumentType
+from src.api.models.user import User, UserRole
+from src.api.models.webhook import Webhook
+from src.services.data_extractor import DataExtractor
+from src.services.data_validator import DataValidator
+from src.services.document_classifier import DocumentClassifier
+from src.services.webhook_service import WebhookService
+from tests.benchmarks.synthetic import DOCUMENT_KINDS, generate_documents
+
+STAGES = ("classification", "ocr", "extraction", "validation", "webhook_delivery", "total")
+WEBHOOK_EVENT = "DOCUMENT_UPLOADED"
+
+def _percentile(samples, fraction):
+    # Nearest-rank percentile over an unsorted list of samples
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in DOCUMENT_KINDS:
+            raise argparse.ArgumentTypeError(f"unknown document kind {kind!r}, expected one of {', '.join(DOCUMENT_KINDS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+class _FakeTextract:
+    # Returns the pre-generated AnalyzeDocument response for the uploaded bytes
+    def __init__(self, responses):
+        self.responses = responses
+
+    def analyze_document(self, Document, FeatureTypes):
+        return self.responses[Document["Bytes"]]
+
+class _WebhookSink(BaseHTTPRequestHandler):
+    # Accepts every delivery with 204 and counts it
+    deliveries = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            type(self).deliveries += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class _StageTimer:
+    # Collects per-stage latency samples and failures
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.first_error = {}
+
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self.errors[stage] += 1
+            self.first_error.setdefault(stage, f"{type(e).__name__}: {e}")
+            return None
+        finally:
+            self.samples[stage].append(time.perf_counter() - start)
+
+def _build_pipeline(documents, workdir: Path, webhook_count: int):
+    # Write the documents and map each file's bytes to its Textract response
+    responses = {}
+    for document in documents:
+        path = workdir / document.file_name
+        path.write_text(document.text, encoding="utf-8")
+        responses[path.read_bytes()] = document.textract_response
+
+    extractor = DataExtractor()
+    extractor.ocr_engine.textract_client = _FakeTextract(responses)
+
+    # Register webhooks pointing at a local HTTP sink
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _WebhookSink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    User.__table__.create(engine)
+    Webhook.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    owner = User(email="bench@example.com", hashed_password="", full_name="Benchmark", role=UserRole.API_USER)
+    session.add(owner)
+    for _ in range(webhook_count):
+        session.add(Webhook(url=f"http://127.0.0.1:{server.server_port}/hook", event_type=WEBHOOK_EVENT, user_id=owner.id))
+    session.commit()
+
+    return DocumentClassifier(), extractor, DataValidator(), WebhookService(), session, server
+
+def _process(document, path: Path, classifier, extractor, validator, webhook_service, session, timer: _StageTimer):
+    # Run one document through every stage, timing OCR separately from the extraction around it
+    document_start = time.perf_counter()
+    document_type = timer.run("classification", classifier.classify_document, path, {"file_name": path.name, "file_size": path.stat().st_size})
+
+    perform_ocr = extractor.ocr_engine.perform_ocr
+    ocr_seconds = []
+
+    def timed_ocr(file_path):
+        ocr_start = time.perf_counter()
+        try:
+            return perform_ocr(file_path)
+        finally:
+            ocr_seconds.append(time.perf_counter() - ocr_start)
+
+    extractor.ocr_engine.perform_ocr = timed_ocr
+    try:
+        extracted = timer.run("extraction", extractor.extract_data, str(path), document.kind)
+    finally:
+        extractor.ocr_engine.perform_ocr = perform_ocr
+    if ocr_seconds:
+        timer.samples["ocr"].append(ocr_seconds[0])
+        timer.samples["extraction"][-1] -= ocr_seconds[0]
+
+    timer.run("validation", validator.validate_data, extracted or {}, DocumentType(document.kind))
+    timer.run("webhook_delivery", webhook_service.trigger_webhook, WEBHOOK_EVENT, {"document": path.name, "document_type": document.kind}, session)
+    timer.samples["total"].append(time.perf_counter() - document_start)
+    return document_type
+
+def run_benchmark(args) -> dict:
+    """Generate the documents, run the pipeline and return the results"""
+    documents = generate_documents(args.documents + args.warmup, args.mix, args.pages, args.transactions_per_page, args.seed)
+    warmup, measured = documents[:args.warmup], documents[args.warmup:]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        classifier, extractor, validator, webhook_service, session, server = _build_pipeline(documents, Path(workdir), args.webhooks)
+        try:
+            # Warm imports, regex caches and the HTTP connection path before measuring
+            for document in warmup:
+                _process(document, Path(workdir) / document.file_name, classifier, extractor, validator, webhook_service, session, _StageTimer())
+            _WebhookSink.deliveries = 0
+
+            timer = _StageTimer()
+            correct = 0
+            start = time.perf_counter()
+            for document in measured:
+                document_type = _process(document, Path(workdir) / document.file_name, classifier, extractor, validator, webhook_service, session, timer)
+                correct += document_type is not None and document_type.value == document.kind
+            elapsed = time.perf_counter() - start
+        finally:
+            server.shutdown()
+            session.close()
+
+    return {
+        "config": {
+            "documents": args.documents,
+            "mix": args.mix,
+            "pages": args.pages,
+            "transactions_per_page": args.transactions_per_page,
+            "webhooks": args.webhooks,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "docs_per_second": len(measured) / elapsed,
+        "classification_accuracy": correct / len(measured),
+        "webhook_deliveries": _WebhookSink.deliveries,
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": {
+            stage: {
+                "p50_ms": _percentile(timer.samples[stage], 0.50) * 1000,
+                "p95_ms": _percentile(timer.samples[stage], 0.95) * 1000,
+                "p99_ms": _percentile(timer.samples[stage], 0.99) * 1000,
+                "errors": timer.errors[stage],
+                "first_error": timer.first_error.get(stage),
+            }
+            for stage in STAGES if timer.samples[stage]
+        },
+    }
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a description of every metric that regressed by more than `tolerance`"""
+    regressions = []
+    if results["config"] != baseline["config"]:
+        print("warning: baseline was recorded with different options, comparison is not like for like")
+
+    if results["docs_per_second"] < baseline["docs_per_second"] * (1 - tolerance):
+        regressions.append(f"docs/sec {results['docs_per_second']:.1f} < baseline {baseline['docs_per_second']:.1f}")
+
+    for stage, stats in results["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if previous and stats["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{stage} p95 {stats['p95_ms']:.2f} ms > baseline {previous['p95_ms']:.2f} ms")
+
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {results['peak_rss_mb']:.0f} MB > baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("bank_statement=0.6,tax_return=0.2,business_license=0.2"))
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--transactions-per-page", type=int, default=40)
+    parser.add_argument("--webhooks", type=int, default=1, help="subscribers notified per document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+
+    print(f"documents:               {args.documents} ({', '.join(f'{kind}={weight:g}' for kind, weight in args.mix.items())})")
+    print(f"docs/sec:                {results['docs_per_second']:.1f}")
+    print(f"classification accuracy: {results['classification_accuracy']:.1%}")
+    print(f"webhook deliveries:      {results['webhook_deliveries']}")
+    print(f"peak RSS:                {results['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:<18}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['errors']:>8}")
+    for stage, stats in results["stages"].items():
+        if stats["first_error"]:
+            print(f"first {stage} error: {stats['first_error']}")
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
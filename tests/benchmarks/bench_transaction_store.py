@@ -0,0 +1,66 @@
+"""
+Storing and loading extracted bank statement transactions
+
+Extracts a synthetic statement and compares keeping its transactions as a
+JSON blob on the document with the transactions table: bulk-saving the rows
+(COPY on PostgreSQL, one multi-row INSERT elsewhere) and loading them back as
+columns. Runs against an in-memory SQLite database unless --database-url
+points at a scratch PostgreSQL database; the table is created and dropped.
+
+Usage:
+    python -m tests.benchmarks.bench_transaction_store --pages 250 --transactions 80
+"""
+import argparse
+import json
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from src.api.models.transaction import Transaction
+from src.services.extraction_templates import compiled_template
+from src.services.ocr_engine import OCREngine
+from src.services.transaction_store import load_transactions, save_transactions, transaction_columns
+from tests.benchmarks.synthetic import generate_documents
+
+def _time(function, repeat):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=250)
+    parser.add_argument("--transactions", type=int, default=80)
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Extract the transactions the way DataExtractor does, without calling Textract
+    document = generate_documents(1, {"bank_statement": 1.0}, args.pages, args.transactions)[0]
+    ocr_engine = OCREngine.__new__(OCREngine)
+    response = document.textract_response
+    ocr_result = {'full_text': ocr_engine.extract_text(response), 'form_data': {}, 'tables': ocr_engine.extract_tables(response)}
+    transactions = compiled_template("bank_statement").extract(ocr_result)['transactions']
+    blob = json.dumps(transactions)
+
+    engine = create_engine(args.database_url)
+    table = Transaction.__table__
+    table.create(engine, checkfirst=True)
+    try:
+        with Session(engine) as db:
+            def save():
+                save_transactions(db, 'bench', transaction_columns(transactions))
+                db.commit()
+
+            print(f"transactions:         {len(transactions)}")
+            print(f"json blob size:       {len(blob) / 1024:.0f} KiB")
+            print(f"json encode:          {_time(lambda: json.dumps(transactions), args.repeat):.1f} ms")
+            print(f"json decode:          {_time(lambda: json.loads(blob), args.repeat):.1f} ms")
+            print(f"table save:           {_time(save, args.repeat):.1f} ms")
+            print(f"table load (columns): {_time(lambda: load_transactions(db, 'bench'), args.repeat):.1f} ms")
+    finally:
+        table.drop(engine)
+
+if __name__ == "__main__":
+    main()
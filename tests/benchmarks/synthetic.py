@@ -0,0 +1,172 @@
+"""
+Synthetic MCA documents for benchmarks
+
+Each generated document has the plain text the classifier reads and a
+Textract AnalyzeDocument response (PAGE, LINE, KEY_VALUE_SET, TABLE and
+CELL blocks) in the shape OCREngine parses. Sizes are configurable so the
+same generator covers a one-page license and a multi-page statement with
+hundreds of transactions. Output is deterministic for a given seed.
+"""
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Sequence
+
+DOCUMENT_KINDS = ("bank_statement", "tax_return", "business_license")
+
+_BUSINESS_NAMES = ("Riverside Diner LLC", "Summit Auto Repair Inc", "Blue Harbor Dental PC", "Maple Street Bakery", "Northline Logistics LLC")
+_DESCRIPTIONS = ("CARD SETTLEMENT", "ACH DEPOSIT", "PAYROLL", "RENT", "UTILITIES", "SUPPLIER PAYMENT", "LOAN PAYMENT", "CASH DEPOSIT")
+
+@dataclass
+class SyntheticDocument:
+    """A generated document and the Textract response for it"""
+    kind: str
+    file_name: str
+    text: str
+    textract_response: Dict[str, Any]
+
+class _BlockBuilder:
+    # Accumulates Textract blocks and the plain text lines they represent
+    def __init__(self):
+        self.blocks: List[Dict[str, Any]] = []
+        self.lines: List[str] = []
+        self._ids = itertools.count(1)
+        self._page = 0
+
+    def _block(self, block_type: str, **fields) -> Dict[str, Any]:
+        block = {
+            "BlockType": block_type,
+            "Id": f"{block_type.lower()}-{next(self._ids)}",
+            "Confidence": 99.0,
+            "Page": self._page,
+            "Geometry": {"BoundingBox": {"Width": 0.5, "Height": 0.01, "Left": 0.1, "Top": 0.1}},
+        }
+        block.update(fields)
+        self.blocks.append(block)
+        return block
+
+    def page(self) -> None:
+        self._page += 1
+        self._block("PAGE")
+
+    def line(self, text: str) -> None:
+        self._block("LINE", Text=text)
+        self.lines.append(text)
+
+    def key_value(self, key: str, value: str) -> None:
+        value_block = self._block("KEY_VALUE_SET", EntityTypes=["VALUE"], Text=value)
+        self._block("KEY_VALUE_SET", EntityTypes=["KEY"], Text=key, Relationships=[{"Type": "VALUE", "Ids": [value_block["Id"]]}])
+        self.line(f"{key} {value}")
+
+    def table(self, rows: Sequence[Sequence[str]]) -> None:
+        self._block("TABLE")
+        for row_index, row in enumerate(rows, start=1):
+            for column_index, text in enumerate(row, start=1):
+                self._block("CELL", RowIndex=row_index, ColumnIndex=column_index, Text=text)
+            self.line(" ".join(row))
+
+    def response(self) -> Dict[str, Any]:
+        return {"DocumentMetadata": {"Pages": self._page}, "Blocks": self.blocks}
+
+def _money(value: float) -> str:
+    return f"{value:,.2f}"
+
+def bank_statement(rng: random.Random, pages: int, transactions_per_page: int) -> _BlockBuilder:
+    """Build a statement with a running-balance transaction table on every page"""
+    builder = _BlockBuilder()
+    start = date(2023, 1, 1) + timedelta(days=30 * rng.randrange(12))
+    end = start + timedelta(days=30)
+    balance = round(rng.uniform(5000, 80000), 2)
+
+    builder.page()
+    builder.line("First Commerce Bank")
+    builder.line("Business Checking Bank Statement")
+    builder.key_value("Account Holder", rng.choice(_BUSINESS_NAMES))
+    builder.key_value("Account Number", "".join(rng.choice("0123456789") for _ in range(10)))
+    builder.key_value("Statement Period", f"{start:%m/%d/%Y} - {end:%m/%d/%Y}")
+    builder.key_value("Opening Balance", _money(balance))
+
+    for page in range(pages):
+        if page:
+            builder.page()
+            builder.line(f"Page {page + 1} of {pages}")
+        rows = [("Date", "Description", "Amount", "Balance")]
+        for _ in range(transactions_per_page):
+            amount = round(rng.uniform(-4000, 6000), 2)
+            balance = round(balance + amount, 2)
+            day = start + timedelta(days=rng.randrange(30))
+            rows.append((f"{day:%m/%d/%Y}", rng.choice(_DESCRIPTIONS), _money(amount), _money(balance)))
+        builder.table(rows)
+
+    builder.key_value("Closing Balance", _money(balance))
+    return builder
+
+def tax_return(rng: random.Random, pages: int, transactions_per_page: int) -> _BlockBuilder:
+    """Build a business tax return with a deductions schedule"""
+    builder = _BlockBuilder()
+    gross = round(rng.uniform(200000, 3000000), 2)
+    deductions = [(name, round(gross * rng.uniform(0.01, 0.1), 2)) for name in ("Salaries and wages", "Rents", "Taxes and licenses", "Interest", "Depreciation", "Advertising")]
+    taxable = round(gross - sum(amount for _, amount in deductions), 2)
+
+    builder.page()
+    builder.line("Form 1120-S")
+    builder.line("U.S. Income Tax Return for an S Corporation")
+    builder.key_value("Name", rng.choice(_BUSINESS_NAMES))
+    builder.key_value("Employer identification number", f"{rng.randrange(10, 99)}-{rng.randrange(1000000, 9999999)}")
+    builder.key_value("Tax Year", str(rng.choice((2021, 2022, 2023))))
+    builder.key_value("Gross receipts or sales", _money(gross))
+    builder.key_value("Total income", _money(gross))
+    builder.key_value("Taxable income", _money(taxable))
+    builder.key_value("Total tax", _money(round(taxable * 0.21, 2)))
+    for page in range(1, pages):
+        builder.page()
+        builder.line(f"Schedule {page}")
+        builder.table([("Deduction", "Amount")] + [(name, _money(amount)) for name, amount in deductions])
+    return builder
+
+def business_license(rng: random.Random, pages: int, transactions_per_page: int) -> _BlockBuilder:
+    """Build a single-page business license"""
+    builder = _BlockBuilder()
+    issued = date(2020, 1, 1) + timedelta(days=rng.randrange(1200))
+
+    builder.page()
+    builder.line("City of Springfield")
+    builder.line("Business License")
+    builder.key_value("Business Name", rng.choice(_BUSINESS_NAMES))
+    builder.key_value("License Number", f"BL-{rng.randrange(100000, 999999)}")
+    builder.key_value("Issue Date", f"{issued:%m/%d/%Y}")
+    builder.key_value("Expiration Date", f"{issued + timedelta(days=365):%m/%d/%Y}")
+    builder.key_value("Business Type", rng.choice(("Restaurant", "Retail", "Auto Repair", "Medical")))
+    builder.key_value("Business Address", f"{rng.randrange(1, 9999)} Main St, Springfield, IL 62701")
+    return builder
+
+_GENERATORS = {"bank_statement": bank_statement, "tax_return": tax_return, "business_license": business_license}
+
+def generate_documents(count: int, mix: Dict[str, float], pages: int = 3, transactions_per_page: int = 40, seed: int = 0) -> List[SyntheticDocument]:
+    """
+    Generate a reproducible batch of synthetic documents
+
+    Args:
+        count (int): Number of documents to generate
+        mix (Dict[str, float]): Relative weight of each kind in DOCUMENT_KINDS
+        pages (int): Pages per bank statement (and schedule pages per tax return)
+        transactions_per_page (int): Transaction rows per bank statement page
+        seed (int): Random seed
+
+    Returns:
+        List[SyntheticDocument]: The generated documents
+    """
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+
+    documents = []
+    for index, kind in enumerate(kinds):
+        builder = _GENERATORS[kind](rng, pages, transactions_per_page)
+        documents.append(SyntheticDocument(
+            kind=kind,
+            file_name=f"{kind}-{index:05d}.txt",
+            text="\n".join(builder.lines),
+            textract_response=builder.response(),
+        ))
+    return documents
@@ -0,0 +1,194 @@
+import sqlite3
+from unittest.mock import patch
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import exc
+from src.core.config import settings
+from src.core.database import READ_PRIMARY_COOKIE, InstrumentedQueuePool, attach_idle_pre_ping, get_db, get_pool_stats, get_read_db, create_database_engine
+
+def _make_pool(**kwargs):
+    # Build an instrumented pool over an in-memory SQLite database
+    return InstrumentedQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False), **kwargs)
+
+def test_checkouts_are_counted():
+    pool = _make_pool(pool_size=2, max_overflow=0)
+
+    # Check out and return a connection twice
+    for _ in range(2):
+        connection = pool.connect()
+        connection.close()
+
+    # Assert that both checkouts and their wait times were recorded
+    assert pool.metrics.checkouts == 2
+    assert pool.metrics.wait_seconds_total >= 0.0
+    assert pool.metrics.wait_seconds_max >= 0.0
+
+def test_checkout_timeout_is_counted():
+    pool = _make_pool(pool_size=1, max_overflow=0, timeout=0.01)
+
+    # Hold the only connection so the next checkout times out
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    held.close()
+
+    # Assert that the timeout was recorded
+    assert pool.metrics.timeouts == 1
+
+def test_idle_pre_ping_skips_recently_used_connections():
+    pool = _make_pool(pool_size=1, max_overflow=0)
+    attach_idle_pre_ping(pool, idle_seconds=3600)
+
+    # Reuse the same connection well within the idle threshold
+    for _ in range(3):
+        pool.connect().close()
+
+    # Assert that no ping round-trips were issued
+    assert pool.metrics.pre_pings == 0
+
+def test_idle_pre_ping_pings_idle_connections():
+    pool = _make_pool(pool_size=1, max_overflow=0)
+    attach_idle_pre_ping(pool, idle_seconds=-1)
+
+    # Every checkout is past the threshold, so every checkout is pinged
+    for _ in range(3):
+        pool.connect().close()
+
+    # Assert that each checkout issued one successful ping
+    assert pool.metrics.pre_pings == 3
+    assert pool.metrics.pre_ping_failures == 0
+
+def test_metrics_survive_pool_recreate():
+    pool = _make_pool(pool_size=1, max_overflow=0)
+    pool.connect().close()
+
+    # Recreate the pool as dispose/invalidate would
+    new_pool = pool.recreate()
+
+    # Assert that counters carry over to the new pool
+    assert new_pool.metrics is pool.metrics
+    assert new_pool.metrics.checkouts == 1
+
+def test_get_pool_stats_reports_queue_pool_usage():
+    pool_engine = create_database_engine("sqlite://")
+    pool_engine.pool = _make_pool(pool_size=2, max_overflow=1)
+
+    # Hold one connection while reading the stats
+    held = pool_engine.pool.connect()
+    stats = get_pool_stats(pool_engine)
+    held.close()
+
+    # Assert that occupancy and counters are reported
+    assert stats["pool_class"] == "InstrumentedQueuePool"
+    assert stats["pool_size"] == 2
+    assert stats["checked_out"] == 1
+    assert stats["overflow_in_use"] == 0
+    assert stats["checkouts_total"] == 1
+
+def _make_routing_session(tmp_path):
+    from sqlalchemy import Column, Integer, String, create_engine
+    from sqlalchemy.orm import declarative_base
+    from src.core.database import RoutingSession
+
+    # Declare a throwaway model and create it in two separate SQLite databases
+    TestBase = declarative_base()
+
+    class Item(TestBase):
+        __tablename__ = "items"
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    TestBase.metadata.create_all(primary)
+    TestBase.metadata.create_all(replica)
+
+    # Seed each database with a row that identifies it
+    with primary.begin() as connection:
+        connection.execute(Item.__table__.insert(), {"id": 1, "name": "primary"})
+    with replica.begin() as connection:
+        connection.execute(Item.__table__.insert(), {"id": 1, "name": "replica"})
+
+    return RoutingSession(primary=primary, replicas=[replica]), Item, primary, replica
+
+def test_routing_session_reads_from_replica(tmp_path):
+    session, Item, primary, replica = _make_routing_session(tmp_path)
+
+    # Assert that a read-only session is served by the replica
+    assert session.query(Item).get(1).name == "replica"
+    session.close()
+
+def test_routing_session_writes_to_primary_and_reads_its_writes(tmp_path):
+    session, Item, primary, replica = _make_routing_session(tmp_path)
+
+    # Write a new row and commit it
+    session.add(Item(id=2, name="new"))
+    session.commit()
+
+    # Assert that the write landed on the primary only
+    with primary.connect() as connection:
+        assert connection.execute(Item.__table__.select()).fetchall()[-1].name == "new"
+    with replica.connect() as connection:
+        assert len(connection.execute(Item.__table__.select()).fetchall()) == 1
+
+    # Assert that reads after the write are served by the primary
+    assert session.query(Item).get(2).name == "new"
+    assert session.query(Item).get(1).name == "primary"
+    session.close()
+
+def test_routing_session_reads_after_dml_statement_use_primary(tmp_path):
+    from sqlalchemy import update
+    session, Item, primary, replica = _make_routing_session(tmp_path)
+
+    # Run an UPDATE directly, which bypasses the flush
+    session.execute(update(Item).where(Item.id == 1).values(name="updated"))
+
+    # Assert that later reads in the same session see the write on the primary
+    assert session.query(Item.name).filter(Item.id == 1).scalar() == "updated"
+    session.commit()
+    with replica.connect() as connection:
+        assert connection.execute(Item.__table__.select()).fetchall()[0].name == "replica"
+    session.close()
+
+def test_routing_session_without_replicas_uses_primary(tmp_path):
+    session, Item, primary, replica = _make_routing_session(tmp_path)
+    session.replicas = []
+
+    # Assert that reads fall back to the primary
+    assert session.query(Item).get(1).name == "primary"
+    session.close()
+
+def test_get_pool_stats_reports_the_overflow_limit():
+    pool_engine = create_database_engine("sqlite://")
+    pool_engine.pool = _make_pool(pool_size=2, max_overflow=3)
+
+    # Assert that the limit is reported, and kept when the pool is recreated
+    assert get_pool_stats(pool_engine)["max_overflow"] == 3
+    pool_engine.pool = pool_engine.pool.recreate()
+    assert get_pool_stats(pool_engine)["max_overflow"] == 3
+
+def test_client_reads_from_the_primary_after_a_write_request():
+    # A write endpoint and a read endpoint reporting where the session's reads go
+    app = FastAPI()
+
+    @app.post("/items")
+    def write(db=Depends(get_db)):
+        return {}
+
+    @app.get("/items")
+    def read(db=Depends(get_read_db)):
+        return {"primary": db.info.get("use_primary", False)}
+
+    with patch.object(settings, "DATABASE_REPLICA_URLS", ["postgresql://replica/mca"]):
+        client = TestClient(app)
+        assert client.get("/items").json() == {"primary": False}
+
+        # Assert that a write marks the client for DB_READ_PRIMARY_AFTER_WRITE_SECONDS and its next reads use the primary
+        response = client.post("/items")
+        assert f"Max-Age={settings.DB_READ_PRIMARY_AFTER_WRITE_SECONDS}" in response.headers["set-cookie"]
+        assert client.get("/items").json() == {"primary": True}
+
+        # Assert that other clients still read from the replicas
+        assert TestClient(app).get("/items").json() == {"primary": False}
+        assert READ_PRIMARY_COOKIE in client.cookies
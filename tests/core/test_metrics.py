@@ -0,0 +1,50 @@
+from src.core.metrics import Histogram, MetricsRegistry
+
+def test_histogram_counts_observations_into_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test latency", label_names=("stage",), buckets=(0.1, 1.0))
+
+    # Observe values below, between and above the bucket bounds
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, stage="ocr")
+
+    # Assert that bucket counts are cumulative and sum/count are tracked
+    snapshot = histogram.snapshot(stage="ocr")
+    assert list(snapshot["buckets"].values()) == [2, 3, 4]
+    assert snapshot["count"] == 4
+    assert abs(snapshot["sum"] - 5.65) < 1e-9
+
+def test_histogram_keeps_label_series_separate():
+    histogram = Histogram("test_seconds", "Test latency", label_names=("stage",), buckets=(1.0,))
+    histogram.observe(0.5, stage="ocr")
+    histogram.observe(0.5, stage="extraction")
+    histogram.observe(0.5, stage="extraction")
+
+    # Assert that each label value has its own series
+    assert histogram.snapshot(stage="ocr")["count"] == 1
+    assert histogram.snapshot(stage="extraction")["count"] == 2
+
+def test_registry_renders_prometheus_text_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test latency", label_names=("stage",), buckets=(1.0,))
+    counter = registry.counter("test_total", "Test events")
+    histogram.observe(0.5, stage="ocr")
+    counter.inc()
+
+    # Register a collector reporting a gauge
+    registry.register_collector(lambda: [("test_gauge", "gauge", "Test gauge", [({"engine": "primary"}, 3)])])
+
+    output = registry.render()
+
+    # Assert that each metric is rendered with HELP/TYPE lines and samples
+    assert "# TYPE test_seconds histogram" in output
+    assert 'test_seconds_bucket{stage="ocr",le="1.0"} 1' in output
+    assert 'test_seconds_bucket{stage="ocr",le="+Inf"} 1' in output
+    assert 'test_seconds_count{stage="ocr"} 1' in output
+    assert "test_total 1.0" in output
+    assert 'test_gauge{engine="primary"} 3.0' in output
+
+def test_registry_returns_existing_metric_for_same_name():
+    registry = MetricsRegistry()
+
+    # Assert that registering the same name twice returns the same metric
+    assert registry.histogram("test_seconds", "Test") is registry.histogram("test_seconds", "Test")
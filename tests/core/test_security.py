@@ -0,0 +1,125 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from src.core import security
+from src.api.models.user import UserRole
+from src.core.security import Principal, authenticate_user, create_access_token, get_current_user, invalidate_cached_user
+
+def _mock_db(user):
+    # Build a mock session whose user query returns the given user
+    db = Mock()
+    db.query.return_value.filter.return_value.first.return_value = user
+    return db
+
+def _user(user_id, role=UserRole.DATA_ENTRY_SPECIALIST, is_active=True):
+    # Stand-in for a User row
+    return Mock(id=user_id, role=role, is_active=is_active)
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    with patch.object(security, "_all_invalidated_at", float("-inf")):
+        security._token_cache.clear()
+        security._user_invalidations.clear()
+        yield
+        security._token_cache.clear()
+        security._user_invalidations.clear()
+
+def test_get_current_user_caches_verified_tokens():
+    user = _user("user-1", UserRole.ADMIN)
+    db = _mock_db(user)
+    token = create_access_token({"sub": "user-1"}, timedelta(minutes=5))
+
+    # Authenticate twice with the same token
+    principal = get_current_user(token, db)
+    assert get_current_user(token, db) is principal
+
+    # Assert that the cache holds an immutable principal rather than the session's User, and only the first request queried the database
+    assert principal == Principal("user-1", UserRole.ADMIN, True) and principal.is_admin
+    assert db.query.call_count == 1
+
+def test_invalidate_cached_user_forces_a_new_lookup():
+    user = _user("user-2")
+    db = _mock_db(user)
+    token = create_access_token({"sub": "user-2"}, timedelta(minutes=5))
+    get_current_user(token, db)
+
+    # Invalidate the user as update_user/delete_user do
+    invalidate_cached_user("user-2")
+
+    # Assert that the next request queries the database again
+    get_current_user(token, db)
+    assert db.query.call_count == 2
+
+def test_deleted_user_is_rejected_after_invalidation():
+    user = _user("user-3")
+    db = _mock_db(user)
+    token = create_access_token({"sub": "user-3"}, timedelta(minutes=5))
+    get_current_user(token, db)
+
+    # Delete the user and invalidate the cache
+    db.query.return_value.filter.return_value.first.return_value = None
+    invalidate_cached_user("user-3")
+
+    # Assert that the token no longer authenticates
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(token, db)
+    assert exc_info.value.status_code == 401
+
+def test_inactive_user_is_rejected():
+    db = _mock_db(_user("user-6", is_active=False))
+    token = create_access_token({"sub": "user-6"}, timedelta(minutes=5))
+
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(token, db)
+    assert exc_info.value.status_code == 401
+    assert len(security._token_cache) == 0
+
+def test_invalidations_are_bounded_without_reviving_cached_tokens():
+    db = _mock_db(_user("user-7"))
+    token = create_access_token({"sub": "user-7"}, timedelta(minutes=5))
+    get_current_user(token, db)
+
+    # Invalidate more users than the cache holds, the cached one among the last
+    with patch.object(security.settings, "AUTH_CACHE_MAX_SIZE", 3):
+        for index in range(5):
+            invalidate_cached_user(f"other-{index}")
+            assert len(security._user_invalidations) <= 3
+        invalidate_cached_user("user-7")
+
+    # Assert that the cached token was still looked up again
+    get_current_user(token, db)
+    assert db.query.call_count == 2
+
+def test_invalid_token_is_not_cached():
+    db = _mock_db(None)
+
+    # Assert that a malformed token is rejected every time
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            get_current_user("not-a-token", db)
+    assert len(security._token_cache) == 0
+
+def test_authenticate_user_rehashes_outdated_cost_factor():
+    # Create a user whose hash uses another cost factor than configured
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=security.settings.BCRYPT_ROUNDS + 1).hash("secret")
+    user = Mock(id="user-4", hashed_password=old_hash)
+    db = _mock_db(user)
+
+    # Log in with the correct password
+    assert authenticate_user(db, "user@example.com", "secret") is user
+
+    # Assert that the hash was upgraded and the login recorded
+    assert user.hashed_password != old_hash
+    assert not security.pwd_context.needs_update(user.hashed_password)
+    assert security.verify_password("secret", user.hashed_password)
+    user.update_last_login.assert_called_once()
+    db.commit.assert_called_once()
+
+def test_authenticate_user_rejects_bad_credentials():
+    user = Mock(id="user-5", hashed_password=security.get_password_hash("secret"))
+
+    # Assert that a wrong password and an unknown email are both rejected
+    assert authenticate_user(_mock_db(user), "user@example.com", "wrong") is None
+    assert authenticate_user(_mock_db(None), "nobody@example.com", "secret") is None
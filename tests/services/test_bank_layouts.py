@@ -0,0 +1,105 @@
+import json
+from unittest.mock import patch
+import pytest
+from src.core.config import settings
+from src.services.bank_layouts import BUNDLED_LAYOUT_DIR, BankLayout, BankLayoutRegistry
+from src.services.data_extractor import DataExtractor
+
+@pytest.fixture
+def registry():
+    return BankLayoutRegistry([BUNDLED_LAYOUT_DIR])
+
+def test_statement_is_identified_from_its_first_lines(registry):
+    text = "FIRST COMMERCE BANK\nBusiness Checking Bank Statement\nAccount Holder: Riverside Diner LLC"
+
+    # Assert that case and punctuation do not matter, and an unknown bank has no layout
+    assert registry.identify(text).id == 'first_commerce_bank'
+    assert registry.identify("Some Other Bank\nBusiness Checking Bank Statement") is None
+
+def test_markers_below_the_fingerprinted_lines_are_ignored(registry):
+    text = "\n".join(["Transaction history"] * settings.BANK_FINGERPRINT_LINES + ["First Commerce Bank", "Business Checking Bank Statement"])
+
+    assert registry.identify(text) is None
+
+def test_identification_is_a_lookup_per_line(registry):
+    text = "First Commerce Bank\nBusiness Checking Bank Statement\n" + "01/03/2023 CARD SETTLEMENT 1,200.00 11,200.00\n" * 1000
+
+    # Assert that only the first BANK_FINGERPRINT_LINES lines are fingerprinted, however long the statement
+    with patch('src.services.bank_layouts.fingerprint_line', wraps=lambda line: line.lower()) as fingerprint_line:
+        registry.identify(text)
+    assert fingerprint_line.call_count == settings.BANK_FINGERPRINT_LINES
+
+def test_debit_and_credit_columns_become_signed_amounts(registry):
+    ocr_result = {
+        'full_text': "Harbor National Bank\nCommercial Account Statement",
+        'form_data': {'Prepared For': 'Blue Harbor Dental PC', 'Account Holder': 'BLUE HARBOR', 'Balance Last Statement': '$2,000.00'},
+        'tables': [
+            [['Post Date', 'Transaction Details', 'Withdrawals', 'Deposits', 'Daily Balance'],
+             ['Mar 01', 'Balance forward', '', '', '2,000.00'],
+             ['Mar 02', 'CARD SETTLEMENT', '', '1,250.00', '3,250.00']],
+            # Continued on the next page without a header row
+            [['Mar 05', 'RENT', '1,800.00', '', '1,450.00']],
+        ],
+    }
+
+    layout = registry.identify(ocr_result)
+    result = registry.extract(layout, ocr_result)
+
+    # Assert that the layout's own labels win over the generic ones
+    assert result['account_holder'] == 'Blue Harbor Dental PC'
+    assert result['opening_balance'] == '$2,000.00'
+
+    # Assert that rows without an amount are dropped and the others carry a signed amount
+    assert result['transactions'] == [
+        {'date': 'Mar 02', 'description': 'CARD SETTLEMENT', 'amount': '1,250.00', 'balance': '3,250.00'},
+        {'date': 'Mar 05', 'description': 'RENT', 'amount': '-1,800.00', 'balance': '1,450.00'},
+    ]
+
+def test_text_rows_follow_the_layout_column_order_and_date_format(registry):
+    text = ("Summit Credit Union\nBusiness Share Draft Statement\nMember Number: 00042\n"
+            "01-05-23 125.00 SHARE DEPOSIT 1,125.00\n01-09-23 -40.00 ATM WITHDRAWAL 1,085.00\n01/12/2023 Not this layout 5.00")
+
+    result = registry.extract(registry.identify(text), text)
+
+    assert result['account_number'] == '00042'
+    assert result['transactions'] == [
+        {'date': '01-05-23', 'description': 'SHARE DEPOSIT', 'amount': '125.00', 'balance': '1,125.00'},
+        {'date': '01-09-23', 'description': 'ATM WITHDRAWAL', 'amount': '-40.00', 'balance': '1,085.00'},
+    ]
+
+def test_a_new_bank_is_a_data_file(tmp_path):
+    (tmp_path / 'prairie_state_bank.json').write_text(json.dumps({
+        'name': 'Prairie State Bank',
+        'markers': ['Prairie State Bank'],
+        'columns': ['date', 'description', 'amount', 'balance'],
+        'headers': {'date': ['Trans Date']},
+    }))
+
+    registry = BankLayoutRegistry([BUNDLED_LAYOUT_DIR, str(tmp_path)])
+
+    assert registry.identify("Prairie State Bank\nPage 1 of 3").name == 'Prairie State Bank'
+    assert registry.identify("First Commerce Bank\nBusiness Checking Bank Statement").id == 'first_commerce_bank'
+
+@pytest.mark.parametrize("layout", [
+    {'markers': ['Prairie State Bank'], 'columns': ['description', 'amount']},
+    {'markers': ['Prairie State Bank'], 'columns': ['date', 'amount', 'fee']},
+    {'markers': ['12345'], 'columns': ['date', 'amount']},
+    {'markers': ['Prairie State Bank'], 'columns': ['date', 'amount'], 'date_formats': ['%d.%m.%Y %H:%M']},
+])
+def test_invalid_layout_files_are_rejected(tmp_path, layout):
+    path = tmp_path / 'prairie_state_bank.json'
+    path.write_text(json.dumps(layout))
+
+    with pytest.raises(ValueError):
+        BankLayout.from_file(str(path))
+
+def test_data_extractor_reports_the_layout_it_used():
+    with patch('src.services.data_extractor.OCREngine'):
+        data_extractor = DataExtractor()
+
+    recognised = data_extractor.extract_bank_statement("First Commerce Bank\nBusiness Checking Bank Statement\nClosing Balance: 1,500.00")
+    generic = data_extractor.extract_bank_statement("Closing Balance: 1,500.00")
+
+    assert recognised['bank_layout'] == 'first_commerce_bank'
+    assert generic['bank_layout'] is None
+    assert recognised['closing_balance'] == generic['closing_balance'] == '1,500.00'
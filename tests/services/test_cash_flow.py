@@ -0,0 +1,87 @@
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from src.api.models.application import Application
+from src.api.models.cash_flow_metrics import CashFlowMetrics
+from src.api.models.identity_key import IdentityKey
+from src.services.cash_flow import statement_metrics
+from src.services.transaction_store import apply_statement_metrics, store_extracted_data
+
+def _transaction(day, description, amount, balance=None):
+    return {'date': day, 'description': description, 'amount': amount, 'balance': balance}
+
+STATEMENT = [
+    _transaction('01/02/2023', 'CARD SETTLEMENT', '500.00', '1,500.00'),
+    _transaction('01/02/2023', 'ACH DEBIT', '-200.00', '1,300.00'),
+    _transaction('01/05/2023', 'NSF FEE', '-35.00', '-50.00'),
+    _transaction('01/06/2023', 'RETURNED ITEM CHARGE', '-15.00', '-65.00'),
+    _transaction('01/08/2023', 'DEPOSIT', '1,065.00', '1,000.00'),
+]
+
+def test_daily_balances_carry_over_days_without_transactions():
+    metrics = statement_metrics(STATEMENT, '$1,000.00', '01/01/2023 - 01/31/2023')
+
+    # Closing balances: 1,300 for Jan 2-4, -50 on Jan 5, -65 for Jan 6-7, 1,000 on Jan 8
+    assert metrics['days'] == 7
+    assert metrics['daily_balance_sum'] == 1300 * 3 - 50 - 65 * 2 + 1000
+    assert metrics['average_daily_balance'] == round((1300 * 3 - 50 - 65 * 2 + 1000) / 7, 2)
+    assert metrics['negative_balance_days'] == 3
+    assert (metrics['start_date'], metrics['end_date']) == ('2023-01-02', '2023-01-08')
+
+def test_deposits_withdrawals_and_nsf_items_are_counted():
+    metrics = statement_metrics(STATEMENT)
+
+    assert (metrics['deposit_total'], metrics['deposit_count']) == (1565.0, 2)
+    assert metrics['withdrawal_total'] == 250.0
+    assert metrics['nsf_count'] == 2
+    assert metrics['average_monthly_deposits'] == round(1565 * 30.4375 / 7, 2)
+
+def test_balances_are_derived_from_the_opening_balance_when_not_printed():
+    transactions = [_transaction('Dec 30', 'DEPOSIT', '100.00'), _transaction('Jan 02', 'RENT', '(300.00)')]
+
+    metrics = statement_metrics(transactions, '$50.00', 'December 15, 2022 to January 14, 2023')
+
+    # Assert that yearless December dates fall in the year before the period ends
+    assert (metrics['start_date'], metrics['end_date']) == ('2022-12-30', '2023-01-02')
+    assert metrics['daily_balance_sum'] == 150 * 3 - 150
+    assert metrics['withdrawal_total'] == 300.0
+
+def test_statement_without_dated_balances_has_no_averages():
+    metrics = statement_metrics([_transaction(None, 'DEPOSIT', '100.00')])
+
+    assert metrics['days'] == 0
+    assert metrics['average_daily_balance'] is None
+    assert metrics['deposit_total'] == 100.0
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    CashFlowMetrics.__table__.create(engine)
+    IdentityKey.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+def test_statements_are_added_to_the_application_metrics_incrementally(db):
+    january = statement_metrics(STATEMENT)
+    february = statement_metrics([_transaction('02/01/2023', 'DEPOSIT', '3,000.00', '4,000.00'), _transaction('02/03/2023', 'RENT', '-1,000.00', '3,000.00')])
+
+    apply_statement_metrics(db, 'app-1', january)
+    cash_flow = apply_statement_metrics(db, 'app-1', february)
+
+    assert cash_flow.statement_count == 2
+    assert cash_flow.days == 7 + 3
+    assert cash_flow.nsf_count == 2
+    assert cash_flow.average_daily_balance == (Decimal(str(january['daily_balance_sum'] + february['daily_balance_sum'])) / 10).quantize(Decimal('0.01'))
+
+def test_re_extracted_statement_replaces_its_earlier_metrics(db):
+    document = SimpleNamespace(id='doc-1', application_id='app-1', type='bank_statement', file_path='documents/ab/abc.pdf', extracted_data=None)
+    store_extracted_data(db, document, {'cash_flow': statement_metrics(STATEMENT[:2])})
+
+    store_extracted_data(db, document, {'cash_flow': statement_metrics(STATEMENT)})
+
+    cash_flow = db.query(CashFlowMetrics).one()
+    assert cash_flow.statement_count == 1
+    assert cash_flow.nsf_count == 2
+    assert cash_flow.deposit_total == Decimal('1565.00')
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+# Registers the applications table the identity keys refer to
+from src.api.models.application import Application
+from src.api.models.document import application_documents
+from src.api.models.identity_key import IdentityKey, IdentityKind
+from src.api.models.merchant import Merchant, MerchantNameBand
+from src.services.cross_document_validator import (
+    CrossDocumentValidator, identity_keys, normalize_account_number, normalize_business_name, record_identity_keys,
+)
+from src.services.extraction_templates import compiled_template
+from src.services.merchant_matching import save_merchant
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    IdentityKey.__table__.create(engine)
+    application_documents.create(engine)
+    Merchant.__table__.create(engine)
+    MerchantNameBand.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+def _record(db, document_id, application_id, document_type, **data):
+    record_identity_keys(db, document_id, application_id, document_type, data)
+
+def test_identities_are_normalized():
+    assert normalize_business_name("Riverside Diner, L.L.C.") == normalize_business_name("THE RIVERSIDE DINER LLC") == 'RIVERSIDE DINER'
+    assert normalize_business_name("Smith & Sons Inc dba Riverside Diner") == 'SMITH SONS'
+    assert normalize_account_number("0012-3456-78") == '0012345678'
+    # Assert that masked account numbers are not compared
+    assert normalize_account_number("XXXXXX4567") is None
+
+def test_tax_returns_yield_their_ein():
+    extracted = compiled_template('tax_return').extract("Taxpayer Name: Riverside Diner LLC\nEmployer Identification Number: 12-3456789")
+
+    assert identity_keys('tax_return', extracted) == [
+        (IdentityKind.BUSINESS_NAME, 'RIVERSIDE DINER', 'taxpayer_name'),
+        (IdentityKind.EIN, '123456789', 'ein'),
+    ]
+
+def test_consistent_documents_pass(db):
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC', account_number='1234567890')
+    _record(db, 'doc-2', 'app-1', 'business_license', business_name='RIVERSIDE DINER')
+
+    assert CrossDocumentValidator().validate_application(db, 'app-1') == {'errors': [], 'warnings': []}
+
+def test_documents_naming_different_businesses_are_reported(db):
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC')
+    _record(db, 'doc-2', 'app-1', 'tax_return', taxpayer_name='Lakeside Grill Inc', ein='12-3456789')
+    _record(db, 'doc-3', 'app-1', 'tax_return', taxpayer_name='Lakeside Grill Inc', ein='98-7654321')
+
+    result = CrossDocumentValidator().validate_application(db, 'app-1')
+
+    assert result['warnings'] == ["Business name differs across documents: LAKESIDE GRILL (taxpayer_name); RIVERSIDE DINER (account_holder)"]
+    assert result['errors'] == ["Documents carry different Employer Identification Numbers"]
+
+def test_account_reused_by_an_unrelated_application_is_an_error(db):
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC', account_number='1234567890')
+    # The same merchant applying again, and an unrelated business with the same account
+    _record(db, 'doc-2', 'app-2', 'bank_statement', account_holder='Riverside Diner', account_number='1234567890')
+    _record(db, 'doc-3', 'app-3', 'bank_statement', account_holder='Lakeside Grill', account_number='1234567890')
+
+    result = CrossDocumentValidator().validate_application(db, 'app-1')
+
+    assert result['errors'] == ["Account number ending 7890 also appears on unrelated applications: app-3"]
+
+def test_similar_merchants_of_other_applications_are_reported(db):
+    save_merchant(db, 'app-2', 'Riverside Diners LLC', 'RIVERSIDE DINERS')
+    save_merchant(db, 'app-3', 'Lakeside Grill', 'LAKESIDE GRILL')
+    _record(db, 'doc-1', 'app-1', 'business_license', business_name='Riverside Diner')
+    save_merchant(db, 'app-1', 'Riverside Diner', 'RIVERSIDE DINER')
+
+    result = CrossDocumentValidator().validate_application(db, 'app-1')
+
+    assert result['warnings'] == ["Business name RIVERSIDE DINER resembles the merchants of other applications: app-2 (0.88)"]
+
+def test_linked_documents_count_for_the_application(db):
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC')
+    _record(db, 'doc-2', 'app-2', 'business_license', business_name='Lakeside Grill')
+    db.execute(application_documents.insert(), {'application_id': 'app-1', 'document_id': 'doc-2'})
+
+    assert len(CrossDocumentValidator().validate_application(db, 'app-1')['warnings']) == 1
+
+def test_recording_again_replaces_the_keys_of_a_document(db):
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC', account_number='1234567890')
+    _record(db, 'doc-1', 'app-1', 'bank_statement', account_holder='Riverside Diner LLC')
+
+    assert db.query(IdentityKey.__table__).count() == 1
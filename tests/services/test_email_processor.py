@@ -1,10 +1,16 @@
+import hashlib
+import os
+import re
 import pytest
 from unittest.mock import Mock, patch
 from src.services.email_processor import EmailProcessor
 from src.services.document_classifier import DocumentClassifier
+from src.services.storage import LocalStorage
+from src.services.streaming_mime_parser import StreamedAttachment
 from src.core.config import settings
 from src.api.models.application import Application
 from src.api.models.document import Document
+from src.api.models.extraction_job import ExtractionJob
 
 @pytest.mark.asyncio
 async def test_email_processor_initialization():
@@ -17,110 +23,297 @@ async def test_email_processor_initialization():
         mock_imap.assert_called_once_with(settings.EMAIL_SERVER, settings.EMAIL_PORT)
         
         # Assert that the login method was called with correct credentials
-        mock_imap.return_value.login.assert_called_once_with(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
+        mock_imap.return_value.login.assert_called_once_with(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD.get_secret_value())
         
         # Assert that DocumentClassifier was initialized
-        assert isinstance(email_processor.document_classifier, DocumentClassifier)
+        assert isinstance(email_processor.ingestor.document_classifier, DocumentClassifier)
+
+def test_save_attachment(tmp_path):
+    from src.api.models.document import DocumentType
+    from src.services.email_processor import EmailIngestor
+
+    # Write a decoded attachment to a temporary part file, as StreamingMimeParser does
+    content = b'%PDF-1.4 statement'
+    part_path = tmp_path / '0.part'
+    part_path.write_bytes(content)
+    attachment = StreamedAttachment('Statement.PDF', 'application/pdf', str(part_path), len(content), hashlib.md5(content).hexdigest())
+
+    with patch('src.services.email_processor.get_storage', return_value=LocalStorage(str(tmp_path / 'documents'))):
+        ingestor = EmailIngestor()
+    ingestor.document_classifier = Mock()
+    ingestor.document_classifier.classify_document.return_value = DocumentType.BANK_STATEMENT
+
+    result = ingestor.save_attachment(attachment)
+
+    # Assert that the file was classified under its own extension and moved to storage under its content hash
+    classified_path = ingestor.document_classifier.classify_document.call_args.args[0]
+    assert classified_path == tmp_path / '0.pdf'
+    assert ingestor.document_classifier.classify_document.call_args.args[1] == {'file_name': 'Statement.PDF', 'file_size': len(content)}
+    assert result == {
+        'filename': 'Statement.PDF',
+        'file_path': result['file_path'],
+        'content_type': 'application/pdf',
+        'file_size': len(content),
+        'md5_hash': attachment.md5_hash,
+        'document_type': DocumentType.BANK_STATEMENT,
+    }
+    assert attachment.md5_hash in result['file_path']
+    with open(ingestor.storage.local_path(result['file_path']), 'rb') as file:
+        assert file.read() == content
+    assert list(tmp_path.glob('0.*')) == []
+
+def _build_email(message_id, attachments):
+    # Build a raw RFC 822 message with the given (filename, bytes) attachments
+    from email.message import EmailMessage
+    message = EmailMessage()
+    message['Subject'] = 'Funding application'
+    message['From'] = 'broker@example.com'
+    message['Date'] = 'Mon, 02 Oct 2023 10:00:00 +0000'
+    message['Message-ID'] = message_id
+    message.set_content('Please find the statements attached.')
+    for filename, content in attachments:
+        message.add_attachment(content, maintype='application', subtype='pdf', filename=filename)
+    return message.as_bytes()
+
+def _serve_mailbox(mock_imap, emails, uid_validity=1):
+    # Answer SELECT responses and UID SEARCH/FETCH/STORE from a dict of raw emails keyed by UID
+    seen, searches = set(), []
+
+    def uid(command, *args):
+        if command == 'SEARCH':
+            searches.append(args[1])
+            if args[1] == 'UNSEEN':
+                uids = [num for num in emails if num not in seen]
+            else:
+                start = int(re.match(r'UID (\d+):\*', args[1]).group(1))
+                uids = [num for num in emails if int(num) >= start] or [max(emails, key=int)]
+            return ('OK', [b' '.join(uids)])
+        if command == 'FETCH':
+            offset, length = map(int, re.search(r'<(\d+)\.(\d+)>', args[1]).groups())
+            return ('OK', [(b'', emails[args[0]][offset:offset + length]), b')'])
+        if command == 'STORE':
+            seen.update(args[0].split(b','))
+            return ('OK', [])
+
+    mock_imap.uid.side_effect = uid
+    mock_imap.response.side_effect = lambda code: (code, [str(uid_validity if code == 'UIDVALIDITY' else len(emails) + 1).encode()])
+    return seen, searches
+
+@pytest.fixture
+def dedup_processor(tmp_path):
+    # Build an EmailProcessor over a SQLite database and a temporary upload directory
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.api.models.document import DocumentType
+    from src.core.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
 
-@pytest.mark.asyncio
-async def test_process_emails():
-    # Mock the IMAP4_SSL class and its methods
     with patch('imaplib.IMAP4_SSL') as mock_imap, \
-         patch('src.services.email_processor.SessionLocal') as mock_session_local, \
-         patch('src.services.email_processor.EmailProcessor.parse_email') as mock_parse_email, \
-         patch('src.services.email_processor.EmailProcessor.save_attachment') as mock_save_attachment:
-        
-        # Mock the SessionLocal to return a mock database session
-        mock_db = Mock()
-        mock_session_local.return_value.__enter__.return_value = mock_db
-        
-        # Create mock email data
-        mock_email_data = {
-            'subject': 'Test Subject',
-            'sender': 'test@example.com',
-            'body': 'Test Body',
-            'attachments': [('attachment1.pdf', b'test_content')]
-        }
-        
-        # Mock the parse_email method to return the mock email data
-        mock_parse_email.return_value = mock_email_data
-        
-        # Mock the save_attachment method
-        mock_save_attachment.return_value = {'filename': 'attachment1.pdf', 'file_path': '/path/to/attachment1.pdf', 'document_type': 'application_form'}
-        
-        # Create an instance of EmailProcessor
+         patch('src.services.email_processor.SessionLocal', session_factory), \
+         patch('src.services.extraction_queue.SessionLocal', session_factory), \
+         patch('src.services.email_processor.get_storage', return_value=LocalStorage(str(tmp_path / 'documents'))), \
+         patch.object(settings, 'TEMP_UPLOAD_DIR', str(tmp_path / 'uploads')), \
+         patch.object(settings, 'EMAIL_FETCH_CHUNK_SIZE', 256):
         email_processor = EmailProcessor()
-        
-        # Call the process_emails method
-        processed_emails = await email_processor.process_emails()
-        
-        # Assert that the correct IMAP methods were called
-        mock_imap.return_value.select.assert_called_once_with('INBOX')
-        mock_imap.return_value.search.assert_called_once_with(None, 'ALL')
-        mock_imap.return_value.fetch.assert_called()
-        
-        # Assert that parse_email and save_attachment were called correct number of times
-        assert mock_parse_email.call_count == mock_imap.return_value.fetch.return_value[1].__len__.return_value
-        assert mock_save_attachment.call_count == len(mock_email_data['attachments'])
-        
-        # Assert that Application and Document objects were created and added to the session
-        mock_db.add.assert_called()
-        assert isinstance(mock_db.add.call_args[0][0], Application)
-        assert isinstance(mock_db.add.call_args[0][1], Document)
-        
-        # Assert that the processed email data is returned correctly
-        assert len(processed_emails) == mock_imap.return_value.fetch.return_value[1].__len__.return_value
-        assert processed_emails[0] == {**mock_email_data, 'attachments': [mock_save_attachment.return_value]}
-
-def test_parse_email():
-    # Create a mock email message
-    mock_message = Mock()
-    mock_message.get.side_effect = lambda x: {'Subject': 'Test Subject', 'From': 'test@example.com'}[x]
-    mock_message.get_payload.return_value = 'Test Body'
-    mock_attachment = Mock()
-    mock_attachment.get_filename.return_value = 'attachment1.pdf'
-    mock_attachment.get_payload.return_value = b'test_content'
-    mock_message.walk.return_value = [mock_message, mock_attachment]
-    
-    # Create an instance of EmailProcessor
-    email_processor = EmailProcessor()
-    
-    # Call the parse_email method with the mock message
-    parsed_email = email_processor.parse_email(mock_message)
-    
-    # Assert that the returned data contains the correct subject, sender, body, and attachments
-    assert parsed_email['subject'] == 'Test Subject'
-    assert parsed_email['sender'] == 'test@example.com'
-    assert parsed_email['body'] == 'Test Body'
-    assert parsed_email['attachments'] == [('attachment1.pdf', b'test_content')]
-
-def test_save_attachment():
-    # Mock the open function
-    with patch('builtins.open', Mock()) as mock_open, \
-         patch('src.services.document_classifier.DocumentClassifier.classify_document') as mock_classify:
-        
-        # Mock the DocumentClassifier.classify_document method
-        mock_classify.return_value = 'application_form'
-        
-        # Create a mock attachment
-        mock_attachment = ('test_attachment.pdf', b'test_content')
-        
-        # Create an instance of EmailProcessor
-        email_processor = EmailProcessor()
-        
-        # Call the save_attachment method with the mock attachment
-        result = email_processor.save_attachment(mock_attachment)
-        
-        # Assert that the file was saved correctly
-        mock_open.assert_called_once_with(f"{settings.UPLOAD_FOLDER}/test_attachment.pdf", 'wb')
-        mock_open.return_value.__enter__.return_value.write.assert_called_once_with(b'test_content')
-        
-        # Assert that the DocumentClassifier was called
-        mock_classify.assert_called_once_with(f"{settings.UPLOAD_FOLDER}/test_attachment.pdf")
-        
-        # Assert that the returned data contains the correct filename, file path, and document type
-        assert result == {
-            'filename': 'test_attachment.pdf',
-            'file_path': f"{settings.UPLOAD_FOLDER}/test_attachment.pdf",
-            'document_type': 'application_form'
-        }
\ No newline at end of file
+        email_processor.ingestor.document_classifier = Mock()
+        email_processor.ingestor.document_classifier.classify_document.return_value = DocumentType.BANK_STATEMENT
+        yield email_processor, mock_imap.return_value, session_factory, tmp_path
+
+def test_resent_attachment_is_linked_not_stored_again(dedup_processor):
+    from src.api.models.document import application_documents
+    email_processor, mock_imap, session_factory, workdir = dedup_processor
+
+    # Two emails from a broker resending the same statement, the second with a new license too
+    statement = b'%PDF-1.4 statement for march'
+    emails = {
+        b'1': _build_email('<first@example.com>', [('march.pdf', statement)]),
+        b'2': _build_email('<second@example.com>', [('statement-march.pdf', statement), ('license.pdf', b'%PDF-1.4 license')]),
+    }
+    _serve_mailbox(mock_imap, emails)
+
+    processed_emails = email_processor.process_emails()
+
+    # Assert that the resent statement was neither written nor classified again
+    assert len(processed_emails) == 2
+    assert email_processor.ingestor.document_classifier.classify_document.call_count == 2
+    assert len([path for path in (workdir / 'documents').rglob('*') if path.is_file()]) == 2
+    assert list((workdir / 'uploads').iterdir()) == []
+    resent = processed_emails[1]['attachments'][0]
+    assert resent['duplicate'] is True
+    assert resent['document_id'] == processed_emails[0]['attachments'][0]['document_id']
+
+    # Assert that one Document row exists per distinct file and the resend is linked to the second application
+    with session_factory() as db:
+        assert db.query(Document).count() == 2
+        links = db.execute(application_documents.select()).fetchall()
+    assert [(link.application_id, link.document_id) for link in links] == [(processed_emails[1]['application_id'], resent['document_id'])]
+
+def test_new_documents_are_queued_for_extraction(dedup_processor):
+    from datetime import datetime
+    email_processor, mock_imap, session_factory, _ = dedup_processor
+    statement = b'%PDF-1.4 statement for march'
+    emails = {
+        b'1': _build_email('<first@example.com>', [('march.pdf', statement)]),
+        b'2': _build_email('<second@example.com>', [('march.pdf', statement), ('april.pdf', b'%PDF-1.4 april')]),
+    }
+    _serve_mailbox(mock_imap, emails)
+
+    processed_emails = email_processor.process_emails()
+
+    # Assert that each stored document was queued once, from the time its email was sent, and the resent statement was not queued again
+    with session_factory() as db:
+        jobs = db.query(ExtractionJob).all()
+    assert sorted(job.document_id for job in jobs) == sorted([processed_emails[0]['attachments'][0]['document_id'], processed_emails[1]['attachments'][1]['document_id']])
+    assert {job.received_at for job in jobs} == {datetime(2023, 10, 2, 10, 0)}
+
+def test_ingested_documents_name_the_merchant(dedup_processor):
+    from src.api.models.merchant import Merchant, MerchantNameBand
+    from src.services.extraction_queue import ExtractionWorker
+    from src.services.reprocessing import DocumentResults
+    email_processor, mock_imap, session_factory, workdir = dedup_processor
+    _serve_mailbox(mock_imap, {b'1': _build_email('<first@example.com>', [('march.pdf', b'%PDF-1.4 march')])})
+    processed_emails = email_processor.process_emails()
+
+    # Process the queued document for real, with OCR and extraction answered by mocks
+    data_extractor = Mock()
+    data_extractor.extract_from_ocr.return_value = {'account_holder': 'Riverside Diner LLC', 'account_number': 'XXXXXX4567'}
+    data_validator = Mock()
+    data_validator.validate_data.return_value = {'errors': [], 'warnings': []}
+    worker = ExtractionWorker(DocumentResults(email_processor.ingestor.storage, data_extractor, data_validator))
+    assert worker.process_next() is True
+    assert worker.process_next() is False
+
+    # Assert that the application's merchant was created and indexed from the statement, and the job is done
+    with session_factory() as db:
+        assert db.query(ExtractionJob).count() == 0
+        merchant = db.query(Merchant).one()
+        assert (merchant.application_id, merchant.business_name) == (processed_emails[0]['application_id'], 'Riverside Diner LLC')
+        assert db.query(MerchantNameBand).filter(MerchantNameBand.merchant_id == merchant.id).count() > 0
+
+def test_concurrently_stored_document_is_linked(dedup_processor):
+    from src.api.models.document import DocumentType, application_documents
+    email_processor, _, session_factory, _ = dedup_processor
+
+    # Another worker stores the same file after this worker's duplicate lookup
+    with session_factory() as db:
+        first_application, second_application = Application(), Application()
+        first_application.email_id, second_application.email_id = '<a@example.com>', '<b@example.com>'
+        db.add_all([first_application, second_application])
+        db.flush()
+        stored = Document(first_application.id, DocumentType.BANK_STATEMENT, 'a.pdf', '/uploads/a.pdf', 'application/pdf', 3, 'abc')
+        db.add(stored)
+        db.commit()
+        stored_id, second_application_id = stored.id, second_application.id
+
+    # Insert the same file for the second application
+    attachment = {'filename': 'b.pdf', 'file_path': '/uploads/b.pdf', 'content_type': 'application/pdf', 'file_size': 3, 'md5_hash': 'abc', 'document_type': DocumentType.BANK_STATEMENT}
+    with session_factory() as db:
+        document_id = email_processor.ingestor.create_document(db, second_application_id, attachment)
+        db.commit()
+
+    # Assert that the unique index rejected the copy and the application was linked instead
+    assert document_id == stored_id
+    with session_factory() as db:
+        assert db.query(Document).count() == 1
+        assert db.execute(application_documents.select()).fetchall() == [(second_application_id, stored_id)]
+
+def test_polls_resume_from_the_uid_checkpoint(dedup_processor):
+    from src.api.models.mailbox_checkpoint import MailboxCheckpoint
+    email_processor, mock_imap, session_factory, _ = dedup_processor
+
+    # The first poll has no checkpoint and takes the unseen messages
+    emails = {
+        b'1': _build_email('<first@example.com>', [('march.pdf', b'%PDF-1.4 march')]),
+        b'2': _build_email('<second@example.com>', [('april.pdf', b'%PDF-1.4 april')]),
+    }
+    seen, searches = _serve_mailbox(mock_imap, emails)
+    assert len(email_processor.process_emails()) == 2
+
+    # A new message arrives; someone also opens the first message and marks it unread again
+    emails[b'3'] = _build_email('<third@example.com>', [('may.pdf', b'%PDF-1.4 may')])
+    seen.discard(b'1')
+    processed_emails = EmailProcessor().process_emails()
+
+    # Assert that the second poll searched above the checkpoint and only ingested the new message
+    assert searches == ['UNSEEN', 'UID 3:*']
+    assert [email['email_subject'] for email in processed_emails] == ['Funding application']
+    with session_factory() as db:
+        assert db.query(Application).count() == 3
+        checkpoint = db.query(MailboxCheckpoint).one()
+    assert (checkpoint.mailbox, checkpoint.uid_validity, checkpoint.last_uid) == (settings.EMAIL_USERNAME, 1, 3)
+
+def test_redelivered_email_returns_the_existing_application(dedup_processor):
+    email_processor, mock_imap, session_factory, workdir = dedup_processor
+
+    # Ingest an email, then lose the checkpoint as if the server renumbered its UIDs
+    emails = {b'1': _build_email('<first@example.com>', [('march.pdf', b'%PDF-1.4 march')])}
+    _serve_mailbox(mock_imap, emails)
+    first = email_processor.process_emails()
+    _, searches = _serve_mailbox(mock_imap, emails, uid_validity=2)
+    second = EmailProcessor().process_emails()
+
+    # Assert that the whole folder was rescanned but the email mapped to the same application
+    assert searches == ['UID 1:*']
+    assert second[0]['duplicate'] is True
+    assert second[0]['application_id'] == first[0]['application_id']
+    with session_factory() as db:
+        assert db.query(Application).count() == 1
+    assert len([path for path in (workdir / 'documents').rglob('*') if path.is_file()]) == 1
+    assert list((workdir / 'uploads').iterdir()) == []
+
+def test_backlog_is_committed_in_batches_then_flagged(dedup_processor):
+    email_processor, mock_imap, session_factory, _ = dedup_processor
+    emails = {str(uid).encode(): _build_email(f'<{uid}@example.com>', [(f'{uid}.pdf', f'%PDF-1.4 {uid}'.encode())]) for uid in range(1, 6)}
+    seen, _ = _serve_mailbox(mock_imap, emails)
+
+    with patch.object(settings, 'INGESTION_BATCH_SIZE', 2), \
+         patch.object(email_processor.ingestor, 'ingest_batch', wraps=email_processor.ingestor.ingest_batch) as ingest_batch:
+        processed_emails = email_processor.process_emails()
+
+    # Assert that two batches and the remaining email were persisted, and every message flagged once committed
+    assert [len(call.args[0]) for call in ingest_batch.call_args_list] == [2, 2]
+    assert len(processed_emails) == 5
+    assert seen == set(emails)
+    stores = [call.args[1] for call in mock_imap.uid.call_args_list if call.args[0] == 'STORE']
+    assert stores == [b'1,2', b'3,4', b'5']
+    with session_factory() as db:
+        assert db.query(Application).count() == 5
+        assert db.query(Document).count() == 5
+        assert db.query(ExtractionJob).count() == 5
+
+def test_batch_conflicting_with_another_worker_is_persisted_email_by_email(dedup_processor):
+    email_processor, _, session_factory, _ = dedup_processor
+    ingestor = email_processor.ingestor
+
+    # Another worker ingests the second email after this batch looked its Message-ID up
+    with session_factory() as db:
+        other = Application()
+        other.email_id = '<second@example.com>'
+        db.add(other)
+        db.commit()
+        other_id = other.id
+
+    workdir = settings.TEMP_UPLOAD_DIR
+    os.makedirs(workdir, exist_ok=True)
+    def parsed(message_id, content):
+        path = os.path.join(workdir, f'{len(os.listdir(workdir))}.part')
+        with open(path, 'wb') as file:
+            file.write(content)
+        attachment = StreamedAttachment('statement.pdf', 'application/pdf', path, len(content), hashlib.md5(content).hexdigest())
+        return {'message_id': message_id, 'subject': message_id, 'date': None, 'attachments': [attachment]}
+
+    shared = b'%PDF-1.4 shared statement'
+    batch = [parsed('<first@example.com>', shared), parsed('<second@example.com>', b'%PDF-1.4 other'), parsed('<third@example.com>', shared)]
+    with patch.object(ingestor, 'find_applications', return_value={}):
+        results = ingestor.ingest_batch(batch)
+
+    # Assert that the rolled-back batch was persisted again and the shared file stored once
+    assert results[1] == {'application_id': other_id, 'email_subject': '<second@example.com>', 'attachments': [], 'duplicate': True}
+    assert results[2]['attachments'][0]['document_id'] == results[0]['attachments'][0]['document_id']
+    with session_factory() as db:
+        assert db.query(Application).count() == 3
+        assert db.query(Document).count() == 1
+        assert db.query(ExtractionJob).count() == 1
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.application import Application
+from src.api.models.document import Document, DocumentType
+from src.api.models.extraction_job import ExtractionJob
+from src.core.config import settings
+from src.core.database import Base
+from src.services.extraction_queue import ExtractionWorker, claim_job, enqueue_documents
+from src.utils.tracing import document_processing_latency
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A SQLite database with one application that the extraction workers open their sessions on
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with patch('src.services.extraction_queue.SessionLocal', session_factory):
+        yield session_factory
+    engine.dispose()
+
+def _queue(session_factory, document_type=DocumentType.BANK_STATEMENT, received_at=None):
+    # Create a document and queue it as ingestion does, returning its id
+    with session_factory() as db:
+        application = Application()
+        application.email_id = f'<{application.id}@example.com>'
+        db.add(application)
+        document = Document(application.id, document_type, 'march.pdf', f'documents/{application.id}.pdf', 'application/pdf', 3, application.id)
+        db.add(document)
+        db.flush()
+        enqueue_documents(db, [document], received_at)
+        db.commit()
+        return document.id
+
+def test_other_documents_are_not_queued(session_factory):
+    _queue(session_factory, DocumentType.OTHER)
+
+    with session_factory() as db:
+        assert db.query(ExtractionJob).count() == 0
+
+def test_claimed_job_is_leased_to_one_worker(session_factory):
+    document_id = _queue(session_factory)
+
+    with session_factory() as db, session_factory() as other:
+        job = claim_job(db)
+
+        # Assert that the job is held for the lease, and a second worker finds nothing to claim
+        assert (job.document_id, job.attempts) == (document_id, 1)
+        assert job.available_at >= datetime.utcnow() + timedelta(seconds=settings.EXTRACTION_LEASE_SECONDS - 5)
+        assert claim_job(other) is None
+
+def test_processed_job_is_deleted_with_the_results_committed(session_factory):
+    received_at = datetime(2023, 10, 2, 10, 0)
+    document_id = _queue(session_factory, received_at=received_at)
+    processed = []
+    document_results = Mock()
+    document_results.process_document.side_effect = lambda db, document: processed.append(document.id)
+    document_results.commit.side_effect = lambda db, document, outcome: db.commit()
+    before = document_processing_latency.snapshot()
+
+    assert ExtractionWorker(document_results).process_next() is True
+
+    # Assert that the document was processed and its job removed in the transaction storing its data,
+    # and its latency measured from the receipt of its email
+    assert processed == [document_id]
+    after = document_processing_latency.snapshot()
+    assert after["count"] == before["count"] + 1
+    assert after["sum"] - before["sum"] >= (datetime.utcnow() - received_at).total_seconds() - 60
+    with session_factory() as db:
+        assert db.query(ExtractionJob).count() == 0
+    assert ExtractionWorker(document_results).process_next() is False
+
+def test_failed_job_is_retried_until_attempts_run_out(session_factory):
+    document_id = _queue(session_factory)
+    document_results = Mock()
+    document_results.process_document.side_effect = RuntimeError('Textract throttled')
+    worker = ExtractionWorker(document_results)
+
+    with patch.object(settings, 'EXTRACTION_MAX_ATTEMPTS', 2), patch.object(settings, 'EXTRACTION_RETRY_DELAY', 0):
+        # Assert that each failure records its error and frees the job, until the last attempt
+        assert worker.process_next() is True
+        with session_factory() as db:
+            job = db.get(ExtractionJob, document_id)
+            assert (job.attempts, job.last_error) == (1, 'RuntimeError: Textract throttled')
+        assert worker.process_next() is True
+        assert worker.process_next() is False
+
+    with session_factory() as db:
+        assert db.get(ExtractionJob, document_id).attempts == 2
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+import pytest
+from src.services.extraction_templates import compiled_template
+
+def _bank_statement_ocr():
+    # The shape OCREngine returns: newline-joined lines, form key/value pairs and table rows
+    return {
+        'full_text': "First Commerce Bank\nAccount Holder Riverside Diner LLC\nDate Description Amount Balance\n01/03/2023 CARD SETTLEMENT 1,200.00 11,200.00",
+        'form_data': {'Account Holder:': 'Riverside Diner LLC', 'Acct #': '0012345678', 'Account Number': '1234567890',
+                      'Statement Period': '01/01/2023 - 01/31/2023', 'Beginning Balance': '$10,000.00', 'Ending Balance': '9,850.00'},
+        'tables': [
+            [['Date', 'Description', 'Amount', 'Balance'],
+             ['01/03/2023', 'CARD SETTLEMENT', '1,200.00', '11,200.00'],
+             ['01/09/2023', 'RENT', '-1,350.00', '9,850.00']],
+            # The table continues on the next page under a repeated header
+            [['Date', 'Description', 'Amount', 'Balance'],
+             ['Date', 'Description', 'Amount', 'Balance'],
+             ['01/20/2023', 'PAYROLL', '-500.00', '9,350.00']],
+        ],
+    }
+
+def test_form_data_and_tables_resolve_without_scanning_the_text():
+    template = compiled_template('bank_statement')
+
+    with patch.object(template, '_scan_text') as scan_text:
+        result = template.extract(_bank_statement_ocr())
+
+    # Assert that every field came from the indexed form data and the tables alone
+    assert not scan_text.called
+    assert result['account_holder'] == 'Riverside Diner LLC'
+    assert result['statement_period'] == '01/01/2023 - 01/31/2023'
+    assert result['opening_balance'] == '$10,000.00'
+    assert result['closing_balance'] == '9,850.00'
+    assert [row['description'] for row in result['transactions']] == ['CARD SETTLEMENT', 'RENT', 'PAYROLL']
+    assert result['transactions'][1] == {'date': '01/09/2023', 'description': 'RENT', 'amount': '-1,350.00', 'balance': '9,850.00'}
+
+def test_first_declared_alias_wins_when_several_are_present():
+    result = compiled_template('bank_statement').extract(_bank_statement_ocr())
+
+    # "Account Number" is declared before "Acct #"
+    assert result['account_number'] == '1234567890'
+
+def test_text_fills_only_the_fields_the_form_data_missed():
+    ocr_result = {
+        'full_text': "Statement Period: 02/01/2023 - 02/28/2023 Opening Balance: $1,000.00 Closing Balance: $1,250.00\n"
+                     "02/03/2023 Deposit $500.00 $1,500.00\n02/10/2023 Withdrawal -$250.00 $1,250.00",
+        'form_data': {'Account Holder': 'Maple Street Bakery', 'Opening Balance': '$900.00'},
+        'tables': [],
+    }
+
+    result = compiled_template('bank_statement').extract(ocr_result)
+
+    # Assert that form data takes precedence and values on a shared line end at the next label
+    assert result['account_holder'] == 'Maple Street Bakery'
+    assert result['opening_balance'] == '$900.00'
+    assert result['statement_period'] == '02/01/2023 - 02/28/2023'
+    assert result['closing_balance'] == '$1,250.00'
+    assert result['account_number'] is None
+
+    # Assert that without a recognised table, transactions are read from the text lines
+    assert result['transactions'] == [
+        {'date': '02/03/2023', 'description': 'Deposit', 'amount': '$500.00', 'balance': '$1,500.00'},
+        {'date': '02/10/2023', 'description': 'Withdrawal', 'amount': '-$250.00', 'balance': '$1,250.00'},
+    ]
+
+def test_longest_label_wins_and_values_may_follow_on_the_next_line():
+    text = "Company Name:\nXYZ Inc.\nTotal Revenue: $1,000,000\nNet Income: $200,000\nTotal Liabilities and Equity: $5,000,000\nEquity: $3,000,000"
+
+    result = compiled_template('financial_statement').extract(text)
+
+    # Assert that "Net Income" is not read as income, and a label without a value is skipped
+    assert result['company_name'] == 'XYZ Inc.'
+    assert result['revenue'] == '$1,000,000'
+    assert result['net_income'] == '$200,000'
+    assert result['liabilities'] is None
+    assert result['equity'] == '$3,000,000'
+
+def test_tables_can_be_collapsed_into_a_mapping():
+    ocr_result = {
+        'full_text': '',
+        'form_data': {'Name': 'Summit Auto Repair Inc', 'Tax Year': '2022', 'Total income': '1,250,000.00', 'Total tax': '52,500.00'},
+        'tables': [[['Deduction', 'Amount'], ['Rents', '36,000.00'], ['Interest', '4,100.00']]],
+    }
+
+    result = compiled_template('tax_return').extract(ocr_result)
+
+    assert result['taxpayer_name'] == 'Summit Auto Repair Inc'
+    assert result['tax_year'] == '2022'
+    assert result['tax_paid'] == '52,500.00'
+    assert result['deductions_credits'] == {'Rents': '36,000.00', 'Interest': '4,100.00'}
+
+def test_templates_are_compiled_once():
+    assert compiled_template('business_license') is compiled_template('business_license')
+
+def test_unknown_document_type_is_rejected():
+    with pytest.raises(ValueError):
+        compiled_template('passport')
@@ -0,0 +1,204 @@
+import re
+import threading
+import time
+from email.message import EmailMessage
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.mailbox_checkpoint import MailboxCheckpoint
+from src.core.config import settings
+from src.core.database import Base
+from src.services.email_processor import MailboxConfig
+from src.services.mailbox_supervisor import MailboxSupervisor
+
+def _build_email(message_id):
+    message = EmailMessage()
+    message['Subject'] = 'Funding application'
+    message['Message-ID'] = message_id
+    message.set_content('Statements attached')
+    message.add_attachment(message_id.encode() * 100, maintype='application', subtype='pdf', filename='statement.pdf')
+    return message.as_bytes()
+
+class _FakeMailbox:
+    # Server-side state of one mailbox: messages by UID, \Seen flags and who set them
+    def __init__(self, name, count):
+        self.messages = {}
+        self.seen = set()
+        self.flagged_by = set()
+        self.fetches = []
+        self.lock = threading.Lock()
+        for _ in range(count):
+            self.deliver(name)
+
+    def deliver(self, name):
+        with self.lock:
+            uid = len(self.messages) + 1
+            self.messages[uid] = _build_email(f'<{name}-{uid}@example.com>')
+
+class _FakeImap:
+    # Just enough of imaplib.IMAP4_SSL for UID SEARCH, partial UID FETCH and UID STORE
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+
+    def login(self, username, password):
+        pass
+
+    def select(self, folder):
+        return 'OK', [str(len(self.mailbox.messages)).encode()]
+
+    def response(self, code):
+        with self.mailbox.lock:
+            return code, [str(1 if code == 'UIDVALIDITY' else len(self.mailbox.messages) + 1).encode()]
+
+    def logout(self):
+        pass
+
+    def uid(self, command, *args):
+        with self.mailbox.lock:
+            if command == 'SEARCH':
+                if args[1] == 'UNSEEN':
+                    uids = [uid for uid in self.mailbox.messages if uid not in self.mailbox.seen]
+                else:
+                    # Like a real server, "n:*" matches the highest UID even when it is below n
+                    start = int(re.match(r'UID (\d+):\*', args[1]).group(1))
+                    uids = [uid for uid in self.mailbox.messages if uid >= start] or [max(self.mailbox.messages)]
+                return 'OK', [b' '.join(str(uid).encode() for uid in uids)]
+            if command == 'FETCH':
+                offset, length = map(int, re.search(r'<(\d+)\.(\d+)>', args[1]).groups())
+                if offset == 0:
+                    self.mailbox.fetches.append(int(args[0]))
+                return 'OK', [(b'', self.mailbox.messages[int(args[0])][offset:offset + length]), b')']
+            if command == 'STORE':
+                self.mailbox.seen.add(int(args[0]))
+                self.mailbox.flagged_by.add(threading.current_thread().name)
+                return 'OK', []
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def mailboxes(tmp_path):
+    # Two intake mailboxes on the same server, each reached over its own connection
+    servers = {'iso-a': _FakeMailbox('iso-a', 3), 'iso-b': _FakeMailbox('iso-b', 3)}
+    configs = [MailboxConfig(name, 'imap.example.com', 993, name, 'secret') for name in servers]
+    connections = []
+
+    def connect(server, port):
+        connection = _FakeImap(None)
+        original_login = connection.login
+
+        def login(username, password):
+            connection.mailbox = servers[username]
+            connections.append(username)
+            original_login(username, password)
+        connection.login = login
+        return connection
+
+    # Checkpoints are stored in a SQLite database
+    engine = create_engine(f"sqlite:///{tmp_path / 'checkpoints.db'}")
+    Base.metadata.create_all(engine)
+
+    with patch('imaplib.IMAP4_SSL', side_effect=connect), \
+         patch('src.services.email_processor.SessionLocal', sessionmaker(bind=engine)), \
+         patch('src.services.mailbox_supervisor.EmailIngestor') as mock_ingestor, \
+         patch.object(settings, 'TEMP_UPLOAD_DIR', str(tmp_path)), \
+         patch.object(settings, 'EMAIL_FETCH_CHUNK_SIZE', 256):
+        ingestor = mock_ingestor.return_value
+        # Batches taken off a backlog count as one ingestion per email
+        ingestor.ingest_batch.side_effect = lambda emails: [ingestor.ingest(email_data) for email_data in emails]
+        yield servers, configs, connections, ingestor.ingest, sessionmaker(bind=engine)
+
+def _ingested_ids(ingest):
+    return sorted(call.args[0]['message_id'] for call in ingest.call_args_list)
+
+def test_each_mailbox_is_ingested_over_its_own_connection(mailboxes):
+    servers, configs, connections, ingest, _ = mailboxes
+
+    # Run both mailboxes against a queue smaller than the backlog
+    supervisor = MailboxSupervisor(configs, ingestion_workers=2, queue_size=1, poll_interval=0.05)
+    supervisor.start()
+    try:
+        _wait_for(lambda: ingest.call_count == 6)
+
+        # Deliver a new message and wait for the next poll to pick it up
+        servers['iso-a'].deliver('iso-a')
+        _wait_for(lambda: ingest.call_count == 7)
+    finally:
+        supervisor.stop()
+
+    # Assert that each mailbox used one connection and every message was ingested exactly once
+    assert sorted(connections) == ['iso-a', 'iso-b']
+    assert _ingested_ids(ingest) == sorted(
+        [f'<iso-a-{uid}@example.com>' for uid in range(1, 5)] + [f'<iso-b-{uid}@example.com>' for uid in range(1, 4)]
+    )
+
+    # Assert that polls after the first only fetched messages above the checkpoint
+    assert servers['iso-a'].fetches == [1, 2, 3, 4]
+    assert servers['iso-b'].fetches == [1, 2, 3]
+
+    # Assert that messages were flagged once persisted, by the worker owning the connection
+    assert servers['iso-a'].seen == {1, 2, 3, 4}
+    assert servers['iso-a'].flagged_by == {'mailbox-iso-a'}
+    assert servers['iso-b'].flagged_by == {'mailbox-iso-b'}
+
+def test_email_that_fails_to_persist_holds_the_checkpoint_back(mailboxes):
+    servers, configs, _, ingest, session_factory = mailboxes
+
+    # The mailbox already has a checkpoint, and persistence keeps failing for its second message
+    with session_factory() as db:
+        db.add(MailboxCheckpoint('iso-a', 1, 0))
+        db.commit()
+
+    def ingest_email(email_data):
+        if email_data['message_id'] == '<iso-a-2@example.com>':
+            raise RuntimeError("database unavailable")
+        return {'application_id': 'app', 'email_subject': email_data['subject'], 'attachments': []}
+    ingest.side_effect = ingest_email
+
+    supervisor = MailboxSupervisor(configs[:1], ingestion_workers=1, poll_interval=0.05)
+    supervisor.start()
+    try:
+        # Wait until the failed message has been retried by a later poll
+        _wait_for(lambda: ingest.call_count >= 4)
+    finally:
+        supervisor.stop()
+
+    # Assert that only the persisted messages were flagged and only the failed one was fetched again
+    assert servers['iso-a'].seen == {1, 3}
+    assert set(servers['iso-a'].fetches[3:]) == {2}
+
+    # Assert that the stored checkpoint stays below the failed message
+    with session_factory() as db:
+        assert db.query(MailboxCheckpoint).get('iso-a').last_uid == 1
+
+def test_restarted_worker_resumes_from_the_stored_checkpoint(mailboxes):
+    servers, configs, _, ingest, session_factory = mailboxes
+
+    # Ingest the backlog, then stop
+    supervisor = MailboxSupervisor(configs[:1], ingestion_workers=2, poll_interval=0.05)
+    supervisor.start()
+    try:
+        _wait_for(lambda: ingest.call_count == 3)
+    finally:
+        supervisor.stop()
+    with session_factory() as db:
+        assert db.query(MailboxCheckpoint).get('iso-a').last_uid == 3
+
+    # A message arrives and someone marks an ingested one unread before the restart
+    servers['iso-a'].deliver('iso-a')
+    servers['iso-a'].seen.discard(2)
+    supervisor = MailboxSupervisor(configs[:1], ingestion_workers=2, poll_interval=0.05)
+    supervisor.start()
+    try:
+        _wait_for(lambda: ingest.call_count == 4)
+        time.sleep(0.2)
+    finally:
+        supervisor.stop()
+
+    # Assert that only the new message was fetched after the restart
+    assert servers['iso-a'].fetches == [1, 2, 3, 4]
+    assert ingest.call_count == 4
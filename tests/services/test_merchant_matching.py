@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+# Registers the applications table the merchants refer to
+from src.api.models.application import Application
+from src.api.models.document import Document, DocumentType
+from src.api.models.identity_key import IdentityKey
+from src.api.models.merchant import Merchant, MerchantNameBand
+from src.services.merchant_matching import (
+    BANDS, backfill_merchants, band_values, find_candidate_merchants, name_trigrams, save_merchant, similarity,
+)
+from src.services.transaction_store import store_extracted_data
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    Merchant.__table__.create(engine)
+    MerchantNameBand.__table__.create(engine)
+    IdentityKey.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+def test_similar_names_share_bands():
+    riverside = band_values(name_trigrams('RIVERSIDE DINER'))
+    misspelled = band_values(name_trigrams('RIVERSIDE DINNER'))
+    unrelated = band_values(name_trigrams('LAKESIDE GRILL'))
+
+    assert len(riverside) == BANDS
+    assert sum(a == b for a, b in zip(riverside, misspelled)) > sum(a == b for a, b in zip(riverside, unrelated))
+    # Assert that the same name always hashes the same
+    assert riverside == band_values(name_trigrams('RIVERSIDE DINER'))
+
+def test_similarity_is_the_jaccard_index_of_trigrams():
+    assert similarity(name_trigrams('RIVERSIDE DINER'), name_trigrams('RIVERSIDE DINER')) == 1.0
+    assert similarity(name_trigrams('AB'), name_trigrams('CD')) == 0.0
+    assert similarity(set(), name_trigrams('AB')) == 0.0
+
+def test_candidates_are_ranked_by_similarity(db):
+    save_merchant(db, 'app-1', 'Riverside Diner LLC', 'RIVERSIDE DINER')
+    save_merchant(db, 'app-2', 'Riverside Dinner', 'RIVERSIDE DINNER')
+    save_merchant(db, 'app-3', 'Lakeside Grill Inc', 'LAKESIDE GRILL')
+
+    matches = find_candidate_merchants(db, 'RIVERSIDE DINER')
+
+    assert [(merchant.application_id, round(score, 2)) for merchant, score in matches] == [('app-1', 1.0), ('app-2', 0.83)]
+    assert [merchant.application_id for merchant, _ in find_candidate_merchants(db, 'RIVERSIDE DINER', exclude_application_id='app-1')] == ['app-2']
+    assert find_candidate_merchants(db, 'MOUNTAIN BAKERY') == []
+
+def test_an_application_keeps_its_first_merchant(db):
+    first = save_merchant(db, 'app-1', 'Riverside Diner LLC', 'RIVERSIDE DINER')
+
+    assert save_merchant(db, 'app-1', 'Lakeside Grill', 'LAKESIDE GRILL') is first
+    assert db.query(MerchantNameBand.__table__).count() == BANDS
+
+def test_stored_documents_name_the_merchant(db):
+    document = SimpleNamespace(id='doc-1', application_id='app-1', type='business_license', file_path='documents/ab/abc.pdf', extracted_data=None)
+
+    store_extracted_data(db, document, {'business_name': 'Riverside Diner, L.L.C.'})
+
+    merchant = db.query(Merchant).one()
+    assert (merchant.business_name, merchant.normalized_name) == ('Riverside Diner, L.L.C.', 'RIVERSIDE DINER')
+
+def test_backfill_names_merchants_from_indexed_business_names(db):
+    from src.services.cross_document_validator import record_identity_keys
+    Document.__table__.create(db.get_bind())
+
+    # Two documents of one application, indexed before merchants existed, and an application that already has one
+    for number, (application_id, business_name) in enumerate([('app-1', 'Riverside Diner, L.L.C.'), ('app-1', 'Riverside Diner Inc'), ('app-2', 'Lakeside Grill')]):
+        document = Document(application_id, DocumentType.BUSINESS_LICENSE, f'{number}.pdf', f'documents/{number}.pdf', 'application/pdf', 3, str(number), {'business_name': business_name})
+        db.add(document)
+        db.flush()
+        record_identity_keys(db, document.id, application_id, 'business_license', document.extracted_data)
+    save_merchant(db, 'app-2', 'Lakeside Grill', 'LAKESIDE GRILL')
+
+    # Assert that only the application without a merchant gets one, named by its first document
+    assert backfill_merchants(db) == 1
+    merchant = db.query(Merchant).filter(Merchant.application_id == 'app-1').one()
+    assert (merchant.business_name, merchant.normalized_name) == ('Riverside Diner, L.L.C.', 'RIVERSIDE DINER')
+    assert [match.application_id for match, _ in find_candidate_merchants(db, 'RIVERSIDE DINER')] == ['app-1']
+    assert backfill_merchants(db) == 0
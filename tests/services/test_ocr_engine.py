@@ -15,7 +15,7 @@ def test_ocr_engine_initialization():
         mock_boto3_client.assert_called_once_with(
             'textract',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY.get_secret_value(),
             region_name=settings.AWS_REGION
         )
         
@@ -53,7 +53,7 @@ async def test_perform_ocr():
         )
         
         # Assert that the returned OCR results contain expected keys
-        assert set(ocr_results.keys()) == {'full_text', 'form_data', 'tables'}
+        assert set(ocr_results.keys()) == {'full_text', 'form_data', 'tables', 'pages'}
         
         # Verify that extract_text, extract_form_data, and extract_tables methods were called
         assert ocr_results['full_text'] == 'Sample text'
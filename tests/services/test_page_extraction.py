@@ -0,0 +1,85 @@
+from decimal import Decimal
+from unittest.mock import patch
+import pytest
+from src.core.config import settings
+from src.services.bank_layouts import get_bank_layouts
+from src.services.extraction_templates import compiled_template
+from src.services.page_extraction import check_balance_continuity, extract_by_page
+
+def _statement(pages, rows_per_page, with_tables=True, headerless_continuations=False, opening=Decimal('1000.00')):
+    # A multi-page statement as OCREngine returns it, with a running balance across pages
+    balance = opening
+    result_pages = []
+    for number in range(1, pages + 1):
+        lines = ["First Commerce Bank", "Business Checking Bank Statement", f"Opening Balance: {opening:,.2f}"] if number == 1 else [f"Page {number} of {pages}"]
+        table = [] if headerless_continuations and number > 1 else [['Date', 'Description', 'Amount', 'Balance']]
+        for row in range(rows_per_page):
+            amount = Decimal(((number * 37 + row * 11) % 200) - 80).quantize(Decimal('0.01'))
+            balance += amount
+            cells = [f"01/{(row % 28) + 1:02d}/2023", f"PAYMENT {number}-{row}", f"{amount:,.2f}", f"{balance:,.2f}"]
+            table.append(cells)
+            lines.append(" ".join(cells))
+        result_pages.append({'page': number, 'full_text': "\n".join(lines), 'tables': [table] if with_tables else []})
+
+    return {
+        'full_text': "\n".join(page['full_text'] for page in result_pages),
+        'form_data': {'Account Number': '1234567890'},
+        'tables': [table for page in result_pages for table in page['tables']],
+        'pages': result_pages,
+    }
+
+@pytest.mark.parametrize("template", [compiled_template('bank_statement'), get_bank_layouts().templates['first_commerce_bank']])
+@pytest.mark.parametrize("options", [{}, {'with_tables': False}, {'headerless_continuations': True}])
+def test_page_by_page_extraction_matches_serial_extraction(template, options):
+    ocr_result = _statement(12, 25, **options)
+
+    extracted, page_rows = extract_by_page(template, ocr_result)
+
+    # Assert that reading pages separately and merging them gives exactly the serial result
+    assert extracted == template.extract(ocr_result)
+    assert len(extracted['transactions']) == 300
+    assert page_rows['transactions'] == [(page, 25) for page in range(1, 13)]
+
+def test_worker_processes_return_rows_in_page_order():
+    ocr_result = _statement(8, 40)
+    template = compiled_template('bank_statement')
+
+    # Parse every page in two worker processes
+    with patch.object(settings, 'EXTRACTION_PARALLEL_MIN_PAGES', 2), patch.object(settings, 'EXTRACTION_WORKERS', 2):
+        extracted, page_rows = extract_by_page(template, ocr_result)
+
+    assert extracted == template.extract(ocr_result)
+    assert [row['description'] for row in extracted['transactions'][38:42]] == ['PAYMENT 1-38', 'PAYMENT 1-39', 'PAYMENT 2-0', 'PAYMENT 2-1']
+
+def test_results_without_pages_are_extracted_whole():
+    template = compiled_template('bank_statement')
+
+    extracted, page_rows = extract_by_page(template, "Opening Balance: $100.00\n01/02/2023 Deposit $50.00 $150.00")
+
+    assert extracted['opening_balance'] == '$100.00'
+    assert len(extracted['transactions']) == 1
+    assert page_rows == {}
+
+def test_continuous_balances_have_no_breaks():
+    ocr_result = _statement(5, 10)
+    extracted, page_rows = extract_by_page(compiled_template('bank_statement'), ocr_result)
+
+    assert check_balance_continuity(extracted['transactions'], page_rows['transactions'], extracted['opening_balance']) == []
+
+def test_row_lost_at_a_page_break_is_reported():
+    ocr_result = _statement(5, 10)
+    # OCR missed the first row of page 3
+    del ocr_result['pages'][2]['tables'][0][1]
+    extracted, page_rows = extract_by_page(compiled_template('bank_statement'), ocr_result)
+
+    breaks = check_balance_continuity(extracted['transactions'], page_rows['transactions'], extracted['opening_balance'])
+
+    # Assert that only the break after the lost row is reported, with the balance carried into it
+    assert [entry['page'] for entry in breaks] == [3]
+    assert Decimal(breaks[0]['carried_balance']) == Decimal(extracted['transactions'][19]['balance'].replace(',', ''))
+
+def test_opening_balance_is_carried_into_the_first_page():
+    transactions = [{'amount': '50.00', 'balance': '1,060.00'}]
+
+    assert check_balance_continuity(transactions, [(1, 1)], '$1,000.00')[0]['page'] == 1
+    assert check_balance_continuity(transactions, [(1, 1)], '$1,010.00') == []
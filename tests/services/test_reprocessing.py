@@ -0,0 +1,261 @@
+import json
+from decimal import Decimal
+from unittest.mock import Mock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.api.models.application import Application
+from src.api.models.cash_flow_metrics import CashFlowMetrics
+from src.api.models.document import Document, DocumentType
+from src.core.database import Base
+from src.services.bank_layouts import BUNDLED_LAYOUT_DIR, BankLayoutRegistry
+from src.services.cash_flow import statement_metrics
+from src.services.data_extractor import DataExtractor
+from src.services.data_validator import RULE_VERSIONS
+from src.services.reprocessing import QUEUED_PER_WORKER, DocumentResults, extraction_version, ocr_key, reprocess, results_key
+from src.services.storage import LocalStorage
+from src.utils.tracing import current_span
+
+STORAGE_KEY = 'documents/ab/abc.pdf'
+OCR_RESULT = {
+    'full_text': "Taxpayer Name: Riverside Diner LLC\nTax Year: 2022\nTotal Income: $120,000.00",
+    'form_data': {},
+    'tables': [],
+}
+
+@pytest.fixture
+def document_results(tmp_path):
+    with patch('src.services.data_extractor.OCREngine'):
+        data_extractor = DataExtractor()
+    data_extractor.ocr_engine.perform_stored_ocr.return_value = OCR_RESULT
+    data_validator = Mock()
+    data_validator.validate_data.return_value = {'errors': [], 'warnings': []}
+    return DocumentResults(LocalStorage(str(tmp_path)), data_extractor, data_validator)
+
+@pytest.fixture
+def stored_document(tmp_path):
+    # A tax return of one application in a SQLite database that reprocessing sessions are opened on
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        application = Application()
+        application.email_id = '<tax-return@example.com>'
+        db.add(application)
+        document = Document(application.id, DocumentType.TAX_RETURN, 'return.pdf', STORAGE_KEY, 'application/pdf', 3, 'abc')
+        db.add(document)
+        db.commit()
+        document_id = document.id
+
+    with patch('src.services.reprocessing.SessionLocal', session_factory):
+        yield session_factory, document_id
+
+def test_ocr_result_is_cached_next_to_the_document(document_results, tmp_path):
+    outcome = document_results.process(STORAGE_KEY, 'tax_return')
+
+    # Assert that OCR, extraction and validation all ran, and their results were stored beside the document
+    assert outcome.status == 'updated' and outcome.revalidated
+    assert outcome.results['extraction']['data']['taxpayer_name'] == 'Riverside Diner LLC'
+    assert json.loads((tmp_path / ocr_key(STORAGE_KEY)).read_text()) == OCR_RESULT
+    assert (tmp_path / results_key(STORAGE_KEY)).exists()
+
+    # Assert that processing it again recomputes nothing
+    with patch.object(document_results.data_extractor, 'extract_from_ocr') as extract_from_ocr:
+        assert document_results.process(STORAGE_KEY, 'tax_return').status == 'current'
+    assert not extract_from_ocr.called
+    document_results.data_extractor.ocr_engine.perform_stored_ocr.assert_called_once_with(STORAGE_KEY)
+    document_results.data_validator.validate_data.assert_called_once()
+
+def test_template_change_reextracts_from_the_cached_ocr_result(document_results):
+    document_results.process(STORAGE_KEY, 'tax_return')
+    document_results.data_validator.validate_data.reset_mock()
+
+    # A template change that does not change what this document yields
+    with patch('src.services.reprocessing.extraction_version', return_value='changed'):
+        outcome = document_results.process(STORAGE_KEY, 'tax_return', run_ocr=False)
+
+    assert outcome.status == 'updated' and outcome.changed_fields == []
+    assert outcome.results['extraction']['version'] == 'changed'
+    # Assert that Textract was not called again, and the unchanged data was not validated again
+    assert document_results.data_extractor.ocr_engine.perform_stored_ocr.call_count == 1
+    assert not document_results.data_validator.validate_data.called
+
+def test_changed_fields_are_reported_and_revalidated(document_results):
+    document_results.process(STORAGE_KEY, 'tax_return')
+    document_results.data_validator.validate_data.reset_mock()
+
+    fixed = dict(document_results.load(STORAGE_KEY)['extraction']['data'], tax_year='2023')
+    with patch('src.services.reprocessing.extraction_version', return_value='changed'), \
+            patch.object(document_results.data_extractor, 'extract_from_ocr', return_value=fixed):
+        outcome = document_results.process(STORAGE_KEY, 'tax_return', run_ocr=False)
+
+    assert outcome.changed_fields == ['tax_year']
+    assert outcome.revalidated
+    document_results.data_validator.validate_data.assert_called_once()
+
+def test_rule_change_only_revalidates(document_results):
+    document_results.process(STORAGE_KEY, 'tax_return')
+
+    version = RULE_VERSIONS['tax_return'] + 1
+    with patch.dict('src.services.reprocessing.RULE_VERSIONS', {'tax_return': version}), \
+            patch.object(document_results.data_extractor, 'extract_from_ocr') as extract_from_ocr:
+        outcome = document_results.process(STORAGE_KEY, 'tax_return', run_ocr=False)
+
+    assert outcome.revalidated and outcome.results['validation']['version'] == str(version)
+    assert not extract_from_ocr.called
+
+def test_stale_documents_without_cached_ocr_are_not_sent_to_textract(document_results, stored_document, tmp_path):
+    _, document_id = stored_document
+    counts = reprocess([document_id], document_results, workers=2)
+
+    assert counts == {'missing_ocr': 1}
+    assert not document_results.data_extractor.ocr_engine.perform_stored_ocr.called
+    assert not (tmp_path / results_key(STORAGE_KEY)).exists()
+
+def test_document_stages_are_traced_with_the_document_id(document_results, stored_document):
+    session_factory, document_id = stored_document
+    spans = []
+    document_results.data_extractor.ocr_engine.perform_stored_ocr.side_effect = lambda storage_key: spans.append(dict(current_span().attributes)) or OCR_RESULT
+    document_results.data_validator.validate_data.side_effect = lambda data, document_type: spans.append(dict(current_span().attributes)) or {'errors': [], 'warnings': []}
+
+    with session_factory() as db:
+        document = db.get(Document, document_id)
+        document_results.process_document(db, document)
+
+    # Assert that OCR and validation ran in spans naming the document and its application
+    assert [span['document_id'] for span in spans] == [document_id, document_id]
+    assert spans[0]['application_id'] == document.application_id
+
+def test_dry_run_stores_nothing(document_results, stored_document):
+    session_factory, document_id = stored_document
+    document_results.ocr_result(STORAGE_KEY)
+
+    counts = reprocess([document_id], document_results, save=False)
+
+    assert counts == {'updated': 1}
+    assert document_results.load(STORAGE_KEY) is None
+    with session_factory() as db:
+        assert db.get(Document, document_id).extracted_data is None
+
+def test_reextracted_data_is_stored_in_the_database(document_results, stored_document):
+    session_factory, document_id = stored_document
+    document_results.ocr_result(STORAGE_KEY)
+
+    # Reprocess the document, then again after a template fix that changes one field
+    assert reprocess([document_id], document_results) == {'updated': 1}
+    fixed = dict(document_results.load(STORAGE_KEY)['extraction']['data'], tax_year='2023')
+    with patch('src.services.reprocessing.extraction_version', return_value='changed'), \
+            patch.object(document_results.data_extractor, 'extract_from_ocr', return_value=fixed):
+        assert reprocess([document_id], document_results) == {'updated': 1}
+
+    # Assert that the document row carries the re-extracted data
+    with session_factory() as db:
+        extracted_data = db.get(Document, document_id).extracted_data
+    assert extracted_data['taxpayer_name'] == 'Riverside Diner LLC'
+    assert extracted_data['tax_year'] == '2023'
+
+def test_results_are_stored_only_once_the_database_commits(document_results, stored_document):
+    session_factory, document_id = stored_document
+    document_results.ocr_result(STORAGE_KEY)
+
+    # The first attempt fails to commit the extracted data
+    with session_factory() as db:
+        document = db.get(Document, document_id)
+        outcome = document_results.process_document(db, document)
+        with patch.object(db, 'commit', side_effect=RuntimeError('connection lost')), pytest.raises(RuntimeError):
+            document_results.commit(db, document, outcome)
+    assert document_results.load(STORAGE_KEY) is None
+
+    # Assert that the next run still finds the document stale and stores its data
+    assert reprocess([document_id], document_results) == {'updated': 1}
+    assert document_results.load(STORAGE_KEY)['extraction']['data']['taxpayer_name'] == 'Riverside Diner LLC'
+    with session_factory() as db:
+        assert db.get(Document, document_id).extracted_data['taxpayer_name'] == 'Riverside Diner LLC'
+
+def test_reprocessed_statement_replaces_its_cash_flow_metrics(document_results, stored_document):
+    session_factory, tax_return_id = stored_document
+    statement_key = 'documents/cd/cde.pdf'
+    with session_factory() as db:
+        application_id = db.get(Document, tax_return_id).application_id
+        statement = Document(application_id, DocumentType.BANK_STATEMENT, 'march.pdf', statement_key, 'application/pdf', 3, 'cde')
+        db.add(statement)
+        db.commit()
+        statement_id = statement.id
+    document_results.ocr_result(statement_key)
+
+    # The statement is first extracted without its last transaction, then completely after a layout fix
+    transactions = [
+        {'date': '03/01/2023', 'description': 'DEPOSIT', 'amount': '500.00', 'balance': '1,500.00'},
+        {'date': '03/02/2023', 'description': 'NSF FEE', 'amount': '-35.00', 'balance': '-35.00'},
+        {'date': '03/03/2023', 'description': 'DEPOSIT', 'amount': '1,065.00', 'balance': '1,030.00'},
+    ]
+    def extracted(count):
+        return {'transactions': transactions[:count], 'cash_flow': statement_metrics(transactions[:count])}
+
+    with patch.object(document_results.data_extractor, 'extract_from_ocr', return_value=extracted(2)):
+        assert reprocess([statement_id], document_results) == {'updated': 1}
+    with patch('src.services.reprocessing.extraction_version', return_value='changed'), \
+            patch.object(document_results.data_extractor, 'extract_from_ocr', return_value=extracted(3)):
+        assert reprocess([statement_id], document_results) == {'updated': 1}
+
+    # Assert that the application's metrics count the statement once, with its re-extracted transactions
+    with session_factory() as db:
+        cash_flow = db.query(CashFlowMetrics).filter(CashFlowMetrics.application_id == application_id).one()
+        assert db.get(Document, statement_id).extracted_data['transaction_count'] == 3
+    assert cash_flow.statement_count == 1
+    assert cash_flow.deposit_total == Decimal('1565.00')
+    assert cash_flow.nsf_count == 1
+
+def test_application_documents_are_validated_together(document_results, stored_document):
+    session_factory, tax_return_id = stored_document
+    amended_key = 'documents/cd/cde.pdf'
+    extracted = [{'taxpayer_name': 'Riverside Diner LLC', 'ein': '12-3456789'}, {'taxpayer_name': 'Riverside Diner', 'ein': '98-7654321'}]
+
+    # Process two tax returns of one application that carry different EINs
+    with session_factory() as db, patch.object(document_results.data_extractor, 'extract_from_ocr', side_effect=extracted):
+        first = db.get(Document, tax_return_id)
+        amended = Document(first.application_id, DocumentType.TAX_RETURN, 'amended.pdf', amended_key, 'application/pdf', 3, 'cde')
+        db.add(amended)
+        db.flush()
+        first_outcome = document_results.process_document(db, first)
+        amended_outcome = document_results.process_document(db, amended)
+        document_results.commit(db, amended, amended_outcome)
+
+    # Assert that the second return was checked against the first, and the result was not stored with its own
+    assert first_outcome.results['cross_document'] == {'errors': [], 'warnings': []}
+    assert amended_outcome.results['cross_document']['errors'] == ["Documents carry different Employer Identification Numbers"]
+    assert 'cross_document' not in document_results.load(amended_key)
+
+def test_reprocess_reads_ids_as_workers_free_up(document_results):
+    read = []
+    def document_ids():
+        for index in range(100):
+            read.append(index)
+            yield f'doc-{index}'
+
+    # Record how far ahead of the processed documents the ids were read
+    lead = []
+    def process_document(db, document, run_ocr, save):
+        lead.append(len(read) - len(lead))
+        return Mock(status='current', changed_fields=[])
+
+    with patch('src.services.reprocessing.SessionLocal'), \
+            patch.object(document_results, 'process_document', side_effect=process_document):
+        counts = reprocess(document_ids(), document_results, workers=2)
+
+    assert counts == {'current': 100}
+    assert max(lead) <= 2 * QUEUED_PER_WORKER + 1
+
+def test_a_new_bank_layout_only_makes_bank_statements_stale(tmp_path):
+    (tmp_path / 'prairie_state_bank.json').write_text(json.dumps({'markers': ['Prairie State Bank'], 'columns': ['date', 'amount']}))
+    before = {document_type: extraction_version(document_type) for document_type in ('bank_statement', 'tax_return')}
+
+    extraction_version.cache_clear()
+    try:
+        with patch('src.services.reprocessing.get_bank_layouts', return_value=BankLayoutRegistry([BUNDLED_LAYOUT_DIR, str(tmp_path)])):
+            after = {document_type: extraction_version(document_type) for document_type in ('bank_statement', 'tax_return')}
+    finally:
+        extraction_version.cache_clear()
+
+    assert after['bank_statement'] != before['bank_statement']
+    assert after['tax_return'] == before['tax_return']
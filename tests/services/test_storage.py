@@ -0,0 +1,168 @@
+import errno
+import os
+from unittest.mock import Mock, patch
+import pytest
+from src.core.config import settings
+from src.services.storage import LocalStorage, S3Storage, document_key
+
+BUCKET = 'mca-documents-test'
+
+def _chunks(data: bytes, size: int):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+@pytest.fixture
+def local_storage(tmp_path):
+    return LocalStorage(str(tmp_path / 'documents'))
+
+@pytest.fixture
+def s3_storage():
+    # Run against moto's in-memory S3 stand-in
+    moto = pytest.importorskip('moto')
+    import boto3
+    with moto.mock_s3():
+        client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+        client.create_bucket(Bucket=BUCKET)
+        yield S3Storage(BUCKET, client=client, part_size=5 * 1024 * 1024)
+
+def test_local_store_file_moves_the_file(local_storage, tmp_path):
+    source = tmp_path / 'upload.part'
+    source.write_bytes(b'%PDF-1.4 statement')
+
+    local_storage.store_file('documents/ab/abc.pdf', str(source))
+
+    # Assert that the file was moved under the root and is readable by key
+    assert not source.exists()
+    assert b''.join(local_storage.read_range('documents/ab/abc.pdf')) == b'%PDF-1.4 statement'
+    assert local_storage.size('documents/ab/abc.pdf') == 18
+
+def test_local_store_file_across_filesystems_is_copied_then_renamed(local_storage, tmp_path):
+    source = tmp_path / 'upload.part'
+    source.write_bytes(b'%PDF-1.4 statement')
+    real_replace = os.replace
+    renamed = []
+
+    def replace(src, dst):
+        # The upload directory is on another filesystem; renames within the storage root still work
+        if src == str(source):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        renamed.append(src)
+        return real_replace(src, dst)
+
+    with patch('src.services.storage.os.replace', side_effect=replace):
+        local_storage.store_file('documents/ab/abc.pdf', str(source))
+
+    # Assert that a temporary copy next to the destination was renamed into place and the source removed
+    assert [os.path.dirname(path) for path in renamed] == [local_storage.local_path('documents/ab')]
+    assert not source.exists()
+    assert os.listdir(local_storage.local_path('documents/ab')) == ['abc.pdf']
+    assert b''.join(local_storage.read_range('documents/ab/abc.pdf')) == b'%PDF-1.4 statement'
+
+def test_local_read_range_returns_only_the_requested_bytes(local_storage):
+    data = os.urandom(1024 * 1024)
+    assert local_storage.store_stream('big.pdf', _chunks(data, 4096)) == len(data)
+
+    # Assert that ranges, including the open-ended one, match slices of the content
+    assert b''.join(local_storage.read_range('big.pdf', 1000, 1999)) == data[1000:2000]
+    assert b''.join(local_storage.read_range('big.pdf', len(data) - 10)) == data[-10:]
+
+def test_local_store_stream_leaves_nothing_behind_on_error(local_storage, tmp_path):
+    def failing_chunks():
+        yield b'partial'
+        raise IOError("client disconnected")
+
+    with pytest.raises(IOError):
+        local_storage.store_stream('documents/x.pdf', failing_chunks())
+
+    # Assert that neither the object nor a partial file exists
+    assert list((tmp_path / 'documents' / 'documents').iterdir()) == []
+
+def test_local_keys_cannot_escape_the_root(local_storage):
+    with pytest.raises(ValueError):
+        local_storage.local_path('../../etc/passwd')
+
+def test_document_key_is_content_addressed():
+    assert document_key('d41d8cd98f00b204e9800998ecf8427e', 'Statement.PDF') == 'documents/d4/d41d8cd98f00b204e9800998ecf8427e.pdf'
+
+def test_s3_store_stream_uses_multipart_upload(s3_storage):
+    # Eleven MiB in small chunks: two full 5 MiB parts and a final short one
+    data = os.urandom(11 * 1024 * 1024)
+    with patch.object(s3_storage.client, 'upload_part', wraps=s3_storage.client.upload_part) as upload_part:
+        size = s3_storage.store_stream('documents/big.pdf', _chunks(data, 64 * 1024), 'application/pdf')
+
+    # Assert that the parts were uploaded separately and reassemble to the original bytes
+    assert size == len(data)
+    assert upload_part.call_count == 3
+    assert s3_storage.size('documents/big.pdf') == len(data)
+    assert b''.join(s3_storage.read_range('documents/big.pdf')) == data
+
+def test_s3_small_stream_is_a_single_put(s3_storage):
+    with patch.object(s3_storage.client, 'create_multipart_upload') as create_multipart_upload:
+        s3_storage.store_stream('documents/small.pdf', [b'%PDF', b'-1.4'])
+
+    assert not create_multipart_upload.called
+    assert b''.join(s3_storage.read_range('documents/small.pdf')) == b'%PDF-1.4'
+
+def test_s3_failed_stream_aborts_the_multipart_upload(s3_storage):
+    def failing_chunks():
+        yield os.urandom(6 * 1024 * 1024)
+        raise IOError("client disconnected")
+
+    with pytest.raises(IOError):
+        s3_storage.store_stream('documents/broken.pdf', failing_chunks())
+
+    # Assert that no upload is left open and no object was created
+    assert s3_storage.client.list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []
+    with pytest.raises(FileNotFoundError):
+        s3_storage.size('documents/broken.pdf')
+
+def test_s3_ranged_read_and_local_file(s3_storage, tmp_path):
+    data = os.urandom(300 * 1024)
+    source = tmp_path / 'statement.pdf'
+    source.write_bytes(data)
+    s3_storage.store_file('documents/statement.pdf', str(source), 'application/pdf')
+
+    # Assert that a range is served from S3 and the uploaded source file was consumed
+    assert not source.exists()
+    assert b''.join(s3_storage.read_range('documents/statement.pdf', 100, 199)) == data[100:200]
+
+    # Assert that a temporary local copy is available for tools that need a path, and removed afterwards
+    with patch.object(settings, 'TEMP_UPLOAD_DIR', str(tmp_path / 'tmp')):
+        with s3_storage.local_file('documents/statement.pdf') as path:
+            with open(path, 'rb') as file:
+                assert file.read() == data
+    assert not os.path.exists(path)
+
+def test_s3_presigned_url_names_the_object(s3_storage):
+    url = s3_storage.presigned_url('documents/statement.pdf', expires_in=60, filename='statement.pdf')
+
+    assert BUCKET in url and 'documents/statement.pdf' in url
+    assert 'Signature' in url or 'X-Amz-Signature' in url
+
+def test_s3_presigned_url_displays_inline_unless_asked_to_download(s3_storage):
+    from urllib.parse import parse_qs, urlparse
+
+    # Assert that the browser is told to display the document, as for locally stored documents
+    inline = parse_qs(urlparse(s3_storage.presigned_url('documents/statement.pdf', filename='march "final".pdf')).query)
+    assert inline['response-content-disposition'] == ['inline; filename="march final.pdf"']
+
+    # Assert that callers can still force a download
+    attachment = parse_qs(urlparse(s3_storage.presigned_url('documents/statement.pdf', filename='statement.pdf', disposition='attachment')).query)
+    assert attachment['response-content-disposition'] == ['attachment; filename="statement.pdf"']
+
+def test_stored_ocr_lets_textract_read_from_s3():
+    from src.services.ocr_engine import OCREngine
+
+    # Textract is pointed at the object instead of receiving its bytes
+    storage = Mock()
+    storage.s3_location.return_value = (BUCKET, 'documents/ab/abc.pdf')
+    with patch('boto3.client'), patch('src.services.ocr_engine.get_storage', return_value=storage):
+        ocr_engine = OCREngine()
+        ocr_engine.textract_client.analyze_document.return_value = {'Blocks': []}
+        ocr_engine.perform_stored_ocr('documents/ab/abc.pdf')
+
+    ocr_engine.textract_client.analyze_document.assert_called_once_with(
+        Document={'S3Object': {'Bucket': BUCKET, 'Name': 'documents/ab/abc.pdf'}},
+        FeatureTypes=['FORMS', 'TABLES']
+    )
+    assert not storage.local_file.called
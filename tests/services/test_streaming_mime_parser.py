@@ -0,0 +1,120 @@
+import hashlib
+import os
+import tracemalloc
+from email import message_from_bytes
+from email.message import EmailMessage
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import pytest
+from src.services.streaming_mime_parser import StreamingMimeParser
+
+def _chunks(data: bytes, size: int):
+    # Yield the raw message in fixed-size pieces, as partial IMAP fetches would
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+def _stdlib_attachments(raw: bytes):
+    # Reference result: decoded payloads of every part with a Content-Disposition
+    message = message_from_bytes(raw)
+    return [
+        (part.get_filename(), part.get_payload(decode=True))
+        for part in message.walk()
+        if part.get_content_maintype() != 'multipart' and part.get('Content-Disposition') is not None
+    ]
+
+def _streamed_attachments(result):
+    attachments = []
+    for attachment in result['attachments']:
+        with open(attachment.file_path, 'rb') as f:
+            attachments.append((attachment.filename, f.read()))
+    return attachments
+
+def _nested_message() -> bytes:
+    # multipart/mixed with a multipart/alternative body and three differently encoded attachments
+    message = EmailMessage()
+    message['Subject'] = 'Statements for Riverside Diner'
+    message['From'] = 'Broker <broker@example.com>'
+    message['Date'] = 'Mon, 02 Oct 2023 10:00:00 +0000'
+    message['Message-ID'] = '<abc@example.com>'
+    message.set_content('Plain body\nsecond line\n')
+    message.add_alternative('<p>HTML body</p>', subtype='html')
+    message.make_mixed()
+    message.add_attachment(os.urandom(200000), maintype='application', subtype='pdf', filename='statement.pdf')
+    message.add_attachment('Name: Riverside Diner\r\nAmount: $50,000 =\r\n', subtype='plain', filename='notes.txt', cte='quoted-printable')
+    message.add_attachment(b'\x00\x01binary\r\n--not-a-boundary\r\n', maintype='application', subtype='octet-stream', filename='raw.bin', cte='base64')
+    return message.as_bytes()
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 4096, 1 << 20])
+def test_attachments_match_stdlib_parser(tmp_path, chunk_size):
+    raw = _nested_message()
+
+    # Parse the same message with the streaming parser at several chunk sizes
+    result = StreamingMimeParser(str(tmp_path), chunk_size=chunk_size).parse(_chunks(raw, chunk_size))
+
+    # Assert that every attachment decodes to the same bytes as with the stdlib parser
+    assert _streamed_attachments(result) == _stdlib_attachments(raw)
+
+    # Assert that sizes and hashes were computed while decoding
+    for attachment in result['attachments']:
+        with open(attachment.file_path, 'rb') as f:
+            content = f.read()
+        assert attachment.file_size == len(content)
+        assert attachment.md5_hash == hashlib.md5(content).hexdigest()
+
+def test_headers_and_body_are_extracted(tmp_path):
+    raw = _nested_message()
+
+    result = StreamingMimeParser(str(tmp_path), chunk_size=64).parse(_chunks(raw, 64))
+
+    # Assert that headers and the first text/plain body match the message
+    assert result['subject'] == 'Statements for Riverside Diner'
+    assert result['sender'] == 'Broker <broker@example.com>'
+    assert result['date'] == 'Mon, 02 Oct 2023 10:00:00 +0000'
+    assert result['message_id'] == '<abc@example.com>'
+    assert result['body'] == message_from_bytes(raw).get_payload(0).get_payload(0).get_payload(decode=True).decode()
+
+def test_mime_multipart_with_crlf_line_endings(tmp_path):
+    # Build a message the way many mail clients do, with CRLF line endings throughout
+    message = MIMEMultipart()
+    message['Subject'] = 'Application'
+    message.attach(MIMEText('See attached', 'plain'))
+    attachment = MIMEApplication(os.urandom(5000), Name='license.pdf')
+    attachment['Content-Disposition'] = 'attachment; filename="license.pdf"'
+    message.attach(attachment)
+    raw = message.as_bytes().replace(b'\n', b'\r\n')
+
+    result = StreamingMimeParser(str(tmp_path), chunk_size=100).parse(_chunks(raw, 100))
+
+    # Assert that the attachment matches the stdlib parser byte for byte
+    assert _streamed_attachments(result) == _stdlib_attachments(raw)
+    assert result['body'] == 'See attached'
+
+def test_single_part_message_has_no_attachments(tmp_path):
+    raw = b'Subject: Hello\r\nFrom: a@example.com\r\n\r\nJust text\r\n'
+
+    result = StreamingMimeParser(str(tmp_path), chunk_size=8).parse(_chunks(raw, 8))
+
+    # Assert that the whole body is text and nothing is written to disk
+    assert result['body'] == 'Just text\r\n'
+    assert result['attachments'] == []
+    assert os.listdir(tmp_path) == []
+
+def test_peak_memory_is_bounded_by_chunk_size(tmp_path):
+    # A 5 MB scanned PDF, base64 encoded to roughly 6.8 MB of message
+    message = EmailMessage()
+    message['Subject'] = 'Large statement'
+    message.set_content('Attached')
+    message.add_attachment(os.urandom(5 * 1024 * 1024), maintype='application', subtype='pdf', filename='scan.pdf')
+    raw = message.as_bytes()
+    chunk_size = 64 * 1024
+
+    # Measure allocations made while parsing only
+    tracemalloc.start()
+    result = StreamingMimeParser(str(tmp_path), chunk_size=chunk_size).parse(_chunks(raw, chunk_size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Assert that the attachment was decoded in full while memory stayed within a few chunks
+    assert result['attachments'][0].file_size == 5 * 1024 * 1024
+    assert peak < 8 * chunk_size
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from src.api.models.transaction import Transaction
+from src.core.config import settings
+from src.services.storage import LocalStorage
+from src.services.transaction_store import (
+    load_transactions, read_parquet_sidecar, save_transactions, store_extracted_data, transaction_columns,
+)
+
+TRANSACTIONS = [
+    {'date': '01/03/2023', 'description': 'CARD SETTLEMENT', 'amount': '1,200.00', 'balance': '11,200.00'},
+    {'date': '01/04/2023', 'description': 'RENT', 'amount': '(2,500.00)', 'balance': None},
+]
+
+@pytest.fixture
+def db():
+    engine = create_engine('sqlite://')
+    Transaction.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+def test_transactions_are_loaded_as_columns_in_statement_order(db):
+    save_transactions(db, 'doc-1', transaction_columns(TRANSACTIONS))
+    save_transactions(db, 'doc-2', transaction_columns(TRANSACTIONS[:1]))
+
+    assert load_transactions(db, 'doc-1') == {
+        'date': ['01/03/2023', '01/04/2023'],
+        'description': ['CARD SETTLEMENT', 'RENT'],
+        'amount': [Decimal('1200.00'), Decimal('-2500.00')],
+        'balance': [Decimal('11200.00'), None],
+    }
+    assert load_transactions(db, 'doc-3') == {'date': [], 'description': [], 'amount': [], 'balance': []}
+
+def test_saving_again_replaces_the_transactions(db):
+    save_transactions(db, 'doc-1', transaction_columns(TRANSACTIONS))
+
+    assert save_transactions(db, 'doc-1', transaction_columns(TRANSACTIONS[1:])) == 1
+    assert load_transactions(db, 'doc-1')['description'] == ['RENT']
+
+def test_postgresql_rows_are_streamed_with_copy():
+    db = MagicMock()
+    connection = db.connection.return_value
+    connection.dialect.driver = 'psycopg2'
+    cursor = connection.connection.cursor.return_value
+    copied = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.append((sql, buffer.read()))
+
+    transactions = TRANSACTIONS + [{'date': '01/05/2023', 'description': 'WIRE\tREF\\42', 'amount': '10.00'}]
+    save_transactions(db, 'doc-1', transaction_columns(transactions))
+
+    # Assert that every row went through one COPY, in text format with NULLs and escapes
+    sql, data = copied[0]
+    assert sql.startswith('COPY transactions (document_id, position, date, description, amount, balance)')
+    assert data.split('\n') == [
+        'doc-1\t0\t01/03/2023\tCARD SETTLEMENT\t1200.00\t11200.00',
+        'doc-1\t1\t01/04/2023\tRENT\t-2500.00\t\\N',
+        'doc-1\t2\t01/05/2023\tWIRE\\tREF\\\\42\t10.00\t\\N',
+        '',
+    ]
+    assert not connection.execute.called
+    cursor.close.assert_called_once()
+
+def test_fields_are_stored_on_the_document_and_transactions_in_their_table(db):
+    document = SimpleNamespace(id='doc-1', application_id='app-1', type='bank_statement', file_path='documents/ab/abc.pdf', extracted_data=None)
+
+    with patch('src.services.transaction_store.record_identity_keys') as record_identity_keys:
+        store_extracted_data(db, document, {'account_number': '1234', 'transactions': TRANSACTIONS})
+
+    record_identity_keys.assert_called_once_with(db, 'doc-1', 'app-1', 'bank_statement', {'account_number': '1234'})
+
+    assert document.extracted_data == {'account_number': '1234', 'transaction_count': 2}
+    assert len(load_transactions(db, 'doc-1')['amount']) == 2
+
+def test_parquet_sidecar_holds_the_transactions(db, tmp_path):
+    pytest.importorskip('pyarrow')
+    storage = LocalStorage(str(tmp_path))
+    document = SimpleNamespace(id='doc-1', application_id='app-1', type='bank_statement', file_path='documents/ab/abc.pdf', extracted_data=None)
+
+    with patch.object(settings, 'TRANSACTION_PARQUET_SIDECAR', True), patch('src.services.transaction_store.record_identity_keys'):
+        store_extracted_data(db, document, {'transactions': TRANSACTIONS}, storage)
+
+    table = read_parquet_sidecar(storage, document.file_path)
+    assert table.column('amount').to_pylist() == [Decimal('1200.00'), Decimal('-2500.00')]
+    assert read_parquet_sidecar(storage, 'documents/cd/cde.pdf') is None
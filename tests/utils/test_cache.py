@@ -0,0 +1,67 @@
+import time
+from src.utils.cache import TTLCache
+
+def test_get_returns_cached_value():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+
+    # Store a value and read it back
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    # Assert that missing keys return None
+    assert cache.get("missing") is None
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_size=10, ttl_seconds=0.05)
+
+    # Store a value and wait for it to expire
+    cache.set("key", "value")
+    time.sleep(0.1)
+
+    # Assert that the expired entry is gone
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+def test_per_entry_ttl_cannot_exceed_default():
+    cache = TTLCache(max_size=10, ttl_seconds=0.05)
+
+    # Ask for a longer TTL than the cache allows
+    cache.set("key", "value", ttl_seconds=60)
+    time.sleep(0.1)
+
+    # Assert that the default TTL still applies
+    assert cache.get("key") is None
+
+def test_non_positive_ttl_is_not_cached():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+
+    # An already-expired entry should never be stored
+    cache.set("key", "value", ttl_seconds=-1)
+    assert cache.get("key") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60)
+
+    # Fill the cache and touch the first entry
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    # Adding a third entry should evict "b"
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_pop_and_clear():
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    # Remove a single entry
+    cache.pop("a")
+    assert cache.get("a") is None
+
+    # Remove everything
+    cache.clear()
+    assert len(cache) == 0
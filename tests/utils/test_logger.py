@@ -0,0 +1,88 @@
+import json
+import logging
+import queue
+from unittest.mock import Mock
+from src.utils.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, TextFormatter
+
+def _make_record(level=logging.INFO, msg="message %s", args=("arg",), **extra):
+    # Build a LogRecord the way Logger.makeRecord does, including extra attributes
+    record = logging.LogRecord("test", level, __file__, 10, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter_renders_message_and_fields():
+    record = _make_record(fields={"document_id": "doc-1", "pages": 3})
+
+    # Format the record and parse the JSON output
+    payload = json.loads(JsonFormatter().format(record))
+
+    # Assert that the message is interpolated and the fields are included
+    assert payload["message"] == "message arg"
+    assert payload["level"] == "INFO"
+    assert payload["document_id"] == "doc-1"
+    assert payload["pages"] == 3
+
+def test_json_formatter_evaluates_callable_fields_lazily():
+    expensive = Mock(return_value={"errors": []})
+    record = _make_record(fields={"results": expensive})
+
+    # Assert that the callable is not evaluated before formatting
+    expensive.assert_not_called()
+
+    # Assert that formatting evaluates it exactly once
+    payload = json.loads(JsonFormatter().format(record))
+    expensive.assert_called_once()
+    assert payload["results"] == {"errors": []}
+
+def test_sampling_filter_keeps_one_in_n_marked_info_records():
+    sampling_filter = SamplingFilter(sample_every=5)
+
+    # Feed ten marked INFO records from the same call site
+    kept = [sampling_filter.filter(_make_record(sampled=True)) for _ in range(10)]
+
+    # Assert that only every fifth record is kept
+    assert kept.count(True) == 2
+
+def test_sampling_filter_passes_unmarked_and_non_info_records():
+    sampling_filter = SamplingFilter(sample_every=100)
+
+    # Assert that unmarked INFO records and marked WARNING records always pass
+    assert all(sampling_filter.filter(_make_record()) for _ in range(10))
+    assert all(sampling_filter.filter(_make_record(level=logging.WARNING, sampled=True)) for _ in range(10))
+
+def test_text_formatter_appends_fields():
+    record = _make_record(fields={"document_id": "doc-1", "results": Mock(return_value={"errors": []})})
+
+    # Assert that plain text lines carry the same fields as JSON ones
+    line = TextFormatter("%(levelname)s %(message)s").format(record)
+    assert line == 'INFO message arg document_id="doc-1" results={"errors": []}'
+    assert TextFormatter("%(message)s").format(_make_record()) == "message arg"
+
+def test_queue_handler_interpolates_the_message_in_the_caller():
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    expensive = Mock(return_value=1)
+    arg = ["before"]
+
+    # Emit a record whose argument changes right after the call
+    record = _make_record(msg="message %s", args=(arg,), fields={"cost": expensive})
+    handler.handle(record)
+    arg[0] = "after"
+
+    # Assert that the queued copy holds the message as logged, with lazy fields still unevaluated
+    queued = log_queue.get_nowait()
+    assert (queued.msg, queued.args) == ("message ['before']", None)
+    assert queued.getMessage() == "message ['before']"
+    expensive.assert_not_called()
+    assert record.msg == "message %s"
+
+def test_queue_handler_drops_records_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+    # Emit more records than the queue holds
+    for _ in range(3):
+        handler.handle(_make_record())
+
+    # Assert that the overflow was dropped instead of blocking or raising
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+import pytest
+from src.utils.tracing import current_span, document_processing_latency, ingestion_latency, record_application_ingested, record_document_processed, stage_latency, trace_stage
+
+def test_trace_stage_records_latency():
+    before = stage_latency.snapshot(stage="test_stage", outcome="ok")["count"]
+
+    # Run a traced stage
+    with trace_stage("test_stage") as span:
+        pass
+
+    # Assert that the duration was measured and recorded
+    assert span.duration is not None and span.duration >= 0
+    assert stage_latency.snapshot(stage="test_stage", outcome="ok")["count"] == before + 1
+
+def test_trace_stage_records_errors_separately():
+    before = stage_latency.snapshot(stage="failing_stage", outcome="error")["count"]
+
+    # Raise inside a traced stage
+    with pytest.raises(ValueError):
+        with trace_stage("failing_stage"):
+            raise ValueError("boom")
+
+    # Assert that the failure was recorded with the error outcome
+    assert stage_latency.snapshot(stage="failing_stage", outcome="error")["count"] == before + 1
+
+def test_nested_stages_inherit_identifiers():
+    # Open an outer span with an application id and a nested span with a document id
+    with trace_stage("outer", application_id="app-1"):
+        with trace_stage("inner", document_id="doc-1") as inner:
+            # Assert that the inner span carries both identifiers
+            assert inner.attributes == {"application_id": "app-1", "document_id": "doc-1"}
+            assert current_span() is inner
+
+    # Assert that the span context is restored afterwards
+    assert current_span() is None
+
+def test_record_application_ingested_buckets_by_latency():
+    before = ingestion_latency.snapshot()["buckets"][300.0]
+
+    # Record an application stored four minutes after receipt
+    received = datetime(2024, 1, 1, 12, 0, 0)
+    record_application_ingested(received, received + timedelta(minutes=4))
+
+    # Assert that it counts towards the 5 minute bucket
+    assert ingestion_latency.snapshot()["buckets"][300.0] == before + 1
+
+def test_record_document_processed_buckets_by_latency():
+    before = document_processing_latency.snapshot()["buckets"]
+
+    # Record a document extracted six minutes after its email was received
+    received = datetime(2024, 1, 1, 12, 0, 0)
+    record_document_processed(received, received + timedelta(minutes=6))
+
+    # Assert that it misses the 5 minute bucket
+    after = document_processing_latency.snapshot()["buckets"]
+    assert (after[300.0], after[450.0]) == (before[300.0], before[450.0] + 1)
@@ -0,0 +1,36 @@
+from src.utils.validators import (
+    validate_account_number, validate_account_numbers, validate_ein, validate_eins, validate_email, validate_emails,
+    validate_ssn, validate_ssns,
+)
+
+def test_validate_ssn():
+    assert validate_ssn("123-45-6789")
+    assert validate_ssn("123456789")
+
+    # Assert that numbers the SSA never issues and inconsistent dashes are rejected
+    for ssn in ("000-45-6789", "666-45-6789", "912-45-6789", "123-00-6789", "123-45-0000", "12345-6789", "123-45-678"):
+        assert not validate_ssn(ssn)
+
+def test_validate_ein():
+    assert validate_ein("12-3456789")
+    assert validate_ein(" 983456789 ")
+
+    # Assert that prefixes no IRS campus assigns are rejected
+    assert not validate_ein("07-3456789")
+    assert not validate_ein("12-345678")
+
+def test_validate_account_number():
+    for account_number in ("1234567890", "0012-3456-78", "XXXXXX4567", "****4567"):
+        assert validate_account_number(account_number)
+    for account_number in ("123", "12345678901234567890", "ABC12345", ""):
+        assert not validate_account_number(account_number)
+
+def test_non_strings_are_invalid():
+    assert not validate_email(None)
+    assert not validate_ein(123456789)
+
+def test_batch_variants_return_a_mask_per_value():
+    assert validate_emails(["user@example.com", "user@example", None]).tolist() == [True, False, False]
+    assert validate_ssns(["123-45-6789", "666-45-6789"]).tolist() == [True, False]
+    assert validate_eins(iter(["12-3456789", "00-3456789"])).tolist() == [True, False]
+    assert validate_account_numbers([]).tolist() == []